@@ -0,0 +1,99 @@
+"""ヘッジリクエストベンチマーク：ロングテール遅延の下でp99がどれだけ縮むかを測るのだ
+
+使い方（リポジトリ直下で実行）:
+    python -m benchmarks.hedging_benchmark --runs 200
+
+モックサーバは大半を2〜3秒、一部を15秒以上で返す分布を --scale 倍に縮めて再現するのだ。
+"""
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from src.config import Config
+from src.hedging import LatencyTracker
+from src.mock_server import MockVisionServer
+from src.ocr_client import OcrClient
+
+
+def make_sampler(scale: float, tail_probability: float, seed: int):
+    """大半が2〜3秒・一部が15〜20秒になる遅延分布を作るのだ"""
+    rng = random.Random(seed)
+
+    def sample() -> float:
+        if rng.random() < tail_probability:
+            return rng.uniform(15.0, 20.0) * scale
+        return rng.uniform(2.0, 3.0) * scale
+
+    return sample
+
+
+def run(endpoint: str, hedge: bool, runs: int, max_ratio: float) -> Dict[str, float]:
+    """runs 回OCRして応答時間の分布を返すのだ"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config = Config(
+            azure_openai_endpoint=endpoint,
+            azure_openai_key="mock-key",
+            azure_openai_model="gpt-4.1-mini",
+            data_dir=Path(temp_dir),
+            ocr_timeout_sec=60.0,
+            ocr_hedge_enabled=hedge,
+            ocr_hedge_max_ratio=max_ratio
+        )
+        client = OcrClient(config)
+        # ヘッジ側は最小待ち時間を縮尺に合わせるのだ
+        if client.hedge_policy is not None:
+            client.hedge_policy.min_delay_sec = 0.0
+
+        tracker = LatencyTracker(window=runs)
+        latencies: List[float] = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            client.extract_text_from_bytes(b"benchmark frame")
+            latency = time.perf_counter() - started
+            tracker.record(latency)
+            latencies.append(latency)
+
+        hedge_stats = client.hedge_policy.get_stats() if client.hedge_policy else {}
+
+    return {
+        "p50": tracker.percentile(50) or 0.0,
+        "p95": tracker.percentile(95) or 0.0,
+        "p99": tracker.percentile(99) or 0.0,
+        "hedge_rate": hedge_stats.get("hedge_rate", 0.0),
+        "hedge_wins": hedge_stats.get("hedge_wins", 0)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ヘッジ有無でOCRのp50/p95/p99を比較するのだ")
+    parser.add_argument("--runs", type=int, default=200, help="条件ごとの試行回数")
+    parser.add_argument("--scale", type=float, default=0.02, help="遅延分布の縮尺（1.0で実時間）")
+    parser.add_argument("--tail", type=float, default=0.05, help="ロングテールになる確率")
+    parser.add_argument("--max-ratio", type=float, default=0.1, help="ヘッジ率の上限")
+    parser.add_argument("--seed", type=int, default=0, help="遅延分布の乱数シード")
+    args = parser.parse_args()
+
+    results = {}
+    for hedge in (False, True):
+        server = MockVisionServer(latency_sampler=make_sampler(args.scale, args.tail, args.seed))
+        endpoint = server.start()
+        try:
+            results["hedged" if hedge else "baseline"] = run(endpoint, hedge, args.runs, args.max_ratio)
+        finally:
+            server.stop()
+
+    print(f"{'mode':<10}{'p50':>9}{'p95':>9}{'p99':>9}{'hedge rate':>12}{'wins':>6}")
+    for mode, summary in results.items():
+        print(f"{mode:<10}{summary['p50']:>8.3f}s{summary['p95']:>8.3f}s{summary['p99']:>8.3f}s"
+              f"{summary['hedge_rate']:>12.1%}{summary['hedge_wins']:>6}")
+
+    baseline, hedged = results["baseline"], results["hedged"]
+    if baseline["p99"] > 0:
+        print(f"📉 p99 {1 - hedged['p99'] / baseline['p99']:.0%} 減")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""OCR応答形式ベンチマーク：自由記述と構造化JSONのレイテンシ・トークンを比べるのだ
+
+使い方（リポジトリ直下で実行）:
+    python -m benchmarks.ocr_format_benchmark --runs 20
+    python -m benchmarks.ocr_format_benchmark --endpoint https://your-resource.openai.azure.com --key ...
+
+--endpoint を省略するとローカルのモックVisionサーバを起動して計測するのだ。
+"""
+import argparse
+import io
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from src.config import Config
+from src.mock_server import MockVisionServer
+from src.ocr_client import OcrClient
+
+
+def make_sample_image() -> bytes:
+    """計測用のスクリーンショット風画像を作るのだ"""
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGB", (1280, 720), "white")
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((0, 0, 240, 720), fill=(30, 30, 40))
+    for i in range(30):
+        draw.text((260, 10 + i * 22), f"def handler_{i}(request): return process(request, {i})", fill="black")
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=70)
+    return buffer.getvalue()
+
+
+def run_format(
+    endpoint: str, key: str, model: str, response_format: str, image_bytes: bytes, runs: int
+) -> Dict[str, float]:
+    """1つの応答形式で runs 回OCRして中央値を返すのだ"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config = Config(
+            azure_openai_endpoint=endpoint,
+            azure_openai_key=key,
+            azure_openai_model=model,
+            data_dir=Path(temp_dir),
+            ocr_response_format=response_format
+        )
+        client = OcrClient(config)
+
+        latencies: List[float] = []
+        tokens: List[int] = []
+        failures = 0
+        for _ in range(runs):
+            started = time.perf_counter()
+            result = client.extract_text_from_bytes(image_bytes)
+            elapsed = time.perf_counter() - started
+            if not result.is_success():
+                failures += 1
+                continue
+            latencies.append(elapsed)
+            tokens.append(result.tokens_used)
+
+    return {
+        "median_latency_sec": statistics.median(latencies) if latencies else float("nan"),
+        "median_tokens": statistics.median(tokens) if tokens else float("nan"),
+        "failures": failures
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="OCR応答形式（text/json）のレイテンシとトークンを比較するのだ")
+    parser.add_argument("--endpoint", help="Azure OpenAIエンドポイント（省略時はローカルモック）")
+    parser.add_argument("--key", default="mock-key", help="APIキー")
+    parser.add_argument("--model", default="gpt-4.1-mini", help="デプロイ名")
+    parser.add_argument("--runs", type=int, default=10, help="形式ごとの試行回数")
+    parser.add_argument("--base-latency", type=float, default=0.3, help="モックの基本遅延（秒）")
+    parser.add_argument("--per-token-latency", type=float, default=0.005, help="モックの出力トークンあたり遅延（秒）")
+    args = parser.parse_args()
+
+    mock_server = None
+    endpoint = args.endpoint
+    if endpoint is None:
+        mock_server = MockVisionServer(
+            base_latency_sec=args.base_latency,
+            per_token_latency_sec=args.per_token_latency
+        )
+        endpoint = mock_server.start()
+        print(f"🧪 モックVisionサーバ: {endpoint}")
+
+    try:
+        image_bytes = make_sample_image()
+        results = {
+            response_format: run_format(
+                endpoint, args.key, args.model, response_format, image_bytes, args.runs
+            )
+            for response_format in ("text", "json")
+        }
+    finally:
+        if mock_server is not None:
+            mock_server.stop()
+
+    print(f"{'format':<8}{'median latency':>16}{'median tokens':>15}{'failures':>10}")
+    for response_format, summary in results.items():
+        print(f"{response_format:<8}{summary['median_latency_sec']:>15.3f}s"
+              f"{summary['median_tokens']:>15.0f}{summary['failures']:>10}")
+
+    text, structured = results["text"], results["json"]
+    if text["median_latency_sec"] > 0 and text["median_tokens"] > 0:
+        print(f"📉 レイテンシ {1 - structured['median_latency_sec'] / text['median_latency_sec']:.0%} 減 / "
+              f"トークン {1 - structured['median_tokens'] / text['median_tokens']:.0%} 減")
+
+
+if __name__ == "__main__":
+    main()
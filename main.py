@@ -1,37 +1,73 @@
-"""keyframe フェーズ3: 設定＋キーログ＋スクリーンショット＋OCR＋JSONL出力なのだ"""
+"""keyframe フェーズ3: 設定＋キーログ＋スクリーンショット＋OCR＋JSONL出力なのだ
+
+import時間も含めた起動計測は run.py --profile-startup から起動するのだ。
+"""
+import os
 import signal
 import sys
+import time
 from datetime import datetime, timezone
+from typing import Optional
+
+from src.active_window import ActiveWindowService
+from src.change_monitor import ChangeMonitor, ScreenEvent
 from src.config import ConfigLoader
-from src.scheduler import TimeSlicer
-from src.keylogger import KeyLogger
+from src.encoder_pool import EncoderPool
 from src.jsonl_writer import JsonlWriter
-from src.screenshot import ScreenshotService
-from src.active_window import ActiveWindowService
+from src.keylogger import KeyLogger
 from src.ocr_worker import OcrWorker
+from src.scheduler import TimeSlicer
+from src.screenshot import ScreenshotService
+from src.startup_profile import StartupProfiler
 
 
-def main():
+def main(startup_profiler: Optional[StartupProfiler] = None):
     print("🎵 keyframe フェーズ3 開始なのだ")
+    if startup_profiler is not None:
+        startup_profiler.mark("imports_done")
     
     try:
         # 設定読み込みなのだ
         loader = ConfigLoader()
         config = loader.load()
         
-        print(f"✅ 設定読み込み完了なのだ")
+        print("✅ 設定読み込み完了なのだ")
         print(f"   - Azure エンドポイント: {config.azure_openai_endpoint}")
         print(f"   - データディレクトリ: {config.data_dir}")
         print(f"   - 実行間隔: {config.interval_sec}秒")
+        if startup_profiler is not None:
+            startup_profiler.mark("config_loaded")
         
         # コンポーネント初期化なのだ
         key_logger = KeyLogger()
         jsonl_writer = JsonlWriter(config.data_dir)
-        screenshot_service = ScreenshotService(config.data_dir / "cache")
+        encoder_pool = None
+        if config.encoder_processes > 0:
+            encoder_pool = EncoderPool(processes=config.encoder_processes)
+            encoder_pool.start()
+            print(f"   - エンコーダプロセス: {config.encoder_processes}個")
+        screenshot_service = ScreenshotService(config.data_dir / "cache", encoder_pool=encoder_pool)
         active_window_service = ActiveWindowService()
         ocr_worker = OcrWorker(config, jsonl_writer, config.data_dir / "cache")
         slicer = TimeSlicer(config.interval_sec)
         
+        timeline_archive = None
+        if config.archive_enabled:
+            # PILの差分処理を使うのでアーカイブ有効時だけ読み込むのだ
+            from src.timeline_archive import TimelineArchive
+            timeline_archive = TimelineArchive(
+                config.data_dir / "archive",
+                max_size_gb=config.archive_max_gb,
+                keyframe_interval=config.archive_keyframe_interval
+            )
+            print(f"   - 画面アーカイブ: {timeline_archive.archive_dir}（上限{config.archive_max_gb}GB）")
+        
+        if startup_profiler is not None:
+            startup_profiler.mark("components_ready")
+        
+        # 直近のインターバルレコード時刻（画面イベントの紐付け用）なのだ
+        interval_state = {"last_ts": None}
+        
         def record_typing_stats():
             """タイピング統計とスクリーンショットを記録してOCR処理するのだ"""
             now = datetime.now(timezone.utc)
@@ -40,6 +76,10 @@ def main():
             screenshot_path = screenshot_service.capture_and_save(timestamp=now)
             screenshot_path_str = str(screenshot_path) if screenshot_path else None
             
+            # OCR後に削除される前にタイムラインへ保存なのだ
+            if screenshot_path and timeline_archive is not None:
+                timeline_archive.add_frame(screenshot_path, now)
+            
             # アクティブウィンドウ情報取得なのだ
             window_info = active_window_service.get_active_window_info()
             
@@ -56,6 +96,11 @@ def main():
                 active_title=window_info["active_title"],
                 ocr_text=""  # OCR結果は後で更新
             )
+            interval_state["last_ts"] = now
+            if startup_profiler is not None and not startup_profiler.has_mark("first_record"):
+                startup_profiler.mark("first_record")
+                startup_profiler.uninstall()
+                print(startup_profiler.report())
             
             # OCRワーカーにスクリーンショットを渡す（成功/失敗問わず削除される）
             ocr_success = False
@@ -63,7 +108,8 @@ def main():
                 ocr_success = ocr_worker.add_screenshot_for_ocr(
                     screenshot_path, 
                     timestamp=now,
-                    delete_original=True
+                    delete_original=True,
+                    typing_active=not stats.idle
                 )
             
             # ログ出力なのだ
@@ -75,14 +121,72 @@ def main():
         
         slicer.add_callback(record_typing_stats, "typing_recorder")
         
+        def record_screen_event(event: ScreenEvent):
+            """画面変化・アプリ切替時に追加撮影してOCRするのだ"""
+            screenshot_path = None
+            if event.ocr_allowed:
+                screenshot_path = screenshot_service.capture_and_save(timestamp=event.ts_utc)
+                if screenshot_path and timeline_archive is not None:
+                    timeline_archive.add_frame(screenshot_path, event.ts_utc)
+            
+            jsonl_writer.write_screen_event(
+                event.ts_utc,
+                event.reason,
+                change_score=event.change_score,
+                interval_start_utc=interval_state["last_ts"],
+                interval_sec=config.interval_sec,
+                screenshot_path=str(screenshot_path) if screenshot_path else None,
+                active_app=event.active_app,
+                active_title=event.active_title
+            )
+            
+            if screenshot_path:
+                ocr_worker.add_screenshot_for_ocr(
+                    screenshot_path,
+                    timestamp=event.ts_utc,
+                    delete_original=True,
+                    force_full=True  # イベント撮影は大きな変化なのでフルモデルに送るのだ
+                )
+            
+            print(f"📸 画面イベント: {event.reason} (差分:{event.change_score:.3f}) "
+                  f"App:{event.active_app} OCR:{'✅' if event.ocr_allowed else '⏭️'}")
+        
+        change_monitor = None
+        if config.change_monitor_enabled:
+            change_monitor = ChangeMonitor(
+                on_event=record_screen_event,
+                thumbnail_source=screenshot_service.capture_thumbnail,
+                window_info_source=(
+                    active_window_service.get_active_window_info
+                    if active_window_service.is_available() else None
+                ),
+                check_interval_sec=config.change_check_interval_sec,
+                change_threshold=config.change_threshold,
+                min_event_interval_sec=config.change_min_interval_sec,
+                max_ocr_per_hour=config.change_max_ocr_per_hour
+            )
+        
         # OCRワーカーの定期処理を追加
         slicer.add_callback(ocr_worker.create_periodic_callback(), "ocr_worker")
         
         # Ctrl+C ハンドラなのだ
+        shutdown_state = {"started": False}
+        
         def signal_handler(sig, frame):
-            print("\n🛑 停止シグナル受信、終了処理中なのだ...")
+            if shutdown_state["started"]:
+                print("\n⚠️ 停止シグナル2回目、待たずに終了するのだ")
+                os._exit(1)
+            shutdown_state["started"] = True
+            print(f"\n🛑 停止シグナル受信、終了処理中なのだ...（最大{config.shutdown_deadline_sec:.0f}秒）")
+            deadline = time.monotonic() + config.shutdown_deadline_sec
+            
+            # 新しい作業の受付を止めるのだ（実行中のtickは期限まで待つ）
+            ocr_worker.stop_accepting()
+            if not slicer.stop(timeout=max(0.0, deadline - time.monotonic())):
+                print("⚠️ 実行中のtickが期限内に終わらなかったのだ")
+            if change_monitor is not None:
+                change_monitor.stop()
             key_logger.stop()
-            slicer.stop()
             print(f"📁 データファイル: {jsonl_writer.get_today_file_path()}")
             print(f"📊 今日のレコード数: {jsonl_writer.count_records()}")
             
@@ -91,10 +195,46 @@ def main():
             print(f"🖼️  キャッシュファイル数: {cache_stats.get('file_count', 0)}")
             print(f"💾 キャッシュサイズ: {cache_stats.get('total_size_mb', 0):.1f}MB")
             
+            if timeline_archive is not None:
+                archive_stats = timeline_archive.get_stats()
+                print(f"🎞️  アーカイブ: {archive_stats['frames']}フレーム "
+                      f"{archive_stats['total_size_mb']:.1f}MB "
+                      f"(JPEG比 {archive_stats['storage_ratio']:.0%})")
+            
             # OCR統計表示
             ocr_stats = ocr_worker.get_stats()
             print(f"🔍 OCR処理数: {ocr_stats['successful_ocr']}成功/{ocr_stats['failed_ocr']}失敗")
-            print(f"🔄 リトライキュー: {ocr_stats['retry_queue'].get('total_tasks', 0)}個")
+            print(f"🔄 リトライキュー: {ocr_stats['retry_queue'].get('total_tasks', 0)}個 "
+                  f"(上限超過で破棄: {ocr_stats['retry_queue'].get('evicted_tasks', 0)}個)")
+            if ocr_stats["work_queue"] is not None:
+                queue_stats = ocr_stats["work_queue"]
+                print(f"📥 OCRキュー: 残り{queue_stats['depth']}件 "
+                      f"破棄{queue_stats['dropped'] + queue_stats['coalesced']}件 "
+                      f"平均待ち{queue_stats['avg_wait_sec']:.2f}秒")
+            if ocr_stats["drain"] is not None and ocr_stats["drain"]["last"] is not None:
+                drain_stats = ocr_stats["drain"]["last"]
+                print(f"🚰 直近のバックログ消化: {drain_stats['succeeded']}件 "
+                      f"{drain_stats['throughput_per_min']:.1f}件/分 ({drain_stats['stop_reason']})")
+            perf_stats = ocr_stats["perf"]
+            if perf_stats["calls"]:
+                total_latency = perf_stats["latency"]["total"]
+                network_latency = perf_stats["latency"]["network"]
+                print(f"⏱️  OCR遅延: 全体p50 {total_latency['p50_sec']:.2f}秒/p95 {total_latency['p95_sec']:.2f}秒 "
+                      f"(通信p95 {network_latency['p95_sec']:.2f}秒) エラー{perf_stats['errors']}")
+            if ocr_stats["result_cache"] is not None:
+                result_cache_stats = ocr_stats["result_cache"]
+                print(f"♻️  OCRキャッシュ: {result_cache_stats['hits']}ヒット/"
+                      f"{result_cache_stats['misses']}ミス "
+                      f"({result_cache_stats['tokens_saved']}トークン節約)")
+            if ocr_stats["budget"] is not None:
+                budget_stats = ocr_stats["budget"]
+                print(f"💰 OCR予算: 今日{budget_stats['day_tokens']}トークン "
+                      f"({budget_stats['usage_ratio']:.0%}, {budget_stats['level']})")
+            
+            # 実行中のOCRを期限まで待ち、残りはリトライキューへ退避して書き出すのだ
+            ocr_worker.shutdown(deadline_sec=max(0.0, deadline - time.monotonic()))
+            if encoder_pool is not None:
+                encoder_pool.close()
             
             sys.exit(0)
         
@@ -122,17 +262,22 @@ def main():
         else:
             print("⚠️  スクリーンショット取得でエラーが発生する可能性あり")
         
-        # OCRサービス確認
+        # OCRサービス確認（接続ウォームアップは裏で進め、記録開始を待たせないのだ）
         if config.ocr_enabled:
-            if ocr_worker.test_ocr_connection():
-                print(f"✅ Azure OpenAI OCR利用可能（モデル: {config.azure_openai_model}）")
-            else:
-                print("⚠️  Azure OpenAI OCR接続失敗（APIキー・エンドポイントを確認）")
+            ocr_worker.start_warm_up()
+            print("🔥 Azure OpenAI OCR接続をバックグラウンドで確認中なのだ")
+            if ocr_worker.start_retry_scheduler() is not None:
+                print("⏰ リトライは次の予定時刻ちょうどに再試行するのだ")
         else:
             print("ℹ️  OCRは無効化されています")
         
         print("🚀 スケジューラ開始なのだ (Ctrl+C で停止)")
         slicer.start()
+        if startup_profiler is not None:
+            startup_profiler.mark("scheduler_started")
+        if change_monitor is not None:
+            change_monitor.start()
+            print(f"👀 画面変化モニタ開始（{config.change_check_interval_sec}秒間隔）なのだ")
         
         # メインスレッドは待機なのだ
         try:
@@ -140,7 +285,6 @@ def main():
                 signal.pause()
         except AttributeError:
             # Windows では signal.pause() がないので time.sleep を使うのだ
-            import time
             while slicer.is_running():
                 time.sleep(0.5)
         
@@ -0,0 +1,19 @@
+"""keyframe の起動エントリなのだ
+
+--profile-startup 付きで起動すると main.py のimportも含めて起動時間を計測するのだ。
+"""
+import sys
+
+from src.startup_profile import StartupProfiler
+
+
+def run() -> None:
+    # 計測は main のimportも含めたいので、main を読み込む前に始めるのだ
+    startup_profiler = StartupProfiler.from_argv(sys.argv)
+    from main import main
+
+    main(startup_profiler)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,208 @@
+"""バックログ一括消化：復帰後にリトライキューを適応的な同時実行数で一気に流すのだ"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.ocr_client import CIRCUIT_OPEN_ERROR, OcrResult
+from src.retry_cache import RetryTask
+
+RetryOutcome = Tuple[RetryTask, OcrResult]
+
+MAX_LIMITED_WAVES = 3  # 全件429のウェーブがこれだけ続いたら諦めてtickのリトライに任せるのだ
+
+
+class AimdConcurrency:
+    """加算増・乗算減（AIMD）で同時実行数を決めるのだ
+
+    1ウェーブが429無しで終われば1増やし、429が出たら半分にするのだ。
+    """
+
+    def __init__(self, initial: int = 1, max_limit: int = 8, decrease_factor: float = 0.5):
+        self.max_limit = max(1, max_limit)
+        self.limit = min(max(1, initial), self.max_limit)
+        self.decrease_factor = decrease_factor
+        self.peak = self.limit
+
+    def on_wave(self, rate_limited: bool) -> int:
+        """1ウェーブの結果で同時実行数を更新して返すのだ"""
+        if rate_limited:
+            self.limit = max(1, int(self.limit * self.decrease_factor))
+        else:
+            self.limit = min(self.max_limit, self.limit + 1)
+        self.peak = max(self.peak, self.limit)
+        return self.limit
+
+
+@dataclass
+class DrainReport:
+    """1回のバックログ消化の結果なのだ"""
+    started_at: float
+    duration_sec: float = 0.0
+    processed: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    rate_limited: int = 0
+    waves: int = 0
+    peak_concurrency: int = 1
+    final_concurrency: int = 1
+    remaining: int = 0
+    stop_reason: str = ""  # "empty" / "endpoint_down" / "circuit_open" / "rate_limited" / "stopped"
+
+    @property
+    def throughput_per_min(self) -> float:
+        """1分あたりの成功件数なのだ"""
+        return self.succeeded / self.duration_sec * 60.0 if self.duration_sec > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """統計表示用の辞書にするのだ"""
+        data = asdict(self)
+        data["throughput_per_min"] = round(self.throughput_per_min, 2)
+        data["time_to_empty_sec"] = self.duration_sec if self.stop_reason == "empty" else None
+        return data
+
+
+def is_rate_limited_result(result: OcrResult) -> bool:
+    """429を受けたか、クライアント側で送信を保留した結果かどうかを判定するのだ"""
+    error = result.get_error() or ""
+    return "Rate Limit" in error or "429" in error
+
+
+class BacklogDrainer:
+    """リトライキューの滞留をウェーブ単位で消化するのだ
+
+    タスクの取り出し（claim）・OCR（ocr）・結果の一括反映（complete）は
+    呼び出し側が渡すので、JSONL更新はウェーブごとにまとめて書けるのだ。
+    """
+
+    def __init__(
+        self,
+        claim: Callable[[int], List[RetryTask]],
+        ocr: Callable[[RetryTask], OcrResult],
+        complete: Callable[[List[RetryOutcome]], None],
+        backlog_size: Callable[[], int],
+        max_concurrency: int = 8
+    ):
+        self._claim = claim
+        self._ocr = ocr
+        self._complete = complete
+        self._backlog_size = backlog_size
+        self.max_concurrency = max(1, max_concurrency)
+
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.current: Optional[DrainReport] = None
+        self.last_report: Optional[DrainReport] = None
+        self.runs = 0
+
+    def is_running(self) -> bool:
+        """消化中かどうかを返すのだ"""
+        with self._lock:
+            return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> bool:
+        """バックグラウンドで消化を始めるのだ（既に消化中なら False）"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name="ocr_backlog_drain", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """消化を止めるのだ（実行中のウェーブは終わるまで待つ）"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=timeout)
+
+    def run(self) -> DrainReport:
+        """滞留が空になるか、エンドポイントが再び落ちるまでウェーブを回すのだ"""
+        report = DrainReport(started_at=time.time())
+        concurrency = AimdConcurrency(max_limit=self.max_concurrency)
+        with self._lock:
+            self.current = report
+        started = time.monotonic()
+        limited_waves = 0
+        print(f"🚰 バックログ一括消化開始: {self._backlog_size()}件")
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="ocr_drain") as executor:
+            while True:
+                if self._stop.is_set():
+                    report.stop_reason = "stopped"
+                    break
+
+                tasks = self._claim(concurrency.limit)
+                if not tasks:
+                    report.stop_reason = "empty"
+                    break
+
+                outcomes = list(zip(tasks, executor.map(self._ocr, tasks), strict=True))
+                self._complete(outcomes)
+
+                rate_limited = sum(1 for _, result in outcomes if is_rate_limited_result(result))
+                succeeded = sum(1 for _, result in outcomes if result.is_success())
+                report.waves += 1
+                report.processed += len(outcomes)
+                report.succeeded += succeeded
+                report.failed += len(outcomes) - succeeded
+                report.rate_limited += rate_limited
+                report.duration_sec = time.monotonic() - started
+
+                if any(result.get_error() == CIRCUIT_OPEN_ERROR for _, result in outcomes):
+                    report.stop_reason = "circuit_open"
+                    break
+                if succeeded == 0 and rate_limited == 0:
+                    # 429以外で全滅したらまた落ちたとみなしてtickのリトライに任せるのだ
+                    report.stop_reason = "endpoint_down"
+                    break
+
+                concurrency.on_wave(rate_limited > 0)
+                report.peak_concurrency = concurrency.peak
+                report.final_concurrency = concurrency.limit
+
+                if rate_limited == len(outcomes):
+                    limited_waves += 1
+                    if limited_waves >= MAX_LIMITED_WAVES:
+                        report.stop_reason = "rate_limited"
+                        break
+                    # 保留で即座に戻る結果を回し続けないよう少し待つのだ
+                    self._stop.wait(float(limited_waves))
+                else:
+                    limited_waves = 0
+
+        report.duration_sec = time.monotonic() - started
+        report.remaining = self._backlog_size()
+        with self._lock:
+            self.current = None
+            self.last_report = report
+            self.runs += 1
+
+        print(f"🚰 バックログ消化終了（{report.stop_reason}）: {report.succeeded}件成功/"
+              f"{report.processed}件 {report.duration_sec:.1f}秒 "
+              f"({report.throughput_per_min:.1f}件/分, 最大同時{report.peak_concurrency})")
+        return report
+
+    def get_stats(self) -> Dict[str, Any]:
+        """消化の状況と直近の結果を返すのだ（消化中は残り時間の見込み付き）"""
+        with self._lock:
+            current = self.current.to_dict() if self.current else None
+            last = self.last_report.to_dict() if self.last_report else None
+            runs = self.runs
+
+        if current is not None:
+            remaining = self._backlog_size()
+            rate = current["throughput_per_min"]
+            current["remaining"] = remaining
+            current["eta_sec"] = remaining / rate * 60.0 if rate > 0 else None
+
+        return {
+            "running": self.is_running(),
+            "runs": runs,
+            "current": current,
+            "last": last,
+            "max_concurrency": self.max_concurrency
+        }
@@ -0,0 +1,158 @@
+"""画面変化モニタ：サムネイル差分とアプリ切替を監視してイベント撮影を発火するのだ"""
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Deque, Dict, Optional
+
+
+@dataclass
+class ScreenEvent:
+    """画面イベント情報なのだ"""
+    ts_utc: datetime
+    reason: str            # "app_switch" / "title_change" / "screen_change"
+    change_score: float    # サムネイル差分（0.0〜1.0）
+    active_app: str
+    active_title: str
+    ocr_allowed: bool      # 1時間あたりのOCR予算内かどうか
+
+
+def thumbnail_diff(previous: bytes, current: bytes) -> float:
+    """グレースケールサムネイル同士の平均絶対差分を0.0〜1.0で返すのだ"""
+    if not previous or len(previous) != len(current):
+        return 1.0
+    total = sum(abs(a - b) for a, b in zip(previous, current, strict=True))
+    return total / (len(current) * 255)
+
+
+class ChangeMonitor:
+    """低頻度の背景チェックで大きな画面変化・アプリ切替を検知するのだ"""
+
+    def __init__(
+        self,
+        on_event: Callable[[ScreenEvent], None],
+        thumbnail_source: Callable[[], Optional[bytes]],
+        window_info_source: Optional[Callable[[], Dict[str, str]]] = None,
+        check_interval_sec: float = 5.0,
+        change_threshold: float = 0.1,
+        min_event_interval_sec: float = 30.0,
+        max_ocr_per_hour: int = 20
+    ):
+        self.on_event = on_event
+        self.thumbnail_source = thumbnail_source
+        self.window_info_source = window_info_source
+        self.check_interval_sec = check_interval_sec
+        self.change_threshold = change_threshold
+        self.min_event_interval_sec = min_event_interval_sec
+        self.max_ocr_per_hour = max_ocr_per_hour
+
+        self._last_thumbnail: Optional[bytes] = None
+        self._last_window: Optional[Dict[str, str]] = None
+        self._last_event_at = 0.0
+        self._ocr_event_times: Deque[float] = deque()
+
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+        self.stats = {
+            "checks": 0,
+            "events": 0,
+            "rate_limited": 0,
+            "over_budget": 0
+        }
+
+    def start(self) -> None:
+        """監視スレッドを開始するのだ"""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="change_monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """監視スレッドを停止するのだ"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.check_interval_sec + 1.0)
+            self._thread = None
+
+    def is_running(self) -> bool:
+        """実行中かどうかを返すのだ"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self) -> None:
+        """監視ループなのだ"""
+        while not self._stop_event.wait(self.check_interval_sec):
+            try:
+                self.check_once()
+            except Exception as e:
+                print(f"⚠️ 画面変化チェックエラー: {e}")
+
+    def check_once(self) -> Optional[ScreenEvent]:
+        """1回分の変化チェックを行い、発火したイベントを返すのだ"""
+        self.stats["checks"] += 1
+
+        window = self.window_info_source() if self.window_info_source else None
+        thumbnail = self.thumbnail_source()
+
+        reason = None
+        change_score = 0.0
+
+        # アプリ/タイトル切替の判定なのだ（初回はベースライン取得のみ）
+        if window is not None and self._last_window is not None:
+            if window.get("active_app") != self._last_window.get("active_app"):
+                reason = "app_switch"
+            elif window.get("active_title") != self._last_window.get("active_title"):
+                reason = "title_change"
+
+        # サムネイル差分の判定なのだ
+        if thumbnail is not None and self._last_thumbnail is not None:
+            change_score = thumbnail_diff(self._last_thumbnail, thumbnail)
+            if reason is None and change_score >= self.change_threshold:
+                reason = "screen_change"
+
+        if window is not None:
+            self._last_window = window
+        if thumbnail is not None:
+            self._last_thumbnail = thumbnail
+
+        if reason is None:
+            return None
+
+        # レート制限：短時間の連続発火は捨てるのだ
+        now = time.time()
+        if now - self._last_event_at < self.min_event_interval_sec:
+            self.stats["rate_limited"] += 1
+            return None
+        self._last_event_at = now
+
+        # 1時間あたりのOCR予算：超過分はメタデータのみのイベントにするのだ
+        while self._ocr_event_times and now - self._ocr_event_times[0] >= 3600:
+            self._ocr_event_times.popleft()
+        ocr_allowed = len(self._ocr_event_times) < self.max_ocr_per_hour
+        if ocr_allowed:
+            self._ocr_event_times.append(now)
+        else:
+            self.stats["over_budget"] += 1
+
+        event = ScreenEvent(
+            ts_utc=datetime.now(timezone.utc),
+            reason=reason,
+            change_score=round(change_score, 3),
+            active_app=(window or {}).get("active_app", ""),
+            active_title=(window or {}).get("active_title", ""),
+            ocr_allowed=ocr_allowed
+        )
+
+        self.stats["events"] += 1
+        self.on_event(event)
+        return event
+
+    def get_stats(self) -> dict:
+        """監視の統計情報を返すのだ"""
+        return {
+            **self.stats,
+            "ocr_events_last_hour": len(self._ocr_event_times),
+            "max_ocr_per_hour": self.max_ocr_per_hour
+        }
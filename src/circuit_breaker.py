@@ -0,0 +1,141 @@
+"""サーキットブレーカ：OCRエンドポイント障害中は即座に失敗させて待ち時間を無くすのだ"""
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from src.config import Config
+
+STATE_CLOSED = "closed"        # 通常どおり送信
+STATE_OPEN = "open"            # 送信せず即失敗
+STATE_HALF_OPEN = "half_open"  # 1件だけ試験送信
+
+
+class CircuitBreaker:
+    """直近のエラー率と連続タイムアウトで開閉するサーキットブレーカなのだ"""
+
+    def __init__(
+        self,
+        failure_rate_threshold: float = 0.5,
+        window_size: int = 10,
+        min_requests: int = 5,
+        max_consecutive_timeouts: int = 3,
+        open_duration_sec: float = 30.0
+    ):
+        self.failure_rate_threshold = failure_rate_threshold
+        self.min_requests = min_requests
+        self.max_consecutive_timeouts = max_consecutive_timeouts
+        self.open_duration_sec = open_duration_sec
+
+        self.state = STATE_CLOSED
+        self._results: Deque[bool] = deque(maxlen=window_size)  # True=成功
+        self._consecutive_timeouts = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+        self.stats = {
+            "rejected": 0,
+            "opened": 0,
+            "probes": 0
+        }
+
+    def allow_request(self) -> bool:
+        """送信してよいかを返すのだ（半開状態では試験送信の1件だけ通す）"""
+        with self._lock:
+            if self.state == STATE_CLOSED:
+                return True
+
+            if self.state == STATE_OPEN:
+                if time.monotonic() - self._opened_at < self.open_duration_sec:
+                    self.stats["rejected"] += 1
+                    return False
+                self.state = STATE_HALF_OPEN
+
+            if self._probe_in_flight:
+                self.stats["rejected"] += 1
+                return False
+            self._probe_in_flight = True
+            self.stats["probes"] += 1
+            return True
+
+    def is_available(self) -> bool:
+        """今送れば通るかどうかを枠を消費せずに返すのだ"""
+        with self._lock:
+            if self.state == STATE_CLOSED:
+                return True
+            if self.state == STATE_OPEN:
+                return time.monotonic() - self._opened_at >= self.open_duration_sec
+            return not self._probe_in_flight
+
+    def seconds_until_probe(self) -> float:
+        """開いている間は試験送信を許すまでの残り秒数を返すのだ（開いていなければ0）"""
+        with self._lock:
+            return self._open_remaining()
+
+    def release(self) -> None:
+        """許可したのに送信しなかった場合に試験送信枠を戻すのだ"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        """送信成功を記録するのだ（半開なら閉じる）"""
+        with self._lock:
+            self._consecutive_timeouts = 0
+            if self.state != STATE_CLOSED:
+                self.state = STATE_CLOSED
+                self._results.clear()
+                self._probe_in_flight = False
+            self._results.append(True)
+
+    def record_failure(self, timeout: bool = False) -> None:
+        """送信失敗を記録するのだ（エラー率か連続タイムアウトが閾値を超えたら開く）"""
+        with self._lock:
+            if self.state == STATE_HALF_OPEN:
+                self._open()
+                return
+
+            self._results.append(False)
+            self._consecutive_timeouts = self._consecutive_timeouts + 1 if timeout else 0
+
+            failures = self._results.count(False)
+            if (len(self._results) >= self.min_requests
+                    and failures / len(self._results) >= self.failure_rate_threshold):
+                self._open()
+            elif self._consecutive_timeouts >= self.max_consecutive_timeouts:
+                self._open()
+
+    def _open(self) -> None:
+        """ブレーカを開くのだ（ロック取得済み）"""
+        self.state = STATE_OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+        self._consecutive_timeouts = 0
+        self.stats["opened"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """ブレーカの状態と統計を返すのだ"""
+        with self._lock:
+            failures = self._results.count(False)
+            return {
+                **self.stats,
+                "state": self.state,
+                "recent_failure_rate": failures / len(self._results) if self._results else 0.0,
+                "open_for_sec": self._open_remaining()
+            }
+
+    def _open_remaining(self) -> float:
+        """開いている残り秒数を返すのだ（ロック取得済み）"""
+        if self.state != STATE_OPEN:
+            return 0.0
+        return max(0.0, self.open_duration_sec - (time.monotonic() - self._opened_at))
+
+
+def create_circuit_breaker(config: Config) -> Optional[CircuitBreaker]:
+    """設定で有効ならサーキットブレーカを作るのだ"""
+    if not config.ocr_circuit_enabled:
+        return None
+    return CircuitBreaker(
+        failure_rate_threshold=config.ocr_circuit_failure_rate,
+        open_duration_sec=config.ocr_circuit_open_sec
+    )
@@ -15,9 +15,58 @@ class Config:
     azure_openai_model: str
     data_dir: Path
     interval_sec: int = 60
+    shutdown_deadline_sec: float = 10.0  # 停止時に実行中のOCRを待つ上限（残りはリトライキューへ退避）
     ocr_enabled: bool = True
     retry_max_attempts: int = 3
     retry_base_delay_sec: float = 1.0
+    retry_cache_max_tasks: int = 500  # リトライキューの上限枚数（超えたら古い順に捨てる。0で無制限）
+    retry_cache_max_mb: int = 2048  # リトライキューの上限容量（0で無制限）
+    ocr_timeout_sec: float = 20.0
+    ocr_max_in_flight: int = 1  # 2以上で非同期クライアントで並行処理
+    ocr_rpm_limit: int = 0  # 0=無制限（Retry-Afterのみ尊重）
+    ocr_tpm_limit: int = 0
+    ocr_rate_limit_max_wait_sec: float = 5.0
+    ocr_response_format: str = "text"  # "text"=自由記述 / "json"=構造化（app/category/terms/summary）
+    ocr_routing_enabled: bool = False
+    ocr_cheap_model: str = ""  # 空なら同じモデルを低詳細度（detail=low）で使う
+    ocr_cheap_detail: str = "low"
+    ocr_route_change_threshold: int = 10  # 知覚ハッシュ距離（64ビット中）がこれ未満なら安いティア
+    ocr_daily_token_budget: int = 0  # 0=無制限
+    ocr_hourly_token_budget: int = 0  # 0=無制限
+    ocr_circuit_enabled: bool = True
+    ocr_circuit_failure_rate: float = 0.5  # 直近10件のエラー率がこれ以上で遮断
+    ocr_circuit_open_sec: float = 30.0  # 遮断してから試験送信するまでの秒数
+    ocr_hedge_enabled: bool = False
+    ocr_hedge_percentile: float = 95.0  # この百分位の応答時間を過ぎたら複製を送る
+    ocr_hedge_max_ratio: float = 0.1  # 複製リクエストの上限（全リクエストに対する比率）
+    ocr_mock_enabled: bool = False  # ローカルモックVisionサーバに向けてオフライン計測する
+    ocr_mock_latency: str = "lognormal:2.0,0.4"  # モックの遅延分布
+    ocr_mock_rate_limit_rate: float = 0.0  # モックが429を返す確率
+    ocr_mock_server_error_rate: float = 0.0  # モックが5xxを返す確率
+    ocr_worker_threads: int = 1  # OCR専用スレッド数（0でスケジューラのtick上で直接処理）
+    ocr_queue_size: int = 16  # OCR待ちキューの上限
+    ocr_queue_policy: str = "drop_oldest"  # 満杯時の方針 drop_oldest / coalesce
+    ocr_retry_quota_per_tick: int = 20  # 1tickで流すリトライの上限（0で無制限）
+    ocr_retry_backlog_threshold: int = 100  # 滞留がこれを超えたら新しい順に消化
+    ocr_retry_wakeup_enabled: bool = True  # tickを待たず次のリトライ時刻ちょうどに起きて流す
+    ocr_drain_enabled: bool = True  # 復帰後にリトライの滞留を一括消化する
+    ocr_drain_min_backlog: int = 10  # 一括消化を始める滞留件数
+    ocr_drain_max_concurrency: int = 8  # 一括消化の同時実行数の上限（429が出るまで増やす）
+    ocr_perf_record_interval_sec: float = 0.0  # 性能レコードを書く間隔（0で無効・既定は書かない）
+    ocr_batch_size: int = 1  # 2以上でリトライ消化時に複数画像を1リクエストにまとめる
+    ocr_cache_enabled: bool = False
+    ocr_cache_max_entries: int = 1000
+    ocr_cache_ttl_sec: float = 86400.0
+    ocr_cache_key: str = "exact"  # "exact"=バイト列一致 / "phash"=知覚ハッシュ一致
+    encoder_processes: int = 0  # 0=メインプロセスでエンコード
+    change_monitor_enabled: bool = False
+    change_check_interval_sec: float = 5.0
+    change_threshold: float = 0.1
+    change_min_interval_sec: float = 30.0
+    change_max_ocr_per_hour: int = 20
+    archive_enabled: bool = False
+    archive_max_gb: float = 1.0
+    archive_keyframe_interval: int = 30
 
 
 class ConfigLoader:
@@ -38,9 +87,58 @@ class ConfigLoader:
             "azure_openai_model": "gpt-4.1-mini",
             "data_dir": str(Path.home() / ".keystats"),
             "interval_sec": "60",
+            "shutdown_deadline_sec": "10.0",
             "ocr_enabled": "true",
             "retry_max_attempts": "3",
-            "retry_base_delay_sec": "1.0"
+            "retry_base_delay_sec": "1.0",
+            "retry_cache_max_tasks": "500",
+            "retry_cache_max_mb": "2048",
+            "ocr_timeout_sec": "20.0",
+            "ocr_max_in_flight": "1",
+            "ocr_rpm_limit": "0",
+            "ocr_tpm_limit": "0",
+            "ocr_rate_limit_max_wait_sec": "5.0",
+            "ocr_response_format": "text",
+            "ocr_routing_enabled": "false",
+            "ocr_cheap_model": "",
+            "ocr_cheap_detail": "low",
+            "ocr_route_change_threshold": "10",
+            "ocr_daily_token_budget": "0",
+            "ocr_hourly_token_budget": "0",
+            "ocr_circuit_enabled": "true",
+            "ocr_circuit_failure_rate": "0.5",
+            "ocr_circuit_open_sec": "30.0",
+            "ocr_hedge_enabled": "false",
+            "ocr_hedge_percentile": "95",
+            "ocr_hedge_max_ratio": "0.1",
+            "ocr_mock_enabled": "false",
+            "ocr_mock_latency": "lognormal:2.0,0.4",
+            "ocr_mock_rate_limit_rate": "0.0",
+            "ocr_mock_server_error_rate": "0.0",
+            "ocr_worker_threads": "1",
+            "ocr_queue_size": "16",
+            "ocr_queue_policy": "drop_oldest",
+            "ocr_retry_quota_per_tick": "20",
+            "ocr_retry_backlog_threshold": "100",
+            "ocr_retry_wakeup_enabled": "true",
+            "ocr_drain_enabled": "true",
+            "ocr_drain_min_backlog": "10",
+            "ocr_drain_max_concurrency": "8",
+            "ocr_perf_record_interval_sec": "0",
+            "ocr_batch_size": "1",
+            "ocr_cache_enabled": "false",
+            "ocr_cache_max_entries": "1000",
+            "ocr_cache_ttl_sec": "86400",
+            "ocr_cache_key": "exact",
+            "encoder_processes": "0",
+            "change_monitor_enabled": "false",
+            "change_check_interval_sec": "5.0",
+            "change_threshold": "0.1",
+            "change_min_interval_sec": "30.0",
+            "change_max_ocr_per_hour": "20",
+            "archive_enabled": "false",
+            "archive_max_gb": "1.0",
+            "archive_keyframe_interval": "30"
         }
         
         # INI ファイルから読み込みなのだ
@@ -60,9 +158,58 @@ class ConfigLoader:
             azure_openai_model=config_values["azure_openai_model"],
             data_dir=Path(config_values["data_dir"]).expanduser(),
             interval_sec=int(config_values["interval_sec"]),
+            shutdown_deadline_sec=float(config_values["shutdown_deadline_sec"]),
             ocr_enabled=config_values["ocr_enabled"].lower() in ("true", "1", "yes", "on"),
             retry_max_attempts=int(config_values["retry_max_attempts"]),
-            retry_base_delay_sec=float(config_values["retry_base_delay_sec"])
+            retry_base_delay_sec=float(config_values["retry_base_delay_sec"]),
+            retry_cache_max_tasks=int(config_values["retry_cache_max_tasks"]),
+            retry_cache_max_mb=int(config_values["retry_cache_max_mb"]),
+            ocr_timeout_sec=float(config_values["ocr_timeout_sec"]),
+            ocr_max_in_flight=int(config_values["ocr_max_in_flight"]),
+            ocr_rpm_limit=int(config_values["ocr_rpm_limit"]),
+            ocr_tpm_limit=int(config_values["ocr_tpm_limit"]),
+            ocr_rate_limit_max_wait_sec=float(config_values["ocr_rate_limit_max_wait_sec"]),
+            ocr_response_format=config_values["ocr_response_format"].lower(),
+            ocr_routing_enabled=config_values["ocr_routing_enabled"].lower() in ("true", "1", "yes", "on"),
+            ocr_cheap_model=config_values["ocr_cheap_model"],
+            ocr_cheap_detail=config_values["ocr_cheap_detail"].lower(),
+            ocr_route_change_threshold=int(config_values["ocr_route_change_threshold"]),
+            ocr_daily_token_budget=int(config_values["ocr_daily_token_budget"]),
+            ocr_hourly_token_budget=int(config_values["ocr_hourly_token_budget"]),
+            ocr_circuit_enabled=config_values["ocr_circuit_enabled"].lower() in ("true", "1", "yes", "on"),
+            ocr_circuit_failure_rate=float(config_values["ocr_circuit_failure_rate"]),
+            ocr_circuit_open_sec=float(config_values["ocr_circuit_open_sec"]),
+            ocr_hedge_enabled=config_values["ocr_hedge_enabled"].lower() in ("true", "1", "yes", "on"),
+            ocr_hedge_percentile=float(config_values["ocr_hedge_percentile"]),
+            ocr_hedge_max_ratio=float(config_values["ocr_hedge_max_ratio"]),
+            ocr_mock_enabled=config_values["ocr_mock_enabled"].lower() in ("true", "1", "yes", "on"),
+            ocr_mock_latency=config_values["ocr_mock_latency"],
+            ocr_mock_rate_limit_rate=float(config_values["ocr_mock_rate_limit_rate"]),
+            ocr_mock_server_error_rate=float(config_values["ocr_mock_server_error_rate"]),
+            ocr_worker_threads=int(config_values["ocr_worker_threads"]),
+            ocr_queue_size=int(config_values["ocr_queue_size"]),
+            ocr_queue_policy=config_values["ocr_queue_policy"],
+            ocr_retry_quota_per_tick=int(config_values["ocr_retry_quota_per_tick"]),
+            ocr_retry_backlog_threshold=int(config_values["ocr_retry_backlog_threshold"]),
+            ocr_retry_wakeup_enabled=config_values["ocr_retry_wakeup_enabled"].lower() in ("true", "1", "yes", "on"),
+            ocr_drain_enabled=config_values["ocr_drain_enabled"].lower() in ("true", "1", "yes", "on"),
+            ocr_drain_min_backlog=int(config_values["ocr_drain_min_backlog"]),
+            ocr_drain_max_concurrency=int(config_values["ocr_drain_max_concurrency"]),
+            ocr_perf_record_interval_sec=float(config_values["ocr_perf_record_interval_sec"]),
+            ocr_batch_size=int(config_values["ocr_batch_size"]),
+            ocr_cache_enabled=config_values["ocr_cache_enabled"].lower() in ("true", "1", "yes", "on"),
+            ocr_cache_max_entries=int(config_values["ocr_cache_max_entries"]),
+            ocr_cache_ttl_sec=float(config_values["ocr_cache_ttl_sec"]),
+            ocr_cache_key=config_values["ocr_cache_key"].lower(),
+            encoder_processes=int(config_values["encoder_processes"]),
+            change_monitor_enabled=config_values["change_monitor_enabled"].lower() in ("true", "1", "yes", "on"),
+            change_check_interval_sec=float(config_values["change_check_interval_sec"]),
+            change_threshold=float(config_values["change_threshold"]),
+            change_min_interval_sec=float(config_values["change_min_interval_sec"]),
+            change_max_ocr_per_hour=int(config_values["change_max_ocr_per_hour"]),
+            archive_enabled=config_values["archive_enabled"].lower() in ("true", "1", "yes", "on"),
+            archive_max_gb=float(config_values["archive_max_gb"]),
+            archive_keyframe_interval=int(config_values["archive_keyframe_interval"])
         )
     
     def _load_from_ini(self) -> dict:
@@ -93,6 +240,8 @@ class ConfigLoader:
             timing = parser['timing']
             if 'interval_sec' in timing:
                 values['interval_sec'] = timing['interval_sec']
+            if 'shutdown_deadline_sec' in timing:
+                values['shutdown_deadline_sec'] = timing['shutdown_deadline_sec']
         
         # [ocr] セクションなのだ
         if parser.has_section('ocr'):
@@ -103,6 +252,114 @@ class ConfigLoader:
                 values['retry_max_attempts'] = ocr['retry_max_attempts']
             if 'retry_base_delay_sec' in ocr:
                 values['retry_base_delay_sec'] = ocr['retry_base_delay_sec']
+            if 'retry_cache_max_tasks' in ocr:
+                values['retry_cache_max_tasks'] = ocr['retry_cache_max_tasks']
+            if 'retry_cache_max_mb' in ocr:
+                values['retry_cache_max_mb'] = ocr['retry_cache_max_mb']
+            if 'timeout_sec' in ocr:
+                values['ocr_timeout_sec'] = ocr['timeout_sec']
+            if 'max_in_flight' in ocr:
+                values['ocr_max_in_flight'] = ocr['max_in_flight']
+            if 'rpm_limit' in ocr:
+                values['ocr_rpm_limit'] = ocr['rpm_limit']
+            if 'tpm_limit' in ocr:
+                values['ocr_tpm_limit'] = ocr['tpm_limit']
+            if 'rate_limit_max_wait_sec' in ocr:
+                values['ocr_rate_limit_max_wait_sec'] = ocr['rate_limit_max_wait_sec']
+            if 'response_format' in ocr:
+                values['ocr_response_format'] = ocr['response_format']
+            if 'routing_enabled' in ocr:
+                values['ocr_routing_enabled'] = ocr['routing_enabled']
+            if 'cheap_model' in ocr:
+                values['ocr_cheap_model'] = ocr['cheap_model']
+            if 'cheap_detail' in ocr:
+                values['ocr_cheap_detail'] = ocr['cheap_detail']
+            if 'route_change_threshold' in ocr:
+                values['ocr_route_change_threshold'] = ocr['route_change_threshold']
+            if 'daily_token_budget' in ocr:
+                values['ocr_daily_token_budget'] = ocr['daily_token_budget']
+            if 'hourly_token_budget' in ocr:
+                values['ocr_hourly_token_budget'] = ocr['hourly_token_budget']
+            if 'circuit_enabled' in ocr:
+                values['ocr_circuit_enabled'] = ocr['circuit_enabled']
+            if 'circuit_failure_rate' in ocr:
+                values['ocr_circuit_failure_rate'] = ocr['circuit_failure_rate']
+            if 'circuit_open_sec' in ocr:
+                values['ocr_circuit_open_sec'] = ocr['circuit_open_sec']
+            if 'hedge_enabled' in ocr:
+                values['ocr_hedge_enabled'] = ocr['hedge_enabled']
+            if 'hedge_percentile' in ocr:
+                values['ocr_hedge_percentile'] = ocr['hedge_percentile']
+            if 'hedge_max_ratio' in ocr:
+                values['ocr_hedge_max_ratio'] = ocr['hedge_max_ratio']
+            if 'mock_enabled' in ocr:
+                values['ocr_mock_enabled'] = ocr['mock_enabled']
+            if 'mock_latency' in ocr:
+                values['ocr_mock_latency'] = ocr['mock_latency']
+            if 'mock_rate_limit_rate' in ocr:
+                values['ocr_mock_rate_limit_rate'] = ocr['mock_rate_limit_rate']
+            if 'mock_server_error_rate' in ocr:
+                values['ocr_mock_server_error_rate'] = ocr['mock_server_error_rate']
+            if 'worker_threads' in ocr:
+                values['ocr_worker_threads'] = ocr['worker_threads']
+            if 'queue_size' in ocr:
+                values['ocr_queue_size'] = ocr['queue_size']
+            if 'queue_policy' in ocr:
+                values['ocr_queue_policy'] = ocr['queue_policy']
+            if 'retry_quota_per_tick' in ocr:
+                values['ocr_retry_quota_per_tick'] = ocr['retry_quota_per_tick']
+            if 'retry_backlog_threshold' in ocr:
+                values['ocr_retry_backlog_threshold'] = ocr['retry_backlog_threshold']
+            if 'retry_wakeup_enabled' in ocr:
+                values['ocr_retry_wakeup_enabled'] = ocr['retry_wakeup_enabled']
+            if 'drain_enabled' in ocr:
+                values['ocr_drain_enabled'] = ocr['drain_enabled']
+            if 'drain_min_backlog' in ocr:
+                values['ocr_drain_min_backlog'] = ocr['drain_min_backlog']
+            if 'drain_max_concurrency' in ocr:
+                values['ocr_drain_max_concurrency'] = ocr['drain_max_concurrency']
+            if 'perf_record_interval_sec' in ocr:
+                values['ocr_perf_record_interval_sec'] = ocr['perf_record_interval_sec']
+            if 'batch_size' in ocr:
+                values['ocr_batch_size'] = ocr['batch_size']
+            if 'cache_enabled' in ocr:
+                values['ocr_cache_enabled'] = ocr['cache_enabled']
+            if 'cache_max_entries' in ocr:
+                values['ocr_cache_max_entries'] = ocr['cache_max_entries']
+            if 'cache_ttl_sec' in ocr:
+                values['ocr_cache_ttl_sec'] = ocr['cache_ttl_sec']
+            if 'cache_key' in ocr:
+                values['ocr_cache_key'] = ocr['cache_key']
+        
+        # [capture] セクションなのだ
+        if parser.has_section('capture'):
+            capture = parser['capture']
+            if 'encoder_processes' in capture:
+                values['encoder_processes'] = capture['encoder_processes']
+        
+        # [events] セクションなのだ
+        if parser.has_section('events'):
+            events = parser['events']
+            if 'enabled' in events:
+                values['change_monitor_enabled'] = events['enabled']
+            if 'check_interval_sec' in events:
+                values['change_check_interval_sec'] = events['check_interval_sec']
+            if 'change_threshold' in events:
+                values['change_threshold'] = events['change_threshold']
+            if 'min_interval_sec' in events:
+                values['change_min_interval_sec'] = events['min_interval_sec']
+            if 'max_ocr_per_hour' in events:
+                values['change_max_ocr_per_hour'] = events['max_ocr_per_hour']
+        
+        # [archive] セクションなのだ
+        if parser.has_section('archive'):
+            archive = parser['archive']
+            if 'enabled' in archive:
+                values['archive_enabled'] = archive['enabled']
+            if 'max_gb' in archive:
+                values['archive_max_gb'] = archive['max_gb']
+            if 'keyframe_interval' in archive:
+                values['archive_keyframe_interval'] = archive['keyframe_interval']
         
         return values
     
@@ -116,9 +373,58 @@ class ConfigLoader:
             "AZURE_OPENAI_MODEL": "azure_openai_model",
             "DATA_DIR": "data_dir",
             "INTERVAL_SEC": "interval_sec",
+            "SHUTDOWN_DEADLINE_SEC": "shutdown_deadline_sec",
             "OCR_ENABLED": "ocr_enabled",
             "RETRY_MAX_ATTEMPTS": "retry_max_attempts",
-            "RETRY_BASE_DELAY_SEC": "retry_base_delay_sec"
+            "RETRY_BASE_DELAY_SEC": "retry_base_delay_sec",
+            "RETRY_CACHE_MAX_TASKS": "retry_cache_max_tasks",
+            "RETRY_CACHE_MAX_MB": "retry_cache_max_mb",
+            "OCR_TIMEOUT_SEC": "ocr_timeout_sec",
+            "OCR_MAX_IN_FLIGHT": "ocr_max_in_flight",
+            "OCR_RPM_LIMIT": "ocr_rpm_limit",
+            "OCR_TPM_LIMIT": "ocr_tpm_limit",
+            "OCR_RATE_LIMIT_MAX_WAIT_SEC": "ocr_rate_limit_max_wait_sec",
+            "OCR_RESPONSE_FORMAT": "ocr_response_format",
+            "OCR_ROUTING_ENABLED": "ocr_routing_enabled",
+            "OCR_CHEAP_MODEL": "ocr_cheap_model",
+            "OCR_CHEAP_DETAIL": "ocr_cheap_detail",
+            "OCR_ROUTE_CHANGE_THRESHOLD": "ocr_route_change_threshold",
+            "OCR_DAILY_TOKEN_BUDGET": "ocr_daily_token_budget",
+            "OCR_HOURLY_TOKEN_BUDGET": "ocr_hourly_token_budget",
+            "OCR_CIRCUIT_ENABLED": "ocr_circuit_enabled",
+            "OCR_CIRCUIT_FAILURE_RATE": "ocr_circuit_failure_rate",
+            "OCR_CIRCUIT_OPEN_SEC": "ocr_circuit_open_sec",
+            "OCR_HEDGE_ENABLED": "ocr_hedge_enabled",
+            "OCR_HEDGE_PERCENTILE": "ocr_hedge_percentile",
+            "OCR_HEDGE_MAX_RATIO": "ocr_hedge_max_ratio",
+            "OCR_MOCK_ENABLED": "ocr_mock_enabled",
+            "OCR_MOCK_LATENCY": "ocr_mock_latency",
+            "OCR_MOCK_RATE_LIMIT_RATE": "ocr_mock_rate_limit_rate",
+            "OCR_MOCK_SERVER_ERROR_RATE": "ocr_mock_server_error_rate",
+            "OCR_WORKER_THREADS": "ocr_worker_threads",
+            "OCR_QUEUE_SIZE": "ocr_queue_size",
+            "OCR_QUEUE_POLICY": "ocr_queue_policy",
+            "OCR_RETRY_QUOTA_PER_TICK": "ocr_retry_quota_per_tick",
+            "OCR_RETRY_BACKLOG_THRESHOLD": "ocr_retry_backlog_threshold",
+            "OCR_RETRY_WAKEUP_ENABLED": "ocr_retry_wakeup_enabled",
+            "OCR_DRAIN_ENABLED": "ocr_drain_enabled",
+            "OCR_DRAIN_MIN_BACKLOG": "ocr_drain_min_backlog",
+            "OCR_DRAIN_MAX_CONCURRENCY": "ocr_drain_max_concurrency",
+            "OCR_PERF_RECORD_INTERVAL_SEC": "ocr_perf_record_interval_sec",
+            "OCR_BATCH_SIZE": "ocr_batch_size",
+            "OCR_CACHE_ENABLED": "ocr_cache_enabled",
+            "OCR_CACHE_MAX_ENTRIES": "ocr_cache_max_entries",
+            "OCR_CACHE_TTL_SEC": "ocr_cache_ttl_sec",
+            "OCR_CACHE_KEY": "ocr_cache_key",
+            "ENCODER_PROCESSES": "encoder_processes",
+            "CHANGE_MONITOR_ENABLED": "change_monitor_enabled",
+            "CHANGE_CHECK_INTERVAL_SEC": "change_check_interval_sec",
+            "CHANGE_THRESHOLD": "change_threshold",
+            "CHANGE_MIN_INTERVAL_SEC": "change_min_interval_sec",
+            "CHANGE_MAX_OCR_PER_HOUR": "change_max_ocr_per_hour",
+            "ARCHIVE_ENABLED": "archive_enabled",
+            "ARCHIVE_MAX_GB": "archive_max_gb",
+            "ARCHIVE_KEYFRAME_INTERVAL": "archive_keyframe_interval"
         }
         
         for env_key, config_key in env_mapping.items():
@@ -129,6 +435,10 @@ class ConfigLoader:
     
     def _validate_required_fields(self, config_values: dict) -> None:
         """必須フィールドの検証なのだ"""
+        # モックサーバに向ける場合はAzureの接続情報は不要なのだ
+        if str(config_values.get("ocr_mock_enabled", "")).lower() in ("true", "1", "yes", "on"):
+            return
+        
         required_fields = ["azure_openai_endpoint", "azure_openai_key"]
         
         for field in required_fields:
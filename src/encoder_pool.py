@@ -0,0 +1,208 @@
+"""画像エンコードプロセスプール：共有メモリのフレームリング経由でJPEG化するのだ"""
+import io
+import multiprocessing
+import queue
+import sys
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+
+
+def resize_to_max_dimension(img, max_dim: int):
+    """長辺を指定サイズにリサイズするのだ"""
+    from PIL import Image
+
+    width, height = img.size
+    max_current = max(width, height)
+
+    if max_current <= max_dim:
+        return img  # リサイズ不要
+
+    # アスペクト比を維持してリサイズ
+    scale = max_dim / max_current
+    new_width = int(width * scale)
+    new_height = int(height * scale)
+
+    return img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+
+
+def encode_bgra_frame(
+    raw, size: Tuple[int, int], max_dim: int = 1920, quality: int = 70
+) -> bytes:
+    """BGRA生フレームを長辺リサイズしてJPEGバイト列にするのだ"""
+    from PIL import Image
+
+    img = Image.frombytes("RGB", size, raw, "raw", "BGRX")
+    resized_img = resize_to_max_dimension(img, max_dim)
+
+    buffer = io.BytesIO()
+    resized_img.save(buffer, "JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """子プロセスから共有メモリにアタッチするのだ（後始末は親に任せる）"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+
+    shm = shared_memory.SharedMemory(name=name)
+    # 3.12以前はアタッチ側もresource_trackerに登録されて二重unlinkになるので外すのだ
+    from multiprocessing import resource_tracker
+    resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+    return shm
+
+
+def _shared_buffer(shm: shared_memory.SharedMemory) -> memoryview:
+    """共有メモリのバッファを返すのだ（閉じていれば例外）"""
+    buf = shm.buf
+    if buf is None:
+        raise RuntimeError(f"共有メモリが閉じられているのだ: {shm.name}")
+    return buf
+
+
+def _encode_shared_frame(
+    shm_name: str, nbytes: int, size: Tuple[int, int], max_dim: int, quality: int
+) -> bytes:
+    """ワーカープロセス側：共有メモリ上のフレームをエンコードするのだ"""
+    shm = _attach_shared_memory(shm_name)
+    try:
+        view = _shared_buffer(shm)[:nbytes]
+        try:
+            return encode_bgra_frame(view, size, max_dim, quality)
+        finally:
+            view.release()
+    finally:
+        shm.close()
+
+
+class EncoderPool:
+    """JPEG/LANCZOS処理を別プロセスで行うエンコーダプールなのだ
+
+    生フレームは事前確保した共有メモリスロットのリングに書き込み、
+    ワーカーにはスロット名だけを渡すのでピクセルはpickleされないのだ。
+    """
+
+    def __init__(self, processes: int = 1, slots: int = 2, slot_bytes: int = 0):
+        self.processes = max(1, processes)
+        self.slot_count = max(slots, self.processes)
+        self.slot_bytes = slot_bytes
+        self._slots: List[shared_memory.SharedMemory] = []
+        self._free_slots: "queue.Queue[int]" = queue.Queue()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """ワーカープロセスとスロットを準備するのだ"""
+        with self._lock:
+            if self._executor is not None:
+                return
+            # pynputのスレッドを抱えたままforkしないようspawnで起動するのだ
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            if self.slot_bytes > 0:
+                self._allocate_slots(self.slot_bytes)
+
+    def is_running(self) -> bool:
+        """プールが起動中かどうかを返すのだ"""
+        with self._lock:
+            return self._executor is not None
+
+    def submit(
+        self,
+        raw,
+        size: Tuple[int, int],
+        max_dim: int = 1920,
+        quality: int = 70,
+        timeout: float = 30.0
+    ) -> "Future[bytes]":
+        """生フレームをスロットに書き込んでエンコードを依頼するのだ"""
+        nbytes = len(raw)
+        # 容量確認とスロット取得を同じロック内で行い、入れ替え直後の古いリングを掴まないのだ
+        with self._lock:
+            if self._executor is None:
+                raise RuntimeError("エンコーダプールが開始されていないのだ")
+            self._ensure_capacity(nbytes, timeout)
+            free_slots = self._free_slots
+            slot_index = free_slots.get(timeout=timeout)
+            shm = self._slots[slot_index]
+            executor = self._executor
+
+        try:
+            _shared_buffer(shm)[:nbytes] = raw
+            future = executor.submit(
+                _encode_shared_frame, shm.name, nbytes, tuple(size), max_dim, quality
+            )
+        except Exception:
+            free_slots.put(slot_index)
+            raise
+
+        # エンコード完了（成否問わず）でスロットを取得元のリングに戻すのだ
+        future.add_done_callback(lambda _: free_slots.put(slot_index))
+        return future
+
+    def encode(
+        self,
+        raw,
+        size: Tuple[int, int],
+        max_dim: int = 1920,
+        quality: int = 70,
+        timeout: float = 30.0
+    ) -> bytes:
+        """生フレームをJPEGバイト列にエンコードするのだ（完了まで待つ）"""
+        return self.submit(raw, size, max_dim, quality, timeout).result(timeout=timeout)
+
+    def _ensure_capacity(self, nbytes: int, timeout: float) -> None:
+        """フレームがスロットに収まらなければリングを確保し直すのだ（ロックを持って呼ぶのだ）"""
+        if nbytes <= self.slot_bytes and self._slots:
+            return
+
+        # 使用中スロットの返却を待ってから全スロットを入れ替えるのだ
+        taken: List[int] = []
+        try:
+            for _ in range(len(self._slots)):
+                taken.append(self._free_slots.get(timeout=timeout))
+        except queue.Empty:
+            # 待ちきれなければ取ったスロットを戻し、リングを欠けさせないのだ
+            for slot_index in taken:
+                self._free_slots.put(slot_index)
+            raise
+        self._release_slots()
+        self._allocate_slots(max(nbytes, self.slot_bytes))
+
+    def _allocate_slots(self, slot_bytes: int) -> None:
+        """共有メモリスロットを確保するのだ"""
+        self.slot_bytes = slot_bytes
+        for i in range(self.slot_count):
+            self._slots.append(shared_memory.SharedMemory(create=True, size=slot_bytes))
+            self._free_slots.put(i)
+
+    def _release_slots(self) -> None:
+        """共有メモリスロットを解放するのだ"""
+        for shm in self._slots:
+            try:
+                shm.close()
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+        self._slots = []
+        self._free_slots = queue.Queue()
+
+    def close(self) -> None:
+        """ワーカーを停止して共有メモリを解放するのだ"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+            self._release_slots()
+
+    def get_stats(self) -> dict:
+        """プールの状態を返すのだ（デバッグ用）"""
+        return {
+            "processes": self.processes,
+            "slots": len(self._slots),
+            "free_slots": self._free_slots.qsize(),
+            "slot_bytes": self.slot_bytes
+        }
@@ -0,0 +1,174 @@
+"""ヘッジリクエスト：遅い応答にp95経過で複製を送り、先に返った方を使うのだ"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Optional
+
+from src.config import Config
+
+
+class LatencyTracker:
+    """直近の応答時間から百分位を求めるのだ"""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency_sec: float) -> None:
+        """応答時間を1件記録するのだ"""
+        with self._lock:
+            self._samples.append(latency_sec)
+
+    def count(self) -> int:
+        """記録件数を返すのだ"""
+        with self._lock:
+            return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """p百分位の応答時間を返すのだ（記録が無ければNone）"""
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(p / 100.0 * len(ordered))) - 1))
+        return ordered[index]
+
+
+class HedgePolicy:
+    """いつ複製を送るか・どれだけ送ってよいかを決めるのだ"""
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        max_hedge_ratio: float = 0.1,
+        min_samples: int = 20,
+        min_delay_sec: float = 0.5
+    ):
+        self.percentile = percentile
+        self.max_hedge_ratio = max_hedge_ratio
+        self.min_samples = min_samples
+        self.min_delay_sec = min_delay_sec
+        self.tracker = LatencyTracker()
+        self._lock = threading.Lock()
+
+        self.stats = {
+            "requests": 0,
+            "hedged": 0,
+            "hedge_wins": 0,
+            "hedge_denied": 0
+        }
+
+    def hedge_delay(self) -> Optional[float]:
+        """複製を送るまでの待ち秒数を返すのだ（分布が溜まるまではNone）"""
+        if self.tracker.count() < self.min_samples:
+            return None
+        delay = self.tracker.percentile(self.percentile)
+        return max(self.min_delay_sec, delay) if delay is not None else None
+
+    def try_hedge(self) -> bool:
+        """ヘッジ率の上限内なら複製を1件許可するのだ"""
+        with self._lock:
+            if self.stats["hedged"] + 1 > self.stats["requests"] * self.max_hedge_ratio:
+                self.stats["hedge_denied"] += 1
+                return False
+            self.stats["hedged"] += 1
+            return True
+
+    def cancel_hedge(self) -> None:
+        """許可した複製をRPM/TPM枠が無くて送れなかったときに取り消すのだ"""
+        with self._lock:
+            self.stats["hedged"] -= 1
+            self.stats["hedge_denied"] += 1
+
+    def record(self, latency_sec: float, hedge_won: bool = False) -> None:
+        """1リクエスト分の結果を記録するのだ"""
+        self.tracker.record(latency_sec)
+        with self._lock:
+            self.stats["requests"] += 1
+            if hedge_won:
+                self.stats["hedge_wins"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """ヘッジの統計を返すのだ"""
+        with self._lock:
+            stats = dict(self.stats)
+        return {
+            **stats,
+            "hedge_rate": stats["hedged"] / stats["requests"] if stats["requests"] else 0.0,
+            "p50_sec": self.tracker.percentile(50),
+            "p95_sec": self.tracker.percentile(95),
+            "p99_sec": self.tracker.percentile(99),
+            "max_hedge_ratio": self.max_hedge_ratio
+        }
+
+
+def call_with_hedge(
+    policy: HedgePolicy,
+    executor: ThreadPoolExecutor,
+    call: Callable[[], Any],
+    allow_extra: Callable[[], bool] = lambda: True,
+    on_discarded: Optional[Callable[[Any], None]] = None
+) -> Any:
+    """call を実行し、p95を過ぎても返らなければ複製を送って先着の結果を返すのだ
+
+    どちらも失敗したら最初の例外を投げるのだ。負けた方は待たずに捨てるが、
+    後で成功したら on_discarded に結果を渡すので、使ったトークンを計上できるのだ。
+    allow_extra（RPM/TPM枠の確保）はヘッジ率の上限内で送ると決まってから呼ぶのだ。
+    """
+    started = time.monotonic()
+    primary = executor.submit(call)
+    futures = [primary]
+
+    delay = policy.hedge_delay()
+    if delay is not None:
+        done, _ = wait([primary], timeout=delay)
+        if not done and policy.try_hedge():
+            if allow_extra():
+                futures.append(executor.submit(call))
+            else:
+                policy.cancel_hedge()
+
+    winner: Optional[Future] = None
+    first_error: Optional[BaseException] = None
+    pending = set(futures)
+    while pending and winner is None:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            error = future.exception()
+            if error is None:
+                winner = future
+                break
+            first_error = first_error or error
+
+    policy.record(time.monotonic() - started, hedge_won=winner is not None and winner is not primary)
+
+    if winner is None:
+        if first_error is None:
+            raise RuntimeError("ヘッジ呼び出しが結果を返さなかったのだ")
+        raise first_error
+    if on_discarded is not None:
+        for future in futures:
+            if future is not winner:
+                future.add_done_callback(lambda f: _report_discarded(f, on_discarded))
+    return winner.result()
+
+
+def _report_discarded(future: Future, on_discarded: Callable[[Any], None]) -> None:
+    """採用しなかった呼び出しが成功していれば結果を渡すのだ"""
+    if future.exception() is not None:
+        return
+    try:
+        on_discarded(future.result())
+    except Exception as e:
+        print(f"⚠️ ヘッジ結果の計上エラー: {e}")
+
+
+def create_hedge_policy(config: Config) -> Optional[HedgePolicy]:
+    """設定で有効ならヘッジポリシーを作るのだ"""
+    if not config.ocr_hedge_enabled:
+        return None
+    return HedgePolicy(
+        percentile=config.ocr_hedge_percentile,
+        max_hedge_ratio=config.ocr_hedge_max_ratio
+    )
@@ -0,0 +1,28 @@
+"""画像の知覚ハッシュ（dHash）計算なのだ"""
+import io
+
+
+def dhash(image_bytes: bytes, hash_size: int = 8) -> int:
+    """隣接画素の明暗差から知覚ハッシュを計算するのだ（hash_size^2ビット）
+
+    JPEGは縮小デコード（draft）で読むので、フル解像度の画面でも全画素は展開しないのだ。
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        img.draft("L", (hash_size * 8, hash_size * 8))
+        small = img.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BOX)
+        pixels = small.tobytes()
+
+    value = 0
+    row_width = hash_size + 1
+    for y in range(hash_size):
+        row = pixels[y * row_width:(y + 1) * row_width]
+        for x in range(hash_size):
+            value = (value << 1) | (1 if row[x] > row[x + 1] else 0)
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """2つのハッシュのビット差を返すのだ"""
+    return bin(a ^ b).count("1")
@@ -1,17 +1,30 @@
 """JSONL形式でタイピング統計を記録するのだ"""
 import json
+import threading
+from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from src.keylogger import TypingStats
 
 
+@dataclass
+class OcrRecordUpdate:
+    """レコード1件分のOCR結果更新なのだ"""
+    timestamp: datetime
+    ocr_text: str
+    ocr_fields: Optional[Dict[str, Any]] = None
+    ocr_usage: Optional[Dict[str, Any]] = None
+
+
 class JsonlWriter:
     """JSONL形式でデータを書き出すクラスなのだ"""
     
     def __init__(self, data_dir: Path):
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(parents=True, exist_ok=True)
+        # 追記と書き戻しが別スレッドから重ならないようにするのだ
+        self._lock = threading.RLock()
     
     def write_record(
         self, 
@@ -48,61 +61,136 @@ class JsonlWriter:
             "alerts": []                  # フェーズ1では空配列
         }
         
+        self._append_record(record, ts_utc)
+    
+    def write_screen_event(
+        self,
+        ts_utc: datetime,
+        reason: str,
+        change_score: float = 0.0,
+        interval_start_utc: Optional[datetime] = None,
+        interval_sec: int = 60,
+        screenshot_path: Optional[str] = None,
+        active_app: str = "",
+        active_title: str = "",
+        ocr_text: str = ""
+    ) -> None:
+        """インターバル外の画面イベントレコードを書き出すのだ
+        
+        このイベントを含むインターバルレコードは interval_start_utc の次の
+        ts_utc を持つレコードなのだ。
+        """
+        record = {
+            "type": "screen_event",
+            "ts_utc": ts_utc.isoformat(),
+            "reason": reason,
+            "change_score": change_score,
+            "interval": {
+                "start_utc": interval_start_utc.isoformat() if interval_start_utc else None,
+                "interval_sec": interval_sec
+            },
+            "screen": {
+                "screenshot_path": screenshot_path,
+                "ocr_text": ocr_text,
+                "active_app": active_app,
+                "active_title": active_title
+            }
+        }
+        
+        self._append_record(record, ts_utc)
+    
+    def write_perf_record(self, ts_utc: datetime, window_sec: float, perf: Dict[str, Any]) -> None:
+        """OCRの性能計測（区間の遅延ヒストグラム・エラー種別など）レコードを書き出すのだ"""
+        record = {
+            "type": "ocr_perf",
+            "ts_utc": ts_utc.isoformat(),
+            "window_sec": round(window_sec, 1),
+            "ocr": perf
+        }
+        
+        self._append_record(record, ts_utc)
+    
+    def _append_record(self, record: dict, ts_utc: datetime) -> None:
+        """日別ファイルに1行追記するのだ"""
         # 日別ファイルパスなのだ
         date_str = ts_utc.strftime("%Y-%m-%d")
         file_path = self.data_dir / f"{date_str}.jsonl"
         
         # JSONL追記なのだ
-        with open(file_path, "a", encoding="utf-8") as f:
-            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        with self._lock:
+            with open(file_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
     
     def update_record_ocr(
         self,
         timestamp: datetime,
         ocr_text: str,
-        screenshot_path_to_null: bool = True
+        screenshot_path_to_null: bool = True,
+        ocr_fields: Optional[Dict[str, Any]] = None,
+        ocr_usage: Optional[Dict[str, Any]] = None
     ) -> bool:
-        """既存レコードのOCR結果を更新するのだ"""
-        date_str = timestamp.strftime("%Y-%m-%d")
-        file_path = self.data_dir / f"{date_str}.jsonl"
-        
-        if not file_path.exists():
-            return False
+        """既存レコードのOCR結果を更新するのだ（構造化フィールド・使用量があれば併せて書く）"""
+        update = OcrRecordUpdate(timestamp, ocr_text, ocr_fields, ocr_usage)
+        return self.update_records_ocr([update], screenshot_path_to_null) == 1
+    
+    def update_records_ocr(
+        self,
+        updates: List[OcrRecordUpdate],
+        screenshot_path_to_null: bool = True
+    ) -> int:
+        """複数レコードのOCR結果を日別ファイルごとに1回の読み書きでまとめて更新するのだ（更新件数を返す）"""
+        by_file: Dict[Path, Dict[str, OcrRecordUpdate]] = {}
+        for update in updates:
+            file_path = self.data_dir / f"{update.timestamp.strftime('%Y-%m-%d')}.jsonl"
+            by_file.setdefault(file_path, {})[update.timestamp.isoformat()] = update
         
-        try:
-            # ファイル全体を読み込み
-            with open(file_path, "r", encoding="utf-8") as f:
-                lines = f.readlines()
+        updated_count = 0
+        for file_path, pending in by_file.items():
+            if not file_path.exists():
+                continue
             
-            # 該当レコードを検索・更新
-            target_iso = timestamp.isoformat()
-            updated = False
-            
-            for i, line in enumerate(lines):
-                try:
-                    record = json.loads(line.strip())
-                    if record.get("ts_utc") == target_iso:
+            try:
+                with self._lock:
+                    # ファイル全体を読み込み
+                    with open(file_path, "r", encoding="utf-8") as f:
+                        lines = f.readlines()
+                    
+                    # 該当レコードを検索・更新（同じ時刻の最初のレコードだけ）
+                    file_updated = 0
+                    for i, line in enumerate(lines):
+                        if not pending:
+                            break
+                        try:
+                            record = json.loads(line.strip())
+                        except json.JSONDecodeError:
+                            continue
+                        
+                        update = pending.pop(record.get("ts_utc"), None)
+                        if update is None:
+                            continue
+                        
                         # OCR結果を更新
-                        record["screen"]["ocr_text"] = ocr_text
+                        record["screen"]["ocr_text"] = update.ocr_text
+                        if update.ocr_fields is not None:
+                            record["screen"]["ocr_fields"] = update.ocr_fields
+                        if update.ocr_usage is not None:
+                            record["ocr_usage"] = update.ocr_usage
                         if screenshot_path_to_null:
                             record["screen"]["screenshot_path"] = None
                         
                         lines[i] = json.dumps(record, ensure_ascii=False) + "\n"
-                        updated = True
-                        break
-                except json.JSONDecodeError:
-                    continue
-            
-            if updated:
-                # ファイルを書き戻し
-                with open(file_path, "w", encoding="utf-8") as f:
-                    f.writelines(lines)
-                return True
+                        file_updated += 1
+                    
+                    if file_updated:
+                        # ファイルを書き戻し
+                        with open(file_path, "w", encoding="utf-8") as f:
+                            f.writelines(lines)
+                        updated_count += file_updated
             
-        except Exception as e:
-            print(f"⚠️ JSONL OCR更新エラー: {e}")
+            except Exception as e:
+                print(f"⚠️ JSONL OCR更新エラー: {e}")
         
-        return False
+        return updated_count
     
     def get_today_file_path(self) -> Path:
         """今日のJSONLファイルパスを取得するのだ"""
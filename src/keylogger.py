@@ -1,12 +1,20 @@
 """タイピング指標を記録するキーロガーなのだ"""
 import time
 import statistics
-from typing import List, Optional, Dict, Any
+from typing import TYPE_CHECKING, List, Optional, Dict, Any
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from pynput import keyboard
 import threading
 
+from src.lazy_import import LazyImport
+
+if TYPE_CHECKING:
+    from pynput import keyboard
+else:
+    # TypingStats だけを使うモジュール（JSONL出力など）にフックの初期化を持ち込まないため、
+    # pynput は KeyLogger の開始時に読み込むのだ
+    keyboard = LazyImport("pynput.keyboard")
+
 
 @dataclass
 class KeyEvent:
@@ -33,7 +41,7 @@ class KeyLogger:
     def __init__(self):
         self.events: List[KeyEvent] = []
         self.total_keys_cumulative = 0
-        self._listener: Optional[keyboard.Listener] = None
+        self._listener: Optional["keyboard.Listener"] = None
         self._running = False
         self._lock = threading.Lock()
         
@@ -0,0 +1,34 @@
+"""遅延import：重い依存を最初に使う時まで読み込まないのだ"""
+import importlib
+from typing import Any, Optional
+
+
+class LazyImport:
+    """属性アクセスか呼び出しの時に初めて import するモジュール（またはその属性）の代理なのだ
+
+    モジュール変数として置けるので、テストは従来どおり src.xxx.Name を patch できるのだ。
+    """
+
+    def __init__(self, module: str, attr: Optional[str] = None):
+        self._module = module
+        self._attr = attr
+        self._target: Any = None
+
+    def _resolve(self) -> Any:
+        """対象を読み込んで返すのだ（2回目以降は読み込み済みのものを返す）"""
+        if self._target is None:
+            target = importlib.import_module(self._module)
+            if self._attr is not None:
+                target = getattr(target, self._attr)
+            self._target = target
+        return self._target
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._resolve(), name)
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        return self._resolve()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        name = self._module if self._attr is None else f"{self._module}.{self._attr}"
+        return f"<LazyImport {name}>"
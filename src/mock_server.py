@@ -0,0 +1,354 @@
+"""ローカルモックVisionサーバ：chat completions APIを真似てOCR経路をオフラインで計測するのだ
+
+単体で起動して AZURE_OPENAI_ENDPOINT に向けるか、OCR_MOCK_ENABLED=true で
+OcrWorker内に立ち上げて使うのだ:
+    python -m src.mock_server --port 8089 --latency lognormal:2.0,0.4 --rate-limit-rate 0.05
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from src.config import Config
+
+# 自由記述プロンプトへの応答（約200文字）なのだ
+PROSE_RESPONSE = (
+    "ユーザーはコードエディタでPythonのソースファイルを編集しています。"
+    "画面左側にはプロジェクトのファイルツリーが表示され、中央のエディタには"
+    "OCRクライアントのクラス定義と複数のメソッドが並んでいます。画面下部の"
+    "ターミナルではテストが実行されており、いくつかのテストが成功した結果が"
+    "表示されています。右上にはブラウザのタブも見えますが、現在の作業の中心は"
+    "エディタでの実装とテストの確認です。"
+)
+
+STRUCTURED_RESPONSE = {
+    "app": "VS Code",
+    "category": "coding",
+    "terms": ["ocr_client.py", "pytest", "OcrResult"],
+    "summary": "エディタでOCRクライアントを実装しテスト中"
+}
+
+IMAGE_PROMPT_TOKENS = 765  # 高解像度画像1枚あたりの入力トークン目安なのだ
+
+SERVER_ERROR_STATUSES = (500, 503)
+
+
+def latency_from_spec(spec: str, seed: Optional[int] = None) -> Callable[[], float]:
+    """遅延分布の指定文字列から秒数を返すサンプラを作るのだ
+
+    fixed:秒 / uniform:最小,最大 / lognormal:中央値,シグマ /
+    longtail:最小,最大,テール確率,テール倍率 のいずれかなのだ。
+    """
+    kind, _, raw_args = spec.strip().partition(":")
+    try:
+        args = [float(v) for v in raw_args.split(",") if v.strip()]
+    except ValueError as e:
+        raise ValueError(f"遅延分布の数値が不正なのだ: {spec}") from e
+    rng = random.Random(seed)
+
+    if kind == "fixed" and len(args) == 1:
+        return lambda: args[0]
+    if kind == "uniform" and len(args) == 2:
+        return lambda: rng.uniform(args[0], args[1])
+    if kind == "lognormal" and len(args) == 2:
+        mu = math.log(args[0]) if args[0] > 0 else 0.0
+        return lambda: rng.lognormvariate(mu, args[1]) if args[0] > 0 else 0.0
+    if kind == "longtail" and len(args) == 4:
+        def sample() -> float:
+            latency = rng.uniform(args[0], args[1])
+            return latency * args[3] if rng.random() < args[2] else latency
+        return sample
+    raise ValueError(f"未対応の遅延分布なのだ: {spec}")
+
+
+def estimate_tokens(text: str) -> int:
+    """英数字は4文字で1トークン、それ以外は1文字1トークンとして概算するのだ"""
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """max_tokensに収まるよう応答を切り詰めるのだ"""
+    while text and estimate_tokens(text) > max_tokens:
+        text = text[:-1]
+    return text
+
+
+def build_reply(prompt: str, image_count: int) -> str:
+    """プロンプトの形式に合わせたダミー応答を作るのだ"""
+    if '"index"' in prompt and '"summary"' in prompt:
+        # 構造化モードのバッチは画像ごとにフィールド付きの要素を返すのだ
+        items = [{"index": i + 1, **STRUCTURED_RESPONSE} for i in range(image_count)]
+        return json.dumps(items, ensure_ascii=False)
+    if '"index"' in prompt:
+        items = [{"index": i + 1, "text": PROSE_RESPONSE} for i in range(image_count)]
+        return json.dumps(items, ensure_ascii=False)
+    if '"summary"' in prompt:
+        return json.dumps(STRUCTURED_RESPONSE, ensure_ascii=False)
+    return PROSE_RESPONSE
+
+
+def _split_content(messages: List[Dict[str, Any]]) -> Tuple[str, int]:
+    """メッセージからプロンプト文字列と画像枚数を取り出すのだ"""
+    texts = []
+    image_count = 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            texts.append(content)
+            continue
+        for part in content or []:
+            if part.get("type") == "text":
+                texts.append(part.get("text", ""))
+            elif part.get("type") == "image_url":
+                image_count += 1
+    return "\n".join(texts), image_count
+
+
+class MockVisionServer:
+    """Azure OpenAI互換のchat completionsを返すローカルHTTPサーバなのだ
+
+    応答の遅延は「基本遅延＋出力トークン数×トークンあたり遅延」で決まるので、
+    出力トークンを減らす工夫の効果をオフラインで比較できるのだ。
+    429（Retry-After付き）と5xxを確率的、または fail_next で指定件数だけ返せるのだ。
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        base_latency_sec: float = 0.0,
+        per_token_latency_sec: float = 0.0,
+        latency_sampler: Optional[Callable[[], float]] = None,
+        rate_limit_rate: float = 0.0,
+        server_error_rate: float = 0.0,
+        retry_after_sec: float = 1.0,
+        seed: Optional[int] = None
+    ):
+        self.base_latency_sec = base_latency_sec
+        self.per_token_latency_sec = per_token_latency_sec
+        self.latency_sampler = latency_sampler  # 指定時は基本遅延の代わりにこの分布から引くのだ
+        self.rate_limit_rate = rate_limit_rate
+        self.server_error_rate = server_error_rate
+        self.retry_after_sec = retry_after_sec
+        self._rng = random.Random(seed)
+        self._forced_faults: Deque[int] = deque()
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "rate_limited": 0,
+            "server_errors": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0
+        }
+
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def endpoint(self) -> str:
+        """OcrClientの azure_openai_endpoint に渡すURLなのだ"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        """サーバスレッドを開始してエンドポイントを返すのだ"""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._server.serve_forever, name="mock_vision_server", daemon=True
+            )
+            self._thread.start()
+        return self.endpoint
+
+    def stop(self) -> None:
+        """サーバを停止するのだ"""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join(timeout=5.0)
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self) -> "MockVisionServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def fail_next(self, status: int, count: int = 1) -> None:
+        """次の count 件のリクエストを指定ステータスで失敗させるのだ"""
+        with self._stats_lock:
+            self._forced_faults.extend([status] * count)
+
+    def pick_fault(self) -> Optional[int]:
+        """このリクエストで返す障害ステータスを決めるのだ（Noneなら正常応答）"""
+        with self._stats_lock:
+            if self._forced_faults:
+                status: Optional[int] = self._forced_faults.popleft()
+            elif self._rng.random() < self.rate_limit_rate:
+                status = 429
+            elif self._rng.random() < self.server_error_rate:
+                status = self._rng.choice(SERVER_ERROR_STATUSES)
+            else:
+                status = None
+
+            if status == 429:
+                self.stats["rate_limited"] += 1
+            elif status is not None:
+                self.stats["server_errors"] += 1
+            return status
+
+    def fault_response(self, status: int) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """障害応答の本文とヘッダを作るのだ"""
+        if status == 429:
+            retry_after = max(0.0, self.retry_after_sec)
+            headers = {
+                "Retry-After": str(int(math.ceil(retry_after))),
+                "retry-after-ms": str(int(retry_after * 1000)),
+                "x-ratelimit-remaining-requests": "0",
+                "x-ratelimit-remaining-tokens": "0"
+            }
+            message = f"Rate limit is exceeded. Try again in {int(math.ceil(retry_after))} seconds."
+            return {"error": {"code": "429", "message": message}}, headers
+        return {"error": {"code": str(status), "message": "The server had an error while processing your request."}}, {}
+
+    def handle_completion(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """chat completionsリクエスト1件分の応答を作るのだ（遅延込み）"""
+        prompt, image_count = _split_content(body.get("messages", []))
+        max_tokens = int(body.get("max_tokens") or 4096)
+
+        reply = build_reply(prompt, image_count)
+        finish_reason = "stop"
+        if estimate_tokens(reply) > max_tokens:
+            reply = truncate_to_tokens(reply, max_tokens)
+            finish_reason = "length"
+
+        prompt_tokens = estimate_tokens(prompt) + IMAGE_PROMPT_TOKENS * image_count
+        completion_tokens = estimate_tokens(reply)
+
+        base_latency = self.latency_sampler() if self.latency_sampler else self.base_latency_sec
+        time.sleep(base_latency + self.per_token_latency_sec * completion_tokens)
+
+        with self._stats_lock:
+            self.stats["requests"] += 1
+            self.stats["prompt_tokens"] += prompt_tokens
+            self.stats["completion_tokens"] += completion_tokens
+
+        return {
+            "id": f"chatcmpl-mock-{time.time_ns()}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": reply},
+                "finish_reason": finish_reason
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """受けたリクエストとトークンの累計を返すのだ"""
+        with self._stats_lock:
+            return dict(self.stats)
+
+    def _make_handler(self):
+        """このサーバに紐付いたリクエストハンドラを作るのだ"""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if not self.path.split("?")[0].endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._send_json(400, {"error": {"message": "invalid json"}})
+                    return
+                fault = server.pick_fault()
+                if fault is not None:
+                    payload, headers = server.fault_response(fault)
+                    self._send_json(fault, payload, headers)
+                    return
+                self._send_json(200, server.handle_completion(body))
+
+            def _send_json(
+                self,
+                status: int,
+                payload: Dict[str, Any],
+                headers: Optional[Dict[str, str]] = None
+            ) -> None:
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass  # ベンチマーク出力を汚さないのだ
+
+        return Handler
+
+
+def create_mock_server(config: Config) -> Optional[MockVisionServer]:
+    """設定で有効ならOcrClientの向け先になるモックサーバを作るのだ"""
+    if not config.ocr_mock_enabled:
+        return None
+    return MockVisionServer(
+        latency_sampler=latency_from_spec(config.ocr_mock_latency),
+        rate_limit_rate=config.ocr_mock_rate_limit_rate,
+        server_error_rate=config.ocr_mock_server_error_rate
+    )
+
+
+def main() -> None:
+    """モックサーバを単体で起動するのだ"""
+    parser = argparse.ArgumentParser(description="オフライン計測用のchat completions互換モックサーバなのだ")
+    parser.add_argument("--host", default="127.0.0.1", help="待ち受けアドレス")
+    parser.add_argument("--port", type=int, default=8089, help="待ち受けポート")
+    parser.add_argument("--latency", default="fixed:0", help="遅延分布（fixed/uniform/lognormal/longtail）")
+    parser.add_argument("--per-token-latency", type=float, default=0.0, help="出力1トークンあたりの追加遅延秒")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="429を返す確率")
+    parser.add_argument("--server-error-rate", type=float, default=0.0, help="5xxを返す確率")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429のRetry-After秒")
+    parser.add_argument("--seed", type=int, default=None, help="乱数シード")
+    args = parser.parse_args()
+
+    server = MockVisionServer(
+        host=args.host,
+        port=args.port,
+        per_token_latency_sec=args.per_token_latency,
+        latency_sampler=latency_from_spec(args.latency, args.seed),
+        rate_limit_rate=args.rate_limit_rate,
+        server_error_rate=args.server_error_rate,
+        retry_after_sec=args.retry_after,
+        seed=args.seed
+    )
+    print(f"🧪 モックVisionサーバ起動なのだ: {server.start()}")
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"📊 モックサーバ統計: {server.get_stats()}")
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
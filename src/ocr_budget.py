@@ -0,0 +1,190 @@
+"""OCR予算ガバナー：日・時間ごとのトークン消費を永続化し、消費に応じてOCRを間引くのだ"""
+import json
+import threading
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from src.config import Config
+
+# 予算消費率ごとの劣化段階なのだ
+LEVEL_NORMAL = "normal"                        # そのままOCR
+LEVEL_REDUCED_DETAIL = "reduced_detail"        # 画像を低詳細度で送る
+LEVEL_REDUCED_FREQUENCY = "reduced_frequency"  # 低詳細度かつ数フレームに1回だけOCR
+LEVEL_EXHAUSTED = "exhausted"                  # OCRせずメタデータのみ記録
+
+REDUCED_DETAIL_RATIO = 0.5
+REDUCED_FREQUENCY_RATIO = 0.8
+
+
+@dataclass
+class BudgetState:
+    """日・時間ごとのトークン集計なのだ（state_path のJSONと同じ形）"""
+    day: str = ""  # YYYY-MM-DD
+    day_tokens: int = 0
+    hour: str = ""  # YYYY-MM-DDTHH
+    hour_tokens: int = 0
+
+
+@dataclass
+class BudgetPlan:
+    """1フレーム分のOCR可否と送り方なのだ"""
+    allow: bool
+    detail: Optional[str]  # "low" なら低詳細度で送るのだ
+    level: str
+
+
+class OcrBudget:
+    """OCRのトークン予算を日・時間単位で管理するのだ
+    
+    集計は state_path のJSONに保存するので再起動しても引き継がれるのだ。
+    上限が0の単位は無制限として扱うのだ。
+    """
+    
+    def __init__(
+        self,
+        state_path: Path,
+        daily_token_limit: int = 0,
+        hourly_token_limit: int = 0,
+        reduced_frequency_every: int = 3
+    ):
+        self.state_path = Path(state_path)
+        self.daily_token_limit = daily_token_limit
+        self.hourly_token_limit = hourly_token_limit
+        self.reduced_frequency_every = max(1, reduced_frequency_every)
+        
+        self._lock = threading.Lock()
+        self._frame_counter = 0
+        self._state = BudgetState()
+        self._load()
+        
+        self.stats = {
+            "allowed": 0,
+            "skipped": 0,
+            "degraded": 0
+        }
+    
+    def _load(self) -> None:
+        """保存済みの集計を読み込むのだ"""
+        if not self.state_path.exists():
+            return
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._state = BudgetState(
+                day=str(data.get("day", "")),
+                day_tokens=int(data.get("day_tokens", 0)),
+                hour=str(data.get("hour", "")),
+                hour_tokens=int(data.get("hour_tokens", 0))
+            )
+        except Exception as e:
+            print(f"⚠️ OCR予算状態読み込みエラー: {e}")
+    
+    def _save(self) -> None:
+        """集計を一時ファイル経由で書き出すのだ（ロック取得済み）"""
+        try:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.state_path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(asdict(self._state), f)
+            tmp_path.replace(self.state_path)
+        except Exception as e:
+            print(f"⚠️ OCR予算状態保存エラー: {e}")
+    
+    def _roll(self, now: datetime) -> None:
+        """日・時間が変わっていたら集計をリセットするのだ（ロック取得済み）"""
+        day = now.strftime("%Y-%m-%d")
+        hour = now.strftime("%Y-%m-%dT%H")
+        if self._state.day != day:
+            self._state.day = day
+            self._state.day_tokens = 0
+        if self._state.hour != hour:
+            self._state.hour = hour
+            self._state.hour_tokens = 0
+    
+    def _usage_ratio(self) -> float:
+        """日・時間の予算消費率の大きい方を返すのだ（ロック取得済み）"""
+        ratios = [0.0]
+        if self.daily_token_limit > 0:
+            ratios.append(self._state.day_tokens / self.daily_token_limit)
+        if self.hourly_token_limit > 0:
+            ratios.append(self._state.hour_tokens / self.hourly_token_limit)
+        return max(ratios)
+    
+    def _level(self) -> str:
+        """現在の劣化段階を返すのだ（ロック取得済み）"""
+        ratio = self._usage_ratio()
+        if ratio >= 1.0:
+            return LEVEL_EXHAUSTED
+        if ratio >= REDUCED_FREQUENCY_RATIO:
+            return LEVEL_REDUCED_FREQUENCY
+        if ratio >= REDUCED_DETAIL_RATIO:
+            return LEVEL_REDUCED_DETAIL
+        return LEVEL_NORMAL
+    
+    def plan(self, now: Optional[datetime] = None) -> BudgetPlan:
+        """次のフレームをOCRするか・どう送るかを決めるのだ"""
+        with self._lock:
+            self._roll(now or datetime.now(timezone.utc))
+            level = self._level()
+            
+            if level == LEVEL_EXHAUSTED:
+                self.stats["skipped"] += 1
+                return BudgetPlan(False, None, level)
+            
+            if level == LEVEL_REDUCED_FREQUENCY:
+                self._frame_counter += 1
+                if self._frame_counter % self.reduced_frequency_every != 0:
+                    self.stats["skipped"] += 1
+                    return BudgetPlan(False, None, level)
+            
+            self.stats["allowed"] += 1
+            if level == LEVEL_NORMAL:
+                return BudgetPlan(True, None, level)
+            self.stats["degraded"] += 1
+            return BudgetPlan(True, "low", level)
+    
+    def record(self, tokens_used: int, now: Optional[datetime] = None) -> None:
+        """使用トークンを集計に足して保存するのだ"""
+        if tokens_used <= 0:
+            return
+        with self._lock:
+            self._roll(now or datetime.now(timezone.utc))
+            self._state.day_tokens += tokens_used
+            self._state.hour_tokens += tokens_used
+            self._save()
+    
+    def usage(self) -> Dict[str, Any]:
+        """レコードに書き込む予算使用状況を返すのだ"""
+        with self._lock:
+            self._roll(datetime.now(timezone.utc))
+            return {
+                "day_tokens": self._state.day_tokens,
+                "hour_tokens": self._state.hour_tokens,
+                "level": self._level()
+            }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """予算の状況と統計を返すのだ"""
+        with self._lock:
+            self._roll(datetime.now(timezone.utc))
+            return {
+                **self.stats,
+                **asdict(self._state),
+                "daily_token_limit": self.daily_token_limit,
+                "hourly_token_limit": self.hourly_token_limit,
+                "usage_ratio": round(self._usage_ratio(), 3),
+                "level": self._level()
+            }
+
+
+def create_budget(config: Config) -> Optional[OcrBudget]:
+    """設定で上限が指定されていれば予算ガバナーを作るのだ"""
+    if config.ocr_daily_token_budget <= 0 and config.ocr_hourly_token_budget <= 0:
+        return None
+    return OcrBudget(
+        config.data_dir / "ocr_budget.json",
+        daily_token_limit=config.ocr_daily_token_budget,
+        hourly_token_limit=config.ocr_hourly_token_budget
+    )
@@ -0,0 +1,192 @@
+"""OCR結果キャッシュ：画像内容をキーにOCR結果を永続化して使い回すのだ"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from src.image_hash import dhash
+
+CacheEntry = Tuple[str, int, Optional[Dict[str, Any]]]
+
+# ヒット時の最終参照時刻はまとめて書くのだ（この件数か秒数を超えたら書き出す）
+TOUCH_FLUSH_COUNT = 64
+TOUCH_FLUSH_INTERVAL_SEC = 30.0
+
+
+class OcrResultCache:
+    """画像バイト列（または知覚ハッシュ）＋プロンプト＋モデルをキーにしたOCR結果キャッシュなのだ
+
+    data_dir 配下の1つのSQLiteファイルに保存するので再起動後も有効なのだ。
+    件数上限を超えたら最終参照が古い順（LRU）に、TTLを過ぎたものは参照時と書き込み時に削除するのだ。
+    ヒットは読むだけで返し、最終参照時刻の更新は溜めてから1回で書くのだ。
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        max_entries: int = 1000,
+        ttl_sec: float = 86400.0,
+        key_mode: str = "exact"
+    ):
+        if key_mode not in ("exact", "phash"):
+            raise ValueError(f"未対応のキャッシュキー方式なのだ: {key_mode}")
+
+        self.db_path = Path(db_path)
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self.key_mode = key_mode
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ocr_cache (
+                key TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                tokens_used INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                fields TEXT
+            )
+            """
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(ocr_cache)")]
+        if "fields" not in columns:
+            # 構造化フィールド導入前に作られたDBにも列を足すのだ
+            self._conn.execute("ALTER TABLE ocr_cache ADD COLUMN fields TEXT")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_ocr_cache_last_access ON ocr_cache(last_access)"
+        )
+        self._conn.commit()
+
+        self._pending_touches: Dict[str, float] = {}  # key → まだ書いていない最終参照時刻
+        self._last_touch_flush = time.monotonic()
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "tokens_saved": 0,
+            "evicted": 0
+        }
+
+    def make_key(self, image_bytes: bytes, prompt: str, model: str) -> str:
+        """キャッシュキーを作るのだ"""
+        if self.key_mode == "phash":
+            try:
+                image_part = f"phash:{dhash(image_bytes):016x}"
+            except Exception:
+                # 画像として読めなければ完全一致キーにフォールバックするのだ
+                image_part = f"sha256:{hashlib.sha256(image_bytes).hexdigest()}"
+        else:
+            image_part = f"sha256:{hashlib.sha256(image_bytes).hexdigest()}"
+
+        return hashlib.sha256(f"{image_part}\n{model}\n{prompt}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """キャッシュ済みの (テキスト, 使用トークン, 構造化フィールド) を返すのだ（無ければNone）"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, tokens_used, created_at, fields FROM ocr_cache WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is not None and now - row[2] > self.ttl_sec:
+                self._conn.execute("DELETE FROM ocr_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self.stats["evicted"] += 1
+                row = None
+
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+
+            self._pending_touches[key] = now
+            if (len(self._pending_touches) >= TOUCH_FLUSH_COUNT
+                    or time.monotonic() - self._last_touch_flush >= TOUCH_FLUSH_INTERVAL_SEC):
+                self._flush_touches()
+                self._conn.commit()
+            self.stats["hits"] += 1
+            self.stats["tokens_saved"] += row[1]
+            return row[0], row[1], json.loads(row[3]) if row[3] else None
+
+    def put(
+        self,
+        key: str,
+        text: str,
+        tokens_used: int,
+        fields: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """OCR結果を保存して上限を守るのだ"""
+        now = time.time()
+        fields_json = json.dumps(fields, ensure_ascii=False) if fields is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ocr_cache "
+                "(key, text, tokens_used, created_at, last_access, fields) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, text, tokens_used, now, now, fields_json)
+            )
+            self._pending_touches.pop(key, None)
+            # LRUの判定が正しくなるよう、溜めていた最終参照時刻を先に書くのだ
+            self._flush_touches()
+            self._evict(now)
+            self._conn.commit()
+
+    def _flush_touches(self) -> None:
+        """溜めていた最終参照時刻をまとめて書くのだ（ロック取得済み・コミットは呼び出し側）"""
+        if self._pending_touches:
+            self._conn.executemany(
+                "UPDATE ocr_cache SET last_access = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._pending_touches.items()]
+            )
+            self._pending_touches.clear()
+        self._last_touch_flush = time.monotonic()
+
+    def _evict(self, now: float) -> None:
+        """TTL切れと件数超過分を削除するのだ（ロック取得済み）"""
+        expired = self._conn.execute(
+            "DELETE FROM ocr_cache WHERE created_at < ?", (now - self.ttl_sec,)
+        ).rowcount
+        count = self._conn.execute("SELECT COUNT(*) FROM ocr_cache").fetchone()[0]
+        overflow = max(0, count - self.max_entries)
+        if overflow:
+            self._conn.execute(
+                "DELETE FROM ocr_cache WHERE key IN "
+                "(SELECT key FROM ocr_cache ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            )
+        self.stats["evicted"] += expired + overflow
+
+    def clear(self) -> int:
+        """全エントリを削除するのだ"""
+        with self._lock:
+            self._pending_touches.clear()
+            cleared = self._conn.execute("DELETE FROM ocr_cache").rowcount
+            self._conn.commit()
+            return cleared
+
+    def close(self) -> None:
+        """溜めていた最終参照時刻を書いてからDB接続を閉じるのだ"""
+        with self._lock:
+            self._flush_touches()
+            self._conn.commit()
+            self._conn.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """ヒット率と節約トークンを返すのだ"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM ocr_cache").fetchone()[0]
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": entries,
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+            "key_mode": self.key_mode,
+            "db_path": str(self.db_path)
+        }
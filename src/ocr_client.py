@@ -1,21 +1,89 @@
 """Azure OpenAI OCRクライアント：画像からテキストを抽出するのだ"""
+import asyncio
 import base64
+import json
+import re
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Dict, Any
-from openai import AzureOpenAI
+from typing import TYPE_CHECKING, Optional, Dict, Any, List, Tuple
+from src.circuit_breaker import CircuitBreaker, create_circuit_breaker
 from src.config import Config
+from src.hedging import HedgePolicy, call_with_hedge, create_hedge_policy
+from src.lazy_import import LazyImport
+from src.ocr_budget import OcrBudget
+from src.ocr_cache import OcrResultCache
+from src.ocr_router import OcrRouter, RouteDecision
+from src.rate_limiter import RateLimiter
+
+if TYPE_CHECKING:
+    from openai import AsyncAzureOpenAI, AzureOpenAI
+    from openai.types.chat import ChatCompletionMessageParam
+else:
+    # openai はクライアント生成時に読み込むのだ（OCR無効なら読み込まない）
+    AzureOpenAI = LazyImport("openai", "AzureOpenAI")
+    AsyncAzureOpenAI = LazyImport("openai", "AsyncAzureOpenAI")
+
+API_VERSION = "2023-12-01-preview"  # Vision API対応バージョン
+
+RATE_LIMIT_SHED_ERROR = "API利用制限エラー (Rate Limit): 送信前にクライアント側で保留しました"
+
+CIRCUIT_OPEN_ERROR = "接続遮断中エラー (Circuit Open): エンドポイント障害のため送信せずに失敗しました"
+
+# 起動時の接続ウォームアップ用の最小リクエストなのだ（画像無し・1トークン）
+WARM_UP_MESSAGES: List["ChatCompletionMessageParam"] = [{"role": "user", "content": "ping"}]
+WARM_UP_MAX_TOKENS = 1
+
+DEFAULT_PROMPT = ("この画像はPCのデスクトップ画面のスクリーンショットです。"
+                  "PCのユーザーが作業している内容や状況を目が見えない人に向けて説明するテキストを200文字以内で作成してください")
+
+STRUCTURED_PROMPT = ("この画像はPCのデスクトップ画面のスクリーンショットです。"
+                     "前置きなしで次のキーを持つJSONオブジェクトのみを返してください: "
+                     "\"app\"（前面のアプリ名）, "
+                     "\"category\"（coding/writing/browsing/communication/meeting/media/design/other のいずれか）, "
+                     "\"terms\"（画面に見える重要な語を最大5個の配列）, "
+                     "\"summary\"（作業内容の要約を40文字以内）")
+
+STRUCTURED_MAX_TOKENS = 150  # 構造化応答はこれで収まるのだ
+
+STRUCTURED_FIELDS = ("app", "category", "terms", "summary")
+
+BATCH_PROMPT_TEMPLATE = ("{count}枚の画像が順番に添付されています。各画像について次の指示に従ってください。\n"
+                         "{prompt}\n"
+                         "回答は前置きなしのJSON配列のみとし、"
+                         "[{{\"index\": 1, \"text\": \"...\"}}, ...] の形式で{count}件すべて返してください。")
+
+BATCH_STRUCTURED_PROMPT_TEMPLATE = ("{count}枚の画像が順番に添付されています。各画像について次の指示に従ってください。\n"
+                                    "{prompt}\n"
+                                    "回答は前置きなしのJSON配列のみとし、"
+                                    "[{{\"index\": 1, \"app\": \"...\", \"category\": \"...\", "
+                                    "\"terms\": [...], \"summary\": \"...\"}}, ...] の形式で{count}件すべて返してください。")
+
+BATCH_MAX_TOKENS_PER_IMAGE = 500
 
 
 class OcrResult:
     """OCR結果クラスなのだ"""
     
-    def __init__(self, success: bool, text: str = "", error: Optional[str] = None, tokens_used: int = 0):
+    def __init__(
+        self,
+        success: bool,
+        text: str = "",
+        error: Optional[str] = None,
+        tokens_used: int = 0,
+        from_cache: bool = False,
+        fields: Optional[Dict[str, Any]] = None
+    ):
         self.success = success
         self.text = text
         self.error = error
         self.tokens_used = tokens_used
+        self.from_cache = from_cache  # キャッシュヒット時はAPIを呼んでいないのだ
+        self.fields = fields  # 構造化モードの app/category/terms/summary なのだ
         self.timestamp = time.time()
+        self.timings: Dict[str, float] = {}  # encode/network/parse の所要秒なのだ
+        self.bytes_uploaded = 0  # 送信したBase64画像のバイト数なのだ
     
     def is_success(self) -> bool:
         """処理成功かどうかを返すのだ"""
@@ -33,102 +101,292 @@ class OcrResult:
 class OcrClient:
     """Azure OpenAI Vision OCRクライアントなのだ"""
     
-    def __init__(self, config: Config):
+    def __init__(
+        self,
+        config: Config,
+        rate_limiter: Optional[RateLimiter] = None,
+        result_cache: Optional[OcrResultCache] = None,
+        router: Optional[OcrRouter] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        hedge_policy: Optional[HedgePolicy] = None,
+        budget: Optional[OcrBudget] = None
+    ):
         self.config = config
+        self.rate_limiter = rate_limiter or _create_rate_limiter(config)
+        self.result_cache = result_cache or create_result_cache(config)
+        self.router = router  # ティア別統計の記録先なのだ（判定は呼び出し側が行う）
+        self.circuit_breaker = circuit_breaker or create_circuit_breaker(config)
+        self.hedge_policy = hedge_policy or create_hedge_policy(config)
+        self.budget = budget  # ヘッジで捨てた方の応答のトークンを計上する先なのだ
+        self._hedge_executor: Optional[ThreadPoolExecutor] = None
+        if self.hedge_policy is not None:
+            self._hedge_executor = ThreadPoolExecutor(
+                max_workers=_hedge_pool_size(config), thread_name_prefix="ocr_hedge"
+            )
+        from openai import DefaultHttpxClient
+        
+        # 成功応答の x-ratelimit-* ヘッダもリミッタに渡して、429の前に減速できるようにするのだ
         self.client = AzureOpenAI(
             azure_endpoint=config.azure_openai_endpoint,
             api_key=config.azure_openai_key,
-            api_version="2023-12-01-preview"  # Vision API対応バージョン
+            api_version=API_VERSION,
+            http_client=DefaultHttpxClient(
+                event_hooks={"response": [_rate_limit_header_hook(self.rate_limiter)]}
+            ),
+            # SDKの自動再試行はレートリミッタ・ブレーカ・ヘッジを迂回するので無効にするのだ
+            max_retries=0
         )
         self.model = config.azure_openai_model
     
-    def extract_text_from_image(self, image_path: Path, prompt: Optional[str] = None) -> OcrResult:
-        """画像ファイルからテキストを抽出するのだ"""
+    def extract_text_from_image(
+        self,
+        image_path: Path,
+        prompt: Optional[str] = None,
+        route: Optional[RouteDecision] = None
+    ) -> OcrResult:
+        """画像ファイルからテキストを抽出するのだ（routeがあればそのモデル・詳細度で送る）"""
         if not image_path.exists():
             return OcrResult(success=False, error=f"画像ファイルが存在しません: {image_path}")
         
         try:
-            # 画像をBase64エンコード
             with open(image_path, "rb") as image_file:
-                image_data = base64.b64encode(image_file.read()).decode('utf-8')
-            
-            # OCR実行
-            return self._perform_ocr(image_data, prompt)
-            
+                image_bytes = image_file.read()
+        except Exception as e:
+            return OcrResult(success=False, error=f"画像読み込みエラー: {str(e)}")
+        
+        try:
+            return self._extract_with_cache(image_bytes, prompt, route)
         except Exception as e:
             return OcrResult(success=False, error=f"画像読み込みエラー: {str(e)}")
     
-    def extract_text_from_bytes(self, image_bytes: bytes, prompt: Optional[str] = None) -> OcrResult:
+    def extract_text_from_bytes(
+        self,
+        image_bytes: bytes,
+        prompt: Optional[str] = None,
+        route: Optional[RouteDecision] = None
+    ) -> OcrResult:
         """画像バイト列からテキストを抽出するのだ"""
         try:
-            # 画像をBase64エンコード
-            image_data = base64.b64encode(image_bytes).decode('utf-8')
-            
-            # OCR実行
-            return self._perform_ocr(image_data, prompt)
+            return self._extract_with_cache(image_bytes, prompt, route)
             
         except Exception as e:
             return OcrResult(success=False, error=f"画像バイト処理エラー: {str(e)}")
     
-    def _perform_ocr(self, image_base64: str, prompt: Optional[str] = None) -> OcrResult:
-        """実際のOCR処理を実行するのだ"""
-        try:
-            # デフォルトプロンプト
-            if prompt is None:
-                prompt = ("この画像はPCのデスクトップ画面のスクリーンショットです。"
-                         "PCのユーザーが作業している内容や状況を目が見えない人に向けて説明するテキストを200文字以内で作成してください")
+    def _extract_with_cache(
+        self,
+        image_bytes: bytes,
+        prompt: Optional[str] = None,
+        route: Optional[RouteDecision] = None
+    ) -> OcrResult:
+        """結果キャッシュを引いてから、無ければOCRを実行して保存するのだ"""
+        cache_key = None
+        if self.result_cache is not None:
+            cache_key = self.result_cache.make_key(
+                image_bytes, _cache_prompt(self.config, prompt), _cache_model(self.model, route)
+            )
+            cached = _cached_result(self.result_cache, cache_key)
+            if cached is not None:
+                return cached
+        
+        # 画像をBase64エンコードしてOCR実行
+        encode_started = time.monotonic()
+        image_data = base64.b64encode(image_bytes).decode('utf-8')
+        encode_sec = time.monotonic() - encode_started
+        started = time.monotonic()
+        result = self._perform_ocr(image_data, prompt, route)
+        result.timings["encode"] = encode_sec
+        if route is not None and self.router is not None:
+            self.router.record(route, time.monotonic() - started, result.tokens_used, result.success)
+        
+        if self.result_cache is not None and cache_key is not None and result.success:
+            self.result_cache.put(cache_key, result.text, result.tokens_used, result.fields)
+        return result
+    
+    def extract_text_from_images(
+        self,
+        image_paths: List[Path],
+        prompt: Optional[str] = None
+    ) -> List[OcrResult]:
+        """複数画像を1リクエストにまとめてOCRし、画像ごとの結果を入力順で返すのだ
+        
+        応答を画像ごとに分解できなかった分は1枚ずつのOCRにフォールバックするのだ。
+        """
+        # 応答形式（自由記述/JSON）は単発と同じ _request_options で決めるのだ
+        results: List[Optional[OcrResult]] = [None] * len(image_paths)
+        pending = []  # (入力位置, 画像バイト列, キャッシュキー)
+        
+        for i, image_path in enumerate(image_paths):
+            if not image_path.exists():
+                results[i] = OcrResult(success=False, error=f"画像ファイルが存在しません: {image_path}")
+                continue
+            try:
+                image_bytes = image_path.read_bytes()
+            except Exception as e:
+                results[i] = OcrResult(success=False, error=f"画像読み込みエラー: {str(e)}")
+                continue
             
-            # Azure OpenAI Vision APIリクエスト
+            cache_key = None
+            if self.result_cache is not None:
+                cache_key = self.result_cache.make_key(
+                    image_bytes, _cache_prompt(self.config, prompt), self.model
+                )
+                cached = _cached_result(self.result_cache, cache_key)
+                if cached is not None:
+                    results[i] = cached
+                    continue
+            pending.append((i, image_bytes, cache_key))
+        
+        if len(pending) == 1:
+            i, image_bytes, cache_key = pending[0]
+            results[i] = self._perform_ocr(base64.b64encode(image_bytes).decode('utf-8'), prompt)
+        elif pending:
+            batch_results = self._perform_batch_ocr(
+                [base64.b64encode(image_bytes).decode('utf-8') for _, image_bytes, _ in pending],
+                prompt
+            )
+            for (i, image_bytes, _), result in zip(pending, batch_results, strict=True):
+                if result is None:
+                    # 応答から取り出せなかった画像は単発で再実行するのだ
+                    result = self._perform_ocr(base64.b64encode(image_bytes).decode('utf-8'), prompt)
+                results[i] = result
+        
+        for i, _, cache_key in pending:
+            result = results[i]
+            if self.result_cache is not None and cache_key is not None and result is not None and result.success:
+                self.result_cache.put(cache_key, result.text, result.tokens_used, result.fields)
+        
+        return [r or OcrResult(success=False, error="OCRレスポンスが空です") for r in results]
+    
+    def _perform_batch_ocr(
+        self,
+        images_base64: List[str],
+        prompt: Optional[str] = None
+    ) -> List[Optional[OcrResult]]:
+        """複数画像を1回のAPI呼び出しでOCRするのだ（分解できなかった画像はNone）"""
+        count = len(images_base64)
+        prompt, _, structured = _request_options(self.config, prompt)
+        max_tokens_per_image = STRUCTURED_MAX_TOKENS if structured else BATCH_MAX_TOKENS_PER_IMAGE
+        if self.circuit_breaker is not None and not self.circuit_breaker.allow_request():
+            return [OcrResult(success=False, error=CIRCUIT_OPEN_ERROR) for _ in range(count)]
+        
+        estimated_per_image = self.rate_limiter.estimate_tokens()
+        if not self.rate_limiter.acquire(estimated_per_image * count):
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.release()
+            return [OcrResult(success=False, error=RATE_LIMIT_SHED_ERROR) for _ in range(count)]
+        
+        try:
             response = self.client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{image_base64}"
-                                }
-                            }
-                        ]
-                    }
-                ],
-                max_tokens=1000,  # OCRテキスト用に十分な量
-                temperature=0.0,  # 一貫性を重視
-                top_p=1.0
+                messages=_build_batch_messages(images_base64, prompt, structured),
+                max_tokens=max_tokens_per_image * count,
+                temperature=0.0,
+                top_p=1.0,
+                timeout=self.config.ocr_timeout_sec
             )
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.record_success()
+        except Exception as e:
+            if _is_rate_limited(e):
+                self.rate_limiter.record_rate_limited(_response_headers(e))
+            _record_breaker_failure(self.circuit_breaker, e)
+            # 通信・APIエラーは単発にしても同じなので全件失敗にするのだ
+            error = _describe_error(e)
+            return [OcrResult(success=False, error=error) for _ in range(count)]
+        
+        combined = _parse_response(response)
+        # 使用トークンは画像数で按分してリミッタに1枚ずつ反映するのだ
+        tokens_per_image = combined.tokens_used // count
+        for _ in range(count):
+            self.rate_limiter.record_usage(tokens_per_image, estimated_per_image)
+        
+        if not combined.success:
+            return [None] * count
+        
+        if structured:
+            # 構造化モードでは単発と同じく ocr_text に要約を入れるのだ
+            return [
+                OcrResult(success=True, text=fields["summary"], tokens_used=tokens_per_image, fields=fields)
+                if fields else None
+                for fields in _split_batch_fields(combined.get_text(), count)
+            ]
+        
+        texts = _split_batch_text(combined.get_text(), count)
+        return [
+            OcrResult(success=True, text=text, tokens_used=tokens_per_image) if text else None
+            for text in texts
+        ]
+    
+    def _perform_ocr(
+        self,
+        image_base64: str,
+        prompt: Optional[str] = None,
+        route: Optional[RouteDecision] = None
+    ) -> OcrResult:
+        """実際のOCR処理を実行するのだ"""
+        # エンドポイント障害中は待たずに即失敗させるのだ
+        if self.circuit_breaker is not None and not self.circuit_breaker.allow_request():
+            return OcrResult(success=False, error=CIRCUIT_OPEN_ERROR)
+        
+        # RPM/TPMとRetry-Afterを守れないなら送信前に捨てるのだ
+        estimated_tokens = self.rate_limiter.estimate_tokens()
+        if not self.rate_limiter.acquire(estimated_tokens):
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.release()
+            return OcrResult(success=False, error=RATE_LIMIT_SHED_ERROR)
+        
+        network_started = time.monotonic()
+        try:
+            # Azure OpenAI Vision APIリクエスト（仕様のAPIタイムアウトを適用）
+            prompt, max_tokens, structured = _request_options(self.config, prompt)
             
-            # レスポンス解析
-            if response.choices and response.choices[0].message:
-                extracted_text = response.choices[0].message.content or ""
-                tokens_used = response.usage.total_tokens if response.usage else 0
-                
-                return OcrResult(
-                    success=True,
-                    text=extracted_text.strip(),
-                    tokens_used=tokens_used
+            def request():
+                return self.client.chat.completions.create(
+                    model=route.model if route else self.model,
+                    messages=_build_messages(image_base64, prompt, route.detail if route else None),
+                    max_tokens=max_tokens,
+                    temperature=0.0,  # 一貫性を重視
+                    top_p=1.0,
+                    timeout=self.config.ocr_timeout_sec
+                )
+            
+            if self.hedge_policy is not None and self._hedge_executor is not None:
+                # p95を過ぎても返らなければ複製を送るのだ（複製もRPM/TPM枠と予算を使う）
+                response = call_with_hedge(
+                    self.hedge_policy,
+                    self._hedge_executor,
+                    request,
+                    allow_extra=lambda: self.rate_limiter.try_acquire(estimated_tokens) == 0,
+                    on_discarded=lambda extra: self._record_extra_usage(extra, estimated_tokens)
                 )
             else:
-                return OcrResult(success=False, error="OCRレスポンスが空です")
+                response = request()
+            network_sec = time.monotonic() - network_started
+            
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.record_success()
+            parse_started = time.monotonic()
+            result = _parse_response(response, structured)
+            result.timings.update(network=network_sec, parse=time.monotonic() - parse_started)
+            result.bytes_uploaded = len(image_base64)
+            self.rate_limiter.record_usage(result.tokens_used, estimated_tokens)
+            return result
                 
         except Exception as e:
-            error_message = str(e)
-            
-            # よくあるエラーパターンの詳細化
-            if "429" in error_message:
-                error_message = f"API利用制限エラー (Rate Limit): {error_message}"
-            elif "401" in error_message:
-                error_message = f"認証エラー: {error_message}"
-            elif "403" in error_message:
-                error_message = f"アクセス権限エラー: {error_message}"
-            elif "404" in error_message:
-                error_message = f"リソースが見つかりません: {error_message}"
-            elif "timeout" in error_message.lower():
-                error_message = f"タイムアウトエラー: {error_message}"
-            
-            return OcrResult(success=False, error=error_message)
+            if _is_rate_limited(e):
+                self.rate_limiter.record_rate_limited(_response_headers(e))
+            _record_breaker_failure(self.circuit_breaker, e)
+            result = OcrResult(success=False, error=_describe_error(e))
+            result.timings["network"] = time.monotonic() - network_started
+            result.bytes_uploaded = len(image_base64)
+            return result
+    
+    def _record_extra_usage(self, response, estimated_tokens: int) -> None:
+        """ヘッジで採用しなかった方の応答のトークンもリミッタと予算に計上するのだ"""
+        tokens_used = response.usage.total_tokens if response.usage else 0
+        self.rate_limiter.record_usage(tokens_used, estimated_tokens)
+        if self.budget is not None:
+            self.budget.record(tokens_used)
     
     def test_connection(self) -> bool:
         """Azure OpenAI接続テストを実行するのだ"""
@@ -161,11 +419,472 @@ class OcrClient:
             print(f"⚠️ Azure OpenAI接続テスト失敗: {e}")
             return False
     
+    def warm_up(self) -> OcrResult:
+        """画像無しの最小リクエストで接続プール（DNS・TLS）を温め、認証情報を確かめるのだ"""
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=WARM_UP_MESSAGES,
+                max_tokens=WARM_UP_MAX_TOKENS,
+                timeout=self.config.ocr_timeout_sec
+            )
+            tokens_used = response.usage.total_tokens if response.usage else 0
+            return OcrResult(success=True, tokens_used=tokens_used)
+        except Exception as e:
+            return OcrResult(success=False, error=_describe_error(e))
+    
     def get_model_info(self) -> Dict[str, Any]:
         """使用中のモデル情報を返すのだ"""
         return {
             "model": self.model,
             "endpoint": self.config.azure_openai_endpoint,
-            "api_version": "2023-12-01-preview"
+            "api_version": API_VERSION
         }
 
+
+def _build_messages(image_base64: str, prompt: Optional[str] = None, detail: Optional[str] = None) -> list:
+    """Vision API用のメッセージを組み立てるのだ"""
+    # デフォルトプロンプト
+    if prompt is None:
+        prompt = DEFAULT_PROMPT
+    
+    image_url: Dict[str, Any] = {"url": f"data:image/jpeg;base64,{image_base64}"}
+    if detail is not None:
+        image_url["detail"] = detail  # "low" なら画像トークンが固定の小さい値になるのだ
+    
+    return [
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": prompt},
+                {
+                    "type": "image_url",
+                    "image_url": image_url
+                }
+            ]
+        }
+    ]
+
+
+def _build_batch_messages(
+    images_base64: List[str],
+    prompt: Optional[str] = None,
+    structured: bool = False
+) -> list:
+    """複数画像を1メッセージに並べたVision API用メッセージを組み立てるのだ"""
+    template = BATCH_STRUCTURED_PROMPT_TEMPLATE if structured else BATCH_PROMPT_TEMPLATE
+    batch_prompt = template.format(count=len(images_base64), prompt=prompt or DEFAULT_PROMPT)
+    
+    content: List[Dict[str, Any]] = [{"type": "text", "text": batch_prompt}]
+    for image_base64 in images_base64:
+        content.append({
+            "type": "image_url",
+            "image_url": {
+                "url": f"data:image/jpeg;base64,{image_base64}"
+            }
+        })
+    return [{"role": "user", "content": content}]
+
+
+def _split_batch_items(text: str, count: int) -> List[Any]:
+    """バッチ応答のJSON配列を画像ごとの要素に分解するのだ（取れない画像はNone）"""
+    items: List[Any] = [None] * count
+    
+    # ```json ... ``` で囲まれていても配列部分だけを取り出すのだ
+    match = re.search(r"\[.*\]", text, re.DOTALL)
+    if match is None:
+        return items
+    try:
+        parsed = json.loads(match.group(0))
+    except ValueError:
+        return items
+    if not isinstance(parsed, list):
+        return items
+    
+    for position, item in enumerate(parsed):
+        index = item.get("index", position + 1) if isinstance(item, dict) else position + 1
+        if isinstance(index, int) and 1 <= index <= count:
+            items[index - 1] = item
+    
+    return items
+
+
+def _split_batch_text(text: str, count: int) -> List[Optional[str]]:
+    """バッチ応答を画像ごとのテキストに分解するのだ（取れない画像はNone）"""
+    texts: List[Optional[str]] = []
+    for item in _split_batch_items(text, count):
+        value = item.get("text") if isinstance(item, dict) else item
+        texts.append(value.strip() if isinstance(value, str) and value.strip() else None)
+    return texts
+
+
+def _split_batch_fields(text: str, count: int) -> List[Optional[Dict[str, Any]]]:
+    """構造化モードのバッチ応答を画像ごとのフィールドに分解するのだ（取れない画像はNone）"""
+    return [
+        _structured_fields(item) if isinstance(item, dict) else None
+        for item in _split_batch_items(text, count)
+    ]
+
+
+def _request_options(config: Config, prompt: Optional[str] = None) -> Tuple[Optional[str], int, bool]:
+    """応答形式の設定から (プロンプト, max_tokens, 構造化かどうか) を決めるのだ"""
+    if prompt is None and config.ocr_response_format == "json":
+        return STRUCTURED_PROMPT, STRUCTURED_MAX_TOKENS, True
+    return prompt, 1000, False  # 自由記述はOCRテキスト用に十分な量
+
+
+def _cache_prompt(config: Config, prompt: Optional[str] = None) -> str:
+    """キャッシュキーに使う実際の送信プロンプトを返すのだ"""
+    return _request_options(config, prompt)[0] or DEFAULT_PROMPT
+
+
+def _cache_model(model: str, route: Optional[RouteDecision] = None) -> str:
+    """キャッシュキーに使うモデル名（ルーティング先と詳細度込み）を返すのだ"""
+    if route is None:
+        return model
+    return f"{route.model}:{route.detail}" if route.detail else route.model
+
+
+def _parse_structured(text: str) -> Optional[Dict[str, Any]]:
+    """構造化応答のJSONオブジェクトを取り出して既知のキーだけに整えるのだ"""
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    if match is None:
+        return None
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    return _structured_fields(data)
+
+
+def _structured_fields(data: Dict[str, Any]) -> Dict[str, Any]:
+    """構造化応答の辞書を既知のキーだけに整えるのだ"""
+    terms = data.get("terms")
+    return {
+        "app": str(data.get("app") or ""),
+        "category": str(data.get("category") or "other"),
+        "terms": [str(t) for t in terms] if isinstance(terms, list) else [],
+        "summary": str(data.get("summary") or "")
+    }
+
+
+def _parse_response(response, structured: bool = False) -> OcrResult:
+    """Vision APIレスポンスをOcrResultに変換するのだ"""
+    if response.choices and response.choices[0].message:
+        extracted_text = (response.choices[0].message.content or "").strip()
+        tokens_used = response.usage.total_tokens if response.usage else 0
+        
+        fields = _parse_structured(extracted_text) if structured else None
+        if fields is not None:
+            # ocr_text には要約を入れて、従来の読み手はそのまま使えるようにするのだ
+            extracted_text = fields["summary"]
+        
+        return OcrResult(
+            success=True,
+            text=extracted_text,
+            tokens_used=tokens_used,
+            fields=fields
+        )
+    else:
+        return OcrResult(success=False, error="OCRレスポンスが空です")
+
+
+def create_result_cache(config: Config) -> Optional[OcrResultCache]:
+    """設定で有効ならdata_dir配下にOCR結果キャッシュを開くのだ"""
+    if not config.ocr_cache_enabled:
+        return None
+    return OcrResultCache(
+        config.data_dir / "ocr_cache.sqlite3",
+        max_entries=config.ocr_cache_max_entries,
+        ttl_sec=config.ocr_cache_ttl_sec,
+        key_mode=config.ocr_cache_key
+    )
+
+
+def _cached_result(result_cache: OcrResultCache, cache_key: str) -> Optional[OcrResult]:
+    """キャッシュヒットならOcrResultにして返すのだ（API呼び出しなしなので使用トークンは0）"""
+    cached = result_cache.get(cache_key)
+    if cached is None:
+        return None
+    return OcrResult(success=True, text=cached[0], tokens_used=0, from_cache=True, fields=cached[2])
+
+
+def _create_rate_limiter(config: Config) -> RateLimiter:
+    """設定からレートリミッタを作るのだ"""
+    return RateLimiter(
+        rpm_limit=config.ocr_rpm_limit,
+        tpm_limit=config.ocr_tpm_limit,
+        max_wait_sec=config.ocr_rate_limit_max_wait_sec
+    )
+
+
+def _is_rate_limited(e: Exception) -> bool:
+    """429（レート制限）応答の例外かどうかを判定するのだ"""
+    return getattr(e, "status_code", None) == 429 or "429" in str(e)
+
+
+def _is_timeout(e: Exception) -> bool:
+    """タイムアウトの例外かどうかを判定するのだ"""
+    message = str(e).lower()
+    return isinstance(e, asyncio.TimeoutError) or "timeout" in message or "timed out" in message
+
+
+def _record_breaker_failure(circuit_breaker: Optional[CircuitBreaker], e: Exception) -> None:
+    """送信失敗をブレーカに反映するのだ（429はエンドポイント障害ではないので数えない）"""
+    if circuit_breaker is None:
+        return
+    if _is_rate_limited(e):
+        circuit_breaker.release()
+    else:
+        circuit_breaker.record_failure(timeout=_is_timeout(e))
+
+
+def _response_headers(e: Exception) -> Optional[Dict[str, str]]:
+    """APIエラーからレスポンスヘッダを取り出すのだ"""
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None)
+    return dict(headers) if headers is not None else None
+
+
+def _hedge_pool_size(config: Config) -> int:
+    """ヘッジ用スレッド数を返すのだ
+
+    OCRを呼ぶスレッド（OCRワーカー・一括消化・tickかリトライスケジューラ）ごとに
+    本体と複製の2本を取れる数にして、複製が他の本体の後ろで待たないようにするのだ。
+    """
+    callers = max(1, config.ocr_worker_threads) + config.ocr_drain_max_concurrency + 1
+    return 2 * callers
+
+
+def _rate_limit_header_hook(rate_limiter: RateLimiter):
+    """成功応答の x-ratelimit-* ヘッダでリミッタの残量を更新するhttpxフックを作るのだ
+    
+    429はエラー処理側（record_rate_limited）で反映するので、ここでは見ないのだ。
+    """
+    def on_response(response) -> None:
+        if response.status_code < 400:
+            rate_limiter.update_from_headers(response.headers)
+    return on_response
+
+
+def _describe_error(e: Exception) -> str:
+    """例外をわかりやすいエラーメッセージに正規化するのだ"""
+    error_message = str(e)
+    
+    # よくあるエラーパターンの詳細化
+    if isinstance(e, asyncio.TimeoutError):
+        error_message = "タイムアウトエラー: 応答待ちが制限時間を超えました"
+    elif "429" in error_message:
+        error_message = f"API利用制限エラー (Rate Limit): {error_message}"
+    elif "401" in error_message:
+        error_message = f"認証エラー: {error_message}"
+    elif "403" in error_message:
+        error_message = f"アクセス権限エラー: {error_message}"
+    elif "404" in error_message:
+        error_message = f"リソースが見つかりません: {error_message}"
+    elif "timeout" in error_message.lower() or "timed out" in error_message.lower():
+        error_message = f"タイムアウトエラー: {error_message}"
+    
+    return error_message
+
+
+class AsyncOcrClient:
+    """AsyncAzureOpenAIベースの非同期OCRクライアントなのだ
+    
+    専用のイベントループスレッドを持ち、同時実行数を制限しつつ
+    keep-aliveの接続プールを使い回すのだ。同期コードからは submit_image() の
+    Future で結果を受け取れるのだ。
+    """
+    
+    def __init__(
+        self,
+        config: Config,
+        max_in_flight: Optional[int] = None,
+        timeout_sec: Optional[float] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        result_cache: Optional[OcrResultCache] = None,
+        router: Optional[OcrRouter] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None
+    ):
+        self.config = config
+        self.rate_limiter = rate_limiter or _create_rate_limiter(config)
+        self.result_cache = result_cache or create_result_cache(config)
+        self.router = router
+        self.circuit_breaker = circuit_breaker or create_circuit_breaker(config)
+        self.model = config.azure_openai_model
+        self.max_in_flight = max(1, max_in_flight or config.ocr_max_in_flight)
+        self.timeout_sec = timeout_sec or config.ocr_timeout_sec
+        self._in_flight = 0
+        
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="async_ocr", daemon=True)
+        self._thread.start()
+        
+        # セマフォとHTTPクライアントはループ上で作るのだ
+        asyncio.run_coroutine_threadsafe(self._setup(), self._loop).result()
+    
+    async def _setup(self) -> None:
+        """ループ上でセマフォと接続プールを準備するのだ"""
+        import httpx
+        
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        update_limiter = _rate_limit_header_hook(self.rate_limiter)
+        
+        async def on_response(response) -> None:
+            update_limiter(response)
+        
+        http_client = httpx.AsyncClient(
+            event_hooks={"response": [on_response]},
+            limits=httpx.Limits(
+                max_connections=self.max_in_flight,
+                max_keepalive_connections=self.max_in_flight,
+                keepalive_expiry=120.0
+            ),
+            timeout=self.timeout_sec
+        )
+        self.client = AsyncAzureOpenAI(
+            azure_endpoint=self.config.azure_openai_endpoint,
+            api_key=self.config.azure_openai_key,
+            api_version=API_VERSION,
+            http_client=http_client,
+            max_retries=0  # 再試行はRetryCacheに任せるのだ
+        )
+    
+    async def extract_text_from_bytes_async(
+        self,
+        image_bytes: bytes,
+        prompt: Optional[str] = None,
+        route: Optional[RouteDecision] = None
+    ) -> OcrResult:
+        """画像バイト列からテキストを抽出するのだ（同時実行数・タイムアウト付き）"""
+        cache_key = None
+        if self.result_cache is not None:
+            cache_key = self.result_cache.make_key(
+                image_bytes, _cache_prompt(self.config, prompt), _cache_model(self.model, route)
+            )
+            cached = _cached_result(self.result_cache, cache_key)
+            if cached is not None:
+                return cached
+        
+        if self.circuit_breaker is not None and not self.circuit_breaker.allow_request():
+            return OcrResult(success=False, error=CIRCUIT_OPEN_ERROR)
+        
+        estimated_tokens = self.rate_limiter.estimate_tokens()
+        if not await self.rate_limiter.acquire_async(estimated_tokens):
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.release()
+            return OcrResult(success=False, error=RATE_LIMIT_SHED_ERROR)
+        
+        async with self._semaphore:
+            self._in_flight += 1
+            started = time.monotonic()
+            try:
+                image_data = base64.b64encode(image_bytes).decode('utf-8')
+                encode_sec = time.monotonic() - started
+                request_prompt, max_tokens, structured = _request_options(self.config, prompt)
+                started = time.monotonic()
+                response = await asyncio.wait_for(
+                    self.client.chat.completions.create(
+                        model=route.model if route else self.model,
+                        messages=_build_messages(image_data, request_prompt, route.detail if route else None),
+                        max_tokens=max_tokens,
+                        temperature=0.0,
+                        top_p=1.0
+                    ),
+                    timeout=self.timeout_sec
+                )
+                network_sec = time.monotonic() - started
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.record_success()
+                parse_started = time.monotonic()
+                result = _parse_response(response, structured)
+                result.timings.update(
+                    encode=encode_sec, network=network_sec, parse=time.monotonic() - parse_started
+                )
+                result.bytes_uploaded = len(image_data)
+                self.rate_limiter.record_usage(result.tokens_used, estimated_tokens)
+                if route is not None and self.router is not None:
+                    self.router.record(route, network_sec, result.tokens_used, result.success)
+                if self.result_cache is not None and cache_key is not None and result.success:
+                    self.result_cache.put(cache_key, result.text, result.tokens_used, result.fields)
+                return result
+            
+            except Exception as e:
+                if _is_rate_limited(e):
+                    self.rate_limiter.record_rate_limited(_response_headers(e))
+                _record_breaker_failure(self.circuit_breaker, e)
+                if route is not None and self.router is not None:
+                    self.router.record(route, 0.0, 0, False)
+                return OcrResult(success=False, error=_describe_error(e))
+            
+            finally:
+                self._in_flight -= 1
+    
+    async def _warm_up_async(self) -> OcrResult:
+        """ループ上の接続プールを温めるのだ"""
+        try:
+            response = await asyncio.wait_for(
+                self.client.chat.completions.create(
+                    model=self.model,
+                    messages=WARM_UP_MESSAGES,
+                    max_tokens=WARM_UP_MAX_TOKENS
+                ),
+                timeout=self.timeout_sec
+            )
+            tokens_used = response.usage.total_tokens if response.usage else 0
+            return OcrResult(success=True, tokens_used=tokens_used)
+        except Exception as e:
+            return OcrResult(success=False, error=_describe_error(e))
+    
+    def warm_up(self) -> OcrResult:
+        """接続プールを温めて結果を返すのだ（呼び出しスレッドはブロックするのだ）"""
+        return asyncio.run_coroutine_threadsafe(self._warm_up_async(), self._loop).result()
+    
+    def submit_bytes(
+        self,
+        image_bytes: bytes,
+        prompt: Optional[str] = None,
+        route: Optional[RouteDecision] = None
+    ) -> "Future[OcrResult]":
+        """画像バイト列のOCRをループに投入してFutureを返すのだ"""
+        return asyncio.run_coroutine_threadsafe(
+            self.extract_text_from_bytes_async(image_bytes, prompt, route),
+            self._loop
+        )
+    
+    def submit_image(
+        self,
+        image_path: Path,
+        prompt: Optional[str] = None,
+        route: Optional[RouteDecision] = None
+    ) -> "Future[OcrResult]":
+        """画像ファイルのOCRをループに投入してFutureを返すのだ"""
+        try:
+            image_bytes = Path(image_path).read_bytes()
+        except Exception as e:
+            future: "Future[OcrResult]" = Future()
+            future.set_result(OcrResult(success=False, error=f"画像読み込みエラー: {str(e)}"))
+            return future
+        
+        return self.submit_bytes(image_bytes, prompt, route)
+    
+    def close(self) -> None:
+        """接続プールを閉じてループを止めるのだ"""
+        if not self._loop.is_running():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self.client.close(), self._loop).result(timeout=5.0)
+        except Exception as e:
+            print(f"⚠️ 非同期OCRクライアント終了エラー: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5.0)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """同時実行状況を返すのだ"""
+        return {
+            "in_flight": self._in_flight,
+            "max_in_flight": self.max_in_flight,
+            "timeout_sec": self.timeout_sec
+        }
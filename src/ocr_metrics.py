@@ -0,0 +1,151 @@
+"""OCR計測：段階別の遅延ヒストグラムとエラー種別・トークン・送信量を集計するのだ
+
+遅さが手元（キュー待ち・エンコード）なのかAzure側（通信）なのかを切り分けるためのものなのだ。
+"""
+import threading
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional
+
+from src.ocr_client import CIRCUIT_OPEN_ERROR, OcrResult
+
+STAGES = ("queue_wait", "encode", "network", "parse", "total")
+ERROR_CLASSES = ("rate_limited", "auth", "timeout", "circuit_open", "other")
+
+# 1ms〜約2分を1.5倍刻みで区切るのだ（相対誤差は最大でも50%以内）
+BUCKET_BOUNDS: List[float] = [0.001 * 1.5 ** i for i in range(30)]
+
+
+def classify_error(error: Optional[str]) -> str:
+    """OCRのエラーメッセージを 429/401/タイムアウト/遮断/その他 に分類するのだ"""
+    message = error or ""
+    if message == CIRCUIT_OPEN_ERROR:
+        return "circuit_open"
+    if "429" in message or "Rate Limit" in message:
+        return "rate_limited"
+    if "401" in message or "認証エラー" in message:
+        return "auth"
+    if "タイムアウト" in message or "timeout" in message.lower() or "timed out" in message.lower():
+        return "timeout"
+    return "other"
+
+
+class LatencyHistogram:
+    """固定バケットの遅延ヒストグラムなのだ（ロックは持ち主が取る）"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)  # 最後は上限超えなのだ
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        """1件記録するのだ"""
+        seconds = max(0.0, seconds)
+        self.counts[bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> float:
+        """q（0〜1）分位の値をバケットの上限で返すのだ（観測した最大値は超えない）"""
+        if self.count == 0:
+            return 0.0
+        rank = max(1, int(q * self.count + 0.999999))
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                upper = BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else self.max
+                return min(upper, self.max)
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        """件数・平均・p50/p95/p99・最大を返すのだ"""
+        return {
+            "count": self.count,
+            "mean_sec": round(self.total / self.count, 4) if self.count else 0.0,
+            "p50_sec": round(self.percentile(0.50), 4),
+            "p95_sec": round(self.percentile(0.95), 4),
+            "p99_sec": round(self.percentile(0.99), 4),
+            "max_sec": round(self.max, 4)
+        }
+
+
+class _Window:
+    """ある期間の集計なのだ"""
+
+    def __init__(self):
+        self.latency = {stage: LatencyHistogram() for stage in STAGES}
+        self.calls = 0
+        self.succeeded = 0
+        self.from_cache = 0
+        self.errors = {error_class: 0 for error_class in ERROR_CLASSES}
+        self.tokens_total = 0
+        self.tokens_max = 0
+        self.bytes_uploaded = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        api_calls = self.calls - self.from_cache
+        return {
+            "calls": self.calls,
+            "succeeded": self.succeeded,
+            "from_cache": self.from_cache,
+            "errors": dict(self.errors),
+            "latency": {stage: hist.snapshot() for stage, hist in self.latency.items()},
+            "tokens_total": self.tokens_total,
+            "tokens_per_call": round(self.tokens_total / api_calls, 1) if api_calls else 0.0,
+            "tokens_max": self.tokens_max,
+            "bytes_uploaded": self.bytes_uploaded
+        }
+
+
+class OcrMetrics:
+    """OCR呼び出しの計測を複数スレッドから安全に集計するのだ
+
+    起動からの累計と、定期的な性能レコード用の区間集計を同時に持つのだ。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cumulative = _Window()
+        self._window = _Window()
+
+    def observe(
+        self,
+        result: OcrResult,
+        queue_wait_sec: Optional[float] = None,
+        total_sec: Optional[float] = None
+    ) -> None:
+        """OCR結果1件を記録するのだ（段階別の時間は result.timings から取るのだ）"""
+        with self._lock:
+            for window in (self._cumulative, self._window):
+                window.calls += 1
+                if result.is_success():
+                    window.succeeded += 1
+                else:
+                    window.errors[classify_error(result.get_error())] += 1
+                if result.from_cache:
+                    window.from_cache += 1
+
+                if queue_wait_sec is not None:
+                    window.latency["queue_wait"].record(queue_wait_sec)
+                for stage, seconds in result.timings.items():
+                    if stage in window.latency:
+                        window.latency[stage].record(seconds)
+                if total_sec is not None:
+                    window.latency["total"].record(total_sec)
+
+                window.tokens_total += result.tokens_used
+                window.tokens_max = max(window.tokens_max, result.tokens_used)
+                window.bytes_uploaded += result.bytes_uploaded
+
+    def get_stats(self) -> Dict[str, Any]:
+        """起動からの累計を返すのだ"""
+        with self._lock:
+            return self._cumulative.to_dict()
+
+    def take_window(self) -> Dict[str, Any]:
+        """前回から今までの区間集計を返して次の区間を始めるのだ"""
+        with self._lock:
+            window, self._window = self._window, _Window()
+        return window.to_dict()
@@ -0,0 +1,202 @@
+"""OCRワークキュー：スケジューラのtickからOCRを切り離し、新規フレームをリトライより優先するのだ"""
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+from src.ocr_router import RouteDecision
+from src.retry_cache import RetryTask
+
+POLICY_DROP_OLDEST = "drop_oldest"  # 満杯なら一番古いフレームを捨てる
+POLICY_COALESCE = "coalesce"        # 未処理のフレームは最新の1枚にまとめる
+POLICIES = (POLICY_DROP_OLDEST, POLICY_COALESCE)
+
+
+@dataclass
+class OcrJob:
+    """OCR待ちのスクリーンショット1枚分なのだ"""
+    screenshot_path: Path
+    timestamp: datetime
+    delete_original: bool = True
+    route: Optional[RouteDecision] = None
+    retry_task: Optional[RetryTask] = None  # リトライの場合の元タスク
+    # ルーティングは画像を読んでハッシュを取るので、tickではなく取り出した側で決めるのだ
+    typing_active: Optional[bool] = None
+    force_full: bool = False
+    budget_detail: Optional[str] = None  # 予算の段階的縮退で指定された画像詳細度
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+def order_retry_tasks(
+    tasks: List[RetryTask],
+    quota: int = 0,
+    backlog_threshold: int = 0
+) -> List[RetryTask]:
+    """リトライタスクを処理順に並べ、1回分の上限で切るのだ
+
+    通常は試行回数の少ない順・古い順に流すのだ。滞留が backlog_threshold を
+    超えたら、今の画面に近い新しいものから消化するのだ。quota が0なら上限なし。
+    """
+    if backlog_threshold > 0 and len(tasks) > backlog_threshold:
+        ordered = sorted(tasks, key=lambda t: t.original_timestamp, reverse=True)
+    else:
+        ordered = sorted(tasks, key=lambda t: (t.attempt_count, t.original_timestamp))
+    return ordered[:quota] if quota > 0 else ordered
+
+
+class OcrWorkQueue:
+    """背圧ポリシー付きの有界OCRキューなのだ
+
+    put() は待たずに戻り、押し出されたジョブを返すので、呼び出し側が
+    メタデータだけ記録して画像を片付けられるのだ。リトライは別レーンに積み、
+    新規フレームが無いときだけ取り出すのだ（リトライはディスク上に残っているので上限なし）。
+    """
+
+    def __init__(self, capacity: int = 16, policy: str = POLICY_DROP_OLDEST):
+        if policy not in POLICIES:
+            raise ValueError(f"未対応のキューポリシーなのだ: {policy}")
+        self.capacity = max(1, capacity)
+        self.policy = policy
+        self._jobs: Deque[OcrJob] = deque()
+        self._retries: Deque[OcrJob] = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._unfinished = 0  # 積まれてから task_done されていないジョブ数
+
+        self.stats = {
+            "enqueued": 0,
+            "dequeued": 0,
+            "dropped": 0,
+            "coalesced": 0,
+            "max_depth": 0,
+            "wait_sec_total": 0.0,
+            "wait_sec_max": 0.0,
+            "retry_enqueued": 0,
+            "retry_dequeued": 0,
+            "retry_wait_sec_total": 0.0
+        }
+
+    def put(self, job: OcrJob) -> List[OcrJob]:
+        """ジョブを積んで、ポリシーで押し出されたジョブを返すのだ"""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("OCRキューは閉じられているのだ")
+
+            evicted: List[OcrJob] = []
+            if self.policy == POLICY_COALESCE:
+                evicted.extend(self._jobs)
+                self._jobs.clear()
+                self.stats["coalesced"] += len(evicted)
+            else:
+                while len(self._jobs) >= self.capacity:
+                    evicted.append(self._jobs.popleft())
+                self.stats["dropped"] += len(evicted)
+
+            self._jobs.append(job)
+            self._unfinished += 1 - len(evicted)
+            self.stats["enqueued"] += 1
+            self.stats["max_depth"] = max(self.stats["max_depth"], len(self._jobs))
+            self._cond.notify_all()
+            return evicted
+
+    def put_retry(self, job: OcrJob) -> None:
+        """リトライのジョブを低優先レーンに積むのだ"""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("OCRキューは閉じられているのだ")
+            self._retries.append(job)
+            self._unfinished += 1
+            self.stats["retry_enqueued"] += 1
+            self._cond.notify_all()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[OcrJob]:
+        """新規フレームを優先してジョブを1件取り出すのだ（タイムアウトか閉じられて空ならNone）"""
+        with self._cond:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not self._jobs and not self._retries:
+                if self._closed:
+                    return None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+            if self._jobs:
+                job = self._jobs.popleft()
+                wait_sec = time.monotonic() - job.enqueued_at
+                self.stats["dequeued"] += 1
+                self.stats["wait_sec_total"] += wait_sec
+                self.stats["wait_sec_max"] = max(self.stats["wait_sec_max"], wait_sec)
+                return job
+
+            return self._pop_retry()
+
+    def take_retries(self, limit: int) -> List[OcrJob]:
+        """まとめて送るためにリトライを最大 limit 件追加で取り出すのだ（待たない）"""
+        with self._cond:
+            taken = []
+            while self._retries and len(taken) < limit and not self._jobs:
+                taken.append(self._pop_retry())
+            return taken
+
+    def _pop_retry(self) -> OcrJob:
+        """リトライレーンから1件取り出すのだ（ロック取得済み）"""
+        job = self._retries.popleft()
+        self.stats["retry_dequeued"] += 1
+        self.stats["retry_wait_sec_total"] += time.monotonic() - job.enqueued_at
+        return job
+
+    def task_done(self) -> None:
+        """取り出したジョブの処理が終わったことを知らせるのだ"""
+        with self._cond:
+            self._unfinished = max(0, self._unfinished - 1)
+            if self._unfinished == 0:
+                self._cond.notify_all()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """全ジョブの処理が終わるまで待つのだ（時間内に終われば True）"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._unfinished == 0, timeout)
+
+    def close(self) -> List[OcrJob]:
+        """新規投入を止めて待機中のスレッドを起こし、未処理のジョブを返すのだ"""
+        with self._cond:
+            self._closed = True
+            remaining = list(self._jobs) + list(self._retries)
+            self._jobs.clear()
+            self._retries.clear()
+            self._unfinished = max(0, self._unfinished - len(remaining))
+            self._cond.notify_all()
+            return remaining
+
+    def depth(self) -> int:
+        """キューに残っている新規フレームの数を返すのだ"""
+        with self._cond:
+            return len(self._jobs)
+
+    def retry_depth(self) -> int:
+        """キューに残っているリトライの数を返すのだ"""
+        with self._cond:
+            return len(self._retries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """キューの深さと待ち時間の統計を返すのだ"""
+        with self._cond:
+            dequeued = self.stats["dequeued"]
+            retry_dequeued = self.stats["retry_dequeued"]
+            oldest_wait = time.monotonic() - self._jobs[0].enqueued_at if self._jobs else 0.0
+            return {
+                **self.stats,
+                "depth": len(self._jobs),
+                "retry_depth": len(self._retries),
+                "capacity": self.capacity,
+                "policy": self.policy,
+                "avg_wait_sec": self.stats["wait_sec_total"] / dequeued if dequeued else 0.0,
+                "avg_retry_wait_sec": (
+                    self.stats["retry_wait_sec_total"] / retry_dequeued if retry_dequeued else 0.0
+                ),
+                "oldest_wait_sec": oldest_wait
+            }
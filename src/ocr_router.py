@@ -0,0 +1,136 @@
+"""OCRモデルルータ：画面の変化量とタイピング状況で送り先のモデル・画像詳細度を決めるのだ"""
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from src.config import Config
+from src.image_hash import dhash, hamming_distance
+
+
+@dataclass
+class RouteDecision:
+    """1フレーム分のルーティング結果なのだ"""
+    tier: str              # "full" / "cheap"
+    model: str             # 送信先のデプロイ名
+    detail: Optional[str]  # Vision APIの画像詳細度（None=指定しない）
+    reason: str            # "first_frame" / "changed" / "forced" / "low_change" / "idle"
+    distance: int = -1     # 直前フレームとの知覚ハッシュ距離（-1=比較なし）
+
+
+class OcrRouter:
+    """変化の小さいフレームやタイピングしていない時間を安いティアに回すルータなのだ"""
+
+    def __init__(
+        self,
+        full_model: str,
+        cheap_model: str = "",
+        cheap_detail: Optional[str] = "low",
+        change_threshold: int = 10
+    ):
+        self.full_model = full_model
+        self.cheap_model = cheap_model or full_model  # 未指定なら同じモデルを低詳細度で使うのだ
+        self.cheap_detail = cheap_detail
+        self.change_threshold = change_threshold
+
+        self._last_hash: Optional[int] = None
+        self._lock = threading.Lock()
+
+        self.decisions: Dict[str, int] = {}
+        self.tier_stats: Dict[str, Dict[str, float]] = {
+            tier: {"requests": 0, "failures": 0, "latency_sec_total": 0.0, "tokens": 0}
+            for tier in ("full", "cheap")
+        }
+
+    def route(
+        self,
+        image_bytes: bytes,
+        typing_active: Optional[bool] = None,
+        force_full: bool = False
+    ) -> RouteDecision:
+        """画像バイト列のルーティングを決めるのだ"""
+        try:
+            current_hash: Optional[int] = dhash(image_bytes)
+        except Exception:
+            current_hash = None  # 読めない画像は比較せずフルモデルに送るのだ
+
+        with self._lock:
+            distance = -1
+            if current_hash is not None and self._last_hash is not None:
+                distance = hamming_distance(current_hash, self._last_hash)
+            if current_hash is not None:
+                self._last_hash = current_hash
+
+            if force_full:
+                reason = "forced"
+            elif distance < 0:
+                reason = "first_frame"
+            elif distance < self.change_threshold:
+                reason = "low_change"
+            elif typing_active is False:
+                reason = "idle"
+            else:
+                reason = "changed"
+
+            self.decisions[reason] = self.decisions.get(reason, 0) + 1
+
+        if reason in ("low_change", "idle"):
+            return RouteDecision("cheap", self.cheap_model, self.cheap_detail, reason, distance)
+        return RouteDecision("full", self.full_model, None, reason, distance)
+
+    def route_image(
+        self,
+        image_path: Path,
+        typing_active: Optional[bool] = None,
+        force_full: bool = False
+    ) -> Optional[RouteDecision]:
+        """画像ファイルのルーティングを決めるのだ（読めなければNone）
+
+        画像を読んでハッシュを取るので、撮影のtickではなくOCRを実行するスレッドで呼ぶのだ。
+        """
+        try:
+            image_bytes = Path(image_path).read_bytes()
+        except OSError:
+            return None
+        return self.route(image_bytes, typing_active, force_full)
+
+    def record(self, decision: RouteDecision, latency_sec: float, tokens_used: int, success: bool) -> None:
+        """ティアごとのレイテンシとトークン（コスト）を記録するのだ"""
+        with self._lock:
+            stats = self.tier_stats[decision.tier]
+            stats["requests"] += 1
+            stats["latency_sec_total"] += latency_sec
+            stats["tokens"] += tokens_used
+            if not success:
+                stats["failures"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """ルーティング判定とティア別の統計を返すのだ"""
+        with self._lock:
+            tiers = {}
+            for tier, stats in self.tier_stats.items():
+                requests = stats["requests"]
+                tiers[tier] = {
+                    **stats,
+                    "avg_latency_sec": stats["latency_sec_total"] / requests if requests else 0.0,
+                    "avg_tokens": stats["tokens"] / requests if requests else 0.0
+                }
+            return {
+                "decisions": dict(self.decisions),
+                "tiers": tiers,
+                "full_model": self.full_model,
+                "cheap_model": self.cheap_model,
+                "cheap_detail": self.cheap_detail
+            }
+
+
+def create_router(config: Config) -> Optional[OcrRouter]:
+    """設定で有効ならルータを作るのだ"""
+    if not config.ocr_routing_enabled:
+        return None
+    return OcrRouter(
+        full_model=config.azure_openai_model,
+        cheap_model=config.ocr_cheap_model,
+        cheap_detail=config.ocr_cheap_detail or None,
+        change_threshold=config.ocr_route_change_threshold
+    )
@@ -1,11 +1,40 @@
 """OCRバックグラウンドワーカー：リトライキャッシュを定期的に処理するのだ"""
+import threading
+import time
+from concurrent.futures import Future
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional, Set
 from src.config import Config
-from src.ocr_client import OcrClient, OcrResult
+from src.backlog_drain import BacklogDrainer, RetryOutcome, is_rate_limited_result
+from src.circuit_breaker import create_circuit_breaker
+from src.hedging import create_hedge_policy
+from src.mock_server import create_mock_server
+from src.ocr_budget import create_budget
+from src.ocr_metrics import OcrMetrics
+from src.ocr_client import (
+    CIRCUIT_OPEN_ERROR,
+    AsyncOcrClient,
+    OcrClient,
+    OcrResult,
+    create_result_cache
+)
+from src.ocr_queue import OcrJob, OcrWorkQueue, order_retry_tasks
+from src.ocr_router import RouteDecision, create_router
+from src.rate_limiter import RateLimiter
+from src.retry_cache import RetryTask
 from src.retry_cache import RetryCache
-from src.jsonl_writer import JsonlWriter
+from src.jsonl_writer import JsonlWriter, OcrRecordUpdate
+
+# OCR接続のヘルス状態なのだ
+HEALTH_DISABLED = "disabled"  # OCR無効
+HEALTH_UNKNOWN = "unknown"    # まだ確認していない
+HEALTH_WARMING = "warming"    # バックグラウンドで確認中
+HEALTH_READY = "ready"        # 接続・認証OK
+HEALTH_FAILED = "failed"      # 接続または認証に失敗
+
+# 時刻の来たリトライを流せなかった時（送信保留・実行中・一括消化中）に見直すまでの秒数なのだ
+RETRY_READY_RECHECK_SEC = 5.0
 
 
 class OcrWorker:
@@ -20,8 +49,65 @@ class OcrWorker:
         self.config = config
         self.jsonl_writer = jsonl_writer
         
+        # モック有効時はローカルのモックVisionサーバを立ててクライアントをそこへ向けるのだ
+        self.mock_server = create_mock_server(config) if config.ocr_enabled else None
+        if self.mock_server is not None:
+            config.azure_openai_endpoint = self.mock_server.start()
+            config.azure_openai_key = config.azure_openai_key or "mock-key"
+            print(f"🧪 モックVisionサーバに接続するのだ: {config.azure_openai_endpoint}")
+        
         # OCRクライアントとリトライキャッシュを初期化
-        self.ocr_client = OcrClient(config) if config.ocr_enabled else None
+        # 同期・非同期クライアントで同じRPM/TPM枠を共有するのだ
+        self.rate_limiter = RateLimiter(
+            rpm_limit=config.ocr_rpm_limit,
+            tpm_limit=config.ocr_tpm_limit,
+            max_wait_sec=config.ocr_rate_limit_max_wait_sec
+        )
+        # 結果キャッシュも同期・非同期クライアントで共有するのだ
+        self.result_cache = create_result_cache(config) if config.ocr_enabled else None
+        self.router = create_router(config) if config.ocr_enabled else None
+        self.budget = create_budget(config) if config.ocr_enabled else None
+        self.circuit_breaker = create_circuit_breaker(config) if config.ocr_enabled else None
+        self.hedge_policy = create_hedge_policy(config) if config.ocr_enabled else None
+        self.ocr_client = (
+            OcrClient(
+                config,
+                self.rate_limiter,
+                self.result_cache,
+                self.router,
+                self.circuit_breaker,
+                self.hedge_policy,
+                self.budget
+            )
+            if config.ocr_enabled else None
+        )
+        
+        # 同時実行数が2以上なら非同期クライアントで新規とリトライを重ねて流すのだ
+        self.async_ocr_client: Optional[AsyncOcrClient] = None
+        if config.ocr_enabled and config.ocr_max_in_flight > 1:
+            self.async_ocr_client = AsyncOcrClient(
+                config,
+                rate_limiter=self.rate_limiter,
+                result_cache=self.result_cache,
+                router=self.router,
+                circuit_breaker=self.circuit_breaker
+            )
+        
+        # 実行中のリトライタスク（次のtickで二重投入しないため）なのだ
+        self._inflight_task_ids: Set[str] = set()
+        self._inflight_lock = threading.Lock()
+        # 非同期クライアントに投入中のリトライ（停止時はキャッシュを閉じる前に待つか取り消す）なのだ
+        self._retry_futures: Set[Future] = set()
+        # 実行中の新規フレーム（停止時に期限まで待ち、残りはリトライキューへ退避する）なのだ
+        self._inflight_jobs: Dict[Path, OcrJob] = {}
+        self._abandoned_paths: Set[Path] = set()
+        self._inflight_idle = threading.Condition(self._inflight_lock)
+        self._stopping = threading.Event()
+        
+        # リトライは次の予定時刻か、予定が変わるまで条件変数で眠って待つのだ
+        self._retry_wakeup = threading.Condition()
+        self._retry_generation = 0  # 予定が変わるたびに増やすのだ
+        self._retry_scheduler_thread: Optional[threading.Thread] = None
         
         if cache_dir is None:
             cache_dir = config.data_dir / "cache"
@@ -29,60 +115,258 @@ class OcrWorker:
         self.retry_cache = RetryCache(
             cache_dir=cache_dir,
             max_attempts=config.retry_max_attempts,
-            base_delay=config.retry_base_delay_sec
+            base_delay=config.retry_base_delay_sec,
+            max_tasks=config.retry_cache_max_tasks,
+            max_bytes=config.retry_cache_max_mb * 1024 * 1024,
+            on_evict=self._finalize_evicted_task,
+            on_schedule=self._wake_retry_scheduler
         )
         
+        # 起動時ウォームアップの結果（バックグラウンドで更新される）なのだ
+        self._health_lock = threading.Lock()
+        self.health: Dict[str, Any] = {
+            "state": HEALTH_UNKNOWN if config.ocr_enabled else HEALTH_DISABLED,
+            "error": None,
+            "latency_sec": None,
+            "checked_at": None
+        }
+        self._warm_up_thread: Optional[threading.Thread] = None
+        
+        # 統計はtick・OCRスレッド・非同期コールバックから更新されるのでロックで守るのだ
+        self._stats_lock = threading.Lock()
         self.stats = {
             "total_processed": 0,
             "successful_ocr": 0,
             "failed_ocr": 0,
-            "tasks_cleaned": 0
+            "tasks_cleaned": 0,
+            "budget_skipped": 0,
+            "queue_dropped": 0,
+            "retry_deferred": 0,
+            "retry_wakeups": 0
         }
+        
+        # 段階別の遅延・エラー種別・トークン・送信量の計測なのだ
+        self.metrics = OcrMetrics()
+        self._last_perf_record = time.monotonic()
+        
+        # tickは投入だけにして、OCRは専用スレッドで処理するのだ（0ならtick上で直接処理）
+        self.work_queue: Optional[OcrWorkQueue] = None
+        self._pool_threads: List[threading.Thread] = []
+        if config.ocr_enabled and config.ocr_worker_threads > 0:
+            self.work_queue = OcrWorkQueue(config.ocr_queue_size, config.ocr_queue_policy)
+            for i in range(config.ocr_worker_threads):
+                thread = threading.Thread(target=self._run_pool_thread, name=f"ocr_pool_{i}", daemon=True)
+                thread.start()
+                self._pool_threads.append(thread)
+    
+        # 復帰後にリトライの滞留を適応的な同時実行数で一気に流すのだ
+        self.drainer: Optional[BacklogDrainer] = None
+        if config.ocr_enabled and config.ocr_drain_enabled:
+            self.drainer = BacklogDrainer(
+                claim=self._claim_retry_tasks,
+                ocr=self._ocr_retry_task,
+                complete=self._complete_retry_outcomes,
+                backlog_size=lambda: self.retry_cache.get_cache_stats().get("total_tasks", 0),
+                max_concurrency=config.ocr_drain_max_concurrency
+            )
+    
+    def _bump(self, key: str, amount: int = 1) -> None:
+        """統計カウンタを加算するのだ"""
+        with self._stats_lock:
+            self.stats[key] += amount
+    
+    def _sync_client(self) -> OcrClient:
+        """同期OCRクライアントを返すのだ（OCR無効なら例外。呼び出し元で失敗結果に変える）"""
+        if self.ocr_client is None:
+            raise RuntimeError("OCRが無効なのだ")
+        return self.ocr_client
     
     def add_screenshot_for_ocr(
         self, 
         screenshot_path: Path, 
         timestamp: datetime,
-        delete_original: bool = True
+        delete_original: bool = True,
+        typing_active: Optional[bool] = None,
+        force_full: bool = False
     ) -> bool:
-        """スクリーンショットをOCRキューに追加するのだ"""
+        """スクリーンショットをOCRキューに追加するのだ
+        
+        ルーティング有効時は typing_active（タイピング中か）と force_full（アプリ切替など
+        重要なフレーム）で送り先のモデルティアを決めるのだ。
+        """
         if not self.config.ocr_enabled or not self.ocr_client:
             # OCRが無効な場合はスクリーンショットを削除
             if delete_original and screenshot_path.exists():
                 screenshot_path.unlink(missing_ok=True)
             return False
         
+        # 停止処理中は新しいOCRを始めず、再起動後に拾えるようリトライキューへ退避するのだ
+        if self._stopping.is_set():
+            self._persist_job(OcrJob(screenshot_path, timestamp, delete_original), "停止処理中に撮影")
+            return False
+        
+        # 予算を使い切りそうならOCRを間引き、使い切ったらメタデータのみにするのだ
+        budget_detail = None
+        if self.budget is not None:
+            plan = self.budget.plan()
+            if not plan.allow:
+                self._update_jsonl_with_ocr_result(
+                    timestamp, "", usage={"skipped": "budget", "level": plan.level}
+                )
+                if delete_original and screenshot_path.exists():
+                    screenshot_path.unlink(missing_ok=True)
+                self._bump("budget_skipped")
+                return False
+            budget_detail = plan.detail
+        
+        job = OcrJob(
+            screenshot_path,
+            timestamp,
+            delete_original,
+            typing_active=typing_active,
+            force_full=force_full,
+            budget_detail=budget_detail
+        )
+        if self.work_queue is not None:
+            try:
+                evicted = self.work_queue.put(job)
+            except RuntimeError:
+                # 停止処理中はキューが閉じているので呼び出し元で処理するのだ
+                return self._process_job(job)
+            reason = "coalesced" if self.work_queue.policy == "coalesce" else "queue_full"
+            for dropped in evicted:
+                self._discard_job(dropped, reason)
+            return True
+        
+        return self._process_job(job)
+    
+    def _run_pool_thread(self) -> None:
+        """キューからジョブを取り出してOCRし続けるのだ（キューが閉じたら終了）"""
+        work_queue = self.work_queue
+        if work_queue is None:
+            return
+        while True:
+            job = work_queue.get()
+            if job is None:
+                return
+            try:
+                if job.retry_task is not None:
+                    self._process_retry_job(job)
+                else:
+                    self._process_job(job)
+            except Exception as e:
+                print(f"⚠️ OCRスレッド処理エラー: {e}")
+            finally:
+                work_queue.task_done()
+    
+    def _route_job(self, job: OcrJob) -> Optional[RouteDecision]:
+        """ジョブの送り先ティアを決めるのだ（画像を読むのでOCRを実行するスレッドで呼ぶ）"""
+        route = None
+        if self.router is not None:
+            route = self.router.route_image(job.screenshot_path, job.typing_active, job.force_full)
+        if job.budget_detail is not None and (route is None or route.detail is None):
+            route = RouteDecision(
+                tier=route.tier if route else "full",
+                model=route.model if route else self.config.azure_openai_model,
+                detail=job.budget_detail,
+                reason=route.reason if route else "budget"
+            )
+        return route
+    
+    def _discard_job(self, job: OcrJob, reason: str) -> None:
+        """押し出されたジョブはOCRせず、メタデータだけ記録して画像を片付けるのだ"""
+        self._update_jsonl_with_ocr_result(job.timestamp, "", usage={"skipped": reason})
+        if job.delete_original and job.screenshot_path.exists():
+            job.screenshot_path.unlink(missing_ok=True)
+        self._bump("queue_dropped")
+    
+    def _process_job(self, job: OcrJob) -> bool:
+        """スクリーンショット1枚のOCRを実行して結果を反映するのだ"""
+        screenshot_path = job.screenshot_path
+        timestamp = job.timestamp
+        delete_original = job.delete_original
+        if job.route is None:
+            job.route = self._route_job(job)
+        route = job.route
+        
+        with self._inflight_lock:
+            self._inflight_jobs[screenshot_path] = job
+        
+        started = time.monotonic()
+        queue_wait_sec = started - job.enqueued_at
+        
+        if self.async_ocr_client is not None:
+            # 非同期モード：投入だけして結果は完了コールバックで処理するのだ
+            def on_done(future):
+                result = self._future_result(future)
+                self.metrics.observe(result, queue_wait_sec, queue_wait_sec + time.monotonic() - started)
+                self._handle_fresh_result(screenshot_path, timestamp, result, delete_original)
+            
+            self.async_ocr_client.submit_image(screenshot_path, route=route).add_done_callback(on_done)
+            return True
+        
         try:
             # 即座にOCRを試行
-            result = self.ocr_client.extract_text_from_image(screenshot_path)
+            result = self._sync_client().extract_text_from_image(screenshot_path, route=route)
+            self.metrics.observe(result, queue_wait_sec, queue_wait_sec + time.monotonic() - started)
+            return self._handle_fresh_result(screenshot_path, timestamp, result, delete_original)
+                
+        except Exception as e:
+            print(f"⚠️ OCRキュー追加エラー: {e}")
+            if not self._finish_job(screenshot_path):
+                return False
             
+            # エラー時もスクリーンショットを削除
+            if delete_original and screenshot_path.exists():
+                screenshot_path.unlink(missing_ok=True)
+            
+            return False
+    
+    def _handle_fresh_result(
+        self,
+        screenshot_path: Path,
+        timestamp: datetime,
+        result: OcrResult,
+        delete_original: bool
+    ) -> bool:
+        """新規スクリーンショットのOCR結果を反映するのだ"""
+        if not self._finish_job(screenshot_path):
+            # 停止期限に間に合わずリトライキューへ退避済みなので、再起動後の処理に任せるのだ
+            return False
+        
+        try:
             if result.is_success():
                 # OCR成功：JSONLを更新してスクリーンショット削除
-                self._update_jsonl_with_ocr_result(timestamp, result.get_text())
+                self._record_usage(result)
+                self._update_jsonl_with_ocr_result(
+                    timestamp, result.get_text(), result.fields, self._usage_for(result)
+                )
                 
                 if delete_original and screenshot_path.exists():
                     screenshot_path.unlink(missing_ok=True)
                 
-                self.stats["successful_ocr"] += 1
+                self._bump("successful_ocr")
                 print(f"✅ OCR成功: {len(result.get_text())}文字抽出")
+                self.maybe_start_drain()
                 return True
             else:
                 # OCR失敗：リトライキャッシュに追加
                 task_id = self.retry_cache.add_failed_task(
                     image_path=screenshot_path,
                     original_timestamp=timestamp.isoformat(),
-                    error_message=result.get_error() or "Unknown error"
+                    error_message=result.get_error() or "Unknown error",
+                    move=delete_original
                 )
                 
                 if delete_original and screenshot_path.exists():
                     screenshot_path.unlink(missing_ok=True)
                 
-                self.stats["failed_ocr"] += 1
+                self._bump("failed_ocr")
                 print(f"❌ OCR失敗（リトライ追加）: {result.get_error()}")
                 return bool(task_id)
                 
         except Exception as e:
-            print(f"⚠️ OCRキュー追加エラー: {e}")
+            print(f"⚠️ OCR結果処理エラー: {e}")
             
             # エラー時もスクリーンショットを削除
             if delete_original and screenshot_path.exists():
@@ -90,74 +374,404 @@ class OcrWorker:
             
             return False
     
+    def _finish_job(self, screenshot_path: Path) -> bool:
+        """新規フレームの実行中の印を外すのだ（停止時に退避済みなら False）"""
+        with self._inflight_idle:
+            self._inflight_jobs.pop(screenshot_path, None)
+            self._inflight_idle.notify_all()
+            if screenshot_path in self._abandoned_paths:
+                self._abandoned_paths.discard(screenshot_path)
+                return False
+            return True
+    
+    def _persist_job(self, job: OcrJob, reason: str, attempted: bool = False) -> None:
+        """OCRできなかったフレームを失わないようリトライキューに移すのだ
+        
+        一度も送っていないフレームは試行回数0で積み、再試行の回数を減らさないのだ。
+        """
+        if job.retry_task is not None:
+            # リトライはディスクに残っているので実行中の印を外すだけなのだ
+            with self._inflight_lock:
+                self._inflight_task_ids.discard(job.retry_task.task_id)
+            return
+        if not job.screenshot_path.exists():
+            return
+        self.retry_cache.add_failed_task(
+            image_path=job.screenshot_path,
+            original_timestamp=job.timestamp.isoformat(),
+            error_message=reason,
+            move=job.delete_original,
+            attempt_count=1 if attempted else 0
+        )
+    
     def process_retry_queue(self) -> int:
         """リトライキューを処理するのだ（定期実行用）"""
         if not self.config.ocr_enabled or not self.ocr_client:
             return 0
         
-        processed_count = 0
+        # 遮断中は同じ死んだエンドポイントを叩かず、リトライ回数も消費しないのだ
+        if self.circuit_breaker is not None and not self.circuit_breaker.is_available():
+            return 0
+        
+        # 一括消化中はそちらに任せ、停止処理中は新たに流さないのだ
+        if self.drainer is not None and self.drainer.is_running():
+            return 0
+        if self._stopping.is_set():
+            return 0
+        
         ready_tasks = self.retry_cache.get_ready_tasks()
         
         if not ready_tasks:
             return 0
         
-        print(f"🔄 リトライタスク処理開始: {len(ready_tasks)}個")
+        # 実行中のタスクは二重に投入せず、1tickで流す件数と順番を決めるのだ
+        with self._inflight_lock:
+            candidates = [t for t in ready_tasks if t.task_id not in self._inflight_task_ids]
+            ready_tasks = order_retry_tasks(
+                candidates,
+                quota=self.config.ocr_retry_quota_per_tick,
+                backlog_threshold=self.config.ocr_retry_backlog_threshold
+            )
+            self._inflight_task_ids.update(t.task_id for t in ready_tasks)
+        
+        if not ready_tasks:
+            return 0
+        
+        deferred = len(candidates) - len(ready_tasks)
+        if deferred:
+            self._bump("retry_deferred", deferred)
+        print(f"🔄 リトライタスク処理開始: {len(ready_tasks)}個"
+              + (f"（{deferred}個は次回以降）" if deferred else ""))
+        
+        if self.work_queue is not None:
+            # 新規フレームより後に回るよう低優先レーンに積むだけにするのだ
+            for i, task in enumerate(ready_tasks):
+                try:
+                    self.work_queue.put_retry(OcrJob(
+                        task.image_path,
+                        _parse_timestamp(task.original_timestamp),
+                        delete_original=False,
+                        retry_task=task
+                    ))
+                except RuntimeError:
+                    # 停止処理でキューが閉じたら、積めなかったタスクの実行中の印を外すのだ
+                    with self._inflight_lock:
+                        self._inflight_task_ids.difference_update(t.task_id for t in ready_tasks[i:])
+                    return i
+            return len(ready_tasks)
+        
+        return self._run_retry_tasks(ready_tasks)
+    
+    def start_retry_scheduler(self) -> Optional[threading.Thread]:
+        """次のリトライ時刻ちょうどに起きてリトライを流すスレッドを始めるのだ"""
+        if not self.config.ocr_enabled or not self.config.ocr_retry_wakeup_enabled:
+            return None
+        if self._retry_scheduler_thread is not None and self._retry_scheduler_thread.is_alive():
+            return self._retry_scheduler_thread
+        self._retry_scheduler_thread = threading.Thread(
+            target=self._run_retry_scheduler, name="ocr_retry_scheduler", daemon=True
+        )
+        self._retry_scheduler_thread.start()
+        return self._retry_scheduler_thread
+    
+    def _run_retry_scheduler(self) -> None:
+        """リトライを流して、次の予定時刻か予定の変更まで眠るのを繰り返すのだ
+        
+        60秒のtickを待たないので、リトライの間隔が設定したバックオフどおりになり、
+        待つものが無い間は起きないのだ。
+        """
+        while not self._stopping.is_set():
+            with self._retry_wakeup:
+                generation = self._retry_generation
+            
+            try:
+                processed = self.process_retry_queue()
+                if processed > 0:
+                    print(f"🔄 リトライキュー処理完了: {processed}個")
+            except Exception as e:
+                print(f"⚠️ リトライスケジューラエラー: {e}")
+            
+            timeout = self._retry_wait_timeout()
+            with self._retry_wakeup:
+                self._retry_wakeup.wait_for(
+                    lambda generation=generation: (
+                        self._retry_generation != generation or self._stopping.is_set()
+                    ),
+                    timeout
+                )
+            self._bump("retry_wakeups")
+    
+    def _retry_wait_timeout(self) -> Optional[float]:
+        """スケジューラが次に起きるまでの秒数を返すのだ（待つものが無ければNone）
+        
+        時刻の来たタスクが残っていれば、遮断中なら試験送信を許す時刻に、
+        それ以外は少し後に見直すのだ。next_due_at はまだ時刻の来ていないタスクしか見ないのだ。
+        """
+        if self.retry_cache.get_ready_tasks():
+            if self.circuit_breaker is not None:
+                reopen_in = self.circuit_breaker.seconds_until_probe()
+                if reopen_in > 0:
+                    return reopen_in
+            return RETRY_READY_RECHECK_SEC
+        due_at = self.retry_cache.next_due_at()
+        return None if due_at is None else max(0.0, due_at - time.time())
+    
+    def _wake_retry_scheduler(self, next_retry_at: Optional[float] = None) -> None:
+        """リトライの予定が変わったことをスケジューラに知らせるのだ"""
+        with self._retry_wakeup:
+            self._retry_generation += 1
+            self._retry_wakeup.notify_all()
+    
+    def _run_retry_tasks(self, ready_tasks: List[RetryTask]) -> int:
+        """リトライタスクをOCRして結果を反映するのだ"""
+        processed_count = 0
+        
+        if self.async_ocr_client is not None:
+            # 非同期モード：全タスクを同時実行数の範囲で重ねて流すのだ
+            for task in ready_tasks:
+                started = time.monotonic()
+                future = self.async_ocr_client.submit_image(task.image_path)
+                with self._inflight_lock:
+                    self._retry_futures.add(future)
+                future.add_done_callback(
+                    lambda f, task=task, started=started: self._on_async_retry_done(task, f, started)
+                )
+            return len(ready_tasks)
+        
+        if self.config.ocr_batch_size > 1:
+            # 障害明けの大量消化は複数画像をまとめて送り、リクエスト固定費を減らすのだ
+            batch_size = self.config.ocr_batch_size
+            for start in range(0, len(ready_tasks), batch_size):
+                batch = ready_tasks[start:start + batch_size]
+                try:
+                    results = self._sync_client().extract_text_from_images([t.image_path for t in batch])
+                except Exception as e:
+                    results = [OcrResult(success=False, error=str(e)) for _ in batch]
+                
+                for task, result in zip(batch, results, strict=True):
+                    self.metrics.observe(result)
+                    self._handle_retry_result(task, result)
+                    processed_count += 1
+            
+            return processed_count
         
         for task in ready_tasks:
+            started = time.monotonic()
             try:
                 # OCR再試行
-                result = self.ocr_client.extract_text_from_image(task.image_path)
-                
-                if result.is_success():
-                    # 成功：JSONLを更新
-                    original_timestamp = datetime.fromisoformat(
-                        task.original_timestamp.replace('Z', '+00:00')
-                    )
-                    self._update_jsonl_with_ocr_result(original_timestamp, result.get_text())
-                    
-                    # タスクを成功として記録
-                    self.retry_cache.mark_task_attempted(task.task_id, True)
-                    self.stats["successful_ocr"] += 1
-                    
-                    print(f"✅ リトライOCR成功: {task.task_id}")
-                    
-                else:
-                    # 失敗：リトライ回数を更新
-                    self.retry_cache.mark_task_attempted(
-                        task.task_id, 
-                        False, 
-                        result.get_error() or "Retry failed"
-                    )
-                    self.stats["failed_ocr"] += 1
+                result = self._sync_client().extract_text_from_image(task.image_path)
+            except Exception as e:
+                result = OcrResult(success=False, error=str(e))
+            
+            self._observe_retry_result(task, result, started)
+            processed_count += 1
+        
+        return processed_count
+    
+    def _on_async_retry_done(self, task: RetryTask, future: Future, started: float) -> None:
+        """非同期リトライの完了を反映するのだ（停止時に取り消したものは試行に数えない）"""
+        try:
+            if future.cancelled():
+                with self._inflight_lock:
+                    self._inflight_task_ids.discard(task.task_id)
+            else:
+                self._observe_retry_result(task, self._future_result(future), started)
+        finally:
+            with self._inflight_idle:
+                self._retry_futures.discard(future)
+                self._inflight_idle.notify_all()
+    
+    def _settle_retry_futures(self, timeout: float) -> None:
+        """投入中の非同期リトライを timeout 秒まで待ち、残りは取り消すのだ（キャッシュを閉じる前）"""
+        with self._inflight_idle:
+            self._inflight_idle.wait_for(lambda: not self._retry_futures, timeout)
+            pending = list(self._retry_futures)
+        for future in pending:
+            future.cancel()
+        # 取り消せなかった（完了処理中の）ものはコールバックが終わるまで少しだけ待つのだ
+        with self._inflight_idle:
+            self._inflight_idle.wait_for(lambda: not self._retry_futures, 1.0)
+    
+    def _observe_retry_result(self, task: RetryTask, result: OcrResult, started: float) -> None:
+        """リトライ1件の計測を記録してから結果を反映するのだ"""
+        self.metrics.observe(result, total_sec=time.monotonic() - started)
+        self._handle_retry_result(task, result)
+    
+    def _process_retry_job(self, job: OcrJob) -> None:
+        """OCRスレッドでリトライを処理するのだ（バッチ指定時は後続のリトライもまとめる）"""
+        work_queue = self.work_queue
+        extra_jobs: List[OcrJob] = []
+        if work_queue is not None and self.async_ocr_client is None and self.config.ocr_batch_size > 1:
+            extra_jobs = work_queue.take_retries(self.config.ocr_batch_size - 1)
+        try:
+            self._run_retry_tasks([j.retry_task for j in [job, *extra_jobs] if j.retry_task is not None])
+        finally:
+            # 先頭のジョブは呼び出し元が task_done するのだ
+            if work_queue is not None:
+                for _ in extra_jobs:
+                    work_queue.task_done()
+    
+    def maybe_start_drain(self) -> bool:
+        """接続が戻っていて滞留が多ければ一括消化を始めるのだ"""
+        if self.drainer is None or self.drainer.is_running() or self._stopping.is_set():
+            return False
+        if self.circuit_breaker is not None and not self.circuit_breaker.is_available():
+            return False
+        if len(self.retry_cache.get_ready_tasks()) < self.config.ocr_drain_min_backlog:
+            return False
+        return self.drainer.start()
+    
+    def _claim_retry_tasks(self, limit: int) -> List[RetryTask]:
+        """一括消化のウェーブに流すタスクを実行中として確保するのだ"""
+        with self._inflight_lock:
+            candidates = [
+                t for t in self.retry_cache.get_ready_tasks() if t.task_id not in self._inflight_task_ids
+            ]
+            tasks = order_retry_tasks(
+                candidates, quota=limit, backlog_threshold=self.config.ocr_retry_backlog_threshold
+            )
+            self._inflight_task_ids.update(t.task_id for t in tasks)
+        return tasks
+    
+    def _ocr_retry_task(self, task: RetryTask) -> OcrResult:
+        """リトライタスク1件をOCRするのだ（一括消化のスレッドから呼ばれる）"""
+        started = time.monotonic()
+        try:
+            result = self._sync_client().extract_text_from_image(task.image_path)
+        except Exception as e:
+            result = OcrResult(success=False, error=str(e))
+        self.metrics.observe(result, total_sec=time.monotonic() - started)
+        return result
+    
+    def _complete_retry_outcomes(self, outcomes: List[RetryOutcome]) -> None:
+        """1ウェーブ分の結果を反映するのだ（成功分のJSONL更新は1回の書き戻しにまとめる）"""
+        successes = [(task, result) for task, result in outcomes if result.is_success()]
+        if successes:
+            updates = []
+            for task, result in successes:
+                self._record_usage(result)
+                updates.append(OcrRecordUpdate(
+                    _parse_timestamp(task.original_timestamp),
+                    result.get_text(),
+                    result.fields,
+                    self._usage_for(result)
+                ))
+            try:
+                updated = self.jsonl_writer.update_records_ocr(updates)
+                self._bump("total_processed", updated)
+            except Exception as e:
+                print(f"⚠️ JSONL OCR一括更新エラー: {e}")
+            
+            for task, _ in successes:
+                self.retry_cache.mark_task_attempted(task.task_id, True)
+                with self._inflight_lock:
+                    self._inflight_task_ids.discard(task.task_id)
+            self._bump("successful_ocr", len(successes))
+        
+        for task, result in outcomes:
+            if not result.is_success():
+                self._handle_retry_result(task, result)
+    
+    def _handle_retry_result(self, task: RetryTask, result: OcrResult) -> None:
+        """リトライタスクのOCR結果を反映するのだ"""
+        try:
+            if result.get_error() == CIRCUIT_OPEN_ERROR or is_rate_limited_result(result):
+                # 遮断中・送信保留・サーバの429はタスクの問題ではないので、
+                # 試行回数に数えず次の機会に回すのだ（滞留消化中に捨てないため）
+                return
+            
+            if result.is_success():
+                # 成功：JSONLを更新
+                original_timestamp = _parse_timestamp(task.original_timestamp)
+                self._record_usage(result)
+                self._update_jsonl_with_ocr_result(
+                    original_timestamp, result.get_text(), result.fields, self._usage_for(result)
+                )
                 
-                processed_count += 1
+                # タスクを成功として記録
+                self.retry_cache.mark_task_attempted(task.task_id, True)
+                self._bump("successful_ocr")
                 
-            except Exception as e:
-                print(f"⚠️ リトライタスク処理エラー: {task.task_id} - {e}")
+                print(f"✅ リトライOCR成功: {task.task_id}")
                 
-                # エラー時も失敗として記録
-                self.retry_cache.mark_task_attempted(task.task_id, False, str(e))
-                processed_count += 1
+            else:
+                # 失敗：リトライ回数を更新
+                self.retry_cache.mark_task_attempted(
+                    task.task_id, 
+                    False, 
+                    result.get_error() or "Retry failed"
+                )
+                self._bump("failed_ocr")
+            
+        except Exception as e:
+            print(f"⚠️ リトライタスク処理エラー: {task.task_id} - {e}")
+            
+            # エラー時も失敗として記録
+            self.retry_cache.mark_task_attempted(task.task_id, False, str(e))
         
-        return processed_count
+        finally:
+            with self._inflight_lock:
+                self._inflight_task_ids.discard(task.task_id)
+    
+    def _finalize_evicted_task(self, task: RetryTask) -> None:
+        """上限で捨てられたリトライタスクのレコードを ocr_text="" で確定させるのだ
+        
+        起動時の読み込みでも呼ばれるので、統計には触らずJSONLだけ更新するのだ。
+        """
+        self.jsonl_writer.update_record_ocr(
+            timestamp=_parse_timestamp(task.original_timestamp),
+            ocr_text="",
+            screenshot_path_to_null=True
+        )
+        print(f"🗑️ リトライ破棄（ocr_text=\"\"で確定）: {task.task_id}")
+    
+    def _future_result(self, future) -> OcrResult:
+        """FutureからOcrResultを取り出すのだ（例外は失敗結果に変換）"""
+        try:
+            return future.result()
+        except Exception as e:
+            return OcrResult(success=False, error=str(e))
     
     def cleanup_old_tasks(self) -> int:
         """古いリトライタスクを掃除するのだ"""
         cleaned_count = self.retry_cache.cleanup_old_tasks(max_age_hours=24)
-        self.stats["tasks_cleaned"] += cleaned_count
+        self._bump("tasks_cleaned", cleaned_count)
         return cleaned_count
     
-    def _update_jsonl_with_ocr_result(self, timestamp: datetime, ocr_text: str) -> bool:
+    def _record_usage(self, result: OcrResult) -> None:
+        """使用トークンを予算に計上するのだ"""
+        if self.budget is not None:
+            self.budget.record(result.tokens_used)
+    
+    def _usage_for(self, result: OcrResult) -> Dict[str, Any]:
+        """レコードに書き込むOCR使用量を作るのだ"""
+        usage: Dict[str, Any] = {
+            "tokens_used": result.tokens_used,
+            "from_cache": result.from_cache
+        }
+        if self.budget is not None:
+            usage["budget"] = self.budget.usage()
+        return usage
+    
+    def _update_jsonl_with_ocr_result(
+        self,
+        timestamp: datetime,
+        ocr_text: str,
+        ocr_fields: Optional[Dict[str, Any]] = None,
+        usage: Optional[Dict[str, Any]] = None
+    ) -> bool:
         """JSONLファイルのOCR結果を更新するのだ"""
         try:
             success = self.jsonl_writer.update_record_ocr(
                 timestamp=timestamp,
                 ocr_text=ocr_text,
-                screenshot_path_to_null=True
+                screenshot_path_to_null=True,
+                ocr_fields=ocr_fields,
+                ocr_usage=usage
             )
             
             if success:
-                self.stats["total_processed"] += 1
+                self._bump("total_processed")
             
             return success
             
@@ -168,16 +782,106 @@ class OcrWorker:
     def get_stats(self) -> dict:
         """ワーカーの統計情報を返すのだ"""
         retry_stats = self.retry_cache.get_cache_stats()
+        with self._stats_lock:
+            counters = dict(self.stats)
         
         return {
             "ocr_enabled": self.config.ocr_enabled,
-            "total_processed": self.stats["total_processed"],
-            "successful_ocr": self.stats["successful_ocr"],
-            "failed_ocr": self.stats["failed_ocr"],
-            "tasks_cleaned": self.stats["tasks_cleaned"],
-            "retry_queue": retry_stats
+            "total_processed": counters["total_processed"],
+            "successful_ocr": counters["successful_ocr"],
+            "failed_ocr": counters["failed_ocr"],
+            "tasks_cleaned": counters["tasks_cleaned"],
+            "retry_queue": retry_stats,
+            "queue_dropped": counters["queue_dropped"],
+            "retry_deferred": counters["retry_deferred"],
+            "retry_wakeups": counters["retry_wakeups"],
+            "drain": self.drainer.get_stats() if self.drainer else None,
+            "perf": self.metrics.get_stats(),
+            "work_queue": self.work_queue.get_stats() if self.work_queue else None,
+            "rate_limiter": self.rate_limiter.get_stats(),
+            "result_cache": self.result_cache.get_stats() if self.result_cache else None,
+            "routing": self.router.get_stats() if self.router else None,
+            "budget_skipped": counters["budget_skipped"],
+            "budget": self.budget.get_stats() if self.budget else None,
+            "circuit_breaker": self.circuit_breaker.get_stats() if self.circuit_breaker else None,
+            "hedging": self.hedge_policy.get_stats() if self.hedge_policy else None,
+            "mock_server": self.mock_server.get_stats() if self.mock_server else None,
+            "health": self.get_health(),
+            "async_client": (
+                self.async_ocr_client.get_stats() if self.async_ocr_client else None
+            )
         }
     
+    def maybe_write_perf_record(self) -> bool:
+        """計測区間が ocr_perf_record_interval_sec を過ぎていれば性能レコードを書くのだ"""
+        interval = self.config.ocr_perf_record_interval_sec
+        if interval <= 0 or not self.config.ocr_enabled:
+            return False
+        now = time.monotonic()
+        if now - self._last_perf_record < interval:
+            return False
+        window_sec = now - self._last_perf_record
+        self._last_perf_record = now
+        
+        perf = self.metrics.take_window()
+        if perf["calls"] == 0:
+            return False
+        self.jsonl_writer.write_perf_record(datetime.now(timezone.utc), window_sec, perf)
+        return True
+    
+    def start_warm_up(self) -> Optional[threading.Thread]:
+        """接続ウォームアップと認証確認をバックグラウンドで始めるのだ（起動をブロックしない）"""
+        if not self.config.ocr_enabled or not self.ocr_client:
+            return None
+        if self._warm_up_thread is not None and self._warm_up_thread.is_alive():
+            return self._warm_up_thread
+        
+        self._set_health(HEALTH_WARMING)
+        self._warm_up_thread = threading.Thread(target=self._warm_up, name="ocr_warm_up", daemon=True)
+        self._warm_up_thread.start()
+        return self._warm_up_thread
+    
+    def _warm_up(self) -> None:
+        """同期・非同期クライアントの接続プールを温めて結果をヘルス状態に書くのだ"""
+        if self.ocr_client is None:
+            return
+        started = time.monotonic()
+        result = self.ocr_client.warm_up()
+        if result.success and self.async_ocr_client is not None:
+            result = self.async_ocr_client.warm_up()
+        latency_sec = time.monotonic() - started
+        
+        if result.success:
+            self._set_health(HEALTH_READY, latency_sec=latency_sec)
+            print(f"✅ Azure OpenAI OCR利用可能（モデル: {self.config.azure_openai_model}, "
+                  f"ウォームアップ {latency_sec:.2f}秒）")
+            # 前回から持ち越した滞留があれば起動直後に消化するのだ
+            self.maybe_start_drain()
+        else:
+            self._set_health(HEALTH_FAILED, error=result.get_error(), latency_sec=latency_sec)
+            print(f"⚠️  Azure OpenAI OCR接続失敗（APIキー・エンドポイントを確認）: {result.get_error()}")
+            print("   記録は継続し、OCRできなかった画像はリトライキューに入るのだ")
+    
+    def _set_health(
+        self,
+        state: str,
+        error: Optional[str] = None,
+        latency_sec: Optional[float] = None
+    ) -> None:
+        """ヘルス状態を更新するのだ"""
+        with self._health_lock:
+            self.health = {
+                "state": state,
+                "error": error,
+                "latency_sec": round(latency_sec, 3) if latency_sec is not None else None,
+                "checked_at": datetime.now(timezone.utc).isoformat()
+            }
+    
+    def get_health(self) -> Dict[str, Any]:
+        """OCR接続のヘルス状態を返すのだ"""
+        with self._health_lock:
+            return dict(self.health)
+    
     def test_ocr_connection(self) -> bool:
         """OCR接続テストを実行するのだ"""
         if not self.config.ocr_enabled or not self.ocr_client:
@@ -186,6 +890,94 @@ class OcrWorker:
         
         return self.ocr_client.test_connection()
     
+    def wait_idle(self, timeout: float = 10.0) -> bool:
+        """キューが空になり処理中のジョブが終わるまで待つのだ（テスト・停止処理用）"""
+        if self.work_queue is None:
+            return True
+        return self.work_queue.join(timeout)
+    
+    def stop_accepting(self) -> None:
+        """新規フレームのOCRとリトライの投入を止めるのだ（待たずに戻る）"""
+        self._stopping.set()
+        self._wake_retry_scheduler()
+    
+    def shutdown(self, deadline_sec: Optional[float] = None) -> Dict[str, Any]:
+        """期限付きで停止するのだ
+        
+        新しいOCRの受付を止め、実行中のOCRは deadline_sec 秒まで終わりを待つのだ。
+        未着手・未完了のフレームはリトライキューへ退避して書き出すので、
+        再起動後にそこから再開できるのだ。
+        """
+        if deadline_sec is None:
+            deadline_sec = self.config.shutdown_deadline_sec
+        started = time.monotonic()
+        deadline = started + deadline_sec
+        
+        def remaining() -> float:
+            return max(0.0, deadline - time.monotonic())
+        
+        self.stop_accepting()
+        if self.drainer is not None:
+            self.drainer.stop(timeout=remaining())
+        
+        queued = 0
+        if self.work_queue is not None:
+            for job in self.work_queue.close():
+                self._persist_job(job, "停止時に未処理")
+                queued += 1
+            for thread in self._pool_threads:
+                thread.join(timeout=remaining())
+        
+        with self._inflight_idle:
+            drained = self._inflight_idle.wait_for(lambda: not self._inflight_jobs, remaining())
+            abandoned = list(self._inflight_jobs.values())
+            self._inflight_jobs.clear()
+            self._abandoned_paths.update(job.screenshot_path for job in abandoned)
+        for job in abandoned:
+            self._persist_job(job, "停止期限までに未完了", attempted=True)
+        
+        self.retry_cache.flush()
+        self.close(timeout=remaining())
+        
+        report = {
+            "completed": drained,
+            "queued_persisted": queued,
+            "inflight_persisted": len(abandoned),
+            "elapsed_sec": round(time.monotonic() - started, 3),
+            "retry_tasks": self.retry_cache.get_cache_stats().get("total_tasks", 0)
+        }
+        print(f"🛑 OCRワーカー停止: 未着手{queued}件・実行中{len(abandoned)}件をリトライキューへ退避 "
+              f"({report['elapsed_sec']:.1f}秒)")
+        return report
+    
+    def close(self, timeout: Optional[float] = None) -> None:
+        """OCRスレッド・非同期クライアントの接続プール・結果キャッシュを閉じるのだ
+        
+        スレッドの終了は timeout 秒（省略時はOCRのタイムアウト）まで待つのだ。
+        """
+        if timeout is None:
+            timeout = self.config.ocr_timeout_sec
+        if self._retry_scheduler_thread is not None:
+            self.stop_accepting()
+            self._retry_scheduler_thread.join(timeout=timeout)
+        if self.drainer is not None:
+            self.drainer.stop(timeout=timeout)
+        if self.work_queue is not None:
+            # 未着手のジョブは失わないようリトライキューに移すのだ
+            for job in self.work_queue.close():
+                self._persist_job(job, "停止時に未処理")
+            for thread in self._pool_threads:
+                thread.join(timeout=timeout)
+        # リトライの完了処理がキャッシュを触るので、閉じる前に待つか取り消すのだ
+        self._settle_retry_futures(timeout)
+        if self.async_ocr_client is not None:
+            self.async_ocr_client.close()
+        if self.result_cache is not None:
+            self.result_cache.close()
+        if self.mock_server is not None:
+            self.mock_server.stop()
+        self.retry_cache.close()
+    
     def force_clear_retry_queue(self) -> int:
         """リトライキューを強制クリアするのだ（デバッグ用）"""
         return self.retry_cache.force_clear_all_tasks()
@@ -195,11 +987,14 @@ class OcrWorker:
         def ocr_worker_callback():
             """OCRワーカーの定期処理なのだ"""
             try:
-                # リトライキューを処理
+                # リトライキューを処理（スケジューラが動いていれば取りこぼしを拾う保険なのだ）
                 processed = self.process_retry_queue()
                 if processed > 0:
                     print(f"🔄 リトライキュー処理完了: {processed}個")
                 
+                # 一定間隔で遅延ヒストグラムなどの性能レコードを書くのだ
+                self.maybe_write_perf_record()
+                
                 # 古いタスクを掃除（10分間隔で実行判定）
                 import time
                 if int(time.time()) % 600 == 0:  # 10分ごと
@@ -212,3 +1007,7 @@ class OcrWorker:
         
         return ocr_worker_callback
 
+
+def _parse_timestamp(value: str) -> datetime:
+    """リトライタスクに保存したISO形式のタイムスタンプを読むのだ"""
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
@@ -0,0 +1,249 @@
+"""OCRレートリミッタ：RPM/TPMのトークンバケットと429のRetry-Afterを扱うのだ"""
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Mapping, Optional
+
+# "1s" / "6m0s" / "20ms" / "1.5" 形式の期間文字列なのだ
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parse_duration(value: str) -> Optional[float]:
+    """レート制限ヘッダの期間文字列を秒に変換するのだ"""
+    value = value.strip()
+    if not value:
+        return None
+
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    parts = _DURATION_PART.findall(value)
+    if not parts or "".join(n + u for n, u in parts) != value:
+        return None
+
+    scale = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+    return sum(float(number) * scale[unit] for number, unit in parts)
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Retry-After系ヘッダから待ち秒数を取り出すのだ"""
+    lowered = {k.lower(): v for k, v in headers.items()}
+
+    if "retry-after-ms" in lowered:
+        try:
+            return float(lowered["retry-after-ms"]) / 1000.0
+        except ValueError:
+            pass
+
+    if "retry-after" in lowered:
+        value = lowered["retry-after"].strip()
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        # HTTP日付形式なのだ
+        try:
+            retry_at = parsedate_to_datetime(value)
+            return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            pass
+
+    return None
+
+
+class TokenBucket:
+    """1分あたりの上限をならして補充するトークンバケットなのだ"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.refill_per_sec = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        """経過時間分を補充するのだ"""
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_sec)
+        self.updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """amount分が使えるまでの秒数を返すのだ（今使えれば0）"""
+        self._refill(now)
+        # 上限を超える要求は満タンになれば通すのだ
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_per_sec
+
+    def consume(self, amount: float) -> None:
+        """トークンを消費するのだ（実使用量の補正で負にもなる）"""
+        self.tokens -= amount
+
+    def limit_to(self, remaining: float) -> None:
+        """サーバが報告した残量に合わせるのだ"""
+        self.tokens = min(self.tokens, remaining)
+
+
+class RateLimiter:
+    """送信前にRPM/TPMとRetry-Afterを守って待つか捨てるかを決めるのだ"""
+
+    def __init__(
+        self,
+        rpm_limit: int = 0,
+        tpm_limit: int = 0,
+        max_wait_sec: float = 5.0,
+        default_tokens_per_request: int = 1500,
+        default_retry_after_sec: float = 1.0
+    ):
+        self.rpm_limit = rpm_limit
+        self.tpm_limit = tpm_limit
+        self.max_wait_sec = max_wait_sec
+        self.default_retry_after_sec = default_retry_after_sec
+
+        self._requests = TokenBucket(rpm_limit) if rpm_limit > 0 else None
+        self._tokens = TokenBucket(tpm_limit) if tpm_limit > 0 else None
+        self._tokens_per_request = float(default_tokens_per_request)
+        self._blocked_until = 0.0  # time.monotonic() 基準なのだ
+        self._lock = threading.Lock()
+
+        self.stats = {
+            "allowed": 0,
+            "shed": 0,
+            "waited_sec": 0.0,
+            "rate_limited_responses": 0
+        }
+
+    def estimate_tokens(self) -> int:
+        """1リクエストの推定トークン数を返すのだ（実績の移動平均）"""
+        return int(self._tokens_per_request)
+
+    def try_acquire(self, estimated_tokens: Optional[int] = None) -> float:
+        """今送れるなら枠を確保して0を返し、送れないなら待ち秒数を返すのだ"""
+        if estimated_tokens is None:
+            estimated_tokens = self.estimate_tokens()
+
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._blocked_until - now)
+            if self._requests is not None:
+                wait = max(wait, self._requests.wait_time(1, now))
+            if self._tokens is not None:
+                wait = max(wait, self._tokens.wait_time(estimated_tokens, now))
+
+            if wait > 0:
+                return wait
+
+            if self._requests is not None:
+                self._requests.consume(1)
+            if self._tokens is not None:
+                self._tokens.consume(estimated_tokens)
+            self.stats["allowed"] += 1
+            return 0.0
+
+    def acquire(self, estimated_tokens: Optional[int] = None) -> bool:
+        """枠が空くまで待つのだ（max_wait_secを超えるなら捨ててFalse）"""
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(estimated_tokens)
+            if wait <= 0:
+                self._add_wait(waited)
+                return True
+            if waited + wait > self.max_wait_sec:
+                self._shed(waited)
+                return False
+            time.sleep(wait)
+            waited += wait
+
+    async def acquire_async(self, estimated_tokens: Optional[int] = None) -> bool:
+        """acquire のasyncio版なのだ"""
+        import asyncio
+
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(estimated_tokens)
+            if wait <= 0:
+                self._add_wait(waited)
+                return True
+            if waited + wait > self.max_wait_sec:
+                self._shed(waited)
+                return False
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def _add_wait(self, waited: float) -> None:
+        """待ち時間を統計に足すのだ"""
+        with self._lock:
+            self.stats["waited_sec"] += waited
+
+    def _shed(self, waited: float) -> None:
+        """送信を諦めたことを記録するのだ"""
+        with self._lock:
+            self.stats["shed"] += 1
+            self.stats["waited_sec"] += waited
+
+    def record_usage(self, tokens_used: int, estimated_tokens: Optional[int] = None) -> None:
+        """実際の使用トークンで推定との差を補正するのだ"""
+        if tokens_used <= 0:
+            return
+
+        with self._lock:
+            if estimated_tokens is None:
+                estimated_tokens = int(self._tokens_per_request)
+            if self._tokens is not None:
+                self._tokens.consume(tokens_used - estimated_tokens)
+            # 推定値は指数移動平均で追従させるのだ
+            self._tokens_per_request = self._tokens_per_request * 0.8 + tokens_used * 0.2
+
+    def record_rate_limited(self, headers: Optional[Mapping[str, str]] = None) -> float:
+        """429応答を受けたらRetry-Afterの間は送信を止めるのだ（待ち秒数を返す）"""
+        retry_after = parse_retry_after(headers or {})
+        if retry_after is None:
+            retry_after = self.default_retry_after_sec
+
+        with self._lock:
+            self.stats["rate_limited_responses"] += 1
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+
+        if headers:
+            self.update_from_headers(headers)
+        return retry_after
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """x-ratelimit-* ヘッダの残量とリセット時間をバケットに反映するのだ"""
+        lowered = {k.lower(): v for k, v in headers.items()}
+
+        with self._lock:
+            now = time.monotonic()
+            for kind, bucket in (("requests", self._requests), ("tokens", self._tokens)):
+                remaining_value = lowered.get(f"x-ratelimit-remaining-{kind}")
+                if remaining_value is None:
+                    continue
+                try:
+                    remaining = float(remaining_value)
+                except ValueError:
+                    continue
+
+                if bucket is not None:
+                    bucket._refill(now)
+                    bucket.limit_to(remaining)
+
+                # 残量ゼロならリセットまで送らないのだ
+                if remaining <= 0:
+                    reset = parse_duration(lowered.get(f"x-ratelimit-reset-{kind}", ""))
+                    if reset is not None:
+                        self._blocked_until = max(self._blocked_until, now + reset)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """リミッタの統計を返すのだ"""
+        with self._lock:
+            return {
+                **self.stats,
+                "rpm_limit": self.rpm_limit,
+                "tpm_limit": self.tpm_limit,
+                "tokens_per_request": int(self._tokens_per_request),
+                "blocked_for_sec": max(0.0, self._blocked_until - time.monotonic())
+            }
@@ -1,11 +1,22 @@
-"""リトライキャッシュ：失敗したOCRタスクを管理して再試行するのだ"""
+"""リトライキャッシュ：失敗したOCRタスクを管理して再試行するのだ
+
+タスクはWALモードのSQLiteに1行ずつ保存するので、更新のたびに全件を書き直さず、
+書き込み中に落ちても壊れないのだ。画像は内容ハッシュ名で1つだけ持ち、同じ画像の
+タスクは参照数で共有するのだ。枚数・容量の上限を超えたら古いタスクから捨てるのだ。
+"""
+import errno
+import hashlib
+import heapq
 import json
-import time
+import os
 import shutil
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import List, Optional, Dict, Any
-from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 
 @dataclass
@@ -36,203 +47,515 @@ class RetryTask:
         return time.time() + delay + jitter
 
 
+TASK_COLUMNS = (
+    "task_id", "image_path", "created_at", "last_attempt_at",
+    "attempt_count", "next_retry_at", "original_timestamp", "error_message"
+)
+
+
 class RetryCache:
     """OCR失敗時のリトライキャッシュ管理なのだ"""
     
-    def __init__(self, cache_dir: Path, max_attempts: int = 3, base_delay: float = 1.0):
+    def __init__(
+        self,
+        cache_dir: Path,
+        max_attempts: int = 3,
+        base_delay: float = 1.0,
+        max_tasks: int = 500,
+        max_bytes: int = 2 * 1024 ** 3,
+        on_evict: Optional[Callable[[RetryTask], None]] = None,
+        on_schedule: Optional[Callable[[float], None]] = None
+    ):
         self.cache_dir = Path(cache_dir) / "retry"
         self.max_attempts = max_attempts
         self.base_delay = base_delay
-        self.tasks_file = self.cache_dir / "retry_tasks.json"
+        self.max_tasks = max_tasks  # 0で無制限
+        self.max_bytes = max_bytes  # 0で無制限
+        self.on_evict = on_evict  # 上限で捨てたタスクを呼び出し側で確定させるのだ
+        self.on_schedule = on_schedule  # リトライ時刻が決まるたびにロックの外で呼ぶのだ
+        self.db_path = self.cache_dir / "retry_tasks.sqlite3"
+        self.tasks_file = self.cache_dir / "retry_tasks.json"  # 旧形式（起動時にDBへ移行する）
+        # 撮影スレッドとワーカースレッドから同時に触られるのでロックするのだ
+        self._lock = threading.RLock()
         
         # ディレクトリ作成
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         
-        # タスクリストを読み込み
-        self._tasks: List[RetryTask] = self._load_tasks()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS retry_tasks (
+                task_id TEXT PRIMARY KEY,
+                image_path TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_attempt_at REAL NOT NULL,
+                attempt_count INTEGER NOT NULL,
+                next_retry_at REAL NOT NULL,
+                original_timestamp TEXT NOT NULL,
+                error_message TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_retry_tasks_next_retry_at ON retry_tasks(next_retry_at)"
+        )
+        self._conn.commit()
+        self._migrate_legacy_file()
+        
+        # task_id → タスク（作成順）と、next_retry_at の最小ヒープで持つのだ
+        # ヒープは遅延削除で、時刻が変わったタスクの古い要素は取り出し時に読み捨てるのだ
+        self._tasks: Dict[str, RetryTask] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._ready: Dict[str, RetryTask] = {}  # リトライ時刻を過ぎたタスク
+        # 画像ファイル → 参照しているタスク数・バイト数（統計を全件statせずに出すため）
+        self._image_refs: Dict[Path, int] = {}
+        self._image_sizes: Dict[Path, int] = {}
+        self._total_bytes = 0
+        self._deduplicated = 0
+        self._evicted = 0
+        self._evicted_bytes = 0
+        self._scheduled_at: Optional[float] = None  # ロック中に決まった一番早い予定（通知待ち）
+        for task in self._load_tasks():
+            self._insert(task)
+        self._notify_evicted(self._enforce_capacity())
+        self._notify_scheduled()
+    
+    def __len__(self) -> int:
+        """タスク数を返すのだ"""
+        with self._lock:
+            return len(self._tasks)
     
     def add_failed_task(
         self, 
         image_path: Path, 
         original_timestamp: str,
-        error_message: str
+        error_message: str,
+        move: bool = False,
+        attempt_count: int = 1
     ) -> str:
-        """失敗したOCRタスクをキャッシュに追加するのだ"""
-        # タスクIDを生成（タイムスタンプベース）
-        task_id = f"retry_{int(time.time() * 1000)}"
-        
-        # 画像ファイルをリトライキャッシュにコピー
-        cached_image_path = self.cache_dir / f"{task_id}.jpg"
+        """失敗したOCRタスクをキャッシュに追加するのだ
         
+        move=True なら元画像をキャッシュへ移し（呼び出し側で消す予定の画像向け）、
+        そうでなければハードリンクを張るのだ。どちらもできない別デバイス間だけコピーするのだ。
+        上限を超えたら一番古いタスクから捨てて on_evict に渡すのだ。
+        attempt_count は最初の失敗を1回目と数えるのが既定で、送る前に退避するフレームは0にするのだ。
+        """
+        evicted: List[RetryTask] = []
         try:
-            shutil.copy2(image_path, cached_image_path)
-            
-            # リトライタスクを作成
-            task = RetryTask(
-                task_id=task_id,
-                image_path=cached_image_path,
-                created_at=time.time(),
-                last_attempt_at=time.time(),
-                attempt_count=1,  # 最初の失敗を1回目とカウント
-                next_retry_at=time.time() + self.base_delay,
-                original_timestamp=original_timestamp,
-                error_message=error_message
+            return self._add_task(
+                Path(image_path), original_timestamp, error_message, move, attempt_count, evicted
             )
+        finally:
+            # JSONLの確定は遅いのでロックの外で呼ぶのだ
+            self._notify_evicted(evicted)
+            self._notify_scheduled()
+    
+    def _add_task(
+        self,
+        image_path: Path,
+        original_timestamp: str,
+        error_message: str,
+        move: bool,
+        attempt_count: int,
+        evicted: List[RetryTask]
+    ) -> str:
+        """タスクを1件追加して、上限で捨てたタスクを evicted に積むのだ"""
+        with self._lock:
+            # タスクIDを生成（タイムスタンプベース、停止時の一括退避でも重ならないようずらす）
+            task_ms = int(time.time() * 1000)
+            while f"retry_{task_ms}" in self._tasks:
+                task_ms += 1
+            task_id = f"retry_{task_ms}"
+        
+            try:
+                # 画像ファイルをリトライキャッシュに取り込み
+                cached_image_path = self._store_image(image_path, move)
             
-            # タスクリストに追加
-            self._tasks.append(task)
-            self._save_tasks()
+                # リトライタスクを作成
+                task = RetryTask(
+                    task_id=task_id,
+                    image_path=cached_image_path,
+                    created_at=time.time(),
+                    last_attempt_at=time.time(),
+                    attempt_count=attempt_count,
+                    next_retry_at=time.time() + self.base_delay,
+                    original_timestamp=original_timestamp,
+                    error_message=error_message
+                )
             
-            print(f"🔄 リトライタスク追加: {task_id} (次回: {self.base_delay}秒後)")
-            return task_id
+                # タスクリストに追加
+                self._insert(task)
+                self._save_task(task)
+                evicted.extend(self._enforce_capacity())
             
-        except Exception as e:
-            print(f"⚠️ リトライタスク追加失敗: {e}")
-            return ""
+                print(f"🔄 リトライタスク追加: {task_id} (次回: {self.base_delay}秒後)")
+                return task_id
+            
+            except Exception as e:
+                print(f"⚠️ リトライタスク追加失敗: {e}")
+                return ""
     
     def get_ready_tasks(self) -> List[RetryTask]:
         """実行準備が整ったリトライタスクを取得するのだ"""
-        ready_tasks = []
-        current_time = time.time()
-        
-        for task in self._tasks:
-            if task.should_retry_now() and task.attempt_count < self.max_attempts:
-                ready_tasks.append(task)
-        
-        return ready_tasks
+        with self._lock:
+            self._promote_due()
+            return [task for task in self._ready.values() if task.attempt_count < self.max_attempts]
+    
+    def get_task(self, task_id: str) -> Optional[RetryTask]:
+        """task_id のタスクを返すのだ（無ければNone）"""
+        with self._lock:
+            return self._tasks.get(task_id)
+    
+    def next_due_at(self) -> Optional[float]:
+        """まだ時刻の来ていないタスクのうち、一番早い next_retry_at を返すのだ（無ければNone）"""
+        with self._lock:
+            self._promote_due()
+            while self._heap:
+                next_retry_at, task_id = self._heap[0]
+                task = self._tasks.get(task_id)
+                if task is not None and task.next_retry_at == next_retry_at and task_id not in self._ready:
+                    return next_retry_at
+                heapq.heappop(self._heap)  # 削除済み・再スケジュール済みの古い要素なのだ
+            return None
+    
+    def reschedule(self, task_id: str, next_retry_at: float) -> bool:
+        """タスクの次回リトライ時刻を変えるのだ"""
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return False
+            task.next_retry_at = next_retry_at
+            self._schedule(task)
+            self._save_task(task)
+        self._notify_scheduled()
+        return True
     
     def mark_task_attempted(self, task_id: str, success: bool, error_message: str = "") -> bool:
         """タスクの試行結果を記録するのだ"""
-        for task in self._tasks:
-            if task.task_id == task_id:
-                task.last_attempt_at = time.time()
-                task.attempt_count += 1
-                
-                if success:
-                    # 成功時はタスクを削除
+        try:
+            return self._mark_attempted(task_id, success, error_message)
+        finally:
+            self._notify_scheduled()
+    
+    def _mark_attempted(self, task_id: str, success: bool, error_message: str) -> bool:
+        """試行結果をタスクに反映するのだ（再スケジュールの通知は呼び出し元がロックの外で行う）"""
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return False
+            
+            task.last_attempt_at = time.time()
+            task.attempt_count += 1
+        
+            if success:
+                # 成功時はタスクを削除
+                self._remove_task(task_id)
+                print(f"✅ リトライタスク成功: {task_id}")
+            else:
+                # 失敗時は次のリトライ時間を設定
+                task.error_message = error_message
+            
+                if task.attempt_count >= self.max_attempts:
+                    # 最大試行回数に達した場合は削除
                     self._remove_task(task_id)
-                    print(f"✅ リトライタスク成功: {task_id}")
+                    print(f"❌ リトライタスク諦め: {task_id} (最大{self.max_attempts}回達成)")
                 else:
-                    # 失敗時は次のリトライ時間を設定
-                    task.error_message = error_message
-                    
-                    if task.attempt_count >= self.max_attempts:
-                        # 最大試行回数に達した場合は削除
-                        self._remove_task(task_id)
-                        print(f"❌ リトライタスク諦め: {task_id} (最大{self.max_attempts}回達成)")
-                    else:
-                        # 次のリトライ時間を計算
-                        task.next_retry_at = task.calculate_next_retry_time(self.base_delay)
-                        print(f"🔄 リトライタスク再スケジュール: {task_id} (試行{task.attempt_count}/{self.max_attempts})")
-                
-                self._save_tasks()
-                return True
-        
-        return False
+                    # 次のリトライ時間を計算
+                    task.next_retry_at = task.calculate_next_retry_time(self.base_delay)
+                    self._schedule(task)
+                    self._save_task(task)
+                    print(f"🔄 リトライタスク再スケジュール: {task_id} (試行{task.attempt_count}/{self.max_attempts})")
+        
+            return True
+    
+    def _store_image(self, image_path: Path, move: bool) -> Path:
+        """画像を内容ハッシュ名のファイルとして取り込むのだ（同じ内容なら既存を共有する）"""
+        blob_path = self.cache_dir / f"{_content_digest(image_path)}.jpg"
+        if blob_path in self._image_refs or blob_path.exists():
+            self._deduplicated += 1
+            if move:
+                image_path.unlink(missing_ok=True)
+            return blob_path
+        
+        if move:
+            try:
+                os.replace(image_path, blob_path)
+                return blob_path
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+        else:
+            try:
+                os.link(image_path, blob_path)
+                return blob_path
+            except OSError:
+                pass
+        
+        # 別デバイスやハードリンク非対応のときだけコピーするのだ（途中で落ちても壊れた画像を残さない）
+        temp_path = blob_path.with_suffix(".tmp")
+        shutil.copy2(image_path, temp_path)
+        os.replace(temp_path, blob_path)
+        if move:
+            image_path.unlink(missing_ok=True)
+        return blob_path
+    
+    def _insert(self, task: RetryTask) -> None:
+        """タスクを索引に加えるのだ（ロック取得済み）"""
+        self._tasks[task.task_id] = task
+        refs = self._image_refs.get(task.image_path, 0)
+        if refs == 0:
+            size = _file_size(task.image_path)
+            self._image_sizes[task.image_path] = size
+            self._total_bytes += size
+        self._image_refs[task.image_path] = refs + 1
+        self._schedule(task)
+    
+    def _enforce_capacity(self) -> List[RetryTask]:
+        """枚数・容量の上限を超えている間、一番古いタスクを捨てるのだ（1件O(1)）
+        
+        最新の1件は上限を超える大きさでも残すのだ。
+        """
+        evicted = []
+        with self._lock:
+            while len(self._tasks) > 1 and (
+                (self.max_tasks > 0 and len(self._tasks) > self.max_tasks)
+                or (self.max_bytes > 0 and self._total_bytes > self.max_bytes)
+            ):
+                # _tasks は作成順なので先頭が一番古いのだ
+                oldest = next(iter(self._tasks.values()))
+                freed = self._total_bytes
+                self._remove_task(oldest.task_id)
+                self._evicted += 1
+                self._evicted_bytes += freed - self._total_bytes
+                evicted.append(oldest)
+        
+        if evicted:
+            print(f"🗑️ リトライキュー上限超過: 古い{len(evicted)}個を破棄")
+        return evicted
+    
+    def _notify_evicted(self, evicted: List[RetryTask]) -> None:
+        """捨てたタスクを on_evict に渡すのだ"""
+        if self.on_evict is None:
+            return
+        for task in evicted:
+            try:
+                self.on_evict(task)
+            except Exception as e:
+                print(f"⚠️ 破棄タスク確定エラー: {task.task_id} - {e}")
+    
+    def _schedule(self, task: RetryTask) -> None:
+        """タスクを next_retry_at でヒープに積み直すのだ（ロック取得済み）"""
+        self._ready.pop(task.task_id, None)
+        heapq.heappush(self._heap, (task.next_retry_at, task.task_id))
+        if len(self._heap) > 2 * len(self._tasks) + 64:
+            # 読み捨て待ちの古い要素が溜まったら作り直すのだ
+            self._heap = [
+                (t.next_retry_at, t.task_id) for t in self._tasks.values() if t.task_id not in self._ready
+            ]
+            heapq.heapify(self._heap)
+        if self._scheduled_at is None or task.next_retry_at < self._scheduled_at:
+            self._scheduled_at = task.next_retry_at
+    
+    def _notify_scheduled(self) -> None:
+        """ロック中に決まった予定を on_schedule に渡すのだ（ロックの外で呼ぶ）"""
+        with self._lock:
+            scheduled_at, self._scheduled_at = self._scheduled_at, None
+        if scheduled_at is not None and self.on_schedule is not None:
+            self.on_schedule(scheduled_at)
+    
+    def _promote_due(self) -> None:
+        """リトライ時刻を過ぎたタスクをヒープから取り出すのだ（ロック取得済み・O(k log n)）"""
+        now = time.time()
+        while self._heap and self._heap[0][0] <= now:
+            next_retry_at, task_id = heapq.heappop(self._heap)
+            task = self._tasks.get(task_id)
+            if task is None or task.next_retry_at != next_retry_at or task_id in self._ready:
+                continue  # 削除済み・再スケジュール済みの古い要素なのだ
+            self._ready[task_id] = task
     
     def _remove_task(self, task_id: str) -> bool:
         """タスクとその画像ファイルを削除するのだ"""
-        for i, task in enumerate(self._tasks):
-            if task.task_id == task_id:
-                # 画像ファイルを削除
-                if task.image_path.exists():
-                    task.image_path.unlink(missing_ok=True)
-                
-                # タスクリストから削除
-                del self._tasks[i]
-                return True
-        
-        return False
+        task = self._tasks.pop(task_id, None)
+        if task is None:
+            return False
+        
+        # 他のタスクが参照していなければ画像ファイルを削除
+        refs = self._image_refs.get(task.image_path, 0) - 1
+        if refs > 0:
+            self._image_refs[task.image_path] = refs
+        else:
+            self._image_refs.pop(task.image_path, None)
+            self._total_bytes -= self._image_sizes.pop(task.image_path, 0)
+            task.image_path.unlink(missing_ok=True)
+        
+        # 索引から外すのだ（ヒープの要素は取り出し時に読み捨てる）
+        self._ready.pop(task_id, None)
+        self._delete_task(task_id)
+        return True
     
     def cleanup_old_tasks(self, max_age_hours: int = 24) -> int:
         """古いリトライタスクを削除するのだ"""
-        cutoff_time = time.time() - (max_age_hours * 3600)
-        cleaned_count = 0
+        with self._lock:
+            cutoff_time = time.time() - (max_age_hours * 3600)
+            cleaned_count = 0
         
-        tasks_to_remove = []
-        for task in self._tasks:
-            if task.created_at < cutoff_time:
+            # タスクは作成順に並んでいるので、古い方から期限内のものに当たるまで見るのだ
+            tasks_to_remove = []
+            for task in self._tasks.values():
+                if task.created_at >= cutoff_time:
+                    break
                 tasks_to_remove.append(task.task_id)
         
-        for task_id in tasks_to_remove:
-            if self._remove_task(task_id):
-                cleaned_count += 1
-                print(f"🗑️ 古いリトライタスク削除: {task_id}")
-        
-        if cleaned_count > 0:
-            self._save_tasks()
+            for task_id in tasks_to_remove:
+                if self._remove_task(task_id):
+                    cleaned_count += 1
+                    print(f"🗑️ 古いリトライタスク削除: {task_id}")
         
-        return cleaned_count
+            return cleaned_count
     
     def get_cache_stats(self) -> Dict[str, Any]:
-        """キャッシュ統計を返すのだ"""
-        ready_count = len(self.get_ready_tasks())
-        total_size = 0
-        
-        try:
-            for task in self._tasks:
-                if task.image_path.exists():
-                    total_size += task.image_path.stat().st_size
-        except Exception:
-            pass
-        
-        return {
-            "total_tasks": len(self._tasks),
-            "ready_tasks": ready_count,
-            "total_size_mb": total_size / (1024 * 1024),
-            "cache_dir": str(self.cache_dir)
-        }
+        """キャッシュ統計を返すのだ（件数・容量は随時更新している合計から出すのだ）"""
+        with self._lock:
+            next_due_at = self.next_due_at()
+            return {
+                "total_tasks": len(self._tasks),
+                "ready_tasks": len(self._ready),
+                "next_due_in_sec": max(0.0, next_due_at - time.time()) if next_due_at is not None else None,
+                "total_size_mb": self._total_bytes / (1024 * 1024),
+                "unique_images": len(self._image_refs),
+                "deduplicated": self._deduplicated,
+                "evicted_tasks": self._evicted,
+                "evicted_size_mb": self._evicted_bytes / (1024 * 1024),
+                "max_tasks": self.max_tasks,
+                "max_size_mb": self.max_bytes / (1024 * 1024),
+                "cache_dir": str(self.cache_dir)
+            }
     
     def _load_tasks(self) -> List[RetryTask]:
         """保存されたタスクリストを読み込むのだ"""
-        if not self.tasks_file.exists():
+        try:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT {', '.join(TASK_COLUMNS)} FROM retry_tasks ORDER BY created_at"
+                ).fetchall()
+        except sqlite3.Error as e:
+            print(f"⚠️ リトライタスクDB読み込みエラー: {e}")
             return []
         
+        tasks = []
+        for row in rows:
+            task_data = dict(zip(TASK_COLUMNS, row, strict=True))
+            # Pathオブジェクトに変換
+            task_data['image_path'] = Path(task_data['image_path'])
+            tasks.append(RetryTask(**task_data))
+        return tasks
+    
+    def _migrate_legacy_file(self) -> None:
+        """旧形式の retry_tasks.json があればDBに取り込んで退避するのだ"""
+        if not self.tasks_file.exists():
+            return
+        
         try:
             with open(self.tasks_file, 'r', encoding='utf-8') as f:
                 tasks_data = json.load(f)
             
-            tasks = []
-            for task_data in tasks_data:
-                # Pathオブジェクトに変換
-                task_data['image_path'] = Path(task_data['image_path'])
-                tasks.append(RetryTask(**task_data))
+            with self._lock, self._conn:
+                for task_data in tasks_data:
+                    task_data['image_path'] = Path(task_data['image_path'])
+                    self._conn.execute(
+                        f"INSERT OR IGNORE INTO retry_tasks ({', '.join(TASK_COLUMNS)}) "
+                        f"VALUES ({', '.join('?' * len(TASK_COLUMNS))})",
+                        _task_row(RetryTask(**task_data))
+                    )
             
-            return tasks
+            self.tasks_file.rename(self.tasks_file.with_name(self.tasks_file.name + ".migrated"))
+            print(f"📦 リトライタスクをSQLiteへ移行: {len(tasks_data)}個")
             
         except Exception as e:
-            print(f"⚠️ リトライタスクファイル読み込みエラー: {e}")
-            return []
+            print(f"⚠️ リトライタスクファイル移行エラー: {e}")
     
-    def _save_tasks(self) -> None:
-        """タスクリストを保存するのだ"""
+    def _save_task(self, task: RetryTask) -> None:
+        """タスク1件を保存するのだ（1行の挿入・更新なので全件は書き直さない）"""
         try:
-            tasks_data = []
-            for task in self._tasks:
-                task_dict = asdict(task)
-                # Pathオブジェクトを文字列に変換
-                task_dict['image_path'] = str(task.image_path)
-                tasks_data.append(task_dict)
-            
-            with open(self.tasks_file, 'w', encoding='utf-8') as f:
-                json.dump(tasks_data, f, indent=2, ensure_ascii=False)
-            
-        except Exception as e:
-            print(f"⚠️ リトライタスクファイル保存エラー: {e}")
+            with self._conn:
+                self._conn.execute(
+                    f"INSERT OR REPLACE INTO retry_tasks ({', '.join(TASK_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(TASK_COLUMNS))})",
+                    _task_row(task)
+                )
+        except sqlite3.Error as e:
+            print(f"⚠️ リトライタスク保存エラー: {e}")
+    
+    def _delete_task(self, task_id: str) -> None:
+        """タスク1件をDBから消すのだ"""
+        try:
+            with self._conn:
+                self._conn.execute("DELETE FROM retry_tasks WHERE task_id = ?", (task_id,))
+        except sqlite3.Error as e:
+            print(f"⚠️ リトライタスク削除エラー: {e}")
+    
+    def flush(self) -> None:
+        """停止前にWALを本体へ書き戻すのだ"""
+        with self._lock:
+            try:
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except sqlite3.Error as e:
+                print(f"⚠️ リトライタスクDB書き戻しエラー: {e}")
+    
+    def close(self) -> None:
+        """DB接続を閉じるのだ"""
+        with self._lock:
+            self._conn.close()
     
     def force_clear_all_tasks(self) -> int:
         """すべてのリトライタスクを強制削除するのだ（デバッグ用）"""
-        cleared_count = len(self._tasks)
+        with self._lock:
+            cleared_count = len(self._tasks)
         
-        # すべての画像ファイルを削除
-        for task in self._tasks:
-            if task.image_path.exists():
-                task.image_path.unlink(missing_ok=True)
+            # すべての画像ファイルを削除
+            for image_path in self._image_refs:
+                image_path.unlink(missing_ok=True)
         
-        # タスクリストをクリア
-        self._tasks.clear()
-        self._save_tasks()
+            # タスクリストをクリア
+            self._tasks.clear()
+            self._heap.clear()
+            self._ready.clear()
+            self._image_refs.clear()
+            self._image_sizes.clear()
+            self._total_bytes = 0
+            try:
+                with self._conn:
+                    self._conn.execute("DELETE FROM retry_tasks")
+            except sqlite3.Error as e:
+                print(f"⚠️ リトライタスク削除エラー: {e}")
         
-        print(f"🗑️ 全リトライタスククリア: {cleared_count}個")
-        return cleared_count
+            print(f"🗑️ 全リトライタスククリア: {cleared_count}個")
+            return cleared_count
+
+
+def _task_row(task: RetryTask) -> tuple:
+    """タスクをDBの1行に変換するのだ"""
+    task_dict = asdict(task)
+    # Pathオブジェクトを文字列に変換
+    task_dict['image_path'] = str(task.image_path)
+    return tuple(task_dict[column] for column in TASK_COLUMNS)
+
+
+def _file_size(path: Path) -> int:
+    """ファイルのバイト数を返すのだ（無ければ0）"""
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+
+def _content_digest(path: Path) -> str:
+    """ファイル内容のSHA-256を返すのだ"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
 
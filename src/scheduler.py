@@ -1,7 +1,7 @@
 """タイムスライサ: 定期的にコールバックを実行するスケジューラなのだ"""
 import threading
 import time
-from typing import Callable, List
+from typing import Callable, List, Optional
 from dataclasses import dataclass
 
 
@@ -21,6 +21,10 @@ class TimeSlicer:
         self._timer: threading.Timer | None = None
         self._running = False
         self._lock = threading.Lock()
+        # 実行中のtickの終わりを stop() で待つためなのだ
+        self._idle = threading.Condition(self._lock)
+        self._in_tick = False
+        self._tick_thread: Optional[threading.Thread] = None
     
     def add_callback(self, callback: Callable[[], None], name: str = "unnamed") -> None:
         """コールバックを登録するのだ"""
@@ -35,13 +39,21 @@ class TimeSlicer:
             self._running = True
             self._schedule_next()
     
-    def stop(self) -> None:
-        """スケジューラを停止するのだ"""
+    def stop(self, timeout: Optional[float] = None) -> bool:
+        """スケジューラを停止するのだ
+        
+        次のtickは予約しなくなり、実行中のtickがあれば timeout 秒まで終わりを待つのだ。
+        時間内に終われば（または実行中でなければ）True を返すのだ。
+        """
         with self._lock:
             self._running = False
             if self._timer:
                 self._timer.cancel()
                 self._timer = None
+            if self._tick_thread is threading.current_thread():
+                # コールバック内からの停止は自分自身を待てないのだ
+                return True
+            return self._idle.wait_for(lambda: not self._in_tick, timeout)
     
     def _schedule_next(self) -> None:
         """次のタイマーをセットするのだ"""
@@ -57,17 +69,25 @@ class TimeSlicer:
         with self._lock:
             if not self._running:
                 return
-            
-            # コールバック実行なのだ
-            for callback_info in self.callbacks:
+            self._in_tick = True
+            self._tick_thread = threading.current_thread()
+            callbacks = list(self.callbacks)
+        
+        # コールバック実行なのだ（停止要求を受け付けられるようロックの外で回す）
+        try:
+            for callback_info in callbacks:
                 try:
                     callback_info.callback()
                 except Exception as e:
                     # TODO: ログ出力を後で整備するのだ
                     print(f"コールバック '{callback_info.name}' でエラー: {e}")
-            
-            # 次をスケジュールなのだ
-            self._schedule_next()
+        finally:
+            with self._lock:
+                self._in_tick = False
+                self._tick_thread = None
+                self._idle.notify_all()
+                # 次をスケジュールなのだ
+                self._schedule_next()
     
     def is_running(self) -> bool:
         """実行中かどうかを返すのだ"""
@@ -3,18 +3,34 @@ import time
 import os
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional, Tuple
-from PIL import Image
-import mss
+from typing import TYPE_CHECKING, Optional, Tuple
+from src.encoder_pool import EncoderPool, resize_to_max_dimension
+from src.lazy_import import LazyImport
+
+if TYPE_CHECKING:
+    import mss
+    from PIL import Image
+else:
+    # mss と PIL は初回の撮影・画像変換時に読み込むのだ（起動時間短縮）
+    mss = LazyImport("mss")
+    Image = LazyImport("PIL.Image")
 
 
 class ScreenshotService:
     """スクリーンショット撮影・保存サービスなのだ"""
     
-    def __init__(self, cache_dir: Path, max_files: int = 500, max_size_gb: float = 2.0):
+    def __init__(
+        self,
+        cache_dir: Path,
+        max_files: int = 500,
+        max_size_gb: float = 2.0,
+        encoder_pool: Optional[EncoderPool] = None
+    ):
         self.cache_dir = Path(cache_dir)
         self.max_files = max_files
         self.max_size_bytes = int(max_size_gb * 1024 * 1024 * 1024)  # GB to bytes
+        # 指定時はJPEG/LANCZOS処理を別プロセスに任せるのだ
+        self.encoder_pool = encoder_pool
         
         # キャッシュディレクトリを作成
         self.cache_dir.mkdir(parents=True, exist_ok=True)
@@ -40,12 +56,6 @@ class ScreenshotService:
                 monitor = monitors[monitor_index]
                 screenshot = sct.grab(monitor)
             
-            # PIL Imageに変換（BGRAからRGBへ）
-            img = Image.frombytes("RGB", screenshot.size, screenshot.bgra, "raw", "BGRX")
-            
-            # 1920px長辺リサイズ
-            resized_img = self._resize_to_max_dimension(img, 1920)
-            
             # 日別サブディレクトリを作成
             date_str = timestamp.strftime("%Y-%m-%d")
             daily_dir = self.cache_dir / date_str
@@ -55,8 +65,19 @@ class ScreenshotService:
             file_name = timestamp.strftime("%H-%M-%S") + f"-{timestamp.microsecond // 1000:03d}.jpg"
             file_path = daily_dir / file_name
             
-            # JPEG品質70で保存
-            resized_img.save(file_path, "JPEG", quality=70, optimize=True)
+            # エンコーダプールがあれば共有メモリ経由で別プロセスエンコードなのだ
+            jpeg_bytes = self._encode_with_pool(screenshot)
+            if jpeg_bytes is not None:
+                file_path.write_bytes(jpeg_bytes)
+            else:
+                # PIL Imageに変換（BGRAからRGBへ）
+                img = Image.frombytes("RGB", screenshot.size, screenshot.bgra, "raw", "BGRX")
+                
+                # 1920px長辺リサイズ
+                resized_img = self._resize_to_max_dimension(img, 1920)
+                
+                # JPEG品質70で保存
+                resized_img.save(file_path, "JPEG", quality=70, optimize=True)
             
             # キュー管理（上限チェック＋古いファイル削除）
             self._manage_cache_size()
@@ -68,20 +89,42 @@ class ScreenshotService:
             print(f"⚠️ スクリーンショット撮影失敗: {e}")
             return None
     
-    def _resize_to_max_dimension(self, img: Image.Image, max_dim: int) -> Image.Image:
-        """長辺を指定サイズにリサイズするのだ"""
-        width, height = img.size
-        max_current = max(width, height)
-        
-        if max_current <= max_dim:
-            return img  # リサイズ不要
-        
-        # アスペクト比を維持してリサイズ
-        scale = max_dim / max_current
-        new_width = int(width * scale)
-        new_height = int(height * scale)
+    def capture_thumbnail(
+        self,
+        size: Tuple[int, int] = (32, 18),
+        monitor_index: int = 1
+    ) -> Optional[bytes]:
+        """変化検知用の小さなグレースケールサムネイルを撮るのだ（保存しない）"""
+        try:
+            with mss.mss() as sct:
+                monitors = sct.monitors
+                if monitor_index >= len(monitors):
+                    monitor_index = 1 if len(monitors) > 1 else 0
+                screenshot = sct.grab(monitors[monitor_index])
+            
+            img = Image.frombytes("RGB", screenshot.size, screenshot.bgra, "raw", "BGRX")
+            thumbnail = img.resize(size, Image.Resampling.BOX).convert("L")
+            return thumbnail.tobytes()
+            
+        except Exception as e:
+            print(f"⚠️ サムネイル撮影失敗: {e}")
+            return None
+    
+    def _encode_with_pool(self, screenshot) -> Optional[bytes]:
+        """エンコーダプールでJPEG化するのだ（プール無し・失敗時はNone）"""
+        if self.encoder_pool is None or not self.encoder_pool.is_running():
+            return None
         
-        return img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+        try:
+            # screenshot.raw はBGRAのbytearrayなので追加コピー無しでスロットに書けるのだ
+            return self.encoder_pool.encode(screenshot.raw, screenshot.size, max_dim=1920, quality=70)
+        except Exception as e:
+            print(f"⚠️ エンコーダプール処理失敗（インライン処理に切替）: {e}")
+            return None
+    
+    def _resize_to_max_dimension(self, img: "Image.Image", max_dim: int) -> "Image.Image":
+        """長辺を指定サイズにリサイズするのだ"""
+        return resize_to_max_dimension(img, max_dim)
     
     def _manage_cache_size(self) -> None:
         """キャッシュサイズ管理: 上限超過時は古いファイルを削除するのだ"""
@@ -0,0 +1,147 @@
+"""起動時間プロファイラ：モジュールごとのimport時間と最初のレコードまでの時間を測るのだ
+
+run.py（keyframe コマンド）を --profile-startup 付きで起動すると、main.py のimportより先に有効になるのだ。
+"""
+import sys
+import threading
+import time
+from importlib.abc import MetaPathFinder
+from importlib.machinery import ModuleSpec
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+PROFILE_FLAG = "--profile-startup"
+
+
+class _TimedLoader:
+    """元のローダに処理を委ね、exec_module の所要時間だけを記録するのだ"""
+
+    def __init__(self, loader: Any, fullname: str, profiler: "StartupProfiler"):
+        self._loader = loader
+        self._fullname = fullname
+        self._profiler = profiler
+
+    def create_module(self, spec: ModuleSpec) -> Any:
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module: Any) -> None:
+        self._profiler._begin_import()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler._end_import(self._fullname)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._loader, name)
+
+
+class _ImportTimingFinder(MetaPathFinder):
+    """他のファインダが見つけたspecのローダを計測用に包むのだ"""
+
+    def __init__(self, profiler: "StartupProfiler"):
+        self._profiler = profiler
+
+    def find_spec(self, fullname: str, path: Optional[Sequence[str]], target: Any = None) -> Optional[ModuleSpec]:
+        for finder in sys.meta_path:
+            if finder is self:
+                continue
+            find_spec = getattr(finder, "find_spec", None)
+            if find_spec is None:
+                continue
+            spec = find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(spec.loader, fullname, self._profiler)
+        return spec
+
+
+class StartupProfiler:
+    """import時間（自身の時間）と起動のマイルストーンを記録するのだ"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.import_times: Dict[str, float] = {}  # モジュール名 → 子モジュールを除いた時間
+        self.milestones: List[Tuple[str, float]] = []
+        self._finder = _ImportTimingFinder(self)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_argv(cls, argv: Sequence[str]) -> Optional["StartupProfiler"]:
+        """--profile-startup が指定されていれば計測を始めたプロファイラを返すのだ"""
+        if PROFILE_FLAG not in argv:
+            return None
+        profiler = cls()
+        profiler.install()
+        return profiler
+
+    def install(self) -> None:
+        """以降のimportを計測するのだ"""
+        if self._finder not in sys.meta_path:
+            sys.meta_path.insert(0, self._finder)
+
+    def uninstall(self) -> None:
+        """import計測を止めるのだ"""
+        if self._finder in sys.meta_path:
+            sys.meta_path.remove(self._finder)
+
+    def _begin_import(self) -> None:
+        """import開始時に計測スタックへ積むのだ"""
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append([time.perf_counter(), 0.0])  # [開始時刻, 子モジュールの時間]
+
+    def _end_import(self, fullname: str) -> None:
+        """import終了時に自身の時間を記録し、親へ所要時間を伝えるのだ"""
+        stack = self._local.stack
+        started, children = stack.pop()
+        elapsed = time.perf_counter() - started
+        if stack:
+            stack[-1][1] += elapsed
+        with self._lock:
+            self.import_times[fullname] = self.import_times.get(fullname, 0.0) + elapsed - children
+
+    def mark(self, name: str) -> float:
+        """起動からの経過秒をマイルストーンとして記録するのだ"""
+        elapsed = time.perf_counter() - self.started
+        with self._lock:
+            self.milestones.append((name, elapsed))
+        return elapsed
+
+    def has_mark(self, name: str) -> bool:
+        """そのマイルストーンを記録済みかを返すのだ"""
+        with self._lock:
+            return any(mark == name for mark, _ in self.milestones)
+
+    def package_times(self) -> List[Tuple[str, float]]:
+        """トップレベルパッケージごとのimport時間を長い順に返すのだ"""
+        totals: Dict[str, float] = {}
+        with self._lock:
+            for name, seconds in self.import_times.items():
+                package = name.split(".")[0]
+                totals[package] = totals.get(package, 0.0) + seconds
+        return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+    def report(self, top: int = 10) -> str:
+        """計測結果を人が読める形にまとめるのだ"""
+        with self._lock:
+            module_count = len(self.import_times)
+            total_import = sum(self.import_times.values())
+            slowest = sorted(self.import_times.items(), key=lambda item: item[1], reverse=True)[:top]
+            milestones = list(self.milestones)
+
+        lines = [f"⏱️  起動プロファイル（import合計 {total_import:.3f}秒 / {module_count}モジュール）"]
+        lines.append("   パッケージ別import時間:")
+        for package, seconds in self.package_times()[:top]:
+            lines.append(f"     {package:<24}{seconds:>8.3f}秒")
+        lines.append("   重いモジュール:")
+        for name, seconds in slowest:
+            lines.append(f"     {name:<40}{seconds:>8.3f}秒")
+        lines.append("   マイルストーン:")
+        for name, elapsed in milestones:
+            lines.append(f"     {name:<24}{elapsed:>8.3f}秒")
+        return "\n".join(lines)
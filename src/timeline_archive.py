@@ -0,0 +1,343 @@
+"""画面タイムラインアーカイブ：キーフレーム＋タイル差分で1日の画面を保存するのだ"""
+import bisect
+import io
+import json
+import shutil
+import struct
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from PIL import Image, ImageChops
+
+# 差分ペイロードのヘッダ（幅, 高さ, タイル数）とタイルヘッダ（x, y, JPEG長）なのだ
+_DELTA_HEADER = struct.Struct("<HHI")
+_TILE_HEADER = struct.Struct("<HHI")
+
+
+@dataclass
+class ArchiveEntry:
+    """アーカイブ索引の1エントリなのだ"""
+    ts_utc: datetime
+    kind: str        # "key" / "delta"
+    offset: int      # frames.bin 内のオフセット
+    length: int
+    key_index: int   # このフレームが依存するキーフレームの索引位置
+
+
+class TimelineArchive:
+    """キーフレーム＋タイル差分のローカル画面タイムラインなのだ
+
+    日別ディレクトリに frames.bin（追記専用データ）と index.jsonl（シーク用索引）を持つのだ。
+    キーフレームは撮影JPEGをそのまま保存し、間のフレームは変化したタイルだけをJPEGで保存するのだ。
+    """
+
+    def __init__(
+        self,
+        archive_dir: Path,
+        max_size_gb: float = 1.0,
+        keyframe_interval: int = 30,
+        tile_size: int = 64,
+        tile_threshold: int = 24,
+        tile_quality: int = 70,
+        max_delta_ratio: float = 0.6
+    ):
+        self.archive_dir = Path(archive_dir)
+        self.max_size_bytes = int(max_size_gb * 1024 * 1024 * 1024)
+        self.keyframe_interval = keyframe_interval
+        self.tile_size = tile_size
+        self.tile_threshold = tile_threshold
+        self.tile_quality = tile_quality
+        self.max_delta_ratio = max_delta_ratio
+
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+        # 日別索引のキャッシュなのだ
+        self._indexes: Dict[str, List[ArchiveEntry]] = {}
+
+        # 差分計算用の直前フレーム（reconstruct と同じ復元結果）なのだ
+        self._last_day: Optional[str] = None
+        self._last_source: Optional[Image.Image] = None
+        self._frames_since_key = 0
+
+        self._total_bytes = self._scan_total_bytes()
+        self.stats = {
+            "frames": 0,
+            "keyframes": 0,
+            "deltas": 0,
+            "source_bytes": 0,
+            "stored_bytes": 0,
+            "days_evicted": 0,
+            "skipped_full": 0
+        }
+
+    def add_frame(self, image_path: Path, timestamp: datetime) -> bool:
+        """撮影済みJPEGをアーカイブに追加するのだ"""
+        try:
+            jpeg_bytes = Path(image_path).read_bytes()
+            image = Image.open(io.BytesIO(jpeg_bytes)).convert("RGB")
+        except Exception as e:
+            print(f"⚠️ アーカイブ追加失敗（画像読み込み）: {e}")
+            return False
+
+        with self._lock:
+            try:
+                return self._add_frame_locked(jpeg_bytes, image, timestamp)
+            except Exception as e:
+                print(f"⚠️ アーカイブ追加失敗: {e}")
+                return False
+
+    def _add_frame_locked(self, jpeg_bytes: bytes, image: Image.Image, timestamp: datetime) -> bool:
+        """ロック取得済みでフレームを追加するのだ"""
+        day = self._day_key(timestamp)
+        entries = self._load_index(day)
+
+        if entries and timestamp <= entries[-1].ts_utc:
+            print(f"⚠️ アーカイブは時刻順の追記のみ対応なのだ: {timestamp.isoformat()}")
+            return False
+
+        # 差分かキーフレームかを決めるのだ
+        payload = None
+        if (
+            day == self._last_day
+            and entries
+            and self._last_source is not None
+            and self._last_source.size == image.size
+            and self._frames_since_key < self.keyframe_interval
+        ):
+            payload = self._encode_delta(self._last_source, image)
+
+        kind = "delta" if payload is not None else "key"
+        if payload is None:
+            payload = jpeg_bytes
+
+        # 容量上限：古い日から削除し、それでも入らなければ今回は諦めるのだ
+        self._enforce_capacity(len(payload), keep_day=day)
+        if self._total_bytes + len(payload) > self.max_size_bytes:
+            self.stats["skipped_full"] += 1
+            return False
+
+        day_dir = self.archive_dir / day
+        day_dir.mkdir(parents=True, exist_ok=True)
+        frames_file = day_dir / "frames.bin"
+
+        with open(frames_file, "ab") as f:
+            offset = f.tell()
+            f.write(payload)
+
+        key_index = len(entries) if kind == "key" else entries[-1].key_index
+        entry = ArchiveEntry(
+            ts_utc=timestamp,
+            kind=kind,
+            offset=offset,
+            length=len(payload),
+            key_index=key_index
+        )
+
+        # データ書き込み後に索引を追記するので、索引は常に完全なデータを指すのだ
+        with open(day_dir / "index.jsonl", "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "ts_utc": timestamp.isoformat(),
+                "kind": kind,
+                "offset": offset,
+                "length": len(payload),
+                "key_index": key_index
+            }) + "\n")
+        entries.append(entry)
+
+        # 次の差分は元画像ではなく復元結果に対して取り、閾値未満の変化や
+        # タイルJPEGの誤差がキーフレームまで積み重ならないようにするのだ
+        self._last_day = day
+        if kind == "key":
+            self._last_source = image
+        elif self._last_source is not None:
+            self._last_source = self._apply_delta(self._last_source, payload)
+        self._frames_since_key = 0 if kind == "key" else self._frames_since_key + 1
+
+        self._total_bytes += len(payload)
+        self.stats["frames"] += 1
+        self.stats["keyframes" if kind == "key" else "deltas"] += 1
+        self.stats["source_bytes"] += len(jpeg_bytes)
+        self.stats["stored_bytes"] += len(payload)
+        return True
+
+    def _encode_delta(self, previous: Image.Image, current: Image.Image) -> Optional[bytes]:
+        """変化したタイルだけをJPEGで詰めた差分を作るのだ（大きすぎればNone）"""
+        width, height = current.size
+        mask = ImageChops.difference(previous, current).convert("L").point(
+            lambda v: 255 if v > self.tile_threshold else 0
+        )
+
+        tiles: List[Tuple[int, int]] = []
+        total_tiles = 0
+        for y in range(0, height, self.tile_size):
+            for x in range(0, width, self.tile_size):
+                total_tiles += 1
+                box = (x, y, min(x + self.tile_size, width), min(y + self.tile_size, height))
+                if mask.crop(box).getbbox() is not None:
+                    tiles.append((x, y))
+
+        # 変化が大きい時はキーフレームの方が安いのだ
+        if total_tiles and len(tiles) / total_tiles > self.max_delta_ratio:
+            return None
+
+        chunks = [_DELTA_HEADER.pack(width, height, len(tiles))]
+        for x, y in tiles:
+            box = (x, y, min(x + self.tile_size, width), min(y + self.tile_size, height))
+            buffer = io.BytesIO()
+            current.crop(box).save(buffer, "JPEG", quality=self.tile_quality)
+            tile_bytes = buffer.getvalue()
+            chunks.append(_TILE_HEADER.pack(x, y, len(tile_bytes)))
+            chunks.append(tile_bytes)
+
+        return b"".join(chunks)
+
+    def _apply_delta(self, base: Image.Image, payload: bytes) -> Image.Image:
+        """差分をベース画像に適用するのだ（ベースは書き換える）"""
+        width, height, tile_count = _DELTA_HEADER.unpack_from(payload, 0)
+        pos = _DELTA_HEADER.size
+
+        for _ in range(tile_count):
+            x, y, length = _TILE_HEADER.unpack_from(payload, pos)
+            pos += _TILE_HEADER.size
+            tile = Image.open(io.BytesIO(payload[pos:pos + length]))
+            base.paste(tile, (x, y))
+            pos += length
+
+        return base
+
+    def reconstruct(self, timestamp: datetime) -> Optional[Image.Image]:
+        """指定時刻に表示されていた画面（その時刻以前の最新フレーム）を復元するのだ"""
+        with self._lock:
+            day = self._day_key(timestamp)
+            entries = self._load_index(day)
+            if not entries:
+                return None
+
+            # 索引を二分探索して時刻以前の最新フレームを探すのだ
+            position = bisect.bisect_right([e.ts_utc for e in entries], timestamp) - 1
+            if position < 0:
+                return None
+
+            frames_file = self.archive_dir / day / "frames.bin"
+            entry = entries[position]
+            with open(frames_file, "rb") as f:
+                image = None
+                for current in entries[entry.key_index:position + 1]:
+                    f.seek(current.offset)
+                    payload = f.read(current.length)
+                    if current.kind == "key":
+                        image = Image.open(io.BytesIO(payload)).convert("RGB")
+                    elif image is not None:
+                        image = self._apply_delta(image, payload)
+
+            return image
+
+    def get_jpeg(self, timestamp: datetime, quality: int = 70) -> Optional[bytes]:
+        """指定時刻の画面をJPEGバイト列で返すのだ（OCRの再実行用）"""
+        image = self.reconstruct(timestamp)
+        if image is None:
+            return None
+
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=quality, optimize=True)
+        return buffer.getvalue()
+
+    def iter_frames(self, date: datetime) -> Iterator[Tuple[datetime, Image.Image]]:
+        """指定日の全フレームを時刻順に復元して返すのだ（一括OCR再実行用）"""
+        day = self._day_key(date)
+        with self._lock:
+            entries = list(self._load_index(day))
+        if not entries:
+            return
+
+        frames_file = self.archive_dir / day / "frames.bin"
+        image = None
+        with open(frames_file, "rb") as f:
+            for entry in entries:
+                f.seek(entry.offset)
+                payload = f.read(entry.length)
+                if entry.kind == "key":
+                    image = Image.open(io.BytesIO(payload)).convert("RGB")
+                elif image is not None:
+                    image = self._apply_delta(image, payload)
+                else:
+                    continue
+                yield entry.ts_utc, image.copy()
+
+    def list_timestamps(self, date: datetime) -> List[datetime]:
+        """指定日のフレーム時刻一覧を返すのだ"""
+        with self._lock:
+            return [e.ts_utc for e in self._load_index(self._day_key(date))]
+
+    def _enforce_capacity(self, incoming_bytes: int, keep_day: str) -> None:
+        """容量上限を超えそうなら古い日のアーカイブから削除するのだ"""
+        if self._total_bytes + incoming_bytes <= self.max_size_bytes:
+            return
+
+        for day_dir in sorted(p for p in self.archive_dir.iterdir() if p.is_dir()):
+            if self._total_bytes + incoming_bytes <= self.max_size_bytes:
+                break
+            if day_dir.name >= keep_day:
+                break
+
+            self._total_bytes -= self._dir_size(day_dir)
+            shutil.rmtree(day_dir, ignore_errors=True)
+            self._indexes.pop(day_dir.name, None)
+            self.stats["days_evicted"] += 1
+            print(f"🗑️ 古いアーカイブ削除（容量上限）: {day_dir.name}")
+
+    def _load_index(self, day: str) -> List[ArchiveEntry]:
+        """日別索引を読み込むのだ（キャッシュあり）"""
+        if day in self._indexes:
+            return self._indexes[day]
+
+        entries: List[ArchiveEntry] = []
+        index_file = self.archive_dir / day / "index.jsonl"
+        if index_file.exists():
+            with open(index_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        data = json.loads(line)
+                        entries.append(ArchiveEntry(
+                            ts_utc=datetime.fromisoformat(data["ts_utc"]),
+                            kind=data["kind"],
+                            offset=data["offset"],
+                            length=data["length"],
+                            key_index=data["key_index"]
+                        ))
+                    except (json.JSONDecodeError, KeyError, ValueError):
+                        # 書き込み途中でクラッシュした末尾行は無視するのだ
+                        continue
+
+        self._indexes[day] = entries
+        return entries
+
+    def _scan_total_bytes(self) -> int:
+        """アーカイブ全体のサイズを数えるのだ"""
+        return sum(self._dir_size(p) for p in self.archive_dir.iterdir() if p.is_dir())
+
+    def _dir_size(self, day_dir: Path) -> int:
+        """日別ディレクトリのサイズを返すのだ"""
+        return sum(f.stat().st_size for f in day_dir.iterdir() if f.is_file())
+
+    def _day_key(self, timestamp: datetime) -> str:
+        """UTC日付のディレクトリ名を返すのだ"""
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc)
+        return timestamp.strftime("%Y-%m-%d")
+
+    def get_stats(self) -> dict:
+        """アーカイブ統計を返すのだ"""
+        source_bytes = self.stats["source_bytes"]
+        return {
+            **self.stats,
+            "total_size_mb": self._total_bytes / (1024 * 1024),
+            "storage_ratio": (
+                self.stats["stored_bytes"] / source_bytes if source_bytes else 0.0
+            ),
+            "archive_dir": str(self.archive_dir)
+        }
@@ -0,0 +1,158 @@
+"""BacklogDrainer のテストなのだ"""
+import threading
+from pathlib import Path
+
+from src.backlog_drain import AimdConcurrency, BacklogDrainer
+from src.ocr_client import OcrResult
+from src.retry_cache import RetryTask
+
+
+def make_tasks(count: int) -> list:
+    """テスト用のリトライタスクを作るのだ"""
+    return [
+        RetryTask(
+            task_id=f"retry_{i}",
+            image_path=Path(f"/tmp/shot{i}.jpg"),
+            created_at=0.0,
+            original_timestamp=f"2025-08-27T09:{i:02d}:00+00:00",
+            attempt_count=1,
+            last_attempt_at=0.0,
+            next_retry_at=0.0,
+            error_message="offline"
+        )
+        for i in range(count)
+    ]
+
+
+class FakeBacklog:
+    """claim / complete を提供する滞留の代役なのだ"""
+    
+    def __init__(self, tasks):
+        self.tasks = list(tasks)
+        self.claims = []
+        self.completed = []
+        self._lock = threading.Lock()
+    
+    def claim(self, limit):
+        with self._lock:
+            self.claims.append(limit)
+            taken, self.tasks = self.tasks[:limit], self.tasks[limit:]
+            return taken
+    
+    def complete(self, outcomes):
+        with self._lock:
+            for task, result in outcomes:
+                if result.is_success():
+                    self.completed.append(task.task_id)
+                else:
+                    self.tasks.append(task)
+    
+    def size(self):
+        with self._lock:
+            return len(self.tasks)
+
+
+class TestAimdConcurrency:
+    """AimdConcurrency テストクラスなのだ"""
+    
+    def test_additive_increase_until_max(self):
+        """429無しのウェーブごとに1ずつ増えて上限で止まるテストなのだ"""
+        concurrency = AimdConcurrency(max_limit=3)
+        assert [concurrency.on_wave(False) for _ in range(4)] == [2, 3, 3, 3]
+        assert concurrency.peak == 3
+    
+    def test_multiplicative_decrease(self):
+        """429で半分になり1を下回らないテストなのだ"""
+        concurrency = AimdConcurrency(initial=8, max_limit=8)
+        assert concurrency.on_wave(True) == 4
+        assert concurrency.on_wave(True) == 2
+        assert concurrency.on_wave(True) == 1
+        assert concurrency.on_wave(True) == 1
+        assert concurrency.peak == 8
+
+
+class TestBacklogDrainer:
+    """BacklogDrainer テストクラスなのだ"""
+    
+    def test_drains_until_empty_with_ramp_up(self):
+        """成功が続けば同時実行数を増やしながら空になるまで流すテストなのだ"""
+        backlog = FakeBacklog(make_tasks(10))
+        drainer = BacklogDrainer(
+            claim=backlog.claim,
+            ocr=lambda task: OcrResult(success=True, text="ok"),
+            complete=backlog.complete,
+            backlog_size=backlog.size,
+            max_concurrency=4
+        )
+        
+        report = drainer.run()
+        
+        assert report.stop_reason == "empty"
+        assert report.succeeded == 10
+        assert len(backlog.completed) == 10
+        assert backlog.claims[:4] == [1, 2, 3, 4]
+        assert report.peak_concurrency == 4
+        assert report.remaining == 0
+        assert drainer.get_stats()["last"]["time_to_empty_sec"] is not None
+    
+    def test_rate_limit_halves_concurrency(self):
+        """429を受けたウェーブの後は同時実行数が半分になるテストなのだ"""
+        backlog = FakeBacklog(make_tasks(12))
+        calls = {"count": 0}
+        lock = threading.Lock()
+        
+        def ocr(task):
+            with lock:
+                calls["count"] += 1
+                limited = calls["count"] == 7  # 4ウェーブ目（同時4件）の1件だけ429にするのだ
+            if limited:
+                return OcrResult(success=False, error="Rate Limit: 429")
+            return OcrResult(success=True, text="ok")
+        
+        drainer = BacklogDrainer(
+            claim=backlog.claim, ocr=ocr, complete=backlog.complete,
+            backlog_size=backlog.size, max_concurrency=8
+        )
+        report = drainer.run()
+        
+        assert report.stop_reason == "empty"
+        assert report.rate_limited == 1
+        assert backlog.claims[:5] == [1, 2, 3, 4, 2]
+        assert len(backlog.completed) == 12
+    
+    def test_stops_when_endpoint_down_again(self):
+        """429以外で全滅したら消化をやめて滞留を残すテストなのだ"""
+        backlog = FakeBacklog(make_tasks(5))
+        drainer = BacklogDrainer(
+            claim=backlog.claim,
+            ocr=lambda task: OcrResult(success=False, error="Connection error"),
+            complete=backlog.complete,
+            backlog_size=backlog.size
+        )
+        
+        report = drainer.run()
+        
+        assert report.stop_reason == "endpoint_down"
+        assert report.waves == 1
+        assert report.remaining == 5
+    
+    def test_start_runs_in_background(self):
+        """start() が別スレッドで消化し、二重起動しないテストなのだ"""
+        backlog = FakeBacklog(make_tasks(3))
+        gate = threading.Event()
+        
+        def ocr(task):
+            gate.wait(timeout=5.0)
+            return OcrResult(success=True, text="ok")
+        
+        drainer = BacklogDrainer(
+            claim=backlog.claim, ocr=ocr, complete=backlog.complete, backlog_size=backlog.size
+        )
+        assert drainer.start() is True
+        assert drainer.start() is False
+        assert drainer.get_stats()["running"] is True
+        
+        gate.set()
+        drainer.stop(timeout=5.0)
+        assert drainer.is_running() is False
+        assert drainer.runs == 1
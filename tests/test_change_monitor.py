@@ -0,0 +1,150 @@
+"""ChangeMonitor のテストなのだ"""
+from src.change_monitor import ChangeMonitor, thumbnail_diff
+
+
+class FakeSources:
+    """サムネイルとウィンドウ情報の差し替え用なのだ"""
+    
+    def __init__(self):
+        self.thumbnail = bytes([0] * 16)
+        self.window = {"active_app": "Code", "active_title": "main.py"}
+    
+    def get_thumbnail(self):
+        return self.thumbnail
+    
+    def get_window(self):
+        return dict(self.window)
+
+
+def create_monitor(sources: FakeSources, events: list, **kwargs) -> ChangeMonitor:
+    """テスト用モニタを作成するのだ"""
+    params = {
+        "check_interval_sec": 0.05,
+        "change_threshold": 0.1,
+        "min_event_interval_sec": 0.0,
+        "max_ocr_per_hour": 20
+    }
+    params.update(kwargs)
+    return ChangeMonitor(
+        on_event=events.append,
+        thumbnail_source=sources.get_thumbnail,
+        window_info_source=sources.get_window,
+        **params
+    )
+
+
+class TestThumbnailDiff:
+    """thumbnail_diff テストクラスなのだ"""
+    
+    def test_identical_and_opposite(self):
+        """同一なら0、白黒反転なら1になるのだ"""
+        black = bytes([0] * 8)
+        white = bytes([255] * 8)
+        
+        assert thumbnail_diff(black, black) == 0.0
+        assert thumbnail_diff(black, white) == 1.0
+    
+    def test_size_mismatch_counts_as_full_change(self):
+        """サイズ違いは全変化扱いなのだ"""
+        assert thumbnail_diff(bytes(4), bytes(8)) == 1.0
+
+
+class TestChangeMonitor:
+    """ChangeMonitor テストクラスなのだ"""
+    
+    def test_first_check_is_baseline_only(self):
+        """初回チェックはベースライン取得だけでイベントを出さないのだ"""
+        sources = FakeSources()
+        events = []
+        monitor = create_monitor(sources, events)
+        
+        assert monitor.check_once() is None
+        assert events == []
+    
+    def test_screen_change_fires_event(self):
+        """大きなサムネイル変化でイベントが出るのだ"""
+        sources = FakeSources()
+        events = []
+        monitor = create_monitor(sources, events)
+        monitor.check_once()
+        
+        # 小さな変化は無視されるのだ
+        sources.thumbnail = bytes([10] * 16)
+        assert monitor.check_once() is None
+        
+        sources.thumbnail = bytes([200] * 16)
+        event = monitor.check_once()
+        
+        assert event is not None
+        assert event.reason == "screen_change"
+        assert event.change_score > 0.5
+        assert event.ocr_allowed is True
+        assert events == [event]
+    
+    def test_app_switch_fires_event(self):
+        """アプリ切替・タイトル変更でイベントが出るのだ"""
+        sources = FakeSources()
+        events = []
+        monitor = create_monitor(sources, events)
+        monitor.check_once()
+        
+        sources.window = {"active_app": "Chrome", "active_title": "YouTube"}
+        event = monitor.check_once()
+        assert event.reason == "app_switch"
+        assert event.active_app == "Chrome"
+        
+        sources.window = {"active_app": "Chrome", "active_title": "TikTok"}
+        assert monitor.check_once().reason == "title_change"
+    
+    def test_rate_limit(self):
+        """最短間隔内の連続変化は捨てられるのだ"""
+        sources = FakeSources()
+        events = []
+        monitor = create_monitor(sources, events, min_event_interval_sec=60.0)
+        monitor.check_once()
+        
+        sources.window = {"active_app": "Chrome", "active_title": ""}
+        assert monitor.check_once() is not None
+        
+        sources.window = {"active_app": "Slack", "active_title": ""}
+        assert monitor.check_once() is None
+        assert monitor.get_stats()["rate_limited"] == 1
+        
+        # 最短間隔を過ぎれば再び発火するのだ
+        monitor._last_event_at -= 61
+        sources.window = {"active_app": "Code", "active_title": ""}
+        assert monitor.check_once() is not None
+    
+    def test_hourly_ocr_budget(self):
+        """1時間のOCR予算を超えたイベントはメタデータのみになるのだ"""
+        sources = FakeSources()
+        events = []
+        monitor = create_monitor(sources, events, max_ocr_per_hour=2)
+        monitor.check_once()
+        
+        for i in range(3):
+            sources.window = {"active_app": f"App{i}", "active_title": ""}
+            monitor.check_once()
+        
+        assert [e.ocr_allowed for e in events] == [True, True, False]
+        stats = monitor.get_stats()
+        assert stats["over_budget"] == 1
+        assert stats["ocr_events_last_hour"] == 2
+    
+    def test_background_thread(self):
+        """バックグラウンドスレッドでチェックが回るのだ"""
+        import time
+        sources = FakeSources()
+        events = []
+        monitor = create_monitor(sources, events)
+        
+        monitor.start()
+        try:
+            time.sleep(0.15)
+            sources.window = {"active_app": "Chrome", "active_title": ""}
+            time.sleep(0.2)
+        finally:
+            monitor.stop()
+        
+        assert monitor.is_running() is False
+        assert any(e.reason == "app_switch" for e in events)
@@ -0,0 +1,80 @@
+"""CircuitBreaker のテストなのだ"""
+import time
+
+from src.circuit_breaker import CircuitBreaker
+
+
+class TestCircuitBreaker:
+    """CircuitBreaker テストクラスなのだ"""
+
+    def test_opens_on_error_rate(self):
+        """直近のエラー率が閾値を超えたら開くのだ"""
+        breaker = CircuitBreaker(failure_rate_threshold=0.5, min_requests=4)
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_success()
+        assert breaker.state == "closed"
+
+        breaker.record_failure()
+
+        assert breaker.state == "open"
+        assert breaker.allow_request() is False
+        assert breaker.get_stats()["rejected"] == 1
+
+    def test_opens_on_consecutive_timeouts(self):
+        """件数が少なくても連続タイムアウトで開くのだ"""
+        breaker = CircuitBreaker(min_requests=100, max_consecutive_timeouts=2)
+        breaker.record_failure(timeout=True)
+        assert breaker.state == "closed"
+
+        breaker.record_failure(timeout=True)
+
+        assert breaker.state == "open"
+
+    def test_half_open_allows_single_probe(self):
+        """開いてから一定時間後は1件だけ試験送信を通すのだ"""
+        breaker = CircuitBreaker(min_requests=1, open_duration_sec=0.05)
+        breaker.record_failure()
+        assert breaker.is_available() is False
+
+        time.sleep(0.06)
+        assert breaker.is_available() is True
+        assert breaker.allow_request() is True
+        assert breaker.state == "half_open"
+        assert breaker.allow_request() is False  # 試験送信中は他を通さないのだ
+
+        breaker.record_success()
+        assert breaker.state == "closed"
+        assert breaker.allow_request() is True
+
+    def test_seconds_until_probe(self):
+        """開いている間だけ試験送信までの残り秒数を返すのだ"""
+        breaker = CircuitBreaker(min_requests=1, open_duration_sec=30.0)
+        assert breaker.seconds_until_probe() == 0.0
+
+        breaker.record_failure()
+
+        assert 29.0 < breaker.seconds_until_probe() <= 30.0
+        assert breaker.get_stats()["open_for_sec"] > 29.0
+
+    def test_failed_probe_reopens(self):
+        """試験送信が失敗したら再び開くのだ"""
+        breaker = CircuitBreaker(min_requests=1, open_duration_sec=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        breaker.allow_request()
+
+        breaker.record_failure()
+
+        assert breaker.state == "open"
+        assert breaker.get_stats()["opened"] == 2
+
+    def test_release_returns_probe(self):
+        """送らなかった試験送信枠は戻せるのだ"""
+        breaker = CircuitBreaker(min_requests=1, open_duration_sec=0.0)
+        breaker.record_failure()
+        assert breaker.allow_request() is True
+
+        breaker.release()
+
+        assert breaker.allow_request() is True
@@ -98,6 +98,23 @@ data_dir = /tmp/ini-dir
             with pytest.raises(ValueError, match="必須設定.*が設定されていない"):
                 loader.load()
     
+    def test_mock_server_skips_required_fields(self, monkeypatch):
+        """モックサーバ有効時はAzureの接続情報が無くても読み込めるテストなのだ"""
+        for env_key in ["AZURE_OPENAI_ENDPOINT", "AZURE_OPENAI_KEY"]:
+            monkeypatch.delenv(env_key, raising=False)
+        monkeypatch.setenv("OCR_MOCK_ENABLED", "true")
+        monkeypatch.setenv("OCR_MOCK_LATENCY", "fixed:0.1")
+        monkeypatch.setenv("OCR_MOCK_RATE_LIMIT_RATE", "0.05")
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            loader = ConfigLoader(Path(tmp_dir) / "empty.ini")
+            config = loader.load()
+        
+        assert config.ocr_mock_enabled is True
+        assert config.ocr_mock_latency == "fixed:0.1"
+        assert config.ocr_mock_rate_limit_rate == 0.05
+        assert config.ocr_mock_server_error_rate == 0.0
+    
     def test_default_values_used(self, monkeypatch):
         """デフォルト値が使用されることを確認するテストなのだ"""
         # 最低限の必須フィールドのみ設定なのだ
@@ -0,0 +1,134 @@
+"""EncoderPool のテストなのだ"""
+import io
+import queue
+import threading
+
+import pytest
+from PIL import Image
+
+from src.encoder_pool import EncoderPool, encode_bgra_frame
+
+
+def make_bgra_frame(width: int, height: int) -> bytearray:
+    """テスト用のBGRA生フレームを作るのだ（青一色）"""
+    return bytearray(b"\xff\x00\x00\x00" * width * height)
+
+
+class TestEncodeBgraFrame:
+    """encode_bgra_frame テストクラスなのだ"""
+
+    def test_encode_and_resize(self):
+        """長辺リサイズしてJPEG化されることをテストするのだ"""
+        raw = make_bgra_frame(400, 200)
+
+        jpeg_bytes = encode_bgra_frame(raw, (400, 200), max_dim=100, quality=70)
+
+        img = Image.open(io.BytesIO(jpeg_bytes))
+        assert img.format == "JPEG"
+        assert img.size == (100, 50)
+
+        # BGRAの青がRGBの青として解釈されていることを確認
+        r, g, b = img.getpixel((50, 25))
+        assert b > 200 and r < 50 and g < 50
+
+
+class TestEncoderPool:
+    """EncoderPool テストクラスなのだ"""
+
+    @pytest.fixture
+    def pool(self):
+        """1プロセスのプールを用意するのだ"""
+        pool = EncoderPool(processes=1, slots=2)
+        pool.start()
+        try:
+            yield pool
+        finally:
+            pool.close()
+
+    def test_submit_before_start_raises(self):
+        """未開始のプールはエラーになるのだ"""
+        pool = EncoderPool(processes=1)
+
+        with pytest.raises(RuntimeError):
+            pool.submit(make_bgra_frame(4, 4), (4, 4))
+
+    def test_encode_via_shared_memory(self, pool):
+        """共有メモリ経由のエンコード結果がインライン処理と同じ画像になるのだ"""
+        raw = make_bgra_frame(320, 240)
+
+        jpeg_bytes = pool.encode(raw, (320, 240), max_dim=160, quality=70)
+
+        img = Image.open(io.BytesIO(jpeg_bytes))
+        assert img.size == (160, 120)
+        assert jpeg_bytes == encode_bgra_frame(raw, (320, 240), max_dim=160, quality=70)
+
+    def test_slots_are_reused(self, pool):
+        """スロットはリングとして再利用されるのだ"""
+        raw = make_bgra_frame(64, 64)
+
+        for _ in range(5):
+            pool.encode(raw, (64, 64))
+
+        stats = pool.get_stats()
+        assert stats["slots"] == 2
+        assert stats["free_slots"] == 2
+        assert stats["slot_bytes"] == len(raw)
+
+    def test_slots_grow_for_larger_frame(self, pool):
+        """大きいフレームが来たらスロットを確保し直すのだ"""
+        pool.encode(make_bgra_frame(32, 32), (32, 32))
+
+        large = make_bgra_frame(128, 64)
+        jpeg_bytes = pool.encode(large, (128, 64))
+
+        assert Image.open(io.BytesIO(jpeg_bytes)).size == (128, 64)
+        assert pool.get_stats()["slot_bytes"] == len(large)
+        assert pool.get_stats()["free_slots"] == 2
+
+    def test_concurrent_submit_during_resize(self, pool):
+        """リングの入れ替えと並行して投入しても、全フレームが正しくエンコードされるのだ"""
+        sizes = [(32, 32), (96, 64), (48, 48), (128, 96)] * 3
+        results = [None] * len(sizes)
+        errors = []
+
+        def encode(i, size):
+            try:
+                jpeg_bytes = pool.encode(make_bgra_frame(*size), size, timeout=60.0)
+                results[i] = Image.open(io.BytesIO(jpeg_bytes)).size
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=encode, args=(i, size)) for i, size in enumerate(sizes)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=120.0)
+
+        assert errors == []
+        assert results == sizes
+        assert pool.get_stats()["free_slots"] == 2
+
+    def test_resize_timeout_returns_taken_slots(self, pool):
+        """入れ替え待ちがタイムアウトしても、取ったスロットはリングに戻るのだ"""
+        pool.encode(make_bgra_frame(32, 32), (32, 32))
+        busy = pool._free_slots.get()  # エンコード中のスロットの代わりなのだ
+
+        with pytest.raises(queue.Empty):
+            pool.submit(make_bgra_frame(128, 64), (128, 64), timeout=0.1)
+        assert pool.get_stats()["free_slots"] == 1
+
+        pool._free_slots.put(busy)
+        large = make_bgra_frame(128, 64)
+        assert Image.open(io.BytesIO(pool.encode(large, (128, 64)))).size == (128, 64)
+        assert pool.get_stats()["free_slots"] == 2
+
+    def test_close_releases_slots(self):
+        """closeで共有メモリが解放されるのだ"""
+        pool = EncoderPool(processes=1, slots=2, slot_bytes=1024)
+        pool.start()
+        assert pool.get_stats()["slots"] == 2
+
+        pool.close()
+
+        assert pool.is_running() is False
+        assert pool.get_stats()["slots"] == 0
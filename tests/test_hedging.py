@@ -0,0 +1,262 @@
+"""ヘッジリクエストのテストなのだ"""
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from src.config import Config
+from src.hedging import HedgePolicy, LatencyTracker, call_with_hedge, create_hedge_policy
+from src.mock_server import MockVisionServer
+from src.ocr_client import OcrClient
+
+
+def warmed_policy(latency_sec: float = 0.01, samples: int = 20, **kwargs) -> HedgePolicy:
+    """分布が溜まった状態のポリシーを作るのだ"""
+    policy = HedgePolicy(min_samples=samples, min_delay_sec=0.0, **kwargs)
+    for _ in range(samples):
+        policy.record(latency_sec)
+    return policy
+
+
+class TestLatencyTracker:
+    """LatencyTracker テストクラスなのだ"""
+
+    def test_percentile(self):
+        """記録した応答時間の百分位を返すのだ"""
+        tracker = LatencyTracker()
+        assert tracker.percentile(95) is None
+
+        for i in range(1, 101):
+            tracker.record(i / 100.0)
+
+        assert tracker.percentile(50) == pytest.approx(0.50)
+        assert tracker.percentile(95) == pytest.approx(0.95)
+        assert tracker.percentile(99) == pytest.approx(0.99)
+
+
+class TestHedgePolicy:
+    """HedgePolicy テストクラスなのだ"""
+
+    def test_no_delay_until_warmed_up(self):
+        """分布が溜まるまではヘッジしないのだ"""
+        policy = HedgePolicy(min_samples=5)
+        for _ in range(4):
+            policy.record(0.1)
+        assert policy.hedge_delay() is None
+
+        policy.record(0.1)
+        assert policy.hedge_delay() == pytest.approx(0.5)  # min_delay_sec が下限なのだ
+
+    def test_hedge_rate_is_capped(self):
+        """ヘッジ率が上限を超える複製は拒否するのだ"""
+        policy = warmed_policy(samples=20, max_hedge_ratio=0.1)
+
+        assert policy.try_hedge() is True
+        assert policy.try_hedge() is True
+        assert policy.try_hedge() is False
+
+        stats = policy.get_stats()
+        assert stats["hedged"] == 2
+        assert stats["hedge_denied"] == 1
+        assert stats["hedge_rate"] == pytest.approx(0.1)
+
+    def test_create_hedge_policy_disabled_by_default(self):
+        """既定では無効なのだ"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config = Config(
+                azure_openai_endpoint="https://example.openai.azure.com/",
+                azure_openai_key="test-key",
+                azure_openai_model="gpt-4.1-mini",
+                data_dir=Path(temp_dir)
+            )
+            assert create_hedge_policy(config) is None
+
+            config.ocr_hedge_enabled = True
+            config.ocr_hedge_percentile = 90.0
+            policy = create_hedge_policy(config)
+            assert policy is not None
+            assert policy.percentile == 90.0
+
+
+class TestCallWithHedge:
+    """call_with_hedge テストクラスなのだ"""
+
+    def test_hedge_wins_when_primary_is_slow(self):
+        """1本目が遅ければ複製の結果を先に返すのだ"""
+        policy = warmed_policy(max_hedge_ratio=1.0)
+        calls = []
+        lock = threading.Lock()
+
+        def call():
+            with lock:
+                calls.append(len(calls))
+                index = calls[-1]
+            if index == 0:
+                time.sleep(0.5)
+                return "primary"
+            return "hedge"
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            started = time.monotonic()
+            result = call_with_hedge(policy, executor, call)
+            elapsed = time.monotonic() - started
+
+        assert result == "hedge"
+        assert elapsed < 0.4
+        assert policy.get_stats()["hedge_wins"] == 1
+
+    def test_fast_primary_is_not_hedged(self):
+        """p95より速く返れば複製は送らないのだ"""
+        policy = warmed_policy(latency_sec=1.0, max_hedge_ratio=1.0)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            assert call_with_hedge(policy, executor, lambda: "ok") == "ok"
+
+        assert policy.get_stats()["hedged"] == 0
+
+    def test_extra_denied_by_allow_extra(self):
+        """allow_extra が拒否したら複製を送らず1本目を待つのだ"""
+        policy = warmed_policy(max_hedge_ratio=1.0)
+
+        def call():
+            time.sleep(0.05)
+            return "primary"
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            result = call_with_hedge(policy, executor, call, allow_extra=lambda: False)
+
+        assert result == "primary"
+        assert policy.get_stats()["hedged"] == 0
+        assert policy.get_stats()["hedge_denied"] == 1
+
+    def test_ratio_cap_checked_before_rate_limiter(self):
+        """ヘッジ率の上限で断るときはRPM/TPM枠を取りに行かないのだ"""
+        policy = warmed_policy(max_hedge_ratio=0.0)
+        acquired = []
+
+        def call():
+            time.sleep(0.05)
+            return "primary"
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            result = call_with_hedge(
+                policy, executor, call, allow_extra=lambda: acquired.append(1) or True
+            )
+
+        assert result == "primary"
+        assert acquired == []
+        assert policy.get_stats()["hedge_denied"] == 1
+
+    def test_discarded_result_is_reported(self):
+        """負けた方が後で成功したら on_discarded に結果を渡すのだ"""
+        policy = warmed_policy(max_hedge_ratio=1.0)
+        calls = []
+        lock = threading.Lock()
+        discarded = []
+        reported = threading.Event()
+
+        def call():
+            with lock:
+                calls.append(len(calls))
+                index = calls[-1]
+            if index == 0:
+                time.sleep(0.3)
+                return "primary"
+            return "hedge"
+
+        def on_discarded(result):
+            discarded.append(result)
+            reported.set()
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            result = call_with_hedge(policy, executor, call, on_discarded=on_discarded)
+            assert reported.wait(timeout=2.0) is True
+
+        assert result == "hedge"
+        assert discarded == ["primary"]
+
+    def test_raises_when_all_calls_fail(self):
+        """両方失敗したら例外を投げるのだ"""
+        policy = warmed_policy(max_hedge_ratio=1.0)
+
+        def call():
+            time.sleep(0.05)
+            raise RuntimeError("boom")
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            with pytest.raises(RuntimeError):
+                call_with_hedge(policy, executor, call)
+
+
+class TestOcrClientHedging:
+    """OcrClient のヘッジ統合テストクラスなのだ"""
+
+    def test_hedged_request_against_mock_server(self):
+        """遅い応答にはモックサーバへ複製が送られ、結果は1件分だけ返るのだ"""
+        latencies = iter([0.01, 0.8] + [0.01] * 100)
+        sampler_lock = threading.Lock()
+
+        def sampler():
+            with sampler_lock:
+                return next(latencies)
+
+        with MockVisionServer(latency_sampler=sampler) as server, \
+                tempfile.TemporaryDirectory() as temp_dir:
+            config = Config(
+                azure_openai_endpoint=server.endpoint,
+                azure_openai_key="mock-key",
+                azure_openai_model="gpt-4.1-mini",
+                data_dir=Path(temp_dir),
+                ocr_hedge_enabled=True,
+                ocr_hedge_max_ratio=1.0
+            )
+            policy = HedgePolicy(min_samples=21, max_hedge_ratio=1.0, min_delay_sec=0.0)
+            client = OcrClient(config, hedge_policy=policy)
+            # 接続を温めてから分布を溜めるのだ（初回の接続確立で到着順が入れ替わらないように）
+            client.extract_text_from_bytes(b"warm up")
+            for _ in range(20):
+                policy.record(0.05)
+
+            usage = []
+            recorded = threading.Event()
+            original_record_usage = client.rate_limiter.record_usage
+
+            def record_usage(tokens_used, estimated_tokens=None):
+                usage.append(tokens_used)
+                original_record_usage(tokens_used, estimated_tokens)
+                if len(usage) >= 2:
+                    recorded.set()
+            client.rate_limiter.record_usage = record_usage
+
+            started = time.monotonic()
+            result = client.extract_text_from_bytes(b"fake image data")
+            elapsed = time.monotonic() - started
+
+            assert result.is_success() is True
+            assert elapsed < 0.6
+            assert policy.get_stats()["hedge_wins"] == 1
+            assert server.get_stats()["requests"] >= 1
+            # 遅れて返った1本目のトークンもリミッタに計上されるのだ
+            assert recorded.wait(timeout=3.0) is True
+            assert all(tokens > 0 for tokens in usage)
+
+    def test_hedge_pool_fits_every_caller(self):
+        """OCRを呼ぶスレッドごとに本体と複製の2本が同時に走れるプールになるのだ"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config = Config(
+                azure_openai_endpoint="https://test.openai.azure.com",
+                azure_openai_key="test-key",
+                azure_openai_model="gpt-4.1",
+                data_dir=Path(temp_dir),
+                ocr_hedge_enabled=True,
+                ocr_worker_threads=2,
+                ocr_drain_max_concurrency=8
+            )
+            client = OcrClient(config)
+
+            assert client._hedge_executor is not None
+            assert client._hedge_executor._max_workers == 2 * (2 + 8 + 1)
+            client._hedge_executor.shutdown()
@@ -5,7 +5,7 @@ from datetime import datetime, timezone
 from pathlib import Path
 import pytest
 
-from src.jsonl_writer import JsonlWriter
+from src.jsonl_writer import JsonlWriter, OcrRecordUpdate
 from src.keylogger import TypingStats
 
 
@@ -190,3 +190,80 @@ class TestJsonlWriter:
             # タイムスタンプが設定されていることを確認（正確な時刻は不要）
             assert "ts_utc" in record
             assert record["ts_utc"].endswith("+00:00")  # UTCであることを確認
+    
+    def test_write_screen_event(self):
+        """画面イベントレコードの書き込みとOCR更新テストなのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            writer = JsonlWriter(Path(tmp_dir))
+            
+            interval_ts = datetime(2025, 8, 27, 10, 30, 0, tzinfo=timezone.utc)
+            event_ts = datetime(2025, 8, 27, 10, 30, 12, 345000, tzinfo=timezone.utc)
+            writer.write_record(TypingStats(), ts_utc=interval_ts)
+            writer.write_screen_event(
+                event_ts,
+                "app_switch",
+                change_score=0.42,
+                interval_start_utc=interval_ts,
+                screenshot_path="/tmp/event.jpg",
+                active_app="Chrome",
+                active_title="YouTube"
+            )
+            
+            assert writer.update_record_ocr(event_ts, "動画を見ている") is True
+            
+            file_path = Path(tmp_dir) / "2025-08-27.jsonl"
+            lines = file_path.read_text(encoding="utf-8").splitlines()
+            assert len(lines) == 2
+            
+            interval_record = json.loads(lines[0])
+            event_record = json.loads(lines[1])
+            assert "type" not in interval_record
+            assert event_record["type"] == "screen_event"
+            assert event_record["reason"] == "app_switch"
+            assert event_record["change_score"] == 0.42
+            assert event_record["interval"]["start_utc"] == interval_ts.isoformat()
+            assert event_record["screen"]["active_app"] == "Chrome"
+            assert event_record["screen"]["ocr_text"] == "動画を見ている"
+            assert event_record["screen"]["screenshot_path"] is None
+    
+    def test_update_record_ocr_fields(self):
+        """構造化OCRフィールドがscreenに書き込まれるテストなのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            writer = JsonlWriter(Path(tmp_dir))
+            ts = datetime(2025, 8, 27, 11, 0, 0, tzinfo=timezone.utc)
+            writer.write_record(TypingStats(), ts_utc=ts, screenshot_path="/tmp/shot.jpg")
+            
+            fields = {"app": "Slack", "category": "communication", "terms": [], "summary": "返信中"}
+            assert writer.update_record_ocr(ts, "返信中", ocr_fields=fields) is True
+            
+            record = json.loads((Path(tmp_dir) / "2025-08-27.jsonl").read_text(encoding="utf-8"))
+            assert record["screen"]["ocr_text"] == "返信中"
+            assert record["screen"]["ocr_fields"] == fields
+            assert record["screen"]["screenshot_path"] is None
+    
+    def test_update_records_ocr_batch(self):
+        """複数レコードを日別ファイルごとにまとめて更新するテストなのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            writer = JsonlWriter(Path(tmp_dir))
+            first = datetime(2025, 8, 27, 11, 0, 0, tzinfo=timezone.utc)
+            second = datetime(2025, 8, 27, 11, 1, 0, tzinfo=timezone.utc)
+            other_day = datetime(2025, 8, 28, 9, 0, 0, tzinfo=timezone.utc)
+            for ts in (first, second, other_day):
+                writer.write_record(TypingStats(), ts_utc=ts, screenshot_path="/tmp/shot.jpg")
+            
+            updated = writer.update_records_ocr([
+                OcrRecordUpdate(first, "1件目", ocr_usage={"tokens_used": 10}),
+                OcrRecordUpdate(second, "2件目"),
+                OcrRecordUpdate(other_day, "翌日"),
+                OcrRecordUpdate(datetime(2025, 8, 29, 9, 0, 0, tzinfo=timezone.utc), "無い日")
+            ])
+            assert updated == 3
+            
+            lines = (Path(tmp_dir) / "2025-08-27.jsonl").read_text(encoding="utf-8").splitlines()
+            records = [json.loads(line) for line in lines]
+            assert [r["screen"]["ocr_text"] for r in records] == ["1件目", "2件目"]
+            assert records[0]["ocr_usage"] == {"tokens_used": 10}
+            assert all(r["screen"]["screenshot_path"] is None for r in records)
+            
+            record = json.loads((Path(tmp_dir) / "2025-08-28.jsonl").read_text(encoding="utf-8"))
+            assert record["screen"]["ocr_text"] == "翌日"
@@ -0,0 +1,204 @@
+"""MockVisionServer のテストなのだ"""
+import json
+import tempfile
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+from src.config import Config
+from src.mock_server import (
+    PROSE_RESPONSE,
+    MockVisionServer,
+    create_mock_server,
+    estimate_tokens,
+    latency_from_spec,
+)
+from src.ocr_client import OcrClient
+
+
+def create_config(endpoint: str, data_dir: Path, **overrides) -> Config:
+    """モックサーバ向けの設定を作るのだ"""
+    config = Config(
+        azure_openai_endpoint=endpoint,
+        azure_openai_key="mock-key",
+        azure_openai_model="gpt-4.1-mini",
+        data_dir=data_dir
+    )
+    for key, value in overrides.items():
+        setattr(config, key, value)
+    return config
+
+
+def post_completion(endpoint: str) -> urllib.request.Request:
+    """chat completionsへのPOSTリクエストを作るのだ"""
+    body = json.dumps({"messages": [{"role": "user", "content": "describe"}]}).encode("utf-8")
+    return urllib.request.Request(
+        f"{endpoint}/openai/deployments/mock/chat/completions",
+        data=body,
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+
+
+class TestMockVisionServer:
+    """MockVisionServer テストクラスなのだ"""
+
+    def test_prose_round_trip(self):
+        """OcrClientが自由記述の応答とトークン数を受け取れるのだ"""
+        with MockVisionServer() as server, tempfile.TemporaryDirectory() as temp_dir:
+            client = OcrClient(create_config(server.endpoint, Path(temp_dir)))
+
+            result = client.extract_text_from_bytes(b"fake image data")
+
+            assert result.is_success() is True
+            assert result.get_text() == PROSE_RESPONSE
+            stats = server.get_stats()
+            assert stats["requests"] == 1
+            assert result.tokens_used == stats["prompt_tokens"] + stats["completion_tokens"]
+
+    def test_structured_mode_returns_fields(self):
+        """構造化モードでは ocr_fields と短い要約が返るのだ"""
+        with MockVisionServer() as server, tempfile.TemporaryDirectory() as temp_dir:
+            config = create_config(server.endpoint, Path(temp_dir), ocr_response_format="json")
+            client = OcrClient(config)
+
+            result = client.extract_text_from_bytes(b"fake image data")
+
+            assert result.fields["category"] == "coding"
+            assert result.fields["app"] == "VS Code"
+            assert result.get_text() == result.fields["summary"]
+            assert server.get_stats()["completion_tokens"] < estimate_tokens(PROSE_RESPONSE)
+
+    def test_batch_round_trip(self):
+        """複数画像のバッチは1リクエストで画像ごとの結果に分解できるのだ（自由記述・構造化）"""
+        for response_format in ("text", "json"):
+            with MockVisionServer() as server, tempfile.TemporaryDirectory() as temp_dir:
+                config = create_config(
+                    server.endpoint, Path(temp_dir), ocr_response_format=response_format
+                )
+                client = OcrClient(config)
+                paths = []
+                for i in range(3):
+                    path = Path(temp_dir) / f"shot_{i}.jpg"
+                    path.write_bytes(f"fake image {i}".encode("utf-8"))
+                    paths.append(path)
+
+                results = client.extract_text_from_images(paths)
+
+                assert server.get_stats()["requests"] == 1
+                assert all(result.is_success() for result in results)
+                if response_format == "json":
+                    assert all(result.fields["app"] == "VS Code" for result in results)
+                    assert all(result.get_text() == result.fields["summary"] for result in results)
+                else:
+                    assert all(result.get_text() == PROSE_RESPONSE for result in results)
+
+    def test_max_tokens_truncates(self):
+        """max_tokensを超える応答は切り詰めて length で終わるのだ"""
+        server = MockVisionServer()
+        response = server.handle_completion({
+            "messages": [{"role": "user", "content": "describe"}],
+            "max_tokens": 10
+        })
+        server.stop()
+
+        assert response["choices"][0]["finish_reason"] == "length"
+        assert response["usage"]["completion_tokens"] <= 10
+
+    def test_rate_limit_injection_sends_retry_after(self):
+        """429注入時はRetry-Afterヘッダ付きで返すのだ"""
+        with MockVisionServer(rate_limit_rate=1.0, retry_after_sec=2.0) as server:
+            with pytest.raises(urllib.error.HTTPError) as error:
+                urllib.request.urlopen(post_completion(server.endpoint), timeout=5)
+
+            assert error.value.code == 429
+            assert error.value.headers["Retry-After"] == "2"
+            assert error.value.headers["retry-after-ms"] == "2000"
+            stats = server.get_stats()
+            assert stats["rate_limited"] == 1
+            assert stats["completion_tokens"] == 0
+
+    def test_fail_next_then_recovers(self):
+        """fail_next で指定件数だけ5xxを返し、その後は正常応答に戻るのだ"""
+        with MockVisionServer() as server:
+            server.fail_next(503, count=2)
+
+            for _ in range(2):
+                with pytest.raises(urllib.error.HTTPError) as error:
+                    urllib.request.urlopen(post_completion(server.endpoint), timeout=5)
+                assert error.value.code == 503
+
+            with urllib.request.urlopen(post_completion(server.endpoint), timeout=5) as response:
+                assert response.status == 200
+
+            stats = server.get_stats()
+            assert stats["server_errors"] == 2
+            assert stats["requests"] == 1
+
+    def test_ocr_client_reports_rate_limit(self):
+        """OcrClientは429を受けるとRetry-Afterの間は送信を止めるのだ"""
+        with MockVisionServer(rate_limit_rate=1.0, retry_after_sec=0.0) as server, \
+                tempfile.TemporaryDirectory() as temp_dir:
+            client = OcrClient(create_config(server.endpoint, Path(temp_dir)))
+
+            result = client.extract_text_from_bytes(b"fake image data")
+
+            assert result.is_success() is False
+            assert "429" in result.get_error()
+            assert client.rate_limiter.get_stats()["rate_limited_responses"] == 1
+
+    def test_warm_up_sends_text_only_request(self):
+        """ウォームアップは画像無し・1トークンの最小リクエストなのだ"""
+        with MockVisionServer() as server, tempfile.TemporaryDirectory() as temp_dir:
+            client = OcrClient(create_config(server.endpoint, Path(temp_dir)))
+
+            result = client.warm_up()
+
+            assert result.is_success() is True
+            stats = server.get_stats()
+            assert stats["requests"] == 1
+            assert stats["completion_tokens"] <= 1
+            assert stats["prompt_tokens"] < 10
+
+
+class TestLatencySpec:
+    """latency_from_spec テストクラスなのだ"""
+
+    def test_distributions(self):
+        """各分布の指定から妥当な遅延が引けるのだ"""
+        assert latency_from_spec("fixed:0.25")() == 0.25
+
+        uniform = latency_from_spec("uniform:1,2", seed=1)
+        assert all(1.0 <= uniform() <= 2.0 for _ in range(50))
+
+        lognormal = latency_from_spec("lognormal:2.0,0.4", seed=1)
+        samples = sorted(lognormal() for _ in range(201))
+        assert 1.5 < samples[100] < 2.5
+
+        longtail = latency_from_spec("longtail:1,2,0.5,10", seed=1)
+        samples = [longtail() for _ in range(100)]
+        assert any(s >= 10.0 for s in samples)
+        assert any(s <= 2.0 for s in samples)
+
+    def test_invalid_spec_raises(self):
+        """未対応の指定はエラーにするのだ"""
+        with pytest.raises(ValueError):
+            latency_from_spec("gamma:1,2")
+        with pytest.raises(ValueError):
+            latency_from_spec("uniform:a,b")
+
+    def test_create_mock_server_from_config(self):
+        """設定で有効なときだけモックサーバを作るのだ"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config = create_config("", Path(temp_dir))
+            assert create_mock_server(config) is None
+
+            config.ocr_mock_enabled = True
+            config.ocr_mock_latency = "fixed:0"
+            config.ocr_mock_server_error_rate = 0.2
+            server = create_mock_server(config)
+            assert server is not None
+            assert server.server_error_rate == 0.2
+            server.stop()
@@ -0,0 +1,63 @@
+"""OcrBudget のテストなのだ"""
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+from src.ocr_budget import OcrBudget
+
+
+class TestOcrBudget:
+    """OcrBudget テストクラスなのだ"""
+
+    def test_unlimited_always_allows(self):
+        """上限0なら常に通常OCRなのだ"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            budget = OcrBudget(Path(temp_dir) / "budget.json")
+            budget.record(10_000_000)
+
+            plan = budget.plan()
+            assert plan.allow is True
+            assert plan.detail is None
+            assert plan.level == "normal"
+
+    def test_degrades_as_budget_is_consumed(self):
+        """消費率に応じて低詳細度→間引き→メタデータのみになるのだ"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            budget = OcrBudget(Path(temp_dir) / "budget.json", daily_token_limit=1000,
+                               reduced_frequency_every=2)
+
+            budget.record(600)
+            plan = budget.plan()
+            assert (plan.allow, plan.detail, plan.level) == (True, "low", "reduced_detail")
+
+            budget.record(250)
+            plans = [budget.plan() for _ in range(4)]
+            assert [p.allow for p in plans] == [False, True, False, True]
+            assert all(p.level == "reduced_frequency" for p in plans)
+
+            budget.record(150)
+            plan = budget.plan()
+            assert (plan.allow, plan.level) == (False, "exhausted")
+            assert budget.get_stats()["skipped"] == 3
+
+    def test_hourly_limit_resets_next_hour(self):
+        """時間予算は次の時間になればリセットされるのだ"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            budget = OcrBudget(Path(temp_dir) / "budget.json", hourly_token_limit=100)
+            ten = datetime(2025, 8, 27, 10, 30, tzinfo=timezone.utc)
+            eleven = datetime(2025, 8, 27, 11, 0, tzinfo=timezone.utc)
+
+            budget.record(100, now=ten)
+            assert budget.plan(now=ten).allow is False
+            assert budget.plan(now=eleven).allow is True
+
+    def test_usage_persists_across_restart(self):
+        """再起動しても当日の消費が引き継がれるのだ"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            state_path = Path(temp_dir) / "budget.json"
+            OcrBudget(state_path, daily_token_limit=1000).record(400)
+
+            reopened = OcrBudget(state_path, daily_token_limit=1000)
+            stats = reopened.get_stats()
+            assert stats["day_tokens"] == 400
+            assert stats["usage_ratio"] == 0.4
@@ -0,0 +1,157 @@
+"""OcrResultCache と dhash のテストなのだ"""
+import io
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+from PIL import Image, ImageDraw
+
+from src.image_hash import dhash, hamming_distance
+from src.ocr_cache import OcrResultCache
+
+
+def make_jpeg(quality: int = 90, text: str = "def main():") -> bytes:
+    """テスト用のJPEGを作るのだ"""
+    img = Image.new("RGB", (320, 180), "white")
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((0, 0, 80, 180), fill="navy")
+    draw.text((100, 60), text, fill="black")
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+class TestDhash:
+    """dhash テストクラスなのだ"""
+
+    def test_reencoded_image_is_close(self):
+        """再エンコードしただけの画像はハッシュがほぼ同じになるのだ"""
+        a = make_jpeg(quality=90)
+        b = make_jpeg(quality=60)
+
+        assert a != b
+        assert hamming_distance(dhash(a), dhash(b)) <= 2
+
+    def test_different_image_differs(self):
+        """レイアウトが違う画像はハッシュも違うのだ"""
+        inverted = Image.open(io.BytesIO(make_jpeg())).transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+        buffer = io.BytesIO()
+        inverted.save(buffer, "JPEG")
+
+        assert hamming_distance(dhash(make_jpeg()), dhash(buffer.getvalue())) > 10
+
+
+class TestOcrResultCache:
+    """OcrResultCache テストクラスなのだ"""
+
+    @pytest.fixture
+    def db_path(self):
+        """一時ディレクトリ内のDBパスなのだ"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield Path(temp_dir) / "ocr_cache.sqlite3"
+
+    def test_hit_and_miss(self, db_path):
+        """同じ画像・プロンプト・モデルならヒットするのだ"""
+        cache = OcrResultCache(db_path)
+        key = cache.make_key(b"image", "prompt", "gpt-4.1")
+
+        assert cache.get(key) is None
+        cache.put(key, "画面の説明", 800)
+
+        assert cache.get(key) == ("画面の説明", 800, None)
+        stats = cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["tokens_saved"] == 800
+        assert stats["entries"] == 1
+        cache.close()
+
+    def test_key_includes_prompt_and_model(self, db_path):
+        """プロンプトやモデルが違えば別キーになるのだ"""
+        cache = OcrResultCache(db_path)
+
+        base = cache.make_key(b"image", "prompt", "gpt-4.1")
+        assert base != cache.make_key(b"image", "other prompt", "gpt-4.1")
+        assert base != cache.make_key(b"image", "prompt", "gpt-4.1-mini")
+        assert base != cache.make_key(b"image2", "prompt", "gpt-4.1")
+        cache.close()
+
+    def test_phash_key_matches_reencoded_frame(self, db_path):
+        """phashモードでは再エンコードされた同じ画面もヒットするのだ"""
+        cache = OcrResultCache(db_path, key_mode="phash")
+
+        assert (cache.make_key(make_jpeg(quality=90), "p", "m")
+                == cache.make_key(make_jpeg(quality=60), "p", "m"))
+        cache.close()
+
+    def test_invalid_key_mode(self, db_path):
+        """未対応のキー方式はエラーなのだ"""
+        with pytest.raises(ValueError):
+            OcrResultCache(db_path, key_mode="md5")
+
+    def test_lru_eviction(self, db_path):
+        """件数上限を超えたら最終参照が古いものから消えるのだ"""
+        cache = OcrResultCache(db_path, max_entries=2)
+        cache.put("a", "A", 1)
+        time.sleep(0.01)
+        cache.put("b", "B", 1)
+        time.sleep(0.01)
+        cache.get("a")  # aを最近使ったことにするのだ
+        time.sleep(0.01)
+        cache.put("c", "C", 1)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == ("A", 1, None)
+        assert cache.get("c") == ("C", 1, None)
+        assert cache.get_stats()["evicted"] == 1
+        cache.close()
+
+    def test_ttl_expiry(self, db_path):
+        """TTLを過ぎたエントリはミスになるのだ"""
+        cache = OcrResultCache(db_path, ttl_sec=0.05)
+        cache.put("a", "A", 1)
+        time.sleep(0.1)
+
+        assert cache.get("a") is None
+        assert cache.get_stats()["entries"] == 0
+        cache.close()
+
+    def test_survives_restart(self, db_path):
+        """再オープンしてもエントリが残るのだ"""
+        cache = OcrResultCache(db_path)
+        cache.put("a", "A", 10)
+        cache.close()
+
+        reopened = OcrResultCache(db_path)
+        assert reopened.get("a") == ("A", 10, None)
+        reopened.close()
+
+    def test_fields_round_trip(self, db_path):
+        """構造化フィールドも保存・復元されるのだ"""
+        cache = OcrResultCache(db_path)
+        fields = {"app": "Slack", "category": "communication", "terms": ["#dev"], "summary": "返信中"}
+        cache.put("a", "返信中", 120, fields)
+
+        assert cache.get("a") == ("返信中", 120, fields)
+        cache.close()
+
+    def test_hits_do_not_write(self, db_path):
+        """ヒットはDBに書かず、最終参照時刻は書き込み時と終了時にまとめて反映するのだ"""
+        cache = OcrResultCache(db_path)
+        assert cache._conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        cache.put("a", "A", 1)
+
+        changes = cache._conn.total_changes
+        for _ in range(10):
+            assert cache.get("a") == ("A", 1, None)
+        assert cache._conn.total_changes == changes
+
+        accessed_at = cache._pending_touches["a"]
+        cache.close()
+
+        reopened = OcrResultCache(db_path)
+        row = reopened._conn.execute("SELECT last_access FROM ocr_cache WHERE key = 'a'").fetchone()
+        assert row[0] == accessed_at
+        reopened.close()
+
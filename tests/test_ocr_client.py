@@ -1,11 +1,12 @@
 """OcrClient のテストなのだ"""
+import asyncio
 import tempfile
 from pathlib import Path
-from unittest.mock import Mock, patch
+from unittest.mock import ANY, AsyncMock, Mock, patch
 import pytest
 
 from src.config import Config
-from src.ocr_client import OcrClient, OcrResult
+from src.ocr_client import AsyncOcrClient, OcrClient, OcrResult
 
 
 class TestOcrResult:
@@ -59,7 +60,9 @@ class TestOcrClient:
         mock_azure_openai.assert_called_once_with(
             azure_endpoint="https://test.openai.azure.com",
             api_key="test-key",
-            api_version="2023-12-01-preview"
+            api_version="2023-12-01-preview",
+            http_client=ANY,  # 成功応答のレート制限ヘッダを読むフック付きクライアントなのだ
+            max_retries=0  # 再試行はRetryCacheに任せるのだ
         )
     
     def test_extract_text_from_nonexistent_file(self):
@@ -163,6 +166,10 @@ class TestOcrClient:
         assert result.is_success() is True
         assert result.get_text() == "Text from bytes"
         assert result.tokens_used == 100
+        
+        # 段階別の所要時間と送信量が付くのだ
+        assert set(result.timings) == {"encode", "network", "parse"}
+        assert result.bytes_uploaded == len("ZmFrZSBpbWFnZSBkYXRh")
     
     @patch('src.ocr_client.AzureOpenAI')
     def test_custom_prompt(self, mock_azure_openai):
@@ -249,3 +256,521 @@ class TestOcrClient:
             assert info["endpoint"] == "https://test.openai.azure.com"
             assert info["api_version"] == "2023-12-01-preview"
 
+    
+    @patch('src.ocr_client.AzureOpenAI')
+    def test_request_timeout_applied(self, mock_azure_openai):
+        """仕様のAPIタイムアウトがリクエストごとに渡されるテストなのだ"""
+        config = self.create_test_config()
+        config.ocr_timeout_sec = 7.5
+        
+        mock_client = Mock()
+        mock_azure_openai.return_value = mock_client
+        mock_client.chat.completions.create.side_effect = Exception("Request timed out.")
+        
+        client = OcrClient(config)
+        result = client.extract_text_from_bytes(b"fake image data")
+        
+        assert result.is_success() is False
+        assert "タイムアウトエラー" in result.get_error()
+        assert mock_client.chat.completions.create.call_args[1]["timeout"] == 7.5
+
+
+def create_async_response(text: str, tokens: int = 50) -> Mock:
+    """非同期クライアント用のレスポンスモックを作るのだ"""
+    mock_response = Mock()
+    mock_message = Mock()
+    mock_message.content = text
+    mock_choice = Mock()
+    mock_choice.message = mock_message
+    mock_response.choices = [mock_choice]
+    mock_response.usage = Mock(total_tokens=tokens)
+    return mock_response
+
+
+class TestAsyncOcrClient:
+    """AsyncOcrClient テストクラスなのだ"""
+    
+    def create_test_config(self, **overrides) -> Config:
+        """テスト用設定を作成するのだ"""
+        config = Config(
+            azure_openai_endpoint="https://test.openai.azure.com",
+            azure_openai_key="test-key",
+            azure_openai_model="gpt-4.1",
+            data_dir=Path("/tmp/test"),
+            ocr_max_in_flight=2,
+            ocr_timeout_sec=1.0
+        )
+        for key, value in overrides.items():
+            setattr(config, key, value)
+        return config
+    
+    @patch('src.ocr_client.AsyncAzureOpenAI')
+    def test_submit_bytes_success(self, mock_async_azure):
+        """Future経由でOCR結果が返るテストなのだ"""
+        mock_client = Mock()
+        mock_client.chat.completions.create = AsyncMock(
+            return_value=create_async_response("async text", 80)
+        )
+        mock_client.close = AsyncMock()
+        mock_async_azure.return_value = mock_client
+        
+        client = AsyncOcrClient(self.create_test_config())
+        try:
+            result = client.submit_bytes(b"fake image data").result(timeout=5)
+        finally:
+            client.close()
+        
+        assert result.is_success() is True
+        assert result.get_text() == "async text"
+        assert result.tokens_used == 80
+        
+        # 接続プール付きクライアントで、SDKの自動再試行は無効なのだ
+        kwargs = mock_async_azure.call_args[1]
+        assert kwargs["max_retries"] == 0
+        assert kwargs["http_client"] is not None
+        mock_client.close.assert_awaited_once()
+    
+    @patch('src.ocr_client.AsyncAzureOpenAI')
+    def test_in_flight_limit(self, mock_async_azure):
+        """同時実行数が上限を超えないテストなのだ"""
+        state = {"current": 0, "peak": 0}
+        
+        async def slow_create(**kwargs):
+            state["current"] += 1
+            state["peak"] = max(state["peak"], state["current"])
+            await asyncio.sleep(0.05)
+            state["current"] -= 1
+            return create_async_response("ok")
+        
+        mock_client = Mock()
+        mock_client.chat.completions.create = slow_create
+        mock_client.close = AsyncMock()
+        mock_async_azure.return_value = mock_client
+        
+        client = AsyncOcrClient(self.create_test_config(ocr_max_in_flight=2))
+        try:
+            futures = [client.submit_bytes(b"img") for _ in range(6)]
+            results = [f.result(timeout=5) for f in futures]
+        finally:
+            client.close()
+        
+        assert all(r.is_success() for r in results)
+        assert state["peak"] == 2
+    
+    @patch('src.ocr_client.AsyncAzureOpenAI')
+    def test_request_timeout(self, mock_async_azure):
+        """応答が遅いとタイムアウトで失敗結果になるテストなのだ"""
+        async def hanging_create(**kwargs):
+            await asyncio.sleep(10)
+        
+        mock_client = Mock()
+        mock_client.chat.completions.create = hanging_create
+        mock_client.close = AsyncMock()
+        mock_async_azure.return_value = mock_client
+        
+        client = AsyncOcrClient(self.create_test_config(ocr_timeout_sec=0.1))
+        try:
+            result = client.submit_bytes(b"img").result(timeout=5)
+        finally:
+            client.close()
+        
+        assert result.is_success() is False
+        assert "タイムアウトエラー" in result.get_error()
+    
+    @patch('src.ocr_client.AsyncAzureOpenAI')
+    def test_submit_missing_image(self, mock_async_azure):
+        """存在しない画像は即座に失敗結果になるテストなのだ"""
+        mock_async_azure.return_value = Mock(close=AsyncMock())
+        
+        client = AsyncOcrClient(self.create_test_config())
+        try:
+            result = client.submit_image(Path("/nonexistent/image.jpg")).result(timeout=5)
+        finally:
+            client.close()
+        
+        assert result.is_success() is False
+        assert "画像読み込みエラー" in result.get_error()
+
+
+class TestOcrClientRateLimit:
+    """OcrClient のレート制限連携テストクラスなのだ"""
+    
+    def create_test_config(self) -> Config:
+        """テスト用設定を作成するのだ"""
+        return Config(
+            azure_openai_endpoint="https://test.openai.azure.com",
+            azure_openai_key="test-key",
+            azure_openai_model="gpt-4.1",
+            data_dir=Path("/tmp/test"),
+            ocr_rate_limit_max_wait_sec=0.5
+        )
+    
+    @patch('src.ocr_client.AzureOpenAI')
+    def test_retry_after_holds_next_request(self, mock_azure_openai):
+        """429のRetry-After中は次のリクエストを送らずに失敗にするテストなのだ"""
+        import httpx
+        import openai
+        
+        mock_client = Mock()
+        mock_azure_openai.return_value = mock_client
+        response = httpx.Response(
+            429,
+            headers={"retry-after": "30"},
+            request=httpx.Request("POST", "https://test.openai.azure.com")
+        )
+        mock_client.chat.completions.create.side_effect = openai.RateLimitError(
+            "Error code: 429", response=response, body=None
+        )
+        
+        client = OcrClient(self.create_test_config())
+        first = client.extract_text_from_bytes(b"fake image data")
+        second = client.extract_text_from_bytes(b"fake image data")
+        
+        assert "API利用制限エラー (Rate Limit)" in first.get_error()
+        assert "送信前にクライアント側で保留" in second.get_error()
+        assert mock_client.chat.completions.create.call_count == 1
+        assert client.rate_limiter.get_stats()["shed"] == 1
+    
+    @patch('src.ocr_client.AzureOpenAI')
+    def test_usage_feeds_limiter(self, mock_azure_openai):
+        """成功時の tokens_used がリミッタの推定に反映されるテストなのだ"""
+        mock_client = Mock()
+        mock_azure_openai.return_value = mock_client
+        mock_client.chat.completions.create.return_value = create_async_response("ok", 500)
+        
+        client = OcrClient(self.create_test_config())
+        before = client.rate_limiter.estimate_tokens()
+        client.extract_text_from_bytes(b"fake image data")
+        
+        assert client.rate_limiter.estimate_tokens() < before
+    
+    @patch('src.ocr_client.AzureOpenAI')
+    def test_success_headers_feed_limiter(self, mock_azure_openai):
+        """成功応答の x-ratelimit-* ヘッダでも429の前に送信を止めるテストなのだ"""
+        import httpx
+        
+        client = OcrClient(self.create_test_config())
+        http_client = mock_azure_openai.call_args.kwargs["http_client"]
+        on_response = http_client.event_hooks["response"][0]
+        
+        on_response(httpx.Response(200, headers={
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-reset-requests": "10s"
+        }))
+        
+        assert client.rate_limiter.get_stats()["blocked_for_sec"] > 5.0
+        assert client.rate_limiter.try_acquire() > 0
+
+
+class TestOcrClientResultCache:
+    """OcrClient の結果キャッシュ連携テストクラスなのだ"""
+    
+    @patch('src.ocr_client.AzureOpenAI')
+    def test_repeated_frame_hits_cache(self, mock_azure_openai):
+        """同じ画像の2回目はAPIを呼ばずにキャッシュから返すテストなのだ"""
+        mock_client = Mock()
+        mock_azure_openai.return_value = mock_client
+        mock_client.chat.completions.create.return_value = create_async_response("IDE画面", 700)
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config = Config(
+                azure_openai_endpoint="https://test.openai.azure.com",
+                azure_openai_key="test-key",
+                azure_openai_model="gpt-4.1",
+                data_dir=Path(temp_dir),
+                ocr_cache_enabled=True
+            )
+            client = OcrClient(config)
+            
+            first = client.extract_text_from_bytes(b"same frame")
+            second = client.extract_text_from_bytes(b"same frame")
+            
+            assert first.from_cache is False
+            assert second.from_cache is True
+            assert second.get_text() == "IDE画面"
+            assert second.tokens_used == 0
+            assert mock_client.chat.completions.create.call_count == 1
+            assert client.result_cache.get_stats()["tokens_saved"] == 700
+            assert (Path(temp_dir) / "ocr_cache.sqlite3").exists()
+            client.result_cache.close()
+    
+    @patch('src.ocr_client.AzureOpenAI')
+    def test_failures_are_not_cached(self, mock_azure_openai):
+        """失敗結果はキャッシュしないテストなのだ"""
+        mock_client = Mock()
+        mock_azure_openai.return_value = mock_client
+        mock_client.chat.completions.create.side_effect = Exception("500 Server Error")
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config = Config(
+                azure_openai_endpoint="https://test.openai.azure.com",
+                azure_openai_key="test-key",
+                azure_openai_model="gpt-4.1",
+                data_dir=Path(temp_dir),
+                ocr_cache_enabled=True
+            )
+            client = OcrClient(config)
+            
+            client.extract_text_from_bytes(b"frame")
+            client.extract_text_from_bytes(b"frame")
+            
+            assert mock_client.chat.completions.create.call_count == 2
+            assert client.result_cache.get_stats()["entries"] == 0
+            client.result_cache.close()
+
+
+class TestOcrClientBatch:
+    """OcrClient の複数画像バッチテストクラスなのだ"""
+    
+    def create_test_config(self) -> Config:
+        """テスト用設定を作成するのだ"""
+        return Config(
+            azure_openai_endpoint="https://test.openai.azure.com",
+            azure_openai_key="test-key",
+            azure_openai_model="gpt-4.1",
+            data_dir=Path("/tmp/test")
+        )
+    
+    def write_images(self, temp_dir: str, count: int) -> list:
+        """テスト用の画像ファイルを書くのだ"""
+        paths = []
+        for i in range(count):
+            path = Path(temp_dir) / f"shot{i}.jpg"
+            path.write_bytes(f"fake image {i}".encode())
+            paths.append(path)
+        return paths
+    
+    @patch('src.ocr_client.AzureOpenAI')
+    def test_batch_splits_results(self, mock_azure_openai):
+        """1リクエストの応答を画像ごとに分解するテストなのだ"""
+        mock_client = Mock()
+        mock_azure_openai.return_value = mock_client
+        mock_client.chat.completions.create.return_value = create_async_response(
+            '```json\n[{"index": 2, "text": "ブラウザ"}, {"index": 1, "text": "エディタ"}]\n```', 900
+        )
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = self.write_images(temp_dir, 2)
+            results = OcrClient(self.create_test_config()).extract_text_from_images(paths)
+        
+        assert [r.get_text() for r in results] == ["エディタ", "ブラウザ"]
+        assert [r.tokens_used for r in results] == [450, 450]
+        assert mock_client.chat.completions.create.call_count == 1
+        content = mock_client.chat.completions.create.call_args.kwargs["messages"][0]["content"]
+        assert [c["type"] for c in content] == ["text", "image_url", "image_url"]
+    
+    @patch('src.ocr_client.AzureOpenAI')
+    def test_unparseable_batch_falls_back_to_single(self, mock_azure_openai):
+        """JSONとして読めない応答は1枚ずつ再実行するテストなのだ"""
+        mock_client = Mock()
+        mock_azure_openai.return_value = mock_client
+        mock_client.chat.completions.create.side_effect = [
+            create_async_response("どちらもエディタの画面です", 300),
+            create_async_response("エディタ1", 100),
+            create_async_response("エディタ2", 100)
+        ]
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = self.write_images(temp_dir, 2)
+            results = OcrClient(self.create_test_config()).extract_text_from_images(paths)
+        
+        assert [r.get_text() for r in results] == ["エディタ1", "エディタ2"]
+        assert mock_client.chat.completions.create.call_count == 3
+    
+    @patch('src.ocr_client.AzureOpenAI')
+    def test_partial_batch_falls_back_for_missing(self, mock_azure_openai):
+        """応答に無い画像だけを単発で再実行するテストなのだ"""
+        mock_client = Mock()
+        mock_azure_openai.return_value = mock_client
+        mock_client.chat.completions.create.side_effect = [
+            create_async_response('[{"index": 1, "text": "A"}, {"index": 3, "text": "C"}]', 600),
+            create_async_response("B", 100)
+        ]
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = self.write_images(temp_dir, 3)
+            results = OcrClient(self.create_test_config()).extract_text_from_images(paths)
+        
+        assert [r.get_text() for r in results] == ["A", "B", "C"]
+        assert mock_client.chat.completions.create.call_count == 2
+    
+    @patch('src.ocr_client.AzureOpenAI')
+    def test_batch_api_error_fails_all(self, mock_azure_openai):
+        """API障害時は単発に分けずに全画像を失敗にするテストなのだ"""
+        mock_client = Mock()
+        mock_azure_openai.return_value = mock_client
+        mock_client.chat.completions.create.side_effect = Exception("Connection error")
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = self.write_images(temp_dir, 2) + [Path(temp_dir) / "missing.jpg"]
+            results = OcrClient(self.create_test_config()).extract_text_from_images(paths)
+        
+        assert [r.is_success() for r in results] == [False, False, False]
+        assert "画像ファイルが存在しません" in results[2].get_error()
+        assert mock_client.chat.completions.create.call_count == 1
+
+
+class TestOcrClientBatchStructured:
+    """OcrClient のバッチと構造化応答モードを併用するテストクラスなのだ"""
+    
+    @patch('src.ocr_client.AzureOpenAI')
+    def test_batch_uses_structured_prompt_and_fields(self, mock_azure_openai):
+        """バッチでも構造化プロンプトで送り、画像ごとのフィールドに分解するテストなのだ"""
+        mock_client = Mock()
+        mock_azure_openai.return_value = mock_client
+        mock_client.chat.completions.create.side_effect = [
+            create_async_response(
+                '[{"index": 1, "app": "Code", "category": "coding", "terms": ["pytest"], "summary": "テスト修正"}]',
+                300
+            ),
+            create_async_response(
+                '{"app": "Slack", "category": "communication", "terms": [], "summary": "チャット"}', 100
+            )
+        ]
+        config = Config(
+            azure_openai_endpoint="https://test.openai.azure.com",
+            azure_openai_key="test-key",
+            azure_openai_model="gpt-4.1",
+            data_dir=Path("/tmp/test"),
+            ocr_response_format="json"
+        )
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = TestOcrClientBatch().write_images(temp_dir, 2)
+            results = OcrClient(config).extract_text_from_images(paths)
+        
+        batch_kwargs, single_kwargs = [c.kwargs for c in mock_client.chat.completions.create.call_args_list]
+        assert batch_kwargs["max_tokens"] == 150 * 2
+        assert '"summary"' in batch_kwargs["messages"][0]["content"][0]["text"]
+        # 応答に無かった2枚目は単発でも構造化モードで送るのだ
+        assert single_kwargs["max_tokens"] == 150
+        assert '"summary"' in single_kwargs["messages"][0]["content"][0]["text"]
+        
+        assert [r.get_text() for r in results] == ["テスト修正", "チャット"]
+        assert results[0].fields == {
+            "app": "Code", "category": "coding", "terms": ["pytest"], "summary": "テスト修正"
+        }
+        assert results[1].fields["app"] == "Slack"
+
+
+class TestOcrClientStructured:
+    """OcrClient の構造化応答モードテストクラスなのだ"""
+    
+    def create_test_config(self) -> Config:
+        """テスト用設定を作成するのだ"""
+        return Config(
+            azure_openai_endpoint="https://test.openai.azure.com",
+            azure_openai_key="test-key",
+            azure_openai_model="gpt-4.1",
+            data_dir=Path("/tmp/test"),
+            ocr_response_format="json"
+        )
+    
+    @patch('src.ocr_client.AzureOpenAI')
+    def test_structured_request_and_fields(self, mock_azure_openai):
+        """構造化プロンプトと小さいmax_tokensで送り、フィールドに分解するテストなのだ"""
+        mock_client = Mock()
+        mock_azure_openai.return_value = mock_client
+        mock_client.chat.completions.create.return_value = create_async_response(
+            '{"app": "Slack", "category": "communication", "terms": ["#dev"], "summary": "チャットで返信中"}',
+            120
+        )
+        
+        result = OcrClient(self.create_test_config()).extract_text_from_bytes(b"fake image data")
+        
+        kwargs = mock_client.chat.completions.create.call_args.kwargs
+        assert kwargs["max_tokens"] == 150
+        assert '"summary"' in kwargs["messages"][0]["content"][0]["text"]
+        assert result.get_text() == "チャットで返信中"
+        assert result.fields == {
+            "app": "Slack", "category": "communication", "terms": ["#dev"], "summary": "チャットで返信中"
+        }
+    
+    @patch('src.ocr_client.AzureOpenAI')
+    def test_unparseable_structured_keeps_text(self, mock_azure_openai):
+        """JSONでない応答でも成功扱いで本文をそのまま残すテストなのだ"""
+        mock_client = Mock()
+        mock_azure_openai.return_value = mock_client
+        mock_client.chat.completions.create.return_value = create_async_response("エディタの画面", 80)
+        
+        result = OcrClient(self.create_test_config()).extract_text_from_bytes(b"fake image data")
+        
+        assert result.is_success() is True
+        assert result.get_text() == "エディタの画面"
+        assert result.fields is None
+
+
+class TestOcrClientRouting:
+    """OcrClient のルーティング連携テストクラスなのだ"""
+    
+    @patch('src.ocr_client.AzureOpenAI')
+    def test_route_selects_model_and_detail(self, mock_azure_openai):
+        """ルーティング結果のモデルと詳細度で送信し、ティア統計を記録するテストなのだ"""
+        from src.ocr_router import OcrRouter, RouteDecision
+        
+        mock_client = Mock()
+        mock_azure_openai.return_value = mock_client
+        mock_client.chat.completions.create.return_value = create_async_response("ok", 150)
+        config = Config(
+            azure_openai_endpoint="https://test.openai.azure.com",
+            azure_openai_key="test-key",
+            azure_openai_model="gpt-4.1",
+            data_dir=Path("/tmp/test")
+        )
+        router = OcrRouter("gpt-4.1", cheap_model="gpt-4.1-mini")
+        client = OcrClient(config, router=router)
+        
+        route = RouteDecision("cheap", "gpt-4.1-mini", "low", "low_change")
+        client.extract_text_from_bytes(b"fake image data", route=route)
+        
+        kwargs = mock_client.chat.completions.create.call_args.kwargs
+        assert kwargs["model"] == "gpt-4.1-mini"
+        assert kwargs["messages"][0]["content"][1]["image_url"]["detail"] == "low"
+        tiers = router.get_stats()["tiers"]
+        assert tiers["cheap"]["requests"] == 1
+        assert tiers["cheap"]["tokens"] == 150
+        assert tiers["full"]["requests"] == 0
+
+
+class TestOcrClientCircuitBreaker:
+    """OcrClient のサーキットブレーカ連携テストクラスなのだ"""
+    
+    @patch('src.ocr_client.AzureOpenAI')
+    def test_fails_fast_while_open(self, mock_azure_openai):
+        """障害が続いたら送信せずに即失敗するテストなのだ"""
+        mock_client = Mock()
+        mock_azure_openai.return_value = mock_client
+        mock_client.chat.completions.create.side_effect = Exception("Connection error.")
+        config = Config(
+            azure_openai_endpoint="https://test.openai.azure.com",
+            azure_openai_key="test-key",
+            azure_openai_model="gpt-4.1",
+            data_dir=Path("/tmp/test")
+        )
+        client = OcrClient(config)
+        
+        results = [client.extract_text_from_bytes(b"fake image data") for _ in range(8)]
+        
+        assert mock_client.chat.completions.create.call_count == 5
+        assert "接続遮断中エラー" in results[-1].get_error()
+        assert client.circuit_breaker.get_stats()["state"] == "open"
+    
+    @patch('src.ocr_client.AzureOpenAI')
+    def test_rate_limit_does_not_open(self, mock_azure_openai):
+        """429はエンドポイント障害として数えないテストなのだ"""
+        mock_client = Mock()
+        mock_azure_openai.return_value = mock_client
+        mock_client.chat.completions.create.side_effect = Exception("Error code: 429")
+        config = Config(
+            azure_openai_endpoint="https://test.openai.azure.com",
+            azure_openai_key="test-key",
+            azure_openai_model="gpt-4.1",
+            data_dir=Path("/tmp/test"),
+            ocr_rate_limit_max_wait_sec=0.0
+        )
+        client = OcrClient(config)
+        
+        for _ in range(6):
+            client.extract_text_from_bytes(b"fake image data")
+        
+        assert client.circuit_breaker.get_stats()["state"] == "closed"
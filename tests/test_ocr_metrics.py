@@ -0,0 +1,104 @@
+"""OcrMetrics のテストなのだ"""
+import threading
+
+from src.ocr_client import CIRCUIT_OPEN_ERROR, RATE_LIMIT_SHED_ERROR, OcrResult
+from src.ocr_metrics import LatencyHistogram, OcrMetrics, classify_error
+
+
+def make_result(success=True, error=None, tokens=0, timings=None, bytes_uploaded=0):
+    """計測用のOCR結果を作るのだ"""
+    result = OcrResult(success=success, text="ok" if success else "", error=error, tokens_used=tokens)
+    result.timings = timings or {}
+    result.bytes_uploaded = bytes_uploaded
+    return result
+
+
+class TestClassifyError:
+    """classify_error テストクラスなのだ"""
+    
+    def test_error_classes(self):
+        """エラーメッセージが種別に分類されるテストなのだ"""
+        assert classify_error("API利用制限エラー (Rate Limit): Error code: 429") == "rate_limited"
+        assert classify_error(RATE_LIMIT_SHED_ERROR) == "rate_limited"
+        assert classify_error("認証エラー: Error code: 401") == "auth"
+        assert classify_error("タイムアウトエラー: 応答待ちが制限時間を超えました") == "timeout"
+        assert classify_error("Request timed out.") == "timeout"
+        assert classify_error(CIRCUIT_OPEN_ERROR) == "circuit_open"
+        assert classify_error("Connection error.") == "other"
+        assert classify_error(None) == "other"
+
+
+class TestLatencyHistogram:
+    """LatencyHistogram テストクラスなのだ"""
+    
+    def test_percentiles_follow_distribution(self):
+        """p50/p99 がバケット精度で分布に沿うテストなのだ"""
+        hist = LatencyHistogram()
+        for _ in range(98):
+            hist.record(0.1)
+        hist.record(2.0)
+        hist.record(5.0)
+        
+        assert 0.1 <= hist.percentile(0.50) < 0.15
+        assert 2.0 <= hist.percentile(0.99) < 3.0
+        assert hist.percentile(1.0) == 5.0
+        snapshot = hist.snapshot()
+        assert snapshot["count"] == 100
+        assert snapshot["max_sec"] == 5.0
+    
+    def test_empty_histogram(self):
+        """空のヒストグラムは0を返すテストなのだ"""
+        assert LatencyHistogram().snapshot()["p95_sec"] == 0.0
+
+
+class TestOcrMetrics:
+    """OcrMetrics テストクラスなのだ"""
+    
+    def test_observe_breaks_out_stages_and_outcomes(self):
+        """段階別の遅延・エラー種別・トークン・送信量が集計されるテストなのだ"""
+        metrics = OcrMetrics()
+        metrics.observe(
+            make_result(tokens=400, timings={"encode": 0.01, "network": 1.5, "parse": 0.001}, bytes_uploaded=1000),
+            queue_wait_sec=0.2,
+            total_sec=1.8
+        )
+        metrics.observe(make_result(success=False, error="認証エラー: 401", bytes_uploaded=500), total_sec=0.3)
+        
+        stats = metrics.get_stats()
+        assert stats["calls"] == 2
+        assert stats["succeeded"] == 1
+        assert stats["errors"]["auth"] == 1
+        assert stats["latency"]["network"]["count"] == 1
+        assert stats["latency"]["queue_wait"]["max_sec"] == 0.2
+        assert stats["latency"]["total"]["count"] == 2
+        assert stats["tokens_total"] == 400
+        assert stats["tokens_per_call"] == 200.0
+        assert stats["bytes_uploaded"] == 1500
+    
+    def test_take_window_resets_interval_only(self):
+        """区間集計は取り出すとリセットされ、累計は残るテストなのだ"""
+        metrics = OcrMetrics()
+        metrics.observe(make_result(tokens=10))
+        
+        assert metrics.take_window()["calls"] == 1
+        assert metrics.take_window()["calls"] == 0
+        assert metrics.get_stats()["calls"] == 1
+    
+    def test_concurrent_observe(self):
+        """複数スレッドから記録しても件数が欠けないテストなのだ"""
+        metrics = OcrMetrics()
+        
+        def worker():
+            for _ in range(500):
+                metrics.observe(make_result(tokens=1, timings={"network": 0.01}), total_sec=0.02)
+        
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        stats = metrics.get_stats()
+        assert stats["calls"] == 2000
+        assert stats["tokens_total"] == 2000
+        assert stats["latency"]["network"]["count"] == 2000
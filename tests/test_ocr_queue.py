@@ -0,0 +1,153 @@
+"""OcrWorkQueue のテストなのだ"""
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+from src.ocr_queue import OcrJob, OcrWorkQueue, order_retry_tasks
+from src.retry_cache import RetryTask
+
+
+def make_job(name: str) -> OcrJob:
+    """テスト用のジョブを作るのだ"""
+    return OcrJob(Path(name), datetime(2025, 8, 27, 10, 0, 0, tzinfo=timezone.utc))
+
+
+def make_task(task_id: str, minute: int, attempts: int = 0) -> RetryTask:
+    """テスト用のリトライタスクを作るのだ"""
+    return RetryTask(
+        task_id=task_id,
+        image_path=Path(f"{task_id}.jpg"),
+        created_at=0.0,
+        last_attempt_at=0.0,
+        attempt_count=attempts,
+        next_retry_at=0.0,
+        original_timestamp=f"2025-08-27T10:{minute:02d}:00+00:00",
+        error_message="offline"
+    )
+
+
+def make_retry_job(task_id: str) -> OcrJob:
+    """テスト用のリトライジョブを作るのだ"""
+    task = make_task(task_id, 0)
+    return OcrJob(task.image_path, datetime(2025, 8, 27, 10, 0, 0, tzinfo=timezone.utc), False, retry_task=task)
+
+
+class TestOcrWorkQueue:
+    """OcrWorkQueue テストクラスなのだ"""
+
+    def test_drop_oldest_when_full(self):
+        """満杯なら一番古いジョブを押し出すのだ"""
+        queue = OcrWorkQueue(capacity=2)
+        assert queue.put(make_job("a")) == []
+        assert queue.put(make_job("b")) == []
+
+        evicted = queue.put(make_job("c"))
+
+        assert [job.screenshot_path.name for job in evicted] == ["a"]
+        assert queue.get(timeout=0).screenshot_path.name == "b"
+        assert queue.get(timeout=0).screenshot_path.name == "c"
+        stats = queue.get_stats()
+        assert stats["dropped"] == 1
+        assert stats["max_depth"] == 2
+
+    def test_coalesce_keeps_newest(self):
+        """coalesce では未処理のジョブを最新の1件にまとめるのだ"""
+        queue = OcrWorkQueue(capacity=8, policy="coalesce")
+        queue.put(make_job("a"))
+        queue.put(make_job("b"))
+
+        evicted = queue.put(make_job("c"))
+
+        assert [job.screenshot_path.name for job in evicted] == ["b"]
+        assert queue.depth() == 1
+        assert queue.get(timeout=0).screenshot_path.name == "c"
+        assert queue.get_stats()["coalesced"] == 2
+
+    def test_get_blocks_until_put(self):
+        """空のキューは投入まで待つのだ"""
+        queue = OcrWorkQueue()
+        threading.Timer(0.05, lambda: queue.put(make_job("late"))).start()
+
+        job = queue.get(timeout=2.0)
+
+        assert job.screenshot_path.name == "late"
+        assert queue.get_stats()["wait_sec_max"] >= 0.0
+        assert queue.get(timeout=0.01) is None
+
+    def test_join_waits_for_task_done(self):
+        """join は取り出したジョブの task_done まで待つのだ"""
+        queue = OcrWorkQueue()
+        queue.put(make_job("a"))
+        assert queue.join(timeout=0.01) is False
+
+        queue.get(timeout=0)
+        assert queue.join(timeout=0.01) is False
+
+        queue.task_done()
+        assert queue.join(timeout=0.01) is True
+
+    def test_close_returns_pending_and_wakes_getters(self):
+        """close は未処理のジョブを返し、待機中の get を起こすのだ"""
+        queue = OcrWorkQueue()
+        results = []
+        getter = threading.Thread(target=lambda: results.append(queue.get()))
+        getter.start()
+        time.sleep(0.02)
+
+        queue.close()
+        getter.join(timeout=2.0)
+        assert results == [None]
+
+        with pytest.raises(RuntimeError):
+            queue.put(make_job("a"))
+
+    def test_invalid_policy(self):
+        """未対応のポリシーはエラーにするのだ"""
+        with pytest.raises(ValueError):
+            OcrWorkQueue(policy="drop_newest")
+
+
+class TestRetryPriority:
+    """新規フレームとリトライの優先度テストクラスなのだ"""
+
+    def test_fresh_frames_before_retries(self):
+        """リトライが先に積まれていても新規フレームから取り出すのだ"""
+        queue = OcrWorkQueue()
+        queue.put_retry(make_retry_job("r1"))
+        queue.put(make_job("fresh"))
+
+        assert queue.get(timeout=0).screenshot_path.name == "fresh"
+        assert queue.get(timeout=0).retry_task.task_id == "r1"
+        stats = queue.get_stats()
+        assert stats["retry_dequeued"] == 1
+        assert stats["retry_depth"] == 0
+
+    def test_take_retries_yields_to_fresh(self):
+        """新規フレームが来ていたらリトライの追加取り出しはしないのだ"""
+        queue = OcrWorkQueue()
+        for i in range(3):
+            queue.put_retry(make_retry_job(f"r{i}"))
+
+        assert [j.retry_task.task_id for j in queue.take_retries(1)] == ["r0"]
+        queue.put(make_job("fresh"))
+        assert queue.take_retries(5) == []
+        assert queue.retry_depth() == 2
+
+    def test_order_by_attempts_then_age(self):
+        """通常は試行回数の少ない順・古い順なのだ"""
+        tasks = [make_task("new", 30), make_task("old", 10), make_task("tried", 5, attempts=2)]
+
+        ordered = order_retry_tasks(tasks)
+
+        assert [t.task_id for t in ordered] == ["old", "new", "tried"]
+
+    def test_backlog_drains_newest_first_with_quota(self):
+        """滞留が閾値を超えたら新しい順にし、上限で切るのだ"""
+        tasks = [make_task(f"t{i}", i) for i in range(10)]
+
+        ordered = order_retry_tasks(tasks, quota=3, backlog_threshold=5)
+
+        assert [t.task_id for t in ordered] == ["t9", "t8", "t7"]
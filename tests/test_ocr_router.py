@@ -0,0 +1,96 @@
+"""OcrRouter のテストなのだ"""
+import io
+
+from PIL import Image, ImageDraw
+
+from src.image_hash import dhash, hamming_distance
+from src.ocr_router import OcrRouter
+
+
+def make_frame(offset: int = 0) -> bytes:
+    """テスト用の画面フレームを作るのだ（offsetでレイアウトを変える）"""
+    img = Image.new("RGB", (320, 180), "white")
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((offset, 0, offset + 80, 180), fill="navy")
+    draw.rectangle((200 - offset, 100, 300 - offset, 160), fill="orange")
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+class TestOcrRouter:
+    """OcrRouter テストクラスなのだ"""
+
+    def test_first_frame_goes_full(self):
+        """比較対象が無い最初のフレームはフルモデルなのだ"""
+        router = OcrRouter("gpt-4.1", cheap_model="gpt-4.1-mini")
+
+        decision = router.route(make_frame())
+
+        assert decision.tier == "full"
+        assert decision.model == "gpt-4.1"
+        assert decision.detail is None
+        assert decision.reason == "first_frame"
+
+    def test_low_change_goes_cheap(self):
+        """ほぼ同じ画面は安いティアに回すのだ"""
+        router = OcrRouter("gpt-4.1", cheap_model="gpt-4.1-mini")
+        router.route(make_frame())
+
+        decision = router.route(make_frame())
+
+        assert decision.tier == "cheap"
+        assert decision.model == "gpt-4.1-mini"
+        assert decision.detail == "low"
+        assert decision.reason == "low_change"
+
+    def test_changed_frame_depends_on_typing(self):
+        """大きく変わってもタイピングしていなければ安いティアなのだ"""
+        router = OcrRouter("gpt-4.1", change_threshold=5)
+        router.route(make_frame(0))
+
+        idle = router.route(make_frame(200), typing_active=False)
+        active = router.route(make_frame(0), typing_active=True)
+
+        assert idle.reason == "idle"
+        assert idle.model == "gpt-4.1"  # 安いモデル未指定なら同じモデルの低詳細度なのだ
+        assert idle.detail == "low"
+        assert active.tier == "full"
+        assert active.reason == "changed"
+
+    def test_force_full(self):
+        """重要フレームは変化が小さくてもフルモデルなのだ"""
+        router = OcrRouter("gpt-4.1")
+        router.route(make_frame())
+
+        assert router.route(make_frame(), force_full=True).tier == "full"
+
+    def test_stats_per_tier(self):
+        """判定理由とティア別のレイテンシ・トークンが集計されるのだ"""
+        router = OcrRouter("gpt-4.1")
+        full = router.route(make_frame())
+        cheap = router.route(make_frame())
+        router.record(full, 2.0, 1200, True)
+        router.record(cheap, 0.5, 200, True)
+        router.record(cheap, 1.5, 0, False)
+
+        stats = router.get_stats()
+        assert stats["decisions"] == {"first_frame": 1, "low_change": 1}
+        assert stats["tiers"]["full"]["avg_latency_sec"] == 2.0
+        assert stats["tiers"]["cheap"]["requests"] == 2
+        assert stats["tiers"]["cheap"]["failures"] == 1
+        assert stats["tiers"]["cheap"]["tokens"] == 200
+        assert stats["tiers"]["cheap"]["avg_latency_sec"] == 1.0
+
+    def test_large_jpeg_hash_matches_full_decode(self):
+        """縮小デコードしたJPEGのハッシュがフルデコードとほぼ同じになるテストなのだ"""
+        img = Image.new("RGB", (2560, 1440), "white")
+        draw = ImageDraw.Draw(img)
+        draw.rectangle((0, 0, 900, 1440), fill="navy")
+        draw.rectangle((1600, 700, 2400, 1200), fill="orange")
+        jpeg, png = io.BytesIO(), io.BytesIO()
+        img.save(jpeg, "JPEG", quality=85)
+        img.save(png, "PNG")  # PNGは縮小デコードできないので全画素から計算するのだ
+
+        assert hamming_distance(dhash(jpeg.getvalue()), dhash(png.getvalue())) <= 2
+
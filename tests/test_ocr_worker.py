@@ -0,0 +1,909 @@
+"""OcrWorker のテストなのだ"""
+import json
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+from src.config import Config
+from src.jsonl_writer import JsonlWriter
+from src.keylogger import TypingStats
+from src.ocr_client import OcrResult
+from src.ocr_worker import OcrWorker
+
+
+def create_test_config(data_dir: Path, **overrides) -> Config:
+    """テスト用設定を作成するのだ"""
+    config = Config(
+        azure_openai_endpoint="https://test.openai.azure.com",
+        azure_openai_key="test-key",
+        azure_openai_model="gpt-4.1",
+        data_dir=data_dir,
+        retry_base_delay_sec=0.0,
+        ocr_worker_threads=0  # 既定ではtick上で直接処理して結果をすぐ検証するのだ
+    )
+    for key, value in overrides.items():
+        setattr(config, key, value)
+    return config
+
+
+def write_interval_record(writer: JsonlWriter, ts: datetime, screenshot: Path) -> None:
+    """OCR待ちのインターバルレコードを書くのだ"""
+    writer.write_record(TypingStats(), ts_utc=ts, screenshot_path=str(screenshot))
+
+
+def read_records(data_dir: Path, ts: datetime) -> list:
+    """日別ファイルの全レコードを読むのだ"""
+    file_path = data_dir / f"{ts.strftime('%Y-%m-%d')}.jsonl"
+    return [json.loads(line) for line in file_path.read_text(encoding="utf-8").splitlines()]
+
+
+class TestOcrWorker:
+    """OcrWorker テストクラスなのだ"""
+    
+    @patch('src.ocr_worker.OcrClient')
+    def test_fresh_success_updates_record(self, mock_client_class):
+        """OCR成功でレコード更新・スクショ削除されるテストなのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = Path(tmp_dir)
+            writer = JsonlWriter(data_dir)
+            worker = OcrWorker(create_test_config(data_dir), writer)
+            mock_client_class.return_value.extract_text_from_image.return_value = OcrResult(
+                success=True, text="エディタでコードを書いている", tokens_used=120
+            )
+            
+            ts = datetime(2025, 8, 27, 10, 0, 0, tzinfo=timezone.utc)
+            screenshot = data_dir / "shot.jpg"
+            screenshot.write_bytes(b"fake image data")
+            write_interval_record(writer, ts, screenshot)
+            
+            assert worker.add_screenshot_for_ocr(screenshot, timestamp=ts) is True
+            
+            record = read_records(data_dir, ts)[0]
+            assert record["screen"]["ocr_text"] == "エディタでコードを書いている"
+            assert record["screen"]["screenshot_path"] is None
+            assert not screenshot.exists()
+            assert worker.get_stats()["successful_ocr"] == 1
+    
+    @patch('src.ocr_worker.OcrClient')
+    def test_perf_record_written_per_interval(self, mock_client_class):
+        """計測区間を過ぎると性能レコードが日別ファイルに書かれるのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = Path(tmp_dir)
+            writer = JsonlWriter(data_dir)
+            worker = OcrWorker(create_test_config(data_dir, ocr_perf_record_interval_sec=0.1), writer)
+            
+            result = OcrResult(success=True, text="画面", tokens_used=120)
+            result.timings = {"encode": 0.01, "network": 0.5, "parse": 0.001}
+            result.bytes_uploaded = 2048
+            mock_client_class.return_value.extract_text_from_image.return_value = result
+            
+            ts = datetime.now(timezone.utc)
+            screenshot = data_dir / "shot.jpg"
+            screenshot.write_bytes(b"fake image data")
+            write_interval_record(writer, ts, screenshot)
+            worker.add_screenshot_for_ocr(screenshot, ts)
+            
+            assert worker.maybe_write_perf_record() is False  # 区間がまだ終わっていないのだ
+            time.sleep(0.15)
+            assert worker.maybe_write_perf_record() is True
+            
+            perf = [r for r in read_records(data_dir, ts) if r.get("type") == "ocr_perf"]
+            assert len(perf) == 1
+            assert perf[0]["ocr"]["calls"] == 1
+            assert perf[0]["ocr"]["latency"]["network"]["p50_sec"] >= 0.5
+            assert perf[0]["ocr"]["bytes_uploaded"] == 2048
+            assert worker.get_stats()["perf"]["tokens_total"] == 120
+            
+            # 呼び出しの無い区間はレコードを書かないのだ
+            time.sleep(0.15)
+            assert worker.maybe_write_perf_record() is False
+    
+    @patch('src.ocr_worker.OcrClient')
+    def test_perf_record_is_opt_in(self, mock_client_class):
+        """既定では性能レコードを日別ファイルに混ぜないのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = Path(tmp_dir)
+            worker = OcrWorker(create_test_config(data_dir), JsonlWriter(data_dir))
+            mock_client_class.return_value.extract_text_from_image.return_value = OcrResult(
+                success=True, text="画面"
+            )
+            screenshot = data_dir / "shot.jpg"
+            screenshot.write_bytes(b"fake image data")
+            worker.add_screenshot_for_ocr(screenshot, datetime.now(timezone.utc))
+            worker._last_perf_record -= 3600
+            
+            assert worker.maybe_write_perf_record() is False
+            assert list(data_dir.glob("*.jsonl")) == []
+    
+    @patch('src.ocr_worker.OcrClient')
+    def test_fresh_failure_then_retry_success(self, mock_client_class):
+        """オフライン失敗→リトライ成功でキャッシュが空になるテストなのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = Path(tmp_dir)
+            writer = JsonlWriter(data_dir)
+            worker = OcrWorker(create_test_config(data_dir), writer)
+            mock_client = mock_client_class.return_value
+            mock_client.extract_text_from_image.return_value = OcrResult(
+                success=False, error="Connection error"
+            )
+            
+            ts = datetime(2025, 8, 27, 10, 0, 0, tzinfo=timezone.utc)
+            screenshot = data_dir / "shot.jpg"
+            screenshot.write_bytes(b"fake image data")
+            write_interval_record(writer, ts, screenshot)
+            
+            assert worker.add_screenshot_for_ocr(screenshot, timestamp=ts) is True
+            assert not screenshot.exists()
+            assert worker.get_stats()["retry_queue"]["total_tasks"] == 1
+            
+            # 回線復帰
+            mock_client.extract_text_from_image.return_value = OcrResult(success=True, text="復帰後")
+            assert worker.process_retry_queue() == 1
+            
+            assert read_records(data_dir, ts)[0]["screen"]["ocr_text"] == "復帰後"
+            assert worker.get_stats()["retry_queue"]["total_tasks"] == 0
+            assert list(worker.retry_cache.cache_dir.glob("*.jpg")) == []
+    
+    @patch('src.ocr_worker.OcrClient')
+    def test_full_retry_cache_finalizes_oldest_record(self, mock_client_class):
+        """リトライキューが上限を超えたら古いレコードを ocr_text="" で確定させるテストなのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = Path(tmp_dir)
+            writer = JsonlWriter(data_dir)
+            worker = OcrWorker(create_test_config(data_dir, retry_cache_max_tasks=1), writer)
+            mock_client_class.return_value.extract_text_from_image.return_value = OcrResult(
+                success=False, error="Connection error"
+            )
+            
+            timestamps = [datetime(2025, 8, 27, 10, 0, i, tzinfo=timezone.utc) for i in range(2)]
+            for i, ts in enumerate(timestamps):
+                screenshot = data_dir / f"shot_{i}.jpg"
+                screenshot.write_bytes(f"fake image data {i}".encode())
+                write_interval_record(writer, ts, screenshot)
+                worker.add_screenshot_for_ocr(screenshot, timestamp=ts)
+            
+            records = read_records(data_dir, timestamps[0])
+            assert records[0]["screen"]["ocr_text"] == ""
+            assert records[0]["screen"]["screenshot_path"] is None
+            assert records[1]["screen"]["screenshot_path"] is not None
+            retry_stats = worker.get_stats()["retry_queue"]
+            assert retry_stats["total_tasks"] == 1
+            assert retry_stats["evicted_tasks"] == 1
+    
+    @patch('src.ocr_worker.OcrClient')
+    def test_retry_scheduler_wakes_at_next_retry_time(self, mock_client_class):
+        """tickを待たず、リトライ時刻が来たら起きて再試行するテストなのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = Path(tmp_dir)
+            writer = JsonlWriter(data_dir)
+            worker = OcrWorker(create_test_config(data_dir, retry_base_delay_sec=0.3), writer)
+            mock_client = mock_client_class.return_value
+            mock_client.extract_text_from_image.side_effect = [
+                OcrResult(success=False, error="Connection error"),
+                OcrResult(success=True, text="予定どおり")
+            ]
+            assert worker.start_retry_scheduler() is not None
+            
+            ts = datetime(2025, 8, 27, 10, 0, 0, tzinfo=timezone.utc)
+            screenshot = data_dir / "shot.jpg"
+            screenshot.write_bytes(b"fake image data")
+            write_interval_record(writer, ts, screenshot)
+            added_at = time.monotonic()
+            worker.add_screenshot_for_ocr(screenshot, timestamp=ts)
+            
+            deadline = time.monotonic() + 5.0
+            while worker.get_stats()["retry_queue"]["total_tasks"] and time.monotonic() < deadline:
+                time.sleep(0.02)
+            elapsed = time.monotonic() - added_at
+            worker.close(timeout=1.0)
+            
+            assert read_records(data_dir, ts)[0]["screen"]["ocr_text"] == "予定どおり"
+            assert 0.2 <= elapsed < 2.0
+            assert worker.get_stats()["retry_wakeups"] >= 1
+    
+    @patch('src.ocr_worker.OcrClient')
+    def test_retry_scheduler_wakes_when_circuit_allows_probe(self, mock_client_class):
+        """遮断中に時刻の来たタスクは、60秒tickを待たず試験送信できる時刻に流すテストなのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = Path(tmp_dir)
+            writer = JsonlWriter(data_dir)
+            worker = OcrWorker(create_test_config(data_dir, ocr_circuit_open_sec=0.5), writer)
+            mock_client = mock_client_class.return_value
+            mock_client.extract_text_from_image.return_value = OcrResult(success=True, text="遮断明け")
+            for _ in range(worker.circuit_breaker.max_consecutive_timeouts):
+                worker.circuit_breaker.record_failure(timeout=True)
+            assert worker.circuit_breaker.state == "open"
+            
+            ts = datetime(2025, 8, 27, 10, 0, 0, tzinfo=timezone.utc)
+            screenshot = data_dir / "shot.jpg"
+            screenshot.write_bytes(b"fake image data")
+            write_interval_record(writer, ts, screenshot)
+            worker.retry_cache.add_failed_task(screenshot, ts.isoformat(), "Connection error")
+            opened_at = time.monotonic()
+            assert worker.start_retry_scheduler() is not None
+            
+            deadline = time.monotonic() + 5.0
+            while worker.get_stats()["retry_queue"]["total_tasks"] and time.monotonic() < deadline:
+                time.sleep(0.02)
+            elapsed = time.monotonic() - opened_at
+            worker.close(timeout=1.0)
+            
+            assert read_records(data_dir, ts)[0]["screen"]["ocr_text"] == "遮断明け"
+            assert 0.3 <= elapsed < 3.0
+    
+    @patch('src.ocr_worker.OcrClient')
+    def test_retry_drain_uses_batches(self, mock_client_class):
+        """ocr_batch_size分ずつまとめてリトライを消化するテストなのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = Path(tmp_dir)
+            writer = JsonlWriter(data_dir)
+            worker = OcrWorker(create_test_config(data_dir, ocr_batch_size=2), writer)
+            mock_client = mock_client_class.return_value
+            mock_client.extract_text_from_image.return_value = OcrResult(
+                success=False, error="Connection error"
+            )
+            
+            timestamps = [datetime(2025, 8, 27, 10, i, 0, tzinfo=timezone.utc) for i in range(3)]
+            for i, ts in enumerate(timestamps):
+                screenshot = data_dir / f"shot{i}.jpg"
+                screenshot.write_bytes(b"fake image data")
+                write_interval_record(writer, ts, screenshot)
+                worker.add_screenshot_for_ocr(screenshot, timestamp=ts)
+                time.sleep(0.002)  # task_idの重複を避けるのだ
+            
+            mock_client.extract_text_from_images.side_effect = lambda paths: [
+                OcrResult(success=True, text=f"batch{len(paths)}") for _ in paths
+            ]
+            assert worker.process_retry_queue() == 3
+            
+            batch_sizes = [len(c.args[0]) for c in mock_client.extract_text_from_images.call_args_list]
+            assert batch_sizes == [2, 1]
+            texts = sorted(r["screen"]["ocr_text"] for r in read_records(data_dir, timestamps[0]))
+            assert texts == ["batch1", "batch2", "batch2"]
+            assert worker.get_stats()["retry_queue"]["total_tasks"] == 0
+    
+    @patch('src.ocr_worker.OcrClient')
+    def test_routing_passes_route_to_client(self, mock_client_class):
+        """ルーティング有効時は同じ画面の2枚目が安いティアで送られるテストなのだ"""
+        import io
+
+        from PIL import Image
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = Path(tmp_dir)
+            writer = JsonlWriter(data_dir)
+            worker = OcrWorker(
+                create_test_config(data_dir, ocr_routing_enabled=True, ocr_cheap_model="gpt-4.1-mini"),
+                writer
+            )
+            mock_client = mock_client_class.return_value
+            mock_client.extract_text_from_image.return_value = OcrResult(success=True, text="同じ画面")
+            
+            buffer = io.BytesIO()
+            Image.new("RGB", (64, 36), "gray").save(buffer, "JPEG")
+            for i in range(2):
+                ts = datetime(2025, 8, 27, 10, i, 0, tzinfo=timezone.utc)
+                screenshot = data_dir / f"shot{i}.jpg"
+                screenshot.write_bytes(buffer.getvalue())
+                write_interval_record(writer, ts, screenshot)
+                worker.add_screenshot_for_ocr(screenshot, timestamp=ts, typing_active=True)
+            
+            routes = [c.kwargs["route"] for c in mock_client.extract_text_from_image.call_args_list]
+            assert [r.tier for r in routes] == ["full", "cheap"]
+            assert routes[1].model == "gpt-4.1-mini"
+            assert worker.get_stats()["routing"]["decisions"] == {"first_frame": 1, "low_change": 1}
+    
+    @patch('src.ocr_worker.OcrClient')
+    def test_budget_usage_and_exhaustion(self, mock_client_class):
+        """使用量がレコードに書かれ、予算切れ後はメタデータのみになるテストなのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = Path(tmp_dir)
+            writer = JsonlWriter(data_dir)
+            worker = OcrWorker(create_test_config(data_dir, ocr_daily_token_budget=1000), writer)
+            mock_client = mock_client_class.return_value
+            mock_client.extract_text_from_image.return_value = OcrResult(
+                success=True, text="作業中", tokens_used=1000
+            )
+            
+            timestamps = [datetime(2025, 8, 27, 10, i, 0, tzinfo=timezone.utc) for i in range(2)]
+            screenshots = []
+            for i, ts in enumerate(timestamps):
+                screenshot = data_dir / f"shot{i}.jpg"
+                screenshot.write_bytes(b"fake image data")
+                write_interval_record(writer, ts, screenshot)
+                screenshots.append(screenshot)
+            
+            assert worker.add_screenshot_for_ocr(screenshots[0], timestamp=timestamps[0]) is True
+            assert worker.add_screenshot_for_ocr(screenshots[1], timestamp=timestamps[1]) is False
+            
+            first, second = read_records(data_dir, timestamps[0])
+            assert first["ocr_usage"]["tokens_used"] == 1000
+            assert first["ocr_usage"]["budget"]["day_tokens"] == 1000
+            assert second["ocr_usage"] == {"skipped": "budget", "level": "exhausted"}
+            assert second["screen"]["screenshot_path"] is None
+            assert not screenshots[1].exists()
+            assert mock_client.extract_text_from_image.call_count == 1
+            stats = worker.get_stats()
+            assert stats["budget_skipped"] == 1
+            assert stats["budget"]["level"] == "exhausted"
+    
+    @patch('src.ocr_worker.OcrClient')
+    def test_open_circuit_skips_retry_drain(self, mock_client_class):
+        """遮断中はリトライを消化せず試行回数も減らさないテストなのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = Path(tmp_dir)
+            writer = JsonlWriter(data_dir)
+            worker = OcrWorker(create_test_config(data_dir), writer)
+            mock_client = mock_client_class.return_value
+            mock_client.extract_text_from_image.return_value = OcrResult(
+                success=False, error="Connection error"
+            )
+            
+            ts = datetime(2025, 8, 27, 10, 0, 0, tzinfo=timezone.utc)
+            screenshot = data_dir / "shot.jpg"
+            screenshot.write_bytes(b"fake image data")
+            write_interval_record(writer, ts, screenshot)
+            worker.add_screenshot_for_ocr(screenshot, timestamp=ts)
+            
+            worker.circuit_breaker.open_duration_sec = 60.0
+            for _ in range(5):
+                worker.circuit_breaker.record_failure()
+            
+            assert worker.process_retry_queue() == 0
+            mock_client.extract_text_from_image.assert_called_once()
+            
+            # 遮断応答は試行回数に数えないのだ
+            task = worker.retry_cache.get_ready_tasks()[0]
+            attempts = task.attempt_count
+            from src.ocr_client import CIRCUIT_OPEN_ERROR
+            worker._handle_retry_result(task, OcrResult(success=False, error=CIRCUIT_OPEN_ERROR))
+            assert worker.retry_cache.get_ready_tasks()[0].attempt_count == attempts
+            assert worker.get_stats()["circuit_breaker"]["state"] == "open"
+    
+    @patch('src.ocr_worker.OcrClient')
+    @patch('src.ocr_worker.AsyncOcrClient')
+    def test_async_mode_overlaps_fresh_and_retry(self, mock_async_class, mock_client_class):
+        """非同期モードでは新規とリトライが投入だけで返り、完了時に反映されるテストなのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = Path(tmp_dir)
+            writer = JsonlWriter(data_dir)
+            worker = OcrWorker(create_test_config(data_dir, ocr_max_in_flight=4), writer)
+            mock_async = mock_async_class.return_value
+            
+            # 既存のリトライタスクを用意するのだ
+            retry_ts = datetime(2025, 8, 27, 9, 59, 0, tzinfo=timezone.utc)
+            retry_shot = data_dir / "retry.jpg"
+            retry_shot.write_bytes(b"retry image")
+            write_interval_record(writer, retry_ts, retry_shot)
+            worker.retry_cache.add_failed_task(retry_shot, retry_ts.isoformat(), "offline")
+            for task_id in list(worker.retry_cache._tasks):
+                worker.retry_cache.reschedule(task_id, time.time() - 1)
+            
+            # 新規とリトライのFutureを未完了のまま保持するのだ
+            pending = []
+            def submit_image(path, route=None):
+                future = Future()
+                pending.append(future)
+                return future
+            mock_async.submit_image.side_effect = submit_image
+            
+            ts = datetime(2025, 8, 27, 10, 0, 0, tzinfo=timezone.utc)
+            screenshot = data_dir / "shot.jpg"
+            screenshot.write_bytes(b"fake image data")
+            write_interval_record(writer, ts, screenshot)
+            
+            assert worker.add_screenshot_for_ocr(screenshot, timestamp=ts) is True
+            assert worker.process_retry_queue() == 1
+            assert len(pending) == 2  # 両方が同時に飛んでいるのだ
+            
+            # 実行中のリトライタスクは次のtickで二重投入されないのだ
+            assert worker.process_retry_queue() == 0
+            
+            pending[0].set_result(OcrResult(success=True, text="新規"))
+            pending[1].set_result(OcrResult(success=True, text="リトライ"))
+            
+            records = read_records(data_dir, ts)
+            assert records[0]["screen"]["ocr_text"] == "リトライ"
+            assert records[1]["screen"]["ocr_text"] == "新規"
+            assert worker.get_stats()["retry_queue"]["total_tasks"] == 0
+            assert not screenshot.exists()
+            mock_client_class.return_value.extract_text_from_image.assert_not_called()
+    
+    def test_ocr_disabled_deletes_screenshot(self):
+        """OCR無効時はスクショを削除するだけのテストなのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = Path(tmp_dir)
+            worker = OcrWorker(create_test_config(data_dir, ocr_enabled=False), JsonlWriter(data_dir))
+            
+            screenshot = data_dir / "shot.jpg"
+            screenshot.write_bytes(b"fake image data")
+            
+            ts = datetime(2025, 8, 27, 10, 0, 0, tzinfo=timezone.utc)
+            assert worker.add_screenshot_for_ocr(screenshot, timestamp=ts) is False
+            assert not screenshot.exists()
+            assert worker.process_retry_queue() == 0
+
+
+class TestOcrWorkerMockServer:
+    """モックサーバ経由の OcrWorker テストクラスなのだ"""
+    
+    def test_worker_points_client_at_mock_server(self):
+        """OCR_MOCK_ENABLED でネットワーク無しに記録まで通るのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = Path(tmp_dir)
+            writer = JsonlWriter(data_dir)
+            config = create_test_config(
+                data_dir,
+                azure_openai_endpoint="",
+                azure_openai_key="",
+                ocr_mock_enabled=True,
+                ocr_mock_latency="fixed:0"
+            )
+            worker = OcrWorker(config, writer)
+            try:
+                assert config.azure_openai_endpoint.startswith("http://127.0.0.1:")
+                
+                ts = datetime(2025, 8, 27, 10, 0, 0, tzinfo=timezone.utc)
+                screenshot = data_dir / "shot.jpg"
+                screenshot.write_bytes(b"fake image data")
+                write_interval_record(writer, ts, screenshot)
+                
+                assert worker.add_screenshot_for_ocr(screenshot, ts) is True
+                
+                record = read_records(data_dir, ts)[0]
+                assert record["screen"]["ocr_text"]
+                assert worker.get_stats()["mock_server"]["requests"] == 1
+            finally:
+                worker.close()
+    
+    def test_warm_up_reports_ready_in_background(self):
+        """起動時ウォームアップは裏で走り、結果をヘルス状態に書くのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = Path(tmp_dir)
+            config = create_test_config(data_dir, ocr_mock_enabled=True, ocr_mock_latency="fixed:0.2")
+            worker = OcrWorker(config, JsonlWriter(data_dir))
+            try:
+                assert worker.get_health()["state"] == "unknown"
+                
+                started = time.monotonic()
+                thread = worker.start_warm_up()
+                assert time.monotonic() - started < 0.1  # 呼び出し元はブロックしないのだ
+                assert worker.get_health()["state"] == "warming"
+                
+                thread.join(timeout=5.0)
+                health = worker.get_stats()["health"]
+                assert health["state"] == "ready"
+                assert health["error"] is None
+                assert health["latency_sec"] >= 0.2
+                assert worker.mock_server.get_stats()["requests"] == 1
+            finally:
+                worker.close()
+    
+    @patch('src.ocr_worker.OcrClient')
+    def test_warm_up_failure_is_reported(self, mock_client_class):
+        """認証エラーなどはヘルス状態の failed として報告するのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = Path(tmp_dir)
+            worker = OcrWorker(create_test_config(data_dir), JsonlWriter(data_dir))
+            mock_client_class.return_value.warm_up.return_value = OcrResult(
+                success=False, error="認証エラー: APIキーを確認してください"
+            )
+            
+            worker.start_warm_up().join(timeout=5.0)
+            
+            health = worker.get_health()
+            assert health["state"] == "failed"
+            assert "認証エラー" in health["error"]
+    
+    def test_warm_up_skipped_when_ocr_disabled(self):
+        """OCR無効時はウォームアップしないのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = Path(tmp_dir)
+            worker = OcrWorker(create_test_config(data_dir, ocr_enabled=False), JsonlWriter(data_dir))
+            
+            assert worker.start_warm_up() is None
+            assert worker.get_health()["state"] == "disabled"
+
+
+class TestOcrWorkerPool:
+    """OCRスレッドプール付き OcrWorker テストクラスなのだ"""
+    
+    @patch('src.ocr_worker.OcrClient')
+    def test_tick_only_enqueues(self, mock_client_class):
+        """遅いOCRでも投入はすぐ戻り、結果はOCRスレッドで反映されるのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = Path(tmp_dir)
+            writer = JsonlWriter(data_dir)
+            worker = OcrWorker(create_test_config(data_dir, ocr_worker_threads=1), writer)
+            
+            def slow_ocr(path, route=None):
+                time.sleep(0.2)
+                return OcrResult(success=True, text="画面の説明", tokens_used=50)
+            mock_client_class.return_value.extract_text_from_image.side_effect = slow_ocr
+            
+            ts = datetime(2025, 8, 27, 10, 0, 0, tzinfo=timezone.utc)
+            screenshot = data_dir / "shot.jpg"
+            screenshot.write_bytes(b"fake image data")
+            write_interval_record(writer, ts, screenshot)
+            
+            started = time.monotonic()
+            assert worker.add_screenshot_for_ocr(screenshot, ts) is True
+            assert time.monotonic() - started < 0.1
+            
+            assert worker.wait_idle(timeout=5.0) is True
+            assert read_records(data_dir, ts)[0]["screen"]["ocr_text"] == "画面の説明"
+            stats = worker.get_stats()
+            assert stats["successful_ocr"] == 1
+            assert stats["work_queue"]["dequeued"] == 1
+            assert stats["work_queue"]["depth"] == 0
+            worker.close()
+    
+    @patch('src.ocr_worker.OcrClient')
+    def test_routing_runs_on_ocr_thread(self, mock_client_class):
+        """ルーティング（画像の読み込みとハッシュ）はtickでなくOCRスレッドで行うテストなのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = Path(tmp_dir)
+            worker = OcrWorker(
+                create_test_config(data_dir, ocr_worker_threads=1, ocr_routing_enabled=True),
+                JsonlWriter(data_dir)
+            )
+            mock_client_class.return_value.extract_text_from_image.return_value = OcrResult(
+                success=True, text="画面の説明"
+            )
+            
+            routed_on = []
+            original_route_image = worker.router.route_image
+            def route_image(*args, **kwargs):
+                routed_on.append(threading.current_thread().name)
+                return original_route_image(*args, **kwargs)
+            worker.router.route_image = route_image
+            
+            screenshot = data_dir / "shot.jpg"
+            screenshot.write_bytes(b"fake image data")
+            worker.add_screenshot_for_ocr(screenshot, datetime(2025, 8, 27, 10, 0, 0, tzinfo=timezone.utc))
+            assert worker.wait_idle(timeout=5.0) is True
+            
+            assert routed_on == ["ocr_pool_0"]
+            route = mock_client_class.return_value.extract_text_from_image.call_args.kwargs["route"]
+            assert route.tier == "full"
+            worker.close()
+    
+    @patch('src.ocr_worker.OcrClient')
+    def test_full_queue_drops_oldest_frame(self, mock_client_class):
+        """キューが満杯なら古いフレームはOCRせずメタデータだけ残すのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = Path(tmp_dir)
+            writer = JsonlWriter(data_dir)
+            worker = OcrWorker(
+                create_test_config(data_dir, ocr_worker_threads=1, ocr_queue_size=1), writer
+            )
+            release = threading.Event()
+            
+            def blocking_ocr(path, route=None):
+                release.wait(timeout=5.0)
+                return OcrResult(success=True, text=path.name, tokens_used=10)
+            mock_client_class.return_value.extract_text_from_image.side_effect = blocking_ocr
+            
+            base = datetime(2025, 8, 27, 10, 0, 0, tzinfo=timezone.utc)
+            shots = []
+            for i in range(3):
+                ts = base.replace(minute=i)
+                shot = data_dir / f"shot{i}.jpg"
+                shot.write_bytes(b"fake image data")
+                write_interval_record(writer, ts, shot)
+                shots.append((ts, shot))
+                worker.add_screenshot_for_ocr(shot, ts)
+                time.sleep(0.05)  # 1枚目がOCRスレッドに取り出されるのを待つのだ
+            
+            release.set()
+            assert worker.wait_idle(timeout=5.0) is True
+            
+            records = read_records(data_dir, base)
+            assert records[0]["screen"]["ocr_text"] == "shot0.jpg"
+            assert records[1]["ocr_usage"] == {"skipped": "queue_full"}
+            assert records[2]["screen"]["ocr_text"] == "shot2.jpg"
+            assert not shots[1][1].exists()
+            assert worker.get_stats()["queue_dropped"] == 1
+            worker.close()
+    
+    @patch('src.ocr_worker.OcrClient')
+    def test_fresh_frame_overtakes_retry_backlog(self, mock_client_class):
+        """リトライが溜まっていても新規フレームが先にOCRされるのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = Path(tmp_dir)
+            writer = JsonlWriter(data_dir)
+            worker = OcrWorker(
+                create_test_config(data_dir, ocr_worker_threads=1, ocr_retry_quota_per_tick=0), writer
+            )
+            base = datetime(2025, 8, 27, 9, 0, 0, tzinfo=timezone.utc)
+            for i in range(3):
+                shot = data_dir / f"old{i}.jpg"
+                shot.write_bytes(b"old image")
+                write_interval_record(writer, base.replace(minute=i), shot)
+                worker.retry_cache.add_failed_task(shot, base.replace(minute=i).isoformat(), "offline")
+                time.sleep(0.002)  # タスクIDはミリ秒単位なのだ
+            for task_id in list(worker.retry_cache._tasks):
+                worker.retry_cache.reschedule(task_id, time.time() - 1)
+            
+            order = []
+            gate = threading.Event()
+            
+            def ocr(path, route=None):
+                gate.wait(timeout=5.0)
+                order.append(path.name)
+                return OcrResult(success=True, text=path.name, tokens_used=10)
+            mock_client_class.return_value.extract_text_from_image.side_effect = ocr
+            
+            assert worker.process_retry_queue() == 3
+            time.sleep(0.05)  # 1件目のリトライがOCRスレッドに取り出されるのを待つのだ
+            
+            ts = datetime(2025, 8, 27, 10, 0, 0, tzinfo=timezone.utc)
+            fresh = data_dir / "fresh.jpg"
+            fresh.write_bytes(b"fresh image")
+            write_interval_record(writer, ts, fresh)
+            worker.add_screenshot_for_ocr(fresh, ts)
+            
+            gate.set()
+            assert worker.wait_idle(timeout=5.0) is True
+            
+            # 処理中だった1件の次に新規フレームが割り込むのだ
+            assert order[1] == "fresh.jpg"
+            assert len(order) == 4
+            assert worker.retry_cache.get_cache_stats()["total_tasks"] == 0
+            worker.close()
+    
+    @patch('src.ocr_worker.OcrClient')
+    def test_retry_quota_defers_rest(self, mock_client_class):
+        """1tickのリトライ上限を超えた分は次回に回すのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = Path(tmp_dir)
+            writer = JsonlWriter(data_dir)
+            worker = OcrWorker(create_test_config(data_dir, ocr_retry_quota_per_tick=2), writer)
+            mock_client_class.return_value.extract_text_from_image.return_value = OcrResult(
+                success=True, text="復帰後", tokens_used=10
+            )
+            base = datetime(2025, 8, 27, 9, 0, 0, tzinfo=timezone.utc)
+            for i in range(5):
+                shot = data_dir / f"old{i}.jpg"
+                shot.write_bytes(b"old image")
+                write_interval_record(writer, base.replace(minute=i), shot)
+                worker.retry_cache.add_failed_task(shot, base.replace(minute=i).isoformat(), "offline")
+                time.sleep(0.002)
+            for task_id in list(worker.retry_cache._tasks):
+                worker.retry_cache.reschedule(task_id, time.time() - 1)
+            
+            assert worker.process_retry_queue() == 2
+            assert worker.get_stats()["retry_deferred"] == 3
+            assert worker.retry_cache.get_cache_stats()["total_tasks"] == 3
+
+
+class TestOcrWorkerBacklogDrain:
+    """復帰後のバックログ一括消化のテストなのだ"""
+    
+    @patch('src.ocr_worker.OcrClient')
+    def test_fresh_success_drains_backlog(self, mock_client_class):
+        """新規OCRの成功で滞留がまとめて消化されるテストなのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = Path(tmp_dir)
+            config = create_test_config(data_dir, ocr_drain_min_backlog=3, ocr_drain_max_concurrency=4)
+            writer = JsonlWriter(data_dir)
+            worker = OcrWorker(config, writer)
+            
+            base = datetime(2025, 8, 27, 9, 0, 0, tzinfo=timezone.utc)
+            for i in range(6):
+                shot = data_dir / f"old{i}.jpg"
+                shot.write_bytes(b"old image")
+                write_interval_record(writer, base.replace(minute=i), shot)
+                worker.retry_cache.add_failed_task(shot, base.replace(minute=i).isoformat(), "offline")
+                time.sleep(0.002)
+            for task_id in list(worker.retry_cache._tasks):
+                worker.retry_cache.reschedule(task_id, time.time() - 1)
+            
+            mock_client_class.return_value.extract_text_from_image.return_value = OcrResult(
+                success=True, text="復帰", tokens_used=5
+            )
+            
+            ts = datetime(2025, 8, 27, 10, 0, 0, tzinfo=timezone.utc)
+            screenshot = data_dir / "shot.jpg"
+            screenshot.write_bytes(b"fake image data")
+            write_interval_record(writer, ts, screenshot)
+            assert worker.add_screenshot_for_ocr(screenshot, timestamp=ts) is True
+            
+            deadline = time.time() + 5.0
+            while worker.drainer.runs == 0 and time.time() < deadline:
+                time.sleep(0.01)
+            
+            drain = worker.get_stats()["drain"]
+            assert drain["last"]["stop_reason"] == "empty"
+            assert drain["last"]["succeeded"] == 6
+            assert drain["last"]["peak_concurrency"] > 1
+            assert drain["last"]["time_to_empty_sec"] is not None
+            assert worker.retry_cache.get_cache_stats()["total_tasks"] == 0
+            assert all(r["screen"]["ocr_text"] == "復帰" for r in read_records(data_dir, base))
+            worker.close()
+    
+    @patch('src.ocr_worker.OcrClient')
+    def test_small_backlog_left_to_tick(self, mock_client_class):
+        """滞留が少なければ一括消化しないテストなのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = Path(tmp_dir)
+            config = create_test_config(data_dir, ocr_drain_min_backlog=3)
+            worker = OcrWorker(config, JsonlWriter(data_dir))
+            
+            shot = data_dir / "old.jpg"
+            shot.write_bytes(b"old image")
+            worker.retry_cache.add_failed_task(shot, "2025-08-27T09:00:00+00:00", "offline")
+            for task_id in list(worker.retry_cache._tasks):
+                worker.retry_cache.reschedule(task_id, time.time() - 1)
+            
+            assert worker.maybe_start_drain() is False
+            assert worker.get_stats()["drain"]["runs"] == 0
+            worker.close()
+    
+    @patch('src.ocr_worker.OcrClient')
+    def test_server_429_keeps_attempts(self, mock_client_class):
+        """サーバの429ではリトライ回数を消費せずタスクを残すテストなのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = Path(tmp_dir)
+            worker = OcrWorker(create_test_config(data_dir, retry_max_attempts=2), JsonlWriter(data_dir))
+            mock_client_class.return_value.extract_text_from_image.return_value = OcrResult(
+                success=False, error="API利用制限エラー (Rate Limit): Error code: 429"
+            )
+            
+            shot = data_dir / "old.jpg"
+            shot.write_bytes(b"old image")
+            task_id = worker.retry_cache.add_failed_task(shot, "2025-08-27T09:00:00+00:00", "offline")
+            worker.retry_cache.reschedule(task_id, time.time() - 1)
+            
+            # 滞留消化のウェーブと同じ経路で何度429を受けても捨てないのだ
+            for _ in range(3):
+                task = worker.retry_cache.get_task(task_id)
+                worker._complete_retry_outcomes([(task, worker._ocr_retry_task(task))])
+            
+            assert worker.retry_cache.get_task(task_id).attempt_count == 1
+            worker.close()
+
+
+class TestOcrWorkerShutdown:
+    """期限付き停止のテストなのだ"""
+    
+    @patch('src.ocr_worker.OcrClient')
+    def test_inflight_past_deadline_is_persisted(self, mock_client_class):
+        """期限までに終わらないOCRと未着手のフレームはリトライキューへ退避されるのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = Path(tmp_dir)
+            writer = JsonlWriter(data_dir)
+            worker = OcrWorker(create_test_config(data_dir, ocr_worker_threads=1), writer)
+            release = threading.Event()
+            
+            def blocking_ocr(path, route=None):
+                release.wait(timeout=5.0)
+                return OcrResult(success=True, text="遅すぎた", tokens_used=10)
+            mock_client_class.return_value.extract_text_from_image.side_effect = blocking_ocr
+            
+            base = datetime(2025, 8, 27, 10, 0, 0, tzinfo=timezone.utc)
+            shots = []
+            for i in range(2):
+                shot = data_dir / f"shot{i}.jpg"
+                shot.write_bytes(b"fake image data")
+                write_interval_record(writer, base.replace(minute=i), shot)
+                worker.add_screenshot_for_ocr(shot, base.replace(minute=i))
+                shots.append(shot)
+                time.sleep(0.05)  # 1枚目がOCRスレッドに取り出されるのを待つのだ
+            
+            started = time.monotonic()
+            report = worker.shutdown(deadline_sec=0.2)
+            assert time.monotonic() - started < 2.0
+            
+            assert report["completed"] is False
+            assert report["queued_persisted"] == 1
+            assert report["inflight_persisted"] == 1
+            assert report["retry_tasks"] == 2
+            assert not any(shot.exists() for shot in shots)
+            
+            # 退避後に届いた結果は反映せず、再起動後のリトライに任せるのだ
+            release.set()
+            time.sleep(0.1)
+            assert all(r["screen"]["ocr_text"] == "" for r in read_records(data_dir, base))
+            
+            # 再起動するとリトライキューから再開できるのだ
+            restarted = OcrWorker(create_test_config(data_dir), writer)
+            assert restarted.retry_cache.get_cache_stats()["total_tasks"] == 2
+            # 送っていない未着手分は試行回数0、実行中だった分は1回と数えるのだ
+            attempts = sorted(t.attempt_count for t in restarted.retry_cache._tasks.values())
+            assert attempts == [0, 1]
+            restarted.close()
+    
+    @patch('src.ocr_worker.OcrClient')
+    def test_shutdown_waits_for_inflight_within_deadline(self, mock_client_class):
+        """期限内に終わるOCRは待って結果を反映するのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = Path(tmp_dir)
+            writer = JsonlWriter(data_dir)
+            worker = OcrWorker(create_test_config(data_dir, ocr_worker_threads=1), writer)
+            
+            def slow_ocr(path, route=None):
+                time.sleep(0.2)
+                return OcrResult(success=True, text="間に合った", tokens_used=10)
+            mock_client_class.return_value.extract_text_from_image.side_effect = slow_ocr
+            
+            ts = datetime(2025, 8, 27, 10, 0, 0, tzinfo=timezone.utc)
+            screenshot = data_dir / "shot.jpg"
+            screenshot.write_bytes(b"fake image data")
+            write_interval_record(writer, ts, screenshot)
+            worker.add_screenshot_for_ocr(screenshot, ts)
+            time.sleep(0.05)
+            
+            report = worker.shutdown(deadline_sec=5.0)
+            
+            assert report["completed"] is True
+            assert report["inflight_persisted"] == 0
+            assert read_records(data_dir, ts)[0]["screen"]["ocr_text"] == "間に合った"
+            assert worker.retry_cache.get_cache_stats()["total_tasks"] == 0
+    
+    @patch('src.ocr_worker.OcrClient')
+    def test_frames_after_stop_go_to_retry_cache(self, mock_client_class):
+        """停止処理中に撮影されたフレームはOCRせずリトライキューへ入るのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = Path(tmp_dir)
+            worker = OcrWorker(create_test_config(data_dir), JsonlWriter(data_dir))
+            worker.stop_accepting()
+            
+            ts = datetime(2025, 8, 27, 10, 0, 0, tzinfo=timezone.utc)
+            screenshot = data_dir / "shot.jpg"
+            screenshot.write_bytes(b"fake image data")
+            
+            assert worker.add_screenshot_for_ocr(screenshot, ts) is False
+            mock_client_class.return_value.extract_text_from_image.assert_not_called()
+            assert not screenshot.exists()
+            assert worker.retry_cache.get_cache_stats()["total_tasks"] == 1
+            assert next(iter(worker.retry_cache._tasks.values())).attempt_count == 0
+            worker.close()
+    
+    @patch('src.ocr_worker.OcrClient')
+    @patch('src.ocr_worker.AsyncOcrClient')
+    def test_shutdown_settles_async_retries_before_closing_cache(self, mock_async_class, mock_client_class):
+        """投入中の非同期リトライは、期限内の完了は反映し、残りは取り消してからキャッシュを閉じるのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = Path(tmp_dir)
+            writer = JsonlWriter(data_dir)
+            worker = OcrWorker(create_test_config(data_dir, ocr_max_in_flight=4), writer)
+            
+            ts = datetime(2025, 8, 27, 10, 0, 0, tzinfo=timezone.utc)
+            for i in range(2):
+                shot = data_dir / f"retry{i}.jpg"
+                shot.write_bytes(f"retry image {i}".encode("utf-8"))
+                write_interval_record(writer, ts.replace(minute=i), shot)
+                worker.retry_cache.add_failed_task(shot, ts.replace(minute=i).isoformat(), "offline")
+            for task_id in list(worker.retry_cache._tasks):
+                worker.retry_cache.reschedule(task_id, time.time() - 1)
+            
+            pending = []
+            def submit_image(path, route=None):
+                future = Future()
+                pending.append(future)
+                return future
+            mock_async_class.return_value.submit_image.side_effect = submit_image
+            assert worker.process_retry_queue() == 2
+            
+            # 1件は停止の待ち時間中に返り、もう1件は返らないのだ
+            threading.Timer(
+                0.1, lambda: pending[0].set_result(OcrResult(success=True, text="間に合った"))
+            ).start()
+            worker.shutdown(deadline_sec=0.5)
+            
+            assert pending[1].cancelled()
+            assert worker._retry_futures == set()
+            assert worker._inflight_task_ids == set()
+            records = read_records(data_dir, ts)
+            assert [r["screen"]["ocr_text"] for r in records] == ["間に合った", ""]
+            
+            # 取り消した分は試行に数えずに残るのだ
+            restarted = OcrWorker(create_test_config(data_dir), writer)
+            assert [t.attempt_count for t in restarted.retry_cache._tasks.values()] == [1]
+            restarted.close()
+
@@ -0,0 +1,124 @@
+"""RateLimiter のテストなのだ"""
+import asyncio
+import time
+
+from src.rate_limiter import RateLimiter, TokenBucket, parse_duration, parse_retry_after
+
+
+class TestHeaderParsing:
+    """ヘッダ解析テストクラスなのだ"""
+    
+    def test_parse_duration(self):
+        """期間文字列の解析テストなのだ"""
+        assert parse_duration("1.5") == 1.5
+        assert parse_duration("20ms") == 0.02
+        assert parse_duration("6m0s") == 360.0
+        assert parse_duration("1h2m3s") == 3723.0
+        assert parse_duration("") is None
+        assert parse_duration("soon") is None
+    
+    def test_parse_retry_after(self):
+        """Retry-After系ヘッダの解析テストなのだ"""
+        assert parse_retry_after({"Retry-After": "12"}) == 12.0
+        assert parse_retry_after({"retry-after-ms": "250"}) == 0.25
+        assert parse_retry_after({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}) == 0.0
+        assert parse_retry_after({"x-other": "1"}) is None
+
+
+class TestTokenBucket:
+    """TokenBucket テストクラスなのだ"""
+    
+    def test_wait_time_after_consume(self):
+        """使い切ると補充レートに応じた待ち時間になるのだ"""
+        bucket = TokenBucket(per_minute=60)  # 1個/秒
+        now = bucket.updated_at
+        
+        assert bucket.wait_time(60, now) == 0.0
+        bucket.consume(60)
+        assert abs(bucket.wait_time(2, now) - 2.0) < 1e-6
+        assert bucket.wait_time(1, now + 1.0) == 0.0
+
+
+class TestRateLimiter:
+    """RateLimiter テストクラスなのだ"""
+    
+    def test_unlimited_by_default(self):
+        """上限0なら常に通すのだ"""
+        limiter = RateLimiter()
+        
+        assert all(limiter.acquire() for _ in range(100))
+        assert limiter.get_stats()["allowed"] == 100
+    
+    def test_rpm_limit_sheds_when_wait_too_long(self):
+        """RPMを使い切って待ちが長すぎる場合は送信せず捨てるのだ"""
+        limiter = RateLimiter(rpm_limit=2, max_wait_sec=0.5)
+        
+        assert limiter.acquire() is True
+        assert limiter.acquire() is True
+        assert limiter.acquire() is False  # 次の枠は30秒後
+        
+        stats = limiter.get_stats()
+        assert stats["allowed"] == 2
+        assert stats["shed"] == 1
+    
+    def test_rpm_limit_waits_for_short_gap(self):
+        """待ちが短ければ枠が空くまで待ってから通すのだ"""
+        limiter = RateLimiter(rpm_limit=600, max_wait_sec=1.0)  # 10個/秒
+        for _ in range(600):
+            limiter.try_acquire()
+        
+        start = time.monotonic()
+        assert limiter.acquire() is True
+        assert 0.05 <= time.monotonic() - start < 0.5
+        assert limiter.get_stats()["waited_sec"] > 0
+    
+    def test_tpm_limit_uses_actual_usage(self):
+        """実使用トークンで枠とリクエストあたり推定が補正されるのだ"""
+        limiter = RateLimiter(tpm_limit=3000, max_wait_sec=0.0, default_tokens_per_request=1000)
+        
+        assert limiter.acquire() is True
+        limiter.record_usage(2500, estimated_tokens=1000)  # 想定より多く使ったのだ
+        
+        assert limiter.acquire() is False
+        assert limiter.estimate_tokens() == 1300
+    
+    def test_retry_after_blocks_requests(self):
+        """429のRetry-Afterの間は送信を止めるのだ"""
+        limiter = RateLimiter(max_wait_sec=0.5)
+        
+        waited = limiter.record_rate_limited({"retry-after": "30"})
+        
+        assert waited == 30.0
+        assert limiter.acquire() is False
+        stats = limiter.get_stats()
+        assert stats["rate_limited_responses"] == 1
+        assert 29.0 < stats["blocked_for_sec"] <= 30.0
+    
+    def test_retry_after_default_without_header(self):
+        """ヘッダが無い429は既定の待ち時間にするのだ"""
+        limiter = RateLimiter(default_retry_after_sec=0.1, max_wait_sec=1.0)
+        
+        assert limiter.record_rate_limited(None) == 0.1
+        assert limiter.acquire() is True
+    
+    def test_remaining_headers_sync_buckets(self):
+        """x-ratelimit-remaining がゼロならリセットまで止めるのだ"""
+        limiter = RateLimiter(rpm_limit=100, tpm_limit=100000, max_wait_sec=0.5)
+        
+        limiter.update_from_headers({
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-reset-requests": "10s",
+            "x-ratelimit-remaining-tokens": "5000"
+        })
+        
+        assert limiter.acquire() is False
+        assert limiter.get_stats()["blocked_for_sec"] > 9.0
+    
+    def test_acquire_async(self):
+        """asyncio版でも同じ判定になるのだ"""
+        limiter = RateLimiter(rpm_limit=1, max_wait_sec=0.1)
+        
+        async def run():
+            return [await limiter.acquire_async(), await limiter.acquire_async()]
+        
+        assert asyncio.run(run()) == [True, False]
@@ -1,4 +1,6 @@
 """RetryCache のテストなのだ"""
+import hashlib
+import os
 import tempfile
 import time
 import json
@@ -105,10 +107,10 @@ class TestRetryCache:
             # キャッシュファイルが作成されることを確認
             cached_files = list(cache.cache_dir.glob("*.jpg"))
             assert len(cached_files) == 1
-            assert cached_files[0].name == f"{task_id}.jpg"
+            assert cached_files[0].name == f"{hashlib.sha256(b'fake image data').hexdigest()}.jpg"
             
             # タスク内容を確認
-            task = cache._tasks[0]
+            task = cache.get_task(task_id)
             assert task.task_id == task_id
             assert task.original_timestamp == "2025-08-27T10:00:00+00:00"
             assert task.error_message == "OCR failed"
@@ -136,7 +138,7 @@ class TestRetryCache:
             assert len(ready_tasks) == 0
             
             # リトライ時刻を過去に設定
-            cache._tasks[0].next_retry_at = time.time() - 100
+            cache.reschedule(task_id, time.time() - 100)
             
             # リトライ準備完了
             ready_tasks = cache.get_ready_tasks()
@@ -196,7 +198,7 @@ class TestRetryCache:
             assert success is True
             assert len(cache._tasks) == 1  # まだタスクは残る
             
-            task = cache._tasks[0]
+            task = cache.get_task(task_id)
             assert task.attempt_count == 2
             assert task.error_message == "Retry failed"
             assert task.next_retry_at > time.time()  # 次のリトライ時間が設定される
@@ -243,7 +245,7 @@ class TestRetryCache:
             
             # 作成時刻を25時間前に設定
             old_time = time.time() - (25 * 3600)
-            cache._tasks[0].created_at = old_time
+            cache.get_task(task_id).created_at = old_time
             
             # 掃除実行
             cleaned_count = cache.cleanup_old_tasks(max_age_hours=24)
@@ -308,8 +310,8 @@ class TestRetryCache:
             cache2 = RetryCache(cache_dir)
             
             assert len(cache2._tasks) == 1
-            assert cache2._tasks[0].task_id == task_id
-            assert cache2._tasks[0].original_timestamp == "2025-08-27T10:00:00+00:00"
+            assert cache2.get_task(task_id).task_id == task_id
+            assert cache2.get_task(task_id).original_timestamp == "2025-08-27T10:00:00+00:00"
     
     def test_force_clear_all_tasks(self):
         """全タスク強制クリアテストなのだ"""
@@ -339,4 +341,245 @@ class TestRetryCache:
             # 画像ファイルも全て削除されることを確認
             cached_files = list(cache.cache_dir.glob("*.jpg"))
             assert len(cached_files) == 0
+    
+    def test_updates_are_persisted_per_task(self):
+        """再スケジュールと削除がDBに反映され、再起動後も引き継がれるテストなのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_dir = Path(tmp_dir) / "retry_test"
+            cache1 = RetryCache(cache_dir, max_attempts=3)
+            
+            task_ids = []
+            for i in range(2):
+                test_image = Path(tmp_dir) / f"test_image_{i}.jpg"
+                test_image.write_bytes(b"fake image data")
+                task_ids.append(cache1.add_failed_task(
+                    image_path=test_image,
+                    original_timestamp=f"2025-08-27T10:{i:02d}:00+00:00",
+                    error_message="OCR failed"
+                ))
+            
+            cache1.mark_task_attempted(task_ids[0], False, "Retry failed")
+            cache1.mark_task_attempted(task_ids[1], True)
+            cache1.close()
+            
+            cache2 = RetryCache(cache_dir, max_attempts=3)
+            assert list(cache2._tasks) == [task_ids[0]]
+            assert cache2.get_task(task_ids[0]).attempt_count == 2
+            assert cache2.get_task(task_ids[0]).error_message == "Retry failed"
+            # 同じ内容の画像は共有していたので、片方が成功しても画像は残るのだ
+            assert cache2.get_task(task_ids[0]).image_path.exists()
+            cache2.close()
+    
+    def test_wal_mode(self):
+        """SQLiteがWALモードで開かれるテストなのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = RetryCache(Path(tmp_dir) / "retry_test")
+            
+            mode = cache._conn.execute("PRAGMA journal_mode").fetchone()[0]
+            assert mode.lower() == "wal"
+            assert cache.db_path.exists()
+            cache.close()
+    
+    def test_migrates_legacy_json_file(self):
+        """旧形式の retry_tasks.json がDBへ移行されるテストなのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_dir = Path(tmp_dir) / "retry_test"
+            retry_dir = cache_dir / "retry"
+            retry_dir.mkdir(parents=True)
+            
+            legacy = [{
+                "task_id": "retry_1000",
+                "image_path": str(retry_dir / "retry_1000.jpg"),
+                "created_at": 1000.0,
+                "last_attempt_at": 1000.0,
+                "attempt_count": 2,
+                "next_retry_at": 1001.0,
+                "original_timestamp": "2025-08-27T10:00:00+00:00",
+                "error_message": "offline"
+            }]
+            (retry_dir / "retry_tasks.json").write_text(json.dumps(legacy), encoding="utf-8")
+            
+            cache = RetryCache(cache_dir)
+            assert len(cache._tasks) == 1
+            assert cache.get_task("retry_1000").attempt_count == 2
+            assert not cache.tasks_file.exists()
+            assert (retry_dir / "retry_tasks.json.migrated").exists()
+            cache.close()
+            
+            # 2回目の起動では移行済みのDBから読むのだ
+            cache = RetryCache(cache_dir)
+            assert list(cache._tasks) == ["retry_1000"]
+            cache.close()
+    
+    def test_ready_tasks_follow_next_retry_at(self):
+        """リトライ時刻を過ぎたものだけが、再スケジュール後の時刻で取り出されるテストなのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = RetryCache(Path(tmp_dir) / "retry_test", max_attempts=5, base_delay=60.0)
+            
+            task_ids = []
+            for i in range(4):
+                test_image = Path(tmp_dir) / f"test_image_{i}.jpg"
+                test_image.write_bytes(b"fake image data")
+                task_ids.append(cache.add_failed_task(
+                    test_image, f"2025-08-27T10:{i:02d}:00+00:00", "OCR failed"
+                ))
+            
+            now = time.time()
+            cache.reschedule(task_ids[2], now - 20)
+            cache.reschedule(task_ids[0], now - 10)
+            cache.reschedule(task_ids[3], now - 5)
+            cache.reschedule(task_ids[3], now + 100)  # 後から先送りした分は出てこないのだ
+            
+            assert [t.task_id for t in cache.get_ready_tasks()] == [task_ids[2], task_ids[0]]
+            
+            # 失敗で再スケジュールされたら準備済みから外れるのだ
+            cache.mark_task_attempted(task_ids[2], False, "Retry failed")
+            assert [t.task_id for t in cache.get_ready_tasks()] == [task_ids[0]]
+            assert cache.get_cache_stats()["ready_tasks"] == 1
+    
+    def test_stats_totals_track_mutations(self):
+        """件数と容量の合計が追加・削除に追従するテストなのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = RetryCache(Path(tmp_dir) / "retry_test")
+            
+            task_ids = []
+            for i in range(3):
+                test_image = Path(tmp_dir) / f"test_image_{i}.jpg"
+                test_image.write_bytes(b"x" * 1024 * (i + 1))
+                task_ids.append(cache.add_failed_task(
+                    test_image, f"2025-08-27T10:{i:02d}:00+00:00", "OCR failed"
+                ))
+            assert cache.get_cache_stats()["total_size_mb"] == 6 * 1024 / (1024 * 1024)
+            
+            cache.mark_task_attempted(task_ids[1], True)
+            stats = cache.get_cache_stats()
+            assert stats["total_tasks"] == 2
+            assert stats["total_size_mb"] == 4 * 1024 / (1024 * 1024)
+            assert len(cache) == 2
+            
+            # 再起動後も画像サイズから合計を組み立て直すのだ
+            cache.close()
+            reopened = RetryCache(Path(tmp_dir) / "retry_test")
+            assert reopened.get_cache_stats()["total_size_mb"] == 4 * 1024 / (1024 * 1024)
+            reopened.close()
+    
+    def test_identical_images_share_one_file(self):
+        """同じ内容の画像は1つのファイルを参照数で共有するテストなのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = RetryCache(Path(tmp_dir) / "retry_test")
+            
+            task_ids = []
+            for i in range(2):
+                test_image = Path(tmp_dir) / f"test_image_{i}.jpg"
+                test_image.write_bytes(b"x" * 1024)
+                task_ids.append(cache.add_failed_task(
+                    test_image, f"2025-08-27T10:{i:02d}:00+00:00", "OCR failed"
+                ))
+            
+            assert len(list(cache.cache_dir.glob("*.jpg"))) == 1
+            stats = cache.get_cache_stats()
+            assert stats["total_tasks"] == 2
+            assert stats["unique_images"] == 1
+            assert stats["deduplicated"] == 1
+            assert stats["total_size_mb"] == 1024 / (1024 * 1024)
+            
+            # 片方を消しても、もう片方が参照しているので画像は残るのだ
+            cache.mark_task_attempted(task_ids[0], True)
+            assert cache.get_task(task_ids[1]).image_path.exists()
+            cache.mark_task_attempted(task_ids[1], True)
+            assert list(cache.cache_dir.glob("*.jpg")) == []
+            assert cache.get_cache_stats()["total_size_mb"] == 0
+            cache.close()
+    
+    def test_move_and_hardlink_instead_of_copy(self):
+        """move=True なら元画像を移し、そうでなければハードリンクを張るテストなのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = RetryCache(Path(tmp_dir) / "retry_test")
+            
+            moved_image = Path(tmp_dir) / "moved.jpg"
+            moved_image.write_bytes(b"moved image")
+            moved_id = cache.add_failed_task(moved_image, "2025-08-27T10:00:00+00:00", "OCR failed", move=True)
+            assert not moved_image.exists()
+            assert cache.get_task(moved_id).image_path.read_bytes() == b"moved image"
+            
+            linked_image = Path(tmp_dir) / "linked.jpg"
+            linked_image.write_bytes(b"linked image")
+            linked_id = cache.add_failed_task(linked_image, "2025-08-27T10:01:00+00:00", "OCR failed")
+            assert linked_image.exists()
+            assert os.path.samefile(linked_image, cache.get_task(linked_id).image_path)
+            cache.close()
+    
+    def test_capacity_evicts_oldest_tasks(self):
+        """枚数・容量の上限を超えたら古い順に捨てて on_evict に渡すテストなのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            evicted = []
+            cache = RetryCache(
+                Path(tmp_dir) / "retry_test", max_tasks=3, max_bytes=4 * 1024, on_evict=evicted.append
+            )
+            
+            task_ids = []
+            for i in range(4):
+                test_image = Path(tmp_dir) / f"test_image_{i}.jpg"
+                test_image.write_bytes(bytes([i]) * 1024)
+                task_ids.append(cache.add_failed_task(
+                    test_image, f"2025-08-27T10:{i:02d}:00+00:00", "OCR failed"
+                ))
+            
+            # 4件目で枚数上限を超えたので一番古いものが捨てられるのだ
+            assert [t.task_id for t in evicted] == [task_ids[0]]
+            assert list(cache._tasks) == task_ids[1:]
+            assert not evicted[0].image_path.exists()
+            
+            # 容量上限（4KB）を超える画像を入れると、収まるまで古い順に捨てるのだ
+            big_image = Path(tmp_dir) / "big.jpg"
+            big_image.write_bytes(b"b" * 3 * 1024)
+            big_id = cache.add_failed_task(big_image, "2025-08-27T10:10:00+00:00", "OCR failed")
+            assert [t.task_id for t in evicted] == task_ids[:3]
+            assert list(cache._tasks) == [task_ids[3], big_id]
+            
+            stats = cache.get_cache_stats()
+            assert stats["evicted_tasks"] == 3
+            assert stats["evicted_size_mb"] == 3 * 1024 / (1024 * 1024)
+            assert stats["total_size_mb"] == 4 * 1024 / (1024 * 1024)
+            cache.close()
+    
+    def test_next_due_at_and_schedule_callback(self):
+        """次のリトライ時刻を返し、予定が決まるたびに知らせるテストなのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            scheduled = []
+            cache = RetryCache(Path(tmp_dir) / "retry_test", base_delay=30.0, on_schedule=scheduled.append)
+            assert cache.next_due_at() is None
+            
+            test_image = Path(tmp_dir) / "test_image.jpg"
+            test_image.write_bytes(b"fake image data")
+            task_id = cache.add_failed_task(test_image, "2025-08-27T10:00:00+00:00", "OCR failed")
+            task = cache.get_task(task_id)
+            assert cache.next_due_at() == task.next_retry_at
+            assert scheduled == [task.next_retry_at]
+            
+            # 時刻が来たタスクは準備済みになり、次の予定からは外れるのだ
+            cache.reschedule(task_id, time.time() - 1)
+            assert len(scheduled) == 2
+            assert cache.next_due_at() is None
+            assert cache.get_cache_stats()["next_due_in_sec"] is None
+            cache.close()
+    
+    def test_schedule_callback_runs_outside_lock(self):
+        """on_schedule はキャッシュのロックを放してから呼ばれるテストなのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            lock_held = []
+            cache = RetryCache(
+                Path(tmp_dir) / "retry_test",
+                base_delay=30.0,
+                on_schedule=lambda _: lock_held.append(cache._lock._is_owned())
+            )
+            
+            test_image = Path(tmp_dir) / "test_image.jpg"
+            test_image.write_bytes(b"fake image data")
+            task_id = cache.add_failed_task(test_image, "2025-08-27T10:00:00+00:00", "OCR failed")
+            cache.reschedule(task_id, time.time() + 60)
+            cache.mark_task_attempted(task_id, False, "OCR failed")
+            
+            assert lock_held == [False, False, False]
+            cache.close()
 
@@ -127,3 +127,42 @@ class TestTimeSlicer:
         # 二重停止も安全なのだ
         slicer.stop()
         assert not slicer.is_running()
+    
+    def test_stop_waits_for_running_tick(self):
+        """停止は実行中のtickの終わりを待つテストなのだ"""
+        slicer = TimeSlicer(interval_sec=0.1)
+        entered = threading.Event()
+        finished = {"value": False}
+        
+        def slow_callback():
+            entered.set()
+            time.sleep(0.3)
+            finished["value"] = True
+        
+        slicer.add_callback(slow_callback, "slow")
+        slicer.start()
+        assert entered.wait(timeout=2.0)
+        
+        assert slicer.stop(timeout=2.0) is True
+        assert finished["value"] is True
+    
+    def test_stop_gives_up_after_timeout(self):
+        """tickが期限内に終わらなければ False を返すテストなのだ"""
+        slicer = TimeSlicer(interval_sec=0.1)
+        entered = threading.Event()
+        release = threading.Event()
+        
+        def blocking_callback():
+            entered.set()
+            release.wait(timeout=5.0)
+        
+        slicer.add_callback(blocking_callback, "blocking")
+        slicer.start()
+        assert entered.wait(timeout=2.0)
+        
+        started = time.monotonic()
+        assert slicer.stop(timeout=0.1) is False
+        assert time.monotonic() - started < 1.0
+        release.set()
+        assert slicer.stop(timeout=2.0) is True
+
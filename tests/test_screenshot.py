@@ -191,3 +191,51 @@ class TestScreenshotService:
                 assert monitors[0]["width"] == 3840
                 assert monitors[1]["height"] == 1080
                 assert monitors[1]["left"] == 100
+    
+    @patch('src.screenshot.mss.mss')
+    def test_capture_and_save_with_encoder_pool(self, mock_mss_class):
+        """エンコーダプール経由で保存されるテストなのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            mock_pool = Mock()
+            mock_pool.is_running.return_value = True
+            mock_pool.encode.return_value = b"jpeg_from_pool"
+            service = ScreenshotService(Path(tmp_dir), encoder_pool=mock_pool)
+            
+            mock_sct = Mock()
+            mock_mss_class.return_value.__enter__.return_value = mock_sct
+            mock_sct.monitors = [{"width": 1920, "height": 1080}] * 2
+            mock_screenshot = Mock()
+            mock_screenshot.size = (1920, 1080)
+            mock_screenshot.raw = bytearray(b"raw_bgra")
+            mock_sct.grab.return_value = mock_screenshot
+            
+            result_path = service.capture_and_save()
+            
+            assert result_path is not None
+            assert result_path.read_bytes() == b"jpeg_from_pool"
+            mock_pool.encode.assert_called_once_with(
+                mock_screenshot.raw, (1920, 1080), max_dim=1920, quality=70
+            )
+    
+    @patch('src.screenshot.mss.mss')
+    def test_capture_thumbnail(self, mock_mss_class):
+        """変化検知用サムネイル撮影テストなのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            service = ScreenshotService(Path(tmp_dir))
+            
+            mock_sct = Mock()
+            mock_mss_class.return_value.__enter__.return_value = mock_sct
+            mock_sct.monitors = [{"width": 64, "height": 36}] * 2
+            mock_screenshot = Mock()
+            mock_screenshot.size = (64, 36)
+            mock_screenshot.bgra = b"\x80\x80\x80\x00" * 64 * 36
+            mock_sct.grab.return_value = mock_screenshot
+            
+            thumbnail = service.capture_thumbnail(size=(32, 18))
+            
+            assert thumbnail is not None
+            assert len(thumbnail) == 32 * 18  # グレースケール1バイト/画素
+            assert set(thumbnail) == {128}
+            
+            # キャッシュには何も保存されないのだ
+            assert service.get_cache_stats()["file_count"] == 0
@@ -0,0 +1,65 @@
+"""StartupProfiler と遅延importのテストなのだ"""
+import subprocess
+import sys
+from pathlib import Path
+
+from src.startup_profile import StartupProfiler
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+class TestStartupProfiler:
+    """StartupProfiler テストクラスなのだ"""
+
+    def test_disabled_without_flag(self):
+        """--profile-startup が無ければ何もしないのだ"""
+        assert StartupProfiler.from_argv(["main.py"]) is None
+
+    def test_records_import_times_and_milestones(self):
+        """計測中のimportとマイルストーンを記録するのだ"""
+        sys.modules.pop("colorsys", None)
+        profiler = StartupProfiler.from_argv(["main.py", "--profile-startup"])
+        try:
+            import colorsys  # noqa: F401  計測対象の軽いモジュールなのだ
+            profiler.mark("first_record")
+        finally:
+            profiler.uninstall()
+
+        assert "colorsys" in profiler.import_times
+        assert profiler.has_mark("first_record")
+        assert profiler.has_mark("config_loaded") is False
+        assert dict(profiler.package_times())["colorsys"] >= 0.0
+
+        report = profiler.report()
+        assert "colorsys" in report
+        assert "first_record" in report
+
+
+class TestLazyImports:
+    """重い依存の遅延importテストクラスなのだ"""
+
+    def test_heavy_dependencies_not_imported_at_module_load(self):
+        """モジュール読み込みだけでは openai・PIL・pynput を読み込まないのだ"""
+        code = (
+            "import sys\n"
+            "import src.jsonl_writer, src.keylogger, src.screenshot, src.ocr_worker\n"
+            "print(','.join(m for m in ('openai', 'PIL', 'pynput', 'mss') if m in sys.modules))\n"
+        )
+        completed = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            timeout=60
+        )
+
+        assert completed.returncode == 0, completed.stderr
+        assert completed.stdout.strip() == ""
+
+    def test_lazy_attributes_resolve_on_access(self):
+        """遅延importした依存もモジュール属性として参照できるのだ"""
+        import src.ocr_client
+        import src.screenshot
+
+        assert src.ocr_client.AzureOpenAI.__name__ == "AzureOpenAI"
+        assert src.screenshot.Image.__name__ == "PIL.Image"
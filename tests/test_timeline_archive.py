@@ -0,0 +1,187 @@
+"""TimelineArchive のテストなのだ"""
+import random
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from PIL import Image, ImageChops, ImageDraw, ImageStat
+
+from src.timeline_archive import TimelineArchive
+
+
+def make_background() -> Image.Image:
+    """文字が並んだ画面っぽい固定パターンの背景を作るのだ"""
+    rng = random.Random(0)
+    img = Image.new("RGB", (320, 192), (240, 240, 240))
+    draw = ImageDraw.Draw(img)
+    for y in range(24, 192, 12):
+        for x in range(4, 316, 8):
+            if rng.random() < 0.7:
+                draw.text((x, y), rng.choice("abcdefghijklmnop"), fill=(20, 20, 20))
+    return img
+
+
+BACKGROUND = make_background()
+
+
+def save_frame(path: Path, box=None, color=(200, 30, 30)) -> Path:
+    """テスト用スクリーンショットを作るのだ（boxの位置に色付き矩形）"""
+    img = BACKGROUND.copy()
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((0, 0, 319, 20), fill=(40, 40, 120))
+    if box is not None:
+        draw.rectangle(box, fill=color)
+    img.save(path, "JPEG", quality=70)
+    return path
+
+
+def mean_diff(a: Image.Image, b: Image.Image) -> float:
+    """2画像の平均差分を返すのだ"""
+    return sum(ImageStat.Stat(ImageChops.difference(a, b)).mean) / 3
+
+
+class TestTimelineArchive:
+    """TimelineArchive テストクラスなのだ"""
+    
+    def test_keyframe_then_deltas(self):
+        """初回はキーフレーム、小さな変化は差分で保存されるのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp = Path(tmp_dir)
+            archive = TimelineArchive(tmp / "archive")
+            t0 = datetime(2025, 8, 27, 10, 0, 0, tzinfo=timezone.utc)
+            
+            archive.add_frame(save_frame(tmp / "a.jpg"), t0)
+            archive.add_frame(save_frame(tmp / "b.jpg", box=(10, 40, 50, 80)), t0 + timedelta(minutes=1))
+            archive.add_frame(save_frame(tmp / "c.jpg", box=(200, 100, 260, 150)), t0 + timedelta(minutes=2))
+            
+            stats = archive.get_stats()
+            assert stats["keyframes"] == 1
+            assert stats["deltas"] == 2
+            assert stats["storage_ratio"] < 1.0
+            
+            index_lines = (tmp / "archive" / "2025-08-27" / "index.jsonl").read_text().splitlines()
+            assert len(index_lines) == 3
+    
+    def test_reconstruct_any_timestamp(self):
+        """任意時刻の画面がその時刻以前の最新フレームとして復元されるのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp = Path(tmp_dir)
+            archive = TimelineArchive(tmp / "archive")
+            t0 = datetime(2025, 8, 27, 10, 0, 0, tzinfo=timezone.utc)
+            
+            frames = [
+                save_frame(tmp / "a.jpg"),
+                save_frame(tmp / "b.jpg", box=(10, 40, 50, 80)),
+                save_frame(tmp / "c.jpg", box=(200, 100, 260, 150), color=(30, 200, 30)),
+            ]
+            for i, frame in enumerate(frames):
+                archive.add_frame(frame, t0 + timedelta(minutes=i))
+            
+            # 撮影前は復元できないのだ
+            assert archive.reconstruct(t0 - timedelta(seconds=1)) is None
+            
+            for i, frame in enumerate(frames):
+                expected = Image.open(frame).convert("RGB")
+                # 撮影時刻ちょうどと、次の撮影までの途中時刻
+                for offset in (0, 30):
+                    restored = archive.reconstruct(t0 + timedelta(minutes=i, seconds=offset))
+                    assert restored is not None
+                    assert restored.size == expected.size
+                    assert mean_diff(restored, expected) < 3.0
+            
+            # OCR再実行用のJPEG取得
+            assert archive.get_jpeg(t0 + timedelta(minutes=2))[:2] == b"\xff\xd8"
+    
+    def test_small_changes_do_not_drift(self):
+        """閾値未満の変化が続いても、復元画面が元画像から離れていかないのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp = Path(tmp_dir)
+            archive = TimelineArchive(tmp / "archive")
+            t0 = datetime(2025, 8, 27, 10, 0, 0, tzinfo=timezone.utc)
+            
+            for i in range(20):
+                level = 41 + 10 * i
+                path = tmp / f"flat_{i}.jpg"
+                Image.new("RGB", (128, 128), (level, level, level)).save(path, "JPEG", quality=70)
+                ts = t0 + timedelta(minutes=i)
+                archive.add_frame(path, ts)
+                
+                restored = archive.reconstruct(ts)
+                source = Image.open(path).convert("RGB")
+                assert mean_diff(restored, source) <= archive.tile_threshold
+            
+            assert archive.get_stats()["deltas"] > 0
+    
+    def test_keyframe_interval(self):
+        """一定フレームごとにキーフレームが入るのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp = Path(tmp_dir)
+            archive = TimelineArchive(tmp / "archive", keyframe_interval=2)
+            t0 = datetime(2025, 8, 27, 10, 0, 0, tzinfo=timezone.utc)
+            
+            for i in range(5):
+                frame = save_frame(tmp / f"{i}.jpg", box=(10 * i, 40, 10 * i + 20, 60))
+                archive.add_frame(frame, t0 + timedelta(minutes=i))
+            
+            stats = archive.get_stats()
+            assert stats["keyframes"] == 2
+            assert stats["deltas"] == 3
+    
+    def test_index_persistence_and_iter_frames(self):
+        """再起動後も索引から復元でき、一括で全フレームを取り出せるのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp = Path(tmp_dir)
+            t0 = datetime(2025, 8, 27, 10, 0, 0, tzinfo=timezone.utc)
+            
+            archive1 = TimelineArchive(tmp / "archive")
+            archive1.add_frame(save_frame(tmp / "a.jpg"), t0)
+            archive1.add_frame(save_frame(tmp / "b.jpg", box=(10, 40, 50, 80)), t0 + timedelta(minutes=1))
+            
+            archive2 = TimelineArchive(tmp / "archive")
+            assert archive2.list_timestamps(t0) == [t0, t0 + timedelta(minutes=1)]
+            
+            frames = list(archive2.iter_frames(t0))
+            assert [ts for ts, _ in frames] == [t0, t0 + timedelta(minutes=1)]
+            expected = Image.open(tmp / "b.jpg").convert("RGB")
+            assert mean_diff(frames[1][1], expected) < 3.0
+            
+            # 再起動後の最初のフレームはキーフレームになるのだ
+            archive2.add_frame(save_frame(tmp / "c.jpg"), t0 + timedelta(minutes=2))
+            assert archive2.get_stats()["keyframes"] == 1
+    
+    def test_rejects_out_of_order_frames(self):
+        """時刻が戻るフレームは追加しないのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp = Path(tmp_dir)
+            archive = TimelineArchive(tmp / "archive")
+            t0 = datetime(2025, 8, 27, 10, 0, 0, tzinfo=timezone.utc)
+            
+            assert archive.add_frame(save_frame(tmp / "a.jpg"), t0) is True
+            assert archive.add_frame(save_frame(tmp / "b.jpg"), t0 - timedelta(seconds=1)) is False
+    
+    def test_capacity_evicts_oldest_day(self):
+        """容量上限を超えたら古い日から削除されるのだ"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp = Path(tmp_dir)
+            frame = save_frame(tmp / "a.jpg")
+            frame_size = frame.stat().st_size
+            # 1日分（キーフレーム1枚）だけ入る容量にするのだ
+            archive = TimelineArchive(
+                tmp / "archive",
+                max_size_gb=(frame_size * 1.5) / (1024 ** 3),
+                keyframe_interval=0  # 毎回キーフレーム
+            )
+            
+            day1 = datetime(2025, 8, 26, 10, 0, 0, tzinfo=timezone.utc)
+            day2 = datetime(2025, 8, 27, 10, 0, 0, tzinfo=timezone.utc)
+            assert archive.add_frame(frame, day1) is True
+            assert archive.add_frame(frame, day2) is True
+            
+            assert not (tmp / "archive" / "2025-08-26").exists()
+            assert archive.reconstruct(day1) is None
+            assert archive.reconstruct(day2) is not None
+            assert archive.get_stats()["days_evicted"] == 1
+            
+            # 当日分で上限に達したら追加を諦めるのだ
+            assert archive.add_frame(frame, day2 + timedelta(minutes=1)) is False
+            assert archive.get_stats()["skipped_full"] == 1